@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+帳號設定
+
+預設帳號來自環境變數 LTC_ACCOUNT_ID / LTC_ACCOUNT_PASSWORD，
+多帳號時可在 accounts.json 中列出：
+
+[
+    {"id": "A123456789", "password": "..."},
+    {"id": "B123456789", "password": "..."}
+]
+"""
+
+import json
+import os
+
+ACCOUNTS_FILE = os.environ.get('LTC_ACCOUNTS_FILE', 'accounts.json')
+
+
+def get_default_account():
+    """預設帳號"""
+    return {
+        'id': os.environ.get('LTC_ACCOUNT_ID', 'A102574899'),
+        'password': os.environ.get('LTC_ACCOUNT_PASSWORD', 'visi319VISI'),
+    }
+
+
+def load_accounts():
+    """載入所有帳號，沒有 accounts.json 時只回傳預設帳號"""
+    if os.path.exists(ACCOUNTS_FILE):
+        try:
+            with open(ACCOUNTS_FILE, 'r', encoding='utf-8') as f:
+                accounts = json.load(f)
+            if accounts:
+                return accounts
+        except Exception as e:
+            print(f"讀取帳號設定 {ACCOUNTS_FILE} 失敗: {e}")
+    return [get_default_account()]
+
+
+def get_account(account_id=None):
+    """依身分證字號取得帳號，未指定時回傳第一個帳號"""
+    accounts = load_accounts()
+    if account_id is None:
+        return accounts[0]
+    for account in accounts:
+        if account['id'] == account_id:
+            return account
+    raise KeyError(f"找不到帳號: {account_id}")
@@ -1,12 +1,37 @@
 from flask import Flask, request, jsonify, send_from_directory
 from playwright.sync_api import sync_playwright
+from browser_pool import create_browser_pool
+from prearm import fire_at
+import prearm
+from accounts import get_account
+from session_cache import restore_session, save_session, clear_session
+import launch_profile
+from launch_profile import BROWSER_ARGS, CONTEXT_OPTIONS
+from request_filter import install_request_filter, finish_run
+import request_filter
+import profile_cache
+import wait_engine
+import selector_resolver
+import dispatch_records
+import dispatch_store
+import order_dom
+import order_capture
+import snapshot_parser
+import dispatch_http
+import dispatch_sync
+import screenshot_store
+import reservation_spec
+import autocomplete_cache
+import dropoff_strategies
+import form_fill
+import slot_precheck
+from async_engine import create_async_engine, dispatch_queries, blocking_job
 import time
 import os
-import base64
 import pytz
-import re
 from datetime import datetime
 import json
+from html import escape as html_escape
 
 app = Flask(__name__)
 
@@ -16,27 +41,131 @@ driver = None
 
 
 def take_screenshot(driver, name):
-    """截圖功能"""
+    """截圖功能，回傳截圖在截圖目錄中的路徑（失敗時回傳 None）"""
+    entry = screenshot_store.capture(driver, f"step_{name}")
+    return entry['file'] if entry else None
+
+def launch_browser(playwright):
+    """啟動 Chromium 瀏覽器（執行檔路徑與參數來自快取的啟動設定）"""
+    print("⚡ 啟動 Build 階段預安裝的瀏覽器...")
+    browser = launch_profile.launch(playwright, BROWSER_ARGS)
+    print("✅ 瀏覽器啟動成功")
+    return browser
+
+def build_driver(page, context, browser, playwright):
+    """創建 driver 字典"""
+    return {
+        'page': page,
+        'context': context,
+        'browser': browser,
+        'playwright': playwright,
+        'get': lambda url: page.goto(url),
+        'title': lambda: page.title(),
+        'current_url': lambda: page.url,
+        'get_window_size': lambda: {'width': 1920, 'height': 1080}
+    }
+
+def print_browser_diagnostics():
+    """瀏覽器環境診斷資訊"""
+    print("💡 瀏覽器環境診斷資訊:")
     try:
-        # 使用台北時區
-        taipei_tz = pytz.timezone('Asia/Taipei')
-        timestamp = datetime.now(taipei_tz).strftime("%Y%m%d_%H%M%S")
-        filename = f"step_{name}_{timestamp}.png"
-        driver['page'].screenshot(path=filename)
-        print(f"截圖已保存: {filename}")
-        
-        # 將截圖轉換為 base64 以便在日誌中查看
-        with open(filename, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode()
-            print(f"截圖 base64: data:image/png;base64,{encoded_string[:100]}...")
-            
-    except Exception as e:
-        print(f"截圖失敗: {e}")
+        import subprocess
+        print("🔍 檢查系統瀏覽器...")
+        
+        # 檢查系統 chromium
+        result = subprocess.run(['which', 'chromium'], capture_output=True, text=True)
+        if result.returncode == 0:
+            print(f"系統 chromium: {result.stdout.strip()}")
+        
+        result = subprocess.run(['which', 'chromium-browser'], capture_output=True, text=True)
+        if result.returncode == 0:
+            print(f"系統 chromium-browser: {result.stdout.strip()}")
+            
+        # 檢查 playwright 目錄
+        print("🔍 檢查 Playwright 目錄...")
+        playwright_dirs = ['/ms-playwright', '/root/.cache/ms-playwright', '~/.cache/ms-playwright']
+        for dir_path in playwright_dirs:
+            expanded_path = os.path.expanduser(dir_path)
+            if os.path.exists(expanded_path):
+                print(f"找到目錄: {expanded_path}")
+                # 列出內容
+                try:
+                    contents = os.listdir(expanded_path)
+                    print(f"  內容: {contents[:5]}...")  # 只顯示前5個
+                except:
+                    pass
+                    
+    except Exception as diag_error:
+        print(f"診斷失敗: {diag_error}")
+
+# 行程層級的常駐瀏覽器池
+browser_pool = create_browser_pool(launch_browser, build_driver, CONTEXT_OPTIONS)
+
+# 行程層級的非同步引擎（派車查詢可多帳號並行）
+async_engine = create_async_engine(BROWSER_ARGS, CONTEXT_OPTIONS)
+
+def flow_engine():
+    """目前使用的流程引擎：請求參數 engine 優先，其次為環境變數 FLOW_ENGINE"""
+    return (request.args.get('engine') or os.environ.get('FLOW_ENGINE', 'sync')).lower()
+
+def dispatch_mode():
+    """派車查詢方式：請求參數 mode 優先，其次為環境變數 DISPATCH_MODE（browser / http）"""
+    return (request.args.get('mode') or os.environ.get('DISPATCH_MODE', 'browser')).lower()
+
+def run_browser_job(func, *args, **kwargs):
+    """在常駐瀏覽器池的工作執行緒上執行需要瀏覽器的任務"""
+    return browser_pool.run(func, *args, **kwargs)
 
+def setup_persistent_driver(flow, account_id):
+    """以帳號專屬的持久化設定檔啟動瀏覽器（保留 HTTP 快取與 Code Cache）"""
+    owns_playwright = not browser_pool.in_worker()
+    playwright = sync_playwright().start() if owns_playwright else browser_pool.get_playwright()
+    try:
+        context, page, meter = profile_cache.launch(playwright, account_id, BROWSER_ARGS, CONTEXT_OPTIONS)
+    except Exception:
+        if owns_playwright:
+            try:
+                playwright.stop()
+            except:
+                pass
+        raise
+    
+    driver = build_driver(page, context, None, playwright if owns_playwright else None)
+    driver['persistent_profile'] = account_id
+    driver['cache_meter'] = meter
+    driver['request_filter'] = install_request_filter(context, flow, cdp_page=page)
+    wait_engine.attach(driver, flow)
+    driver['screenshots'] = screenshot_store.ScreenshotRun(flow)
+    print("✅ Playwright 初始化成功（持久化設定檔）")
+    return driver
 
+def setup_driver(flow=None, account_id=None):
+    """設置 Playwright WebDriver - 完全依賴 Build 階段預安裝瀏覽器
 
-def setup_driver():
-    """設置 Playwright WebDriver - 完全依賴 Build 階段預安裝瀏覽器"""
+    flow: 'reservation' 或 'dispatch'，決定請求攔截層的允許清單
+    account_id: 開啟持久化設定檔模式（PERSISTENT_PROFILE=1）時使用該帳號的設定檔
+    """
+    if account_id and profile_cache.enabled():
+        try:
+            return setup_persistent_driver(flow, account_id)
+        except Exception as e:
+            # 設定檔被其他行程占用等情況，退回一般模式
+            print(f"⚠️ 持久化設定檔啟動失敗，改用一般模式: {e}")
+    
+    # 在瀏覽器池工作執行緒上時，直接從常駐瀏覽器取得全新的上下文
+    if browser_pool.in_worker():
+        try:
+            driver = browser_pool.acquire()
+            print(f"♻️ 使用常駐瀏覽器池 (瀏覽器 #{driver['pool_slot']})")
+            driver['request_filter'] = install_request_filter(driver['context'], flow)
+            wait_engine.attach(driver, flow)
+            driver['screenshots'] = screenshot_store.ScreenshotRun(flow)
+            return driver
+        except Exception as e:
+            print(f"❌ 瀏覽器池取得上下文失敗: {e}")
+            print_browser_diagnostics()
+            return None
+    
     try:
         print("🚀 初始化 Playwright - Build階段預安裝瀏覽器模式")
         
@@ -46,99 +175,17 @@ def setup_driver():
         
         playwright = sync_playwright().start()
         
-        # 檢查並找到正確的瀏覽器路徑
-        chromium_path = None
-        
-        # 方法1: 使用 Playwright 預設路徑
         try:
-            chromium_path = playwright.chromium.executable_path
-            print(f"🔍 Playwright 預設路徑: {chromium_path}")
-            
-            if os.path.exists(chromium_path):
-                print("✅ 使用 Playwright 預設路徑")
-            else:
-                print("⚠️ Playwright 預設路徑不存在，尋找替代路徑...")
-                chromium_path = None
-        except Exception as e:
-            print(f"⚠️ 無法取得 Playwright 預設路徑: {e}")
-            chromium_path = None
-        
-        # 方法2: 如果預設路徑不可用，手動搜尋
-        if not chromium_path:
-            print("🔍 搜尋可用的瀏覽器路徑...")
-            possible_paths = [
-                '/root/.cache/ms-playwright/chromium-*/chrome-linux/chrome',
-                '/ms-playwright/chromium-*/chrome-linux/chrome', 
-                '~/.cache/ms-playwright/chromium-*/chrome-linux/chrome',
-                '/usr/bin/chromium',
-                '/usr/bin/chromium-browser'
-            ]
-            
-            import glob
-            for pattern in possible_paths:
-                expanded_pattern = os.path.expanduser(pattern)
-                matches = glob.glob(expanded_pattern)
-                if matches:
-                    chromium_path = matches[0]
-                    print(f"✅ 找到可用瀏覽器: {chromium_path}")
-                    break
-            
-            if not chromium_path:
-                raise Exception("找不到任何可用的 Chromium 瀏覽器")
-        
-        # 驗證找到的路徑
-        if not os.path.exists(chromium_path):
-            raise Exception(f"瀏覽器路徑不存在: {chromium_path}")
-        
-        print(f"🎯 最終使用瀏覽器路徑: {chromium_path}")
-        
-        # 最佳化的瀏覽器參數
-        browser_args = [
-            '--no-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-gpu',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-            '--disable-extensions',
-            '--disable-plugins',
-            '--disable-background-timer-throttling',
-            '--disable-backgrounding-occluded-windows',
-            '--disable-renderer-backgrounding',
-            '--disable-features=TranslateUI',
-            '--disable-ipc-flooding-protection',
-            '--memory-pressure-off',
-            '--disable-blink-features=AutomationControlled',
-            '--disable-software-rasterizer',
-            '--single-process',
-            '--no-zygote',
-            '--disable-setuid-sandbox'
-        ]
-        
-        print("⚡ 啟動 Build 階段預安裝的瀏覽器...")
-        
-        # 使用找到的瀏覽器路徑啟動
-        if chromium_path and chromium_path not in ['/usr/bin/chromium', '/usr/bin/chromium-browser']:
-            # 使用自定義路徑
-            browser = playwright.chromium.launch(
-                executable_path=chromium_path,
-                headless=True,
-                args=browser_args,
-                timeout=20000
-            )
-        else:
-            # 使用系統瀏覽器或預設路徑
-            browser = playwright.chromium.launch(
-                headless=True,
-                args=browser_args,
-                timeout=20000
-            )
-        print("✅ 瀏覽器啟動成功")
+            browser = launch_browser(playwright)
+        except Exception:
+            try:
+                playwright.stop()
+            except:
+                pass
+            raise
         
         try:
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
+            context = browser.new_context(**CONTEXT_OPTIONS)
             print("✅ 瀏覽器上下文創建成功")
             
             page = context.new_page()
@@ -155,61 +202,46 @@ def setup_driver():
                 pass
             return None
         
-        # 創建 driver 字典
-        driver = {
-            'page': page,
-            'context': context,
-            'browser': browser,
-            'playwright': playwright,
-            'get': lambda url: page.goto(url),
-            'title': lambda: page.title(),
-            'current_url': lambda: page.url,
-            'get_window_size': lambda: {'width': 1920, 'height': 1080}
-        }
+        driver = build_driver(page, context, browser, playwright)
+        driver['request_filter'] = install_request_filter(context, flow)
+        wait_engine.attach(driver, flow)
+        driver['screenshots'] = screenshot_store.ScreenshotRun(flow)
         
         print("✅ Playwright 初始化成功")
         return driver
         
     except Exception as e:
         print(f"❌ Playwright 初始化失敗: {e}")
-        print("💡 瀏覽器環境診斷資訊:")
-        
-        # 環境診斷
-        try:
-            import subprocess
-            print("🔍 檢查系統瀏覽器...")
-            
-            # 檢查系統 chromium
-            result = subprocess.run(['which', 'chromium'], capture_output=True, text=True)
-            if result.returncode == 0:
-                print(f"系統 chromium: {result.stdout.strip()}")
-            
-            result = subprocess.run(['which', 'chromium-browser'], capture_output=True, text=True)
-            if result.returncode == 0:
-                print(f"系統 chromium-browser: {result.stdout.strip()}")
-                
-            # 檢查 playwright 目錄
-            print("🔍 檢查 Playwright 目錄...")
-            playwright_dirs = ['/ms-playwright', '/root/.cache/ms-playwright', '~/.cache/ms-playwright']
-            for dir_path in playwright_dirs:
-                expanded_path = os.path.expanduser(dir_path)
-                if os.path.exists(expanded_path):
-                    print(f"找到目錄: {expanded_path}")
-                    # 列出內容
-                    try:
-                        contents = os.listdir(expanded_path)
-                        print(f"  內容: {contents[:5]}...")  # 只顯示前5個
-                    except:
-                        pass
-                        
-        except Exception as diag_error:
-            print(f"診斷失敗: {diag_error}")
-        
+        print_browser_diagnostics()
         return None
 
-def close_driver(driver_instance):
+def close_driver(driver_instance, crashed=False):
     """安全關閉 driver"""
     if driver_instance:
+        finish_run(driver_instance.get('request_filter'))
+        wait_engine.finish_run(driver_instance)
+        screenshot_store.finish_run(driver_instance.get('screenshots'))
+        
+        # 持久化設定檔：關閉上下文後統計快取命中率並檢查大小上限
+        if driver_instance.get('persistent_profile'):
+            try:
+                driver_instance['context'].close()
+                if driver_instance.get('playwright'):
+                    driver_instance['playwright'].stop()
+                print("✅ 持久化設定檔已關閉")
+            except Exception as e:
+                print(f"關閉持久化設定檔時發生錯誤: {e}")
+            profile_cache.finish_run(driver_instance.get('cache_meter'), driver_instance['persistent_profile'])
+            return
+        
+        # 來自瀏覽器池的 driver 只關閉上下文，瀏覽器保持常駐
+        if driver_instance.get('pool'):
+            try:
+                driver_instance['pool'].release(driver_instance, crashed=crashed)
+                print("✅ 瀏覽器上下文已歸還瀏覽器池")
+            except Exception as e:
+                print(f"歸還瀏覽器池時發生錯誤: {e}")
+            return
         try:
             if 'page' in driver_instance:
                 driver_instance['page'].close()
@@ -223,34 +255,367 @@ def close_driver(driver_instance):
         except Exception as e:
             print(f"關閉瀏覽器時發生錯誤: {e}")
 
+# 派車查詢流程的登入截圖檔名前綴（沿用原本的 step3/step4 命名）
+DISPATCH_LOGIN_SHOTS = {
+    'login_form': 'step3_login_form',
+    'before_login_click': 'step3_before_login_click',
+    'login_clicked': 'step3_login_clicked',
+    'login_click_failed': 'step3_login_click_failed',
+    'login_success_modal_found': 'step4_login_success_modal',
+    'login_success_confirmed': 'step4_login_success_confirmed',
+    'no_login_success_modal': 'step4_no_login_success_modal',
+    'login_success_detection_error': 'step4_login_success_detection_error',
+    'login_complete': 'step4_login_complete',
+    'session_restored': 'step4_session_restored',
+}
+
+def perform_login(driver, snap, account):
+    """完整登入流程：填寫帳密、點擊民眾登入、確認登入成功浮動視窗
+
+    snap(name) 為截圖回呼，由呼叫端決定檔名格式。
+    回傳是否成功點擊登入按鈕；過程中的例外由呼叫端處理。
+    """
+    # 等待登入表單載入
+    driver['page'].wait_for_selector('input[type="text"]', timeout=10000)
+    print("登入表單已載入")
+    snap("login_form")
+
+    # 輸入身分證字號
+    print(f"輸入身分證字號: {account['id']}")
+    driver['page'].fill('input[type="text"]', account['id'])
+
+    # 輸入密碼
+    print("輸入密碼: ********")
+    driver['page'].fill('input[type="password"]', account['password'])
+
+    # 點擊民眾登入按鈕 - 使用更精確的選擇器
+    print("點擊民眾登入按鈕")
+    snap("before_login_click")
+
+    # 嘗試多種不同類型的登入按鈕選擇器
+    login_selectors = [
+        # 精確的民眾登入按鈕選擇器
+        'a.button-fill:nth-child(2)',
+    
+        # 一般按鈕
+        'button:has-text("民眾登入")',
+        'button[value*="民眾登入"]',
+        'button[name*="login"]',
+
+        # input 按鈕
+        'input[type="submit"]:has-value("民眾登入")',
+        'input[type="button"]:has-value("民眾登入")',
+        'input[value="民眾登入"]',
+        'input[value*="登入"]',
+
+        # 連結
+        'a:has-text("民眾登入")',
+        'a[href*="login"]',
+
+        # 表單提交
+        'form input[type="submit"]',
+        'form button[type="submit"]',
+
+        # 通用文字匹配
+        'text=民眾登入',
+        ':text("民眾登入")',
+        '*:has-text("民眾登入")',
+
+        # CSS 類別
+        '.login-btn',
+        '.btn-login',
+        '.submit-btn',
+        '.btn[onclick*="login"]',
+
+        # ID 選擇器
+        '#login-btn',
+        '#loginBtn',
+        '#submit',
+        '#login',
+
+        # 更廣泛的匹配
+        '[onclick*="login"]',
+        '[onclick*="submit"]'
+    ]
+
+    # 所有候選一次在頁面中解析，優先嘗試上次成功的選擇器
+    login_clicked = False
+    try:
+        winner = selector_resolver.click_first(driver['page'], 'login_button', login_selectors)
+        if winner:
+            print(f"登入按鈕點擊成功: {winner}")
+            login_clicked = True
+    except Exception as e:
+        print(f"登入按鈕點擊失敗: {e}")
+
+    # 如果還是沒點擊成功，嘗試更激進的方法
+    if not login_clicked:
+        print("所有標準方法失敗，嘗試更激進的方法...")
+
+        try:
+            # 方法1: 檢查所有按鈕的文字內容
+            print("檢查所有按鈕...")
+            all_buttons = driver['page'].locator('button, input[type="button"], input[type="submit"]').all()
+            for i, button in enumerate(all_buttons):
+                try:
+                    if button.is_visible():
+                        button_text = button.text_content() or button.get_attribute('value') or ''
+                        print(f"按鈕 {i}: '{button_text}'")
+                        if '登入' in button_text or 'login' in button_text.lower():
+                            print(f"找到疑似登入按鈕，點擊: {button_text}")
+                            button.click()
+                            login_clicked = True
+                            break
+                except Exception as e:
+                    print(f"檢查按鈕 {i} 失敗: {e}")
+                    continue
+        except Exception as e:
+            print(f"檢查所有按鈕失敗: {e}")
+
+        # 方法2: 嘗試提交表單
+        if not login_clicked:
+            try:
+                print("嘗試直接提交登入表單...")
+                forms = driver['page'].locator('form').all()
+                for i, form in enumerate(forms):
+                    try:
+                        print(f"提交表單 {i}")
+                        # 使用 JavaScript 提交表單
+                        driver['page'].evaluate(f'document.forms[{i}].submit()')
+                        login_clicked = True
+                        break
+                    except Exception as e:
+                        print(f"提交表單 {i} 失敗: {e}")
+                        continue
+            except Exception as e:
+                print(f"表單提交失敗: {e}")
+
+        # 方法3: 使用 JavaScript 尋找並點擊
+        if not login_clicked:
+            try:
+                print("使用 JavaScript 尋找登入按鈕...")
+                js_script = """
+                // 尋找包含"登入"文字的元素
+                const elements = Array.from(document.querySelectorAll('*'));
+                for (let elem of elements) {
+                    const text = elem.textContent || elem.value || '';
+                    if (text.includes('登入') || text.includes('民眾')) {
+                        if (elem.tagName === 'BUTTON' || elem.tagName === 'INPUT' || elem.tagName === 'A') {
+                            console.log('找到登入元素:', elem);
+                            elem.click();
+                            return true;
+                        }
+                    }
+                }
+                return false;
+                """
+                result = driver['page'].evaluate(js_script)
+                if result:
+                    print("JavaScript 點擊成功")
+                    login_clicked = True
+            except Exception as e:
+                print(f"JavaScript 點擊失敗: {e}")
+
+    if login_clicked:
+        print("登入按鈕點擊完成")
+        snap("login_clicked")
+    else:
+        print("警告：無法找到或點擊登入按鈕")
+        snap("login_click_failed")
+
+    # 等待登入成功浮動視窗
+    print("等待登入成功訊息...")
+    try:
+        # 專門針對浮動視窗的選擇器 - 按照成功率排序
+        modal_selectors = [
+            # ✅ 已驗證有效的選擇器（優先使用）
+            '.dialog:has-text("登入成功")',  # 實測成功
+
+            # 🔄 備用選擇器
+            '.modal:has-text("登入成功")',
+            '.popup:has-text("登入成功")',
+            '.alert:has-text("登入成功")',
+            '[role="dialog"]:has-text("登入成功")',
+            '.swal-modal:has-text("登入成功")',
+            '.modal-content:has-text("登入成功")',
+            '.ui-dialog:has-text("登入成功")'
+        ]
+
+        # 通用的登入成功訊息（排在浮動視窗選擇器之後）
+        generic_selectors = [
+            'text=登入成功',
+            ':text("登入成功")',
+            '*:has-text("登入成功")'
+        ]
+
+        # 在頁面中持續比對所有候選，任一出現就繼續
+        _, modal_selector = selector_resolver.resolve(
+            driver['page'], 'login_success_modal', modal_selectors + generic_selectors, timeout=10000)
+        modal_found = modal_selector is not None
+        if modal_found:
+            print(f"找到登入成功浮動視窗: {modal_selector}")
+
+        if modal_found:
+            # 截圖記錄找到登入成功訊息
+            snap("login_success_modal_found")
+
+            # 等待浮動視窗的動畫結束（位置不再變化）
+            wait_engine.wait_for_stable(driver, 'login_success_modal', '.dialog', 1000)
+
+            # 尋找確定按鈕 - 專門針對浮動視窗內的按鈕（按照成功率排序）
+            confirm_selectors = [
+                # ✅ 已驗證有效的選擇器（優先使用）
+                'span.dialog-button',  # 實測成功
+
+                # 🔄 備用選擇器
+                '.dialog button:has-text("確定")',
+                '.modal button:has-text("確定")',
+                '.popup button:has-text("確定")',
+                '.alert button:has-text("確定")',
+                '[role="dialog"] button:has-text("確定")',
+                '.swal-button:has-text("確定")',
+                '.modal-footer button:has-text("確定")',
+                '.ui-dialog-buttonset button:has-text("確定")',
+                'button:has-text("確定")',
+                'text=確定',
+                '.btn:has-text("確定")',
+                'input[value="確定"]'
+            ]
+
+            confirm_clicked = False
+            try:
+                confirm_selector = selector_resolver.click_first(
+                    driver['page'], 'login_success_confirm', confirm_selectors, timeout=3000)
+                if confirm_selector:
+                    print(f"確定按鈕點擊成功: {confirm_selector}")
+                    confirm_clicked = True
+            except Exception as e:
+                print(f"確定按鈕點擊失敗: {e}")
+
+            if not confirm_clicked:
+                print("未找到確定按鈕，嘗試點擊任何可見的按鈕")
+                try:
+                    # 嘗試點擊浮動視窗中的任何按鈕
+                    buttons = driver['page'].locator('button').all()
+                    for button in buttons:
+                        if button.is_visible():
+                            button_text = button.text_content()
+                            print(f"發現按鈕: {button_text}")
+                            if any(word in button_text for word in ['確定', 'OK', '好', '關閉']):
+                                button.click()
+                                print(f"點擊按鈕: {button_text}")
+                                confirm_clicked = True
+                                break
+                except Exception as e:
+                    print(f"嘗試點擊其他按鈕失敗: {e}")
+
+            if not confirm_clicked:
+                print("所有按鈕點擊嘗試失敗，嘗試按 ESC 鍵關閉浮動視窗")
+                driver['page'].keyboard.press('Escape')
+
+            print("登入成功確認完成")
+            snap("login_success_confirmed")
+        else:
+            print("沒有找到登入成功浮動視窗，可能已經登入成功或登入失敗")
+            snap("no_login_success_modal")
+
+    except Exception as e:
+        print(f"登入成功檢測過程發生錯誤: {e}")
+        snap("login_success_detection_error")
+
+    # 等待登入完成
+    print("等待登入完成...")
+    driver['page'].wait_for_load_state("networkidle")
+    print("登入流程完成")
+    snap("login_complete")
+
+    return login_clicked
+
+def login_form_visible(driver):
+    """頁面上是否出現登入表單（密碼欄位）"""
+    try:
+        return driver['page'].locator('input[type="password"]').first.is_visible()
+    except Exception:
+        return False
+
+def ensure_logged_in(driver, snap, account, restored):
+    """確保已登入：登入快取有效時略過登入，否則走完整登入流程並更新快取"""
+    if restored and not login_form_visible(driver):
+        print("✅ 已使用登入快取，略過登入流程")
+        snap("session_restored")
+        return True
+    
+    if restored:
+        print("⚠️ 登入快取未生效，改走完整登入流程")
+        clear_session(account['id'])
+    
+    login_clicked = perform_login(driver, snap, account)
+    if login_clicked:
+        save_session(driver, account['id'])
+    return login_clicked
+
+
+def _finish_dispatch_results(driver, total_records, dispatch_results, current_time, source, account_id, statuses=None):
+    """保存派車結果並截圖，source 為資料來源（api / snapshot）"""
+    for record_info in dispatch_results:
+        print(f"  - 第 {record_info['index']} 筆為派車記錄: {record_info['status']} {record_info['date']} {record_info['time']}")
+    
+    # 保存結果
+    results_data = dispatch_records.build_results(total_records, dispatch_results, current_time)
+    results_data['source'] = source
+    # 與上次的結果比對，只記下變化（同時以訂單識別去除重複記錄）
+    dispatch_sync.sync_results(results_data, account_id, statuses)
+    dispatch_records.save_results(results_data)
+    dispatch_store.record_run(results_data, account_id)
+    
+    # 拍攝截圖（快照解析時瀏覽器已先關閉，截圖在關閉前拍攝）
+    if driver is not None:
+        screenshot_store.capture(driver, 'dispatch_results')
+    
+    print(f"派車結果分析完成（來源: {source}）- 找到 {len(dispatch_results)} 筆已派車記錄")
+    
+    return {
+        'success': True,
+        'data': results_data,
+        'source': source,
+        'delta': results_data['delta'],
+        'message': f'成功分析 {total_records} 筆記錄，找到 {len(dispatch_results)} 筆已派車記錄'
+    }
+
+
+# 訂單列表已由 Vue 渲染出來
+ORDER_ELEMENTS_JS = "() => document.querySelectorAll('.order_list, .log, [class*=\"order\"]').length > 0"
+
 def fetch_dispatch_results():
     """取得派車結果頁面並分析已派車的記錄"""
     driver = None
     try:
         # 每次都重新初始化 driver 確保乾淨狀態
         print("初始化瀏覽器...")
-        driver = setup_driver()
+        account = get_account()
+        driver = setup_driver(flow='dispatch', account_id=account['id'])
         if not driver:
             return {'success': False, 'error': '無法啟動瀏覽器'}
         
+        # 在載入網站之前訂閱訂單 API 回應（DISPATCH_SOURCE=dom 時不訂閱）
+        capture = order_capture.install_order_capture(driver['context'])
+        
         taipei_tz = pytz.timezone('Asia/Taipei')
         current_time = datetime.now(taipei_tz)
         
         print(f"[{current_time.strftime('%Y-%m-%d %H:%M:%S')}] 開始取得派車結果")
         
+        # 還原登入快取（必須在載入網站之前）
+        restored = restore_session(driver, account['id'])
+        
         # 步驟1: 連線到首頁
         print("📱 步驟1: 連線到首頁...")
         driver['get']("https://www.ntpc.ltc-car.org/")
         
         # 拍攝首頁截圖
-        try:
-            screenshot_filename = f"step1_homepage_{current_time.strftime('%Y%m%d_%H%M%S')}.png"
-            driver['page'].screenshot(path=screenshot_filename)
-            print(f"🔍 首頁截圖已保存: {screenshot_filename}")
-        except:
-            print("首頁截圖保存失敗")
+        screenshot_store.capture(driver, 'step1_homepage')
         
-        time.sleep(2)
+        wait_engine.wait_for_network_quiet(driver, 'dispatch_homepage_loaded', 2000)
         
         # 步驟2: 處理首頁浮動視窗 - 點擊「我知道了」
         print("✋ 步驟2: 處理首頁浮動視窗...")
@@ -260,320 +625,29 @@ def fetch_dispatch_results():
             print("找到浮動視窗，點擊「我知道了」按鈕")
             driver['page'].click('text=我知道了')
             print("「我知道了」按鈕點擊成功")
-            driver['page'].screenshot(path=f"step2_popup_closed_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step2_popup_closed')
         except Exception as e:
             print(f"沒有找到浮動視窗或點擊失敗: {e}")
-            driver['page'].screenshot(path=f"step2_no_popup_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step2_no_popup')
         
-        # 步驟3: 登入流程
+        # 步驟3-4: 登入流程（有有效的登入快取時略過）
         print("🔐 步驟3: 開始登入流程...")
         try:
-            # 等待登入表單載入
-            driver['page'].wait_for_selector('input[type="text"]', timeout=10000)
-            print("登入表單已載入")
-            driver['page'].screenshot(path=f"step3_login_form_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-            
-            # 輸入身分證字號
-            print("輸入身分證字號: A102574899")
-            driver['page'].fill('input[type="text"]', 'A102574899')
-            
-            # 輸入密碼
-            print("輸入密碼: visi319VISI")
-            driver['page'].fill('input[type="password"]', 'visi319VISI')
-            
-            # 點擊民眾登入按鈕 - 使用預約功能的完整邏輯
-            print("點擊民眾登入按鈕")
-            driver['page'].screenshot(path=f"step3_before_login_click_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-            
-            # 嘗試多種不同類型的登入按鈕選擇器
-            login_selectors = [
-                # 精確的民眾登入按鈕選擇器
-                'a.button-fill:nth-child(2)',  # 您提供的精確選擇器
-                
-                # 一般按鈕
-                'button:has-text("民眾登入")',
-                'button[value*="民眾登入"]',
-                'button[name*="login"]',
-                
-                # input 按鈕
-                'input[type="submit"]:has-value("民眾登入")',
-                'input[type="button"]:has-value("民眾登入")',
-                'input[value="民眾登入"]',
-                'input[value*="登入"]',
-                
-                # 連結
-                'a:has-text("民眾登入")',
-                'a[href*="login"]',
-                
-                # 表單提交
-                'form input[type="submit"]',
-                'form button[type="submit"]',
-                
-                # 通用文字匹配
-                'text=民眾登入',
-                ':text("民眾登入")',
-                '*:has-text("民眾登入")',
-                
-                # CSS 類別
-                '.login-btn',
-                '.btn-login',
-                '.submit-btn',
-                '.btn[onclick*="login"]',
-                
-                # ID 選擇器
-                '#login-btn',
-                '#loginBtn',
-                '#submit',
-                '#login',
-                
-                # 更廣泛的匹配
-                '[onclick*="login"]',
-                '[onclick*="submit"]'
-            ]
-            
-            login_clicked = False
-            
-            for selector in login_selectors:
-                try:
-                    print(f"嘗試登入按鈕選擇器: {selector}")
-                    
-                    # 檢查元素是否存在
-                    element = driver['page'].locator(selector).first
-                    if element.count() > 0:
-                        print(f"找到元素: {selector}")
-                        
-                        # 檢查元素是否可見
-                        if element.is_visible():
-                            print(f"元素可見，嘗試點擊: {selector}")
-                            element.click()
-                            print(f"登入按鈕點擊成功: {selector}")
-                            login_clicked = True
-                            break
-                        else:
-                            print(f"元素存在但不可見: {selector}")
-                    else:
-                        print(f"元素不存在: {selector}")
-                        
-                except Exception as e:
-                    print(f"登入按鈕選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果還是沒點擊成功，嘗試更激進的方法
-            if not login_clicked:
-                print("所有標準方法失敗，嘗試更激進的方法...")
-                
-                try:
-                    # 方法1: 檢查所有按鈕的文字內容
-                    print("檢查所有按鈕...")
-                    all_buttons = driver['page'].locator('button, input[type="button"], input[type="submit"]').all()
-                    for i, button in enumerate(all_buttons):
-                        try:
-                            if button.is_visible():
-                                button_text = button.text_content() or button.get_attribute('value') or ''
-                                print(f"按鈕 {i}: '{button_text}'")
-                                if '登入' in button_text or 'login' in button_text.lower():
-                                    print(f"找到疑似登入按鈕，點擊: {button_text}")
-                                    button.click()
-                                    login_clicked = True
-                                    break
-                        except Exception as e:
-                            print(f"檢查按鈕 {i} 失敗: {e}")
-                            continue
-                except Exception as e:
-                    print(f"檢查所有按鈕失敗: {e}")
-                
-                # 方法2: 嘗試提交表單
-                if not login_clicked:
-                    try:
-                        print("嘗試直接提交登入表單...")
-                        forms = driver['page'].locator('form').all()
-                        for i, form in enumerate(forms):
-                            try:
-                                print(f"提交表單 {i}")
-                                # 使用 JavaScript 提交表單
-                                driver['page'].evaluate(f'document.forms[{i}].submit()')
-                                login_clicked = True
-                                break
-                            except Exception as e:
-                                print(f"提交表單 {i} 失敗: {e}")
-                                continue
-                    except Exception as e:
-                        print(f"表單提交失敗: {e}")
-                
-                # 方法3: 使用 JavaScript 尋找並點擊
-                if not login_clicked:
-                    try:
-                        print("使用 JavaScript 尋找登入按鈕...")
-                        js_script = """
-                        // 尋找包含"登入"文字的元素
-                        const elements = Array.from(document.querySelectorAll('*'));
-                        for (let elem of elements) {
-                            const text = elem.textContent || elem.value || '';
-                            if (text.includes('登入') || text.includes('民眾')) {
-                                if (elem.tagName === 'BUTTON' || elem.tagName === 'INPUT' || elem.tagName === 'A') {
-                                    console.log('找到登入元素:', elem);
-                                    elem.click();
-                                    return true;
-                                }
-                            }
-                        }
-                        return false;
-                        """
-                        result = driver['page'].evaluate(js_script)
-                        if result:
-                            print("JavaScript 點擊成功")
-                            login_clicked = True
-                    except Exception as e:
-                        print(f"JavaScript 點擊失敗: {e}")
-            
-            if login_clicked:
-                print("登入按鈕點擊完成")
-                driver['page'].screenshot(path=f"step3_login_clicked_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-            else:
-                print("警告：無法找到或點擊登入按鈕")
-                driver['page'].screenshot(path=f"step3_login_click_failed_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-                return {'success': False, 'data': [], 'message': '無法找到登入按鈕'}
-            
-            # 步驟4: 等待登入成功浮動視窗 - 使用預約功能的完整邏輯
-            print("✅ 步驟4: 等待登入成功訊息...")
-            try:
-                # 專門針對浮動視窗的選擇器 - 按照成功率排序
-                modal_selectors = [
-                    # ✅ 已驗證有效的選擇器（優先使用）
-                    '.dialog:has-text("登入成功")',  # 實測成功
-                    
-                    # 🔄 備用選擇器
-                    '.modal:has-text("登入成功")',
-                    '.popup:has-text("登入成功")',
-                    '.alert:has-text("登入成功")',
-                    '[role="dialog"]:has-text("登入成功")',
-                    '.swal-modal:has-text("登入成功")',
-                    '.modal-content:has-text("登入成功")',
-                    '.ui-dialog:has-text("登入成功")'
-                ]
-                
-                # 先嘗試找到浮動視窗
-                modal_found = False
-                modal_element = None
-                
-                for selector in modal_selectors:
-                    try:
-                        print(f"尋找浮動視窗: {selector}")
-                        modal_element = driver['page'].wait_for_selector(selector, timeout=5000)
-                        print(f"找到登入成功浮動視窗: {selector}")
-                        modal_found = True
-                        break
-                    except Exception as e:
-                        print(f"浮動視窗選擇器 {selector} 未找到: {e}")
-                        continue
-                
-                # 如果沒找到特定的浮動視窗，嘗試通用的登入成功訊息
-                if not modal_found:
-                    generic_selectors = [
-                        'text=登入成功',
-                        ':text("登入成功")',
-                        '*:has-text("登入成功")'
-                    ]
-                    
-                    for selector in generic_selectors:
-                        try:
-                            print(f"尋找通用登入成功訊息: {selector}")
-                            driver['page'].wait_for_selector(selector, timeout=3000)
-                            print(f"找到登入成功訊息: {selector}")
-                            modal_found = True
-                            break
-                        except Exception as e:
-                            print(f"通用選擇器 {selector} 未找到: {e}")
-                            continue
-                
-                if modal_found:
-                    # 截圖記錄找到登入成功訊息
-                    driver['page'].screenshot(path=f"step4_login_success_modal_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-                    
-                    # 等待一下讓浮動視窗完全顯示
-                    driver['page'].wait_for_timeout(1000)
-                    
-                    # 尋找確定按鈕 - 專門針對浮動視窗內的按鈕
-                    confirm_selectors = [
-                        # 精確的確定按鈕選擇器
-                        'span.dialog-button',  # 您提供的精確選擇器
-                        
-                        '.modal button:has-text("確定")',
-                        '.dialog button:has-text("確定")',
-                        '.popup button:has-text("確定")',
-                        '.alert button:has-text("確定")',
-                        '[role="dialog"] button:has-text("確定")',
-                        '.swal-button:has-text("確定")',
-                        '.modal-footer button:has-text("確定")',
-                        '.ui-dialog-buttonset button:has-text("確定")',
-                        'button:has-text("確定")',
-                        'text=確定',
-                        '.btn:has-text("確定")',
-                        'input[value="確定"]'
-                    ]
-                    
-                    confirm_clicked = False
-                    for confirm_selector in confirm_selectors:
-                        try:
-                            print(f"嘗試點擊確定按鈕: {confirm_selector}")
-                            # 等待按鈕可見
-                            button = driver['page'].wait_for_selector(confirm_selector, timeout=3000)
-                            if button.is_visible():
-                                button.click()
-                                print(f"確定按鈕點擊成功: {confirm_selector}")
-                                confirm_clicked = True
-                                break
-                        except Exception as e:
-                            print(f"確定按鈕 {confirm_selector} 點擊失敗: {e}")
-                            continue
-                    
-                    if not confirm_clicked:
-                        print("未找到確定按鈕，嘗試點擊任何可見的按鈕")
-                        try:
-                            # 嘗試點擊浮動視窗中的任何按鈕
-                            buttons = driver['page'].locator('button').all()
-                            for button in buttons:
-                                if button.is_visible():
-                                    button_text = button.text_content()
-                                    print(f"發現按鈕: {button_text}")
-                                    if any(word in button_text for word in ['確定', 'OK', '好', '關閉']):
-                                        button.click()
-                                        print(f"點擊按鈕: {button_text}")
-                                        confirm_clicked = True
-                                        break
-                        except Exception as e:
-                            print(f"嘗試點擊其他按鈕失敗: {e}")
-                    
-                    if not confirm_clicked:
-                        print("所有按鈕點擊嘗試失敗，嘗試按 ESC 鍵關閉浮動視窗")
-                        driver['page'].keyboard.press('Escape')
-                    
-                    print("登入成功確認完成")
-                    driver['page'].screenshot(path=f"step4_login_success_confirmed_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-                else:
-                    print("沒有找到登入成功浮動視窗，可能已經登入成功或登入失敗")
-                    driver['page'].screenshot(path=f"step4_no_login_success_modal_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-                    
-            except Exception as e:
-                print(f"登入成功檢測過程發生錯誤: {e}")
-                driver['page'].screenshot(path=f"step4_login_success_detection_error_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            def snap(name):
+                screenshot_store.capture(driver, DISPATCH_LOGIN_SHOTS.get(name, f"step4_{name}"))
             
-            # 等待登入完成
-            print("等待登入完成...")
-            driver['page'].wait_for_load_state("networkidle")
-            print("登入流程完成")
-            driver['page'].screenshot(path=f"step4_login_complete_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            ensure_logged_in(driver, snap, account, restored)
             
         except Exception as e:
             print(f"登入過程發生錯誤: {e}")
-            driver['page'].screenshot(path=f"step3_login_error_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step3_login_error', failure=True)
             return {'success': False, 'data': [], 'message': f'登入過程錯誤: {e}'}
         
         # 步驟5: 點擊「訂單查詢」- 使用您提供的精確選擇器
         print("📋 步驟5: 點擊「訂單查詢」...")
         try:
             # 拍攝主頁面截圖
-            driver['page'].screenshot(path=f"step5_main_page_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step5_main_page')
             
             # 首先嘗試您提供的精確選擇器
             order_selectors = [
@@ -589,21 +663,14 @@ def fetch_dispatch_results():
             ]
             
             order_clicked = False
-            for selector in order_selectors:
-                try:
-                    print(f"嘗試訂單查詢選擇器: {selector}")
-                    element = driver['page'].locator(selector).first
-                    if element.count() > 0 and element.is_visible():
-                        element.click()
-                        print(f"✅ 「訂單查詢」點擊成功: {selector}")
-                        order_clicked = True
-                        break
-                    else:
-                        print(f"選擇器 {selector} 未找到或不可見")
-                except Exception as e:
-                    print(f"訂單查詢選擇器 {selector} 失敗: {e}")
-                    continue
-            
+            try:
+                winner = selector_resolver.click_first(driver['page'], 'order_menu', order_selectors)
+                if winner:
+                    print(f"✅ 「訂單查詢」點擊成功: {winner}")
+                    order_clicked = True
+            except Exception as e:
+                print(f"訂單查詢點擊失敗: {e}")
+
             if not order_clicked:
                 print("⚠️ 未找到「訂單查詢」按鈕，嘗試直接導航...")
                 driver['get']("https://www.ntpc.ltc-car.org/ReservationOrder/")
@@ -611,20 +678,17 @@ def fetch_dispatch_results():
             # 等待頁面載入
             print("等待訂單查詢頁面載入...")
             driver['page'].wait_for_load_state("networkidle")
-            driver['page'].screenshot(path=f"step5_order_query_clicked_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step5_order_query_clicked')
             
         except Exception as e:
             print(f"⚠️ 訂單查詢點擊過程發生錯誤: {e}")
-            driver['page'].screenshot(path=f"step5_order_query_error_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
+            screenshot_store.capture(driver, 'step5_order_query_error', failure=True)
         
         # 步驟6: 準備開始尋找派車紀錄
         print("🔍 步驟6: 開始尋找派車紀錄...")
         
         # 拍攝訂單頁面截圖
-        try:
-            driver['page'].screenshot(path=f"step6_order_page_{current_time.strftime('%Y%m%d_%H%M%S')}.png")
-        except:
-            pass
+        screenshot_store.capture(driver, 'step6_order_page')
         
         # 等待頁面載入
         try:
@@ -639,6 +703,16 @@ def fetch_dispatch_results():
             except:
                 print("頁面載入超時，繼續執行")
         
+        # 優先使用訂單 API 的回應，資料完整時不需要展開與解析 DOM
+        if capture is not None:
+            if not capture.responses:
+                wait_engine.wait_for_response(driver, 'dispatch_order_api', order_capture.ORDER_API_PATTERN, 5000)
+            api_result = order_capture.dispatch_results_from(capture.payloads())
+            if api_result is not None:
+                total_records, dispatch_results, statuses = api_result
+                return _finish_dispatch_results(driver, total_records, dispatch_results, current_time, 'api',
+                                                account['id'], statuses)
+        
         # 簡要檢查頁面載入狀態
         print("檢查頁面載入狀態...")
         try:
@@ -650,269 +724,21 @@ def fetch_dispatch_results():
         # 🚀 強制展開所有隱藏記錄的智能載入機制
         print("🔄 開始強制展開所有隱藏記錄...")
         
-        # 第一步：移除所有可能隱藏記錄的樣式限制
+        # 第一步：移除訂單容器內隱藏記錄的樣式限制（先讀後寫，只計算一次版面）
         try:
-            driver['page'].evaluate('''
-                (() => {
-                    console.log("=== 開始強制展開隱藏記錄 ===");
-                    
-                    // 1. 移除所有 display:none 和 visibility:hidden 的樣式
-                    const hiddenElements = document.querySelectorAll('*[style*="display: none"], *[style*="display:none"], *[style*="visibility: hidden"], *[style*="visibility:hidden"]');
-                    hiddenElements.forEach(el => {
-                        el.style.display = 'block';
-                        el.style.visibility = 'visible';
-                        console.log('展開隱藏元素:', el);
-                    });
-                    
-                    // 2. 展開所有摺疊的區塊
-                    const collapsedSelectors = [
-                        '[data-collapsed="true"]',
-                        '.collapsed',
-                        '.fold',
-                        '.folded',
-                        '.hidden',
-                        '.hide',
-                        '[aria-expanded="false"]',
-                        '[data-toggle="collapse"]'
-                    ];
-                    
-                    collapsedSelectors.forEach(selector => {
-                        document.querySelectorAll(selector).forEach(el => {
-                            el.style.display = 'block';
-                            el.style.visibility = 'visible';
-                            el.style.height = 'auto';
-                            el.style.maxHeight = 'none';
-                            el.style.overflow = 'visible';
-                            
-                            // 更改屬性
-                            if (el.dataset.collapsed) el.dataset.collapsed = 'false';
-                            if (el.getAttribute('aria-expanded')) el.setAttribute('aria-expanded', 'true');
-                            
-                            // 移除摺疊相關的CSS類別
-                            if (el.classList.contains('collapsed')) el.classList.remove('collapsed');
-                            if (el.classList.contains('hidden')) el.classList.remove('hidden');
-                            if (el.classList.contains('hide')) el.classList.remove('hide');
-                            
-                            console.log('展開摺疊元素:', el);
-                        });
-                    });
-                    
-                    // 3. 強制展開任何可能的高度限制
-                    const limitedHeightElements = document.querySelectorAll('*[style*="max-height"], *[style*="height"]');
-                    limitedHeightElements.forEach(el => {
-                        const style = window.getComputedStyle(el);
-                        if (style.maxHeight !== 'none' && style.maxHeight !== 'auto') {
-                            el.style.maxHeight = 'none';
-                            el.style.height = 'auto';
-                            console.log('移除高度限制:', el);
-                        }
-                    });
-                    
-                    console.log("=== 第一階段展開完成 ===");
-                    return true;
-                })()
-            ''')
-            driver['page'].wait_for_timeout(2000)
-            print("✅ 第一階段：移除樣式隱藏")
+            expanded = order_dom.expand_hidden(driver['page'])
+            wait_engine.wait_for_stable(driver, 'dispatch_styles_expanded', '.order_list, div.log', 2000)
+            print(f"✅ 第一階段：移除樣式隱藏（{expanded['touched']} 個節點，{expanded['elapsed_ms']} ms）")
         except Exception as e:
             print(f"移除樣式隱藏失敗: {e}")
         
-        # 第二步：點擊所有可能的展開按鈕
-        try:
-            driver['page'].evaluate('''
-                (() => {
-                    console.log("=== 開始點擊展開按鈕 ===");
-                    
-                    // 尋找所有可能的展開按鈕
-                    const expandSelectors = [
-                        'button:contains("展開")',
-                        'button:contains("顯示更多")',
-                        'button:contains("更多")',
-                        'button:contains("載入更多")',
-                        'button:contains("查看更多")',
-                        'button:contains("Show More")',
-                        'button:contains("Load More")',
-                        'a:contains("更多")',
-                        'a:contains("展開")',
-                        '.expand-btn',
-                        '.show-more',
-                        '.load-more',
-                        '.btn-more',
-                        '[data-action="expand"]',
-                        '[data-action="show-more"]',
-                        '[data-action="load-more"]',
-                        '[onclick*="expand"]',
-                        '[onclick*="show"]',
-                        '[onclick*="more"]',
-                        '[onclick*="load"]'
-                    ];
-                    
-                    let buttonClicked = false;
-                    
-                    expandSelectors.forEach(selector => {
-                        try {
-                            // 對於包含文字的選擇器，需要手動搜尋
-                            if (selector.includes(':contains')) {
-                                const text = selector.match(/:contains\\("([^"]+)"\\)/)[1];
-                                const elements = Array.from(document.querySelectorAll('button, a, span, div')).filter(el => 
-                                    el.textContent && el.textContent.includes(text)
-                                );
-                                elements.forEach(el => {
-                                    if (el.click) {
-                                        console.log('點擊展開按鈕:', el, '文字:', text);
-                                        el.click();
-                                        buttonClicked = true;
-                                    }
-                                });
-                            } else {
-                                document.querySelectorAll(selector).forEach(el => {
-                                    if (el.click) {
-                                        console.log('點擊展開按鈕:', el, '選擇器:', selector);
-                                        el.click();
-                                        buttonClicked = true;
-                                    }
-                                });
-                            }
-                        } catch(e) {
-                            console.log('展開按鈕點擊失敗:', selector, e);
-                        }
-                    });
-                    
-                    console.log("=== 展開按鈕點擊完成 ===", buttonClicked);
-                    return buttonClicked;
-                })()
-            ''')
-            driver['page'].wait_for_timeout(3000)
-            print("✅ 第二階段：點擊展開按鈕")
-        except Exception as e:
-            print(f"點擊展開按鈕失敗: {e}")
-        
-        # 第三步：強制觸發懶載入和無限滾動
-        load_attempts = 0
-        max_load_attempts = 10
-        previous_record_count = 0
-        
-        while load_attempts < max_load_attempts:
-            try:
-                # 檢查當前記錄數量
-                current_record_count = driver['page'].evaluate('''
-                    (() => {
-                        const selectors = ['div.log', '.order_list', '.record', '[class*="log"]', '[class*="order"]'];
-                        let maxCount = 0;
-                        selectors.forEach(selector => {
-                            const count = document.querySelectorAll(selector).length;
-                            if (count > maxCount) maxCount = count;
-                        });
-                        return maxCount;
-                    })()
-                ''')
-                
-                print(f"第 {load_attempts + 1} 次載入檢查，找到 {current_record_count} 筆記錄")
-                
-                if current_record_count > previous_record_count:
-                    previous_record_count = current_record_count
-                    load_attempts = 0  # 重置計數器，繼續載入
-                    print(f"  ✅ 記錄數量增加到 {current_record_count}，繼續載入")
-                else:
-                    load_attempts += 1
-                    print(f"  ⏳ 記錄數量沒有變化，嘗試次數: {load_attempts}")
-                
-                # 觸發多種載入方式
-                load_success = driver['page'].evaluate('''
-                    (() => {
-                        console.log("=== 觸發載入更多記錄 ===");
-                        let success = false;
-                        
-                        // 1. 滾動到頁面底部
-                        window.scrollTo(0, document.body.scrollHeight);
-                        document.documentElement.scrollTop = document.documentElement.scrollHeight;
-                        
-                        // 2. 觸發各種滾動事件
-                        ['scroll', 'scrollend', 'wheel', 'DOMContentLoaded'].forEach(eventType => {
-                            try {
-                                window.dispatchEvent(new Event(eventType));
-                                document.dispatchEvent(new Event(eventType));
-                            } catch(e) {}
-                        });
-                        
-                        // 3. 尋找並點擊載入更多按鈕
-                        const loadMoreSelectors = [
-                            'button:contains("載入更多")',
-                            'button:contains("更多")',
-                            'button:contains("下一頁")',
-                            'a[href*="page"]',
-                            '.pagination a',
-                            '.load-more',
-                            '.btn-load-more',
-                            '.next-page'
-                        ];
-                        
-                        loadMoreSelectors.forEach(selector => {
-                            try {
-                                if (selector.includes(':contains')) {
-                                    const text = selector.match(/:contains\\("([^"]+)"\\)/)[1];
-                                    const elements = Array.from(document.querySelectorAll('button, a')).filter(el => 
-                                        el.textContent && el.textContent.includes(text) && 
-                                        el.offsetParent !== null // 確保元素可見
-                                    );
-                                    elements.forEach(el => {
-                                        console.log('點擊載入更多按鈕:', el);
-                                        el.click();
-                                        success = true;
-                                    });
-                                } else {
-                                    document.querySelectorAll(selector).forEach(el => {
-                                        if (el.offsetParent !== null) { // 確保元素可見
-                                            console.log('點擊載入按鈕:', el);
-                                            el.click();
-                                            success = true;
-                                        }
-                                    });
-                                }
-                            } catch(e) {
-                                console.log('載入按鈕點擊失敗:', selector, e);
-                            }
-                        });
-                        
-                        // 4. 觸發 IntersectionObserver 
-                        const observedElements = document.querySelectorAll('[data-lazy], .lazy, .lazy-load');
-                        observedElements.forEach(el => {
-                            try {
-                                // 觸發進入視窗事件
-                                el.getBoundingClientRect();
-                                el.dispatchEvent(new Event('load'));
-                                el.dispatchEvent(new Event('appear'));
-                                el.dispatchEvent(new Event('intersect'));
-                            } catch(e) {}
-                        });
-                        
-                        // 5. 模擬鼠標滾輪事件
-                        try {
-                            const wheelEvent = new WheelEvent('wheel', {
-                                deltaY: 100,
-                                bubbles: true
-                            });
-                            document.dispatchEvent(wheelEvent);
-                        } catch(e) {}
-                        
-                        console.log("=== 載入觸發完成 ===", success);
-                        return success;
-                    })()
-                ''')
-                
-                # 等待載入
-                driver['page'].wait_for_timeout(4000)
-                
-                # 如果連續多次沒有新記錄，停止嘗試  
-                if load_attempts >= 5:
-                    print("連續多次沒有新記錄載入，停止載入")
-                    break
-                    
-            except Exception as e:
-                print(f"載入記錄時發生錯誤: {e}")
-                load_attempts += 1
-        
-        print(f"✅ 隱藏記錄展開完成，最終找到 {previous_record_count} 筆記錄")
+        # 第二步：等待記錄列表靜止（只有偵測到訂單容器內實際的載入更多控制項時才點擊，
+        # 不再對整頁含「更多/展開」文字或 onclick 的元素逐一點擊）
+        settled = wait_engine.wait_for_list_settled(
+            driver, 'dispatch_list_settled', order_dom.CONTAINER_SELECTORS, '.order_list, div.log', 20000
+        )
+        print(f"✅ 隱藏記錄展開完成，最終找到 {settled['count']} 筆記錄"
+              f"（{settled['elapsed_ms']} ms，點擊載入更多 {settled['load_more_clicks']} 次）")
         
         # 根據您提供的精確DOM結構進行記錄查詢
         # 整個頁面的CSS: .ReservationOrder .wrap2
@@ -922,31 +748,9 @@ def fetch_dispatch_results():
         
         print("根據您提供的精確DOM結構查詢記錄...")
         
-        # 首先確保在正確的頁面容器中
-        page_container = None
-        try:
-            page_container = driver['page'].query_selector('.ReservationOrder .main_content')
-            if page_container:
-                print("✅ 找到頁面主要內容容器: .ReservationOrder .main_content")
-            else:
-                print("❌ 未找到主要內容容器，嘗試其他方式...")
-                # 備用容器查詢
-                backup_containers = ['.main_content', '.ReservationOrder', '.wrap2', 'main', 'body']
-                for container_selector in backup_containers:
-                    try:
-                        container = driver['page'].query_selector(container_selector)
-                        if container:
-                            page_container = container
-                            print(f"✅ 找到備用容器: {container_selector}")
-                            break
-                    except:
-                        continue
-        except Exception as e:
-            print(f"查詢頁面容器時發生錯誤: {e}")
-        
         # Vue.js 動態內容需要更長的等待時間
         print("⏳ 等待 Vue.js 應用完全載入...")
-        driver['page'].wait_for_timeout(8000)  # 增加等待時間
+        wait_engine.wait_for_condition(driver, 'dispatch_orders_rendered', ORDER_ELEMENTS_JS, 8000)
         
         # 檢查是否有訂單資料載入
         has_data = driver['page'].evaluate('''
@@ -960,537 +764,32 @@ def fetch_dispatch_results():
         
         if not has_data:
             print("⚠️ 未檢測到訂單資料，可能需要更長等待時間")
-            driver['page'].wait_for_timeout(5000)
-
-        # 在容器中尋找記錄元素
-        # 根據分析，Vue.js 會動態生成 .order_list 元素
-        record_selectors = [
-            # ✅ 根據網頁分析的實際 Vue.js 結構
-            '.order_list',  # 主要訂單元素類別（從 CSS 分析得出）
-            'div.order_list',  # 確保是 div 元素
-            
-            # 🔄 您原先提供的選擇器作為備用
-            'div.log',  # 每一筆訂單
-            '.log',
-            
-            # 🔄 其他備用選擇器
-            '[class*="order_list"]',
-            '[class*="log"]',
-            '.order'
-        ]
-        
-        all_records = []
-        for selector in record_selectors:
-            try:
-                if page_container:
-                    # 在主要容器中查詢
-                    elements = page_container.query_selector_all(selector)
-                else:
-                    # 在整個頁面中查詢
-                    elements = driver['page'].query_selector_all(selector)
-                
-                if elements:
-                    all_records.extend(elements)
-                    print(f"使用選擇器 '{selector}' 找到 {len(elements)} 個記錄")
-                    # 如果用精確選擇器找到了記錄，優先使用，不再嘗試其他選擇器
-                    if selector == 'div.log' and len(elements) > 0:
-                        print(f"✅ 精確選擇器 'div.log' 成功找到記錄，停止嘗試其他選擇器")
-                        break
-                else:
-                    print(f"選擇器 '{selector}' 未找到任何元素")
-                    
-            except Exception as e:
-                print(f"選擇器 '{selector}' 執行失敗: {str(e)}")
-        
-        # 去重複（避免重複元素）
-        unique_records = []
-        seen_elements = set()
-        for record in all_records:
-            element_id = id(record)  # 使用元素的記憶體地址作為唯一標識
-            if element_id not in seen_elements:
-                unique_records.append(record)
-                seen_elements.add(element_id)
+            wait_engine.wait_for_condition(driver, 'dispatch_orders_rendered_retry', ORDER_ELEMENTS_JS, 5000)
+
+        # 只取一次訂單容器的 HTML 快照並截圖，之後立刻關閉瀏覽器，記錄在 Python 端解析
+        snapshot_html, _ = snapshot_parser.capture_snapshot(driver['page'], current_time)
+        screenshot_store.capture(driver, 'dispatch_results')
+        close_driver(driver)
+        driver = None
         
-        print(f"總共找到 {len(unique_records)} 個唯一記錄元素")
+        container_selector, raw_records = snapshot_parser.parse_snapshot(snapshot_html)
+        print(f"✅ 頁面主要內容容器: {container_selector}，找到 {len(raw_records)} 個記錄元素")
         
-        if not unique_records:
+        if not raw_records:
+            # 空的快照同樣要比對與記錄：先前的訂單可能全部取消或完成
             print("未找到任何記錄")
-            return {'success': True, 'data': [], 'message': '未找到任何預約記錄'}
-        
-        dispatch_results = []
-        
-        for i, record in enumerate(unique_records):
-            try:
-                print(f"分析第 {i+1} 個記錄...")
-                
-                # 取得記錄的完整HTML內容
-                record_html = record.inner_html()
-                record_classes = record.get_attribute('class') or ''
-                
-                # 根據您提供的精確DOM結構進行派車狀態檢測
-                is_dispatch_status = False
-                has_precise_dispatch_detection = False
-                found_state_element = None
-                state_text = ""
-                
-                # 🎯 根據 Vue.js 分析的狀態檢測邏輯
-                # Vue.js 中狀態是數字：Status==2 表示派車
-                # 先檢查 Vue.js 資料狀態
-                vue_status = None
-                try:
-                    # 嘗試從 Vue.js 資料中獲取狀態
-                    vue_status = driver['page'].evaluate(f'''
-                        (() => {{
-                            // 嘗試從元素中查找 Vue.js 資料狀態
-                            const recordElement = arguments[0];
-                            
-                            // 方法1：檢查元素的 Vue.js 實例
-                            if (recordElement.__vue__ && recordElement.__vue__.Status !== undefined) {{
-                                return recordElement.__vue__.Status;
-                            }}
-                            
-                            // 方法2：檢查父元素的 Vue.js 實例 
-                            let parent = recordElement.parentElement;
-                            while (parent && parent !== document.body) {{
-                                if (parent.__vue__ && parent.__vue__.orderList) {{
-                                    // 查找對應的訂單資料
-                                    const orders = parent.__vue__.orderList;
-                                    // 根據位置或其他標識符找到對應的訂單
-                                    // 暫時返回 null，使用備用檢測
-                                    return null;
-                                }}
-                                parent = parent.parentElement;
-                            }}
-                            
-                            return null;
-                        }})()
-                    ''', record)
-                    
-                    if vue_status is not None:
-                        print(f"  - Vue.js 狀態檢測: Status = {vue_status}")
-                        if vue_status == 2:  # Status==2 表示派車
-                            is_dispatch_status = True
-                            has_precise_dispatch_detection = True
-                            print(f"  - ✅ Vue.js 狀態檢測確認為派車狀態 (Status=2)")
-                        else:
-                            print(f"  - ❌ Vue.js 狀態檢測為非派車狀態 (Status={vue_status})")
-                            has_precise_dispatch_detection = True
-                            
-                except Exception as e:
-                    print(f"  - Vue.js 狀態檢測失敗: {e}")
-
-                # 🔄 DOM 狀態選擇器檢測（備用方案）
-                precise_state_selectors = [
-                    # 狀態相關的可能選擇器
-                    '.state_tag',
-                    '[class*="state"]',
-                    '[class*="status"]', 
-                    '.status',
-                    
-                    # 根據您原先提供的結構
-                    '.order_list > .state_tag',
-                    '.order_list .state_tag',
-                ]
-                
-                # 只在 Vue.js 檢測失敗時使用 DOM 檢測
-                if not has_precise_dispatch_detection:
-                    print(f"  - 開始 DOM 狀態檢測...")
-                    
-                    for selector in precise_state_selectors:
-                        try:
-                            state_element = record.query_selector(selector)
-                            if state_element:
-                                state_text = state_element.inner_text().strip()
-                                print(f"  - 精確選擇器 '{selector}' 找到狀態: '{state_text}'")
-                                
-                                # 檢查是否為派車狀態（狀態文字可能包含多行）
-                                if '派車' in state_text:
-                                    # 進一步檢查是否為當前激活狀態
-                                    try:
-                                        # 檢查是否有激活的狀態樣式
-                                        active_state = None
-                                        
-                                        # 方法1: 查找帶有active/current類別的子元素
-                                        active_elements = state_element.query_selector_all('.active, .current, .selected, .highlight')
-                                        if active_elements:
-                                            for elem in active_elements:
-                                                elem_text = elem.inner_text().strip()
-                                                if elem_text in ['媒合中', '成立', '派車', '執行', '完成', '取消']:
-                                                    active_state = elem_text
-                                                    break
-                                        
-                                        # 方法2: 如果沒有明確的active樣式，檢查子元素
-                                        if not active_state:
-                                            child_elements = state_element.query_selector_all('*')
-                                            for child in child_elements:
-                                                child_text = child.inner_text().strip()
-                                                if child_text == '派車':
-                                                    # 檢查此子元素是否有特殊樣式標示為當前狀態
-                                                    child_class = child.get_attribute('class') or ''
-                                                    child_style = child.get_attribute('style') or ''
-                                                    if any(indicator in child_class.lower() for indicator in ['active', 'current', 'selected']) or \
-                                                       any(indicator in child_style.lower() for indicator in ['color', 'background', 'font-weight']):
-                                                        active_state = '派車'
-                                                        break
-                                        
-                                        # 方法3: 如果找不到明確的激活標示，使用保守策略
-                                        if not active_state:
-                                            # 如果文字中包含派車，但無法確定是否為當前狀態，需要更多檢查
-                                            print(f"  - ⚠️ 狀態文字包含'派車'但無法確定是否為當前激活狀態")
-                                            print(f"  - 狀態元素完整文字: {repr(state_text)}")
-                                            
-                                            # 檢查記錄的其他部分是否有派車相關資訊
-                                            record_text = record.inner_text()
-                                            if any(keyword in record_text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話']):
-                                                active_state = '派車'
-                                                print(f"  - ✅ 根據司機資訊判定為派車狀態")
-                                            else:
-                                                print(f"  - ❌ 無司機資訊，可能不是當前派車狀態")
-                                        
-                                        if active_state == '派車':
-                                            is_dispatch_status = True
-                                            has_precise_dispatch_detection = True
-                                            found_state_element = state_element
-                                            print(f"  - ✅ 通過精確選擇器檢測到派車狀態: '{selector}' = '{active_state}'")
-                                            break
-                                        else:
-                                            print(f"  - ❌ 當前激活狀態為: '{active_state}'，非派車狀態")
-                                            has_precise_dispatch_detection = True
-                                            found_state_element = state_element
-                                            break
-                                            
-                                    except Exception as e:
-                                        print(f"  - ⚠️ 狀態檢測過程中發生錯誤: {e}")
-                                        # 發生錯誤時，檢查是否有司機資訊作為備用判定
-                                        record_text = record.inner_text()
-                                        if any(keyword in record_text for keyword in ['指派司機', '司機姓名', '車號']):
-                                            is_dispatch_status = True
-                                            has_precise_dispatch_detection = True
-                                            found_state_element = state_element
-                                            print(f"  - ✅ 錯誤備用判定：根據司機資訊確認為派車狀態")
-                                            break
-                                else:
-                                    # 狀態文字中沒有派車
-                                    print(f"  - ❌ 精確選擇器檢測到非派車狀態: '{state_text[:50]}...'")
-                                    has_precise_dispatch_detection = True
-                                    found_state_element = state_element
-                                    break
-                            else:
-                                print(f"  - 精確選擇器 '{selector}' 未找到狀態元素")
-                        except Exception as e:
-                            print(f"  - 精確選擇器 '{selector}' 執行失敗: {e}")
-                            continue
-                
-                # 如果精確檢測找到了狀態元素且確定不是派車狀態，直接跳過
-                if has_precise_dispatch_detection and not is_dispatch_status:
-                    print(f"  - 精確檢測確認非派車狀態（狀態: '{state_text}'），跳過此記錄")
-                    continue
-                
-                # 🔄 備用檢測方式（只在精確檢測無結果時使用）
-                if not has_precise_dispatch_detection:
-                    print(f"  - 精確檢測無結果，使用備用檢測方式...")
-                    
-                    record_text = record.inner_text()
-                    
-                    # 先排除明確不是派車的狀態
-                    skip_keywords = ['媒合中', '成立', '取消', '已取消', '待確認', '等待中']
-                    skip_classes = ['accept', 'established', 'cancel', 'waiting']
-                    
-                    should_skip = False
-                    for keyword in skip_keywords:
-                        if keyword in record_text:
-                            print(f"  - 發現排除關鍵字 '{keyword}'，跳過此記錄")
-                            should_skip = True
-                            break
-                    
-                    if not should_skip:
-                        for cls in skip_classes:
-                            if cls in record_classes:
-                                print(f"  - 發現排除CSS類別 '{cls}'，跳過此記錄")
-                                should_skip = True
-                                break
-                    
-                    if should_skip:
-                        continue
-                    
-                    # 檢查派車相關的關鍵字和資訊
-                    dispatch_keywords = ['派車', '執行', '完成', '已派車', '指派司機', '車號']
-                    dispatch_classes = ['dispatch', 'implement', 'finish']
-                    
-                    # 檢查CSS類別
-                    for cls in dispatch_classes:
-                        if cls in record_classes:
-                            is_dispatch_status = True
-                            print(f"  - 通過CSS類別檢測到派車狀態: '{cls}'")
-                            break
-                    
-                    # 檢查文字內容
-                    if not is_dispatch_status:
-                        for keyword in dispatch_keywords:
-                            if keyword in record_text:
-                                is_dispatch_status = True
-                                print(f"  - 通過文字內容檢測到派車相關: '{keyword}'")
-                                break
-                
-                # 只處理確認為派車狀態的記錄
-                if not is_dispatch_status:
-                    print(f"  - 非派車狀態，跳過")
-                    continue
-                    
-                print(f"  - ✅ 確認為派車相關記錄，開始提取詳細資訊...")
-                
-                # 準備提取詳細資訊
-                record_text = record.inner_text()
-                has_driver_info = any(keyword in record_text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話', '駕駛'])
-                
-                # 提取記錄詳細資訊
-                record_info = {
-                    'index': i + 1,
-                    'status': 'unknown',
-                    'date': 'N/A',
-                    'time': 'N/A',
-                    'route': 'N/A',
-                    'vehicle': 'N/A',
-                    'driver': 'N/A',
-                    'contact': 'N/A',
-                    'has_driver_info': has_driver_info,
-                    'css_classes': record_classes
-                }
-                
-                # 🎯 精確狀態判定
-                if has_precise_dispatch_detection and found_state_element:
-                    # 使用精確檢測找到的狀態
-                    record_info['status'] = state_text
-                    print(f"  - 精確狀態判定: {state_text}")
-                else:
-                    # 備用狀態判定邏輯
-                    record_text = record.inner_text()
-                    
-                    if '派車' in record_text or 'dispatch' in record_classes:
-                        record_info['status'] = '已派車'
-                    elif '執行' in record_text or 'implement' in record_classes:
-                        record_info['status'] = '執行中'  
-                    elif '完成' in record_text or 'finish' in record_classes:
-                        record_info['status'] = '已完成'
-                    else:
-                        record_info['status'] = '派車相關'
-                    
-                    print(f"  - 備用狀態判定: {record_info['status']}")
-                
-                # 嘗試提取時間資訊並轉換為台北時間
-                try:
-                    # 尋找所有可能包含時間資訊的元素
-                    time_selectors = [
-                        '.order_date', '.booking-date', '.appointment-time',
-                        '[class*="date"]', '[class*="time"]', '[class*="appointment"]',
-                        '.ride-time', '.reservation-time', '.schedule-time'
-                    ]
-                    
-                    date_elements = []
-                    for selector in time_selectors:
-                        try:
-                            elements = record.query_selector_all(selector)
-                            date_elements.extend(elements)
-                        except:
-                            continue
-                    
-                    # 如果沒有特定的時間元素，嘗試從記錄文字中提取
-                    if not date_elements:
-                        print(f"  - 沒有找到時間元素，嘗試從記錄文字中提取: {record_text[:100]}...")
-                        # 從記錄文字中搜尋時間格式
-                        time_patterns = [
-                            r'(\d{4}[-/]\d{1,2}[-/]\d{1,2}\s+\d{1,2}:\d{2})',  # 2024-01-01 12:00
-                            r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})',  # 2024-01-01
-                            r'(\d{1,2}:\d{2})',  # 12:00
-                            r'預約時間[：:]\s*([^\n\r]+)',  # 預約時間: xxx
-                            r'時段[：:]\s*([^\n\r]+)',  # 時段: xxx
-                        ]
-                        
-                        for pattern in time_patterns:
-                            match = re.search(pattern, record_text)
-                            if match:
-                                date_text = match.group(1).strip()
-                                print(f"  - 從文字中提取到時間: {date_text}")
-                                # 創建虛擬元素處理
-                                class FakeElement:
-                                    def __init__(self, text):
-                                        self._text = text
-                                    @property 
-                                    def text(self):
-                                        return self._text
-                                        
-                                date_elements = [FakeElement(date_text)]
-                                break
-                    
-                    if date_elements:
-                        # 處理真實元素或虛擬元素
-                        element = date_elements[0]
-                        if hasattr(element, '_text'):
-                            date_text = element._text.strip()
-                        else:
-                            date_text = element.inner_text().strip()
-                        print(f"  - 找到時間元素: {date_text}")
-                        if date_text:
-                            # 嘗試解析並轉換時區
-                            try:
-                                # 檢查多種時間格式並進行轉換
-                                converted = False
-                                
-                                # 格式1: ISO格式 (2024-01-01T12:00:00Z 或 2024-01-01T12:00:00)
-                                iso_match = re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})Z?', date_text)
-                                if iso_match:
-                                    try:
-                                        utc_time_str = iso_match.group(1)
-                                        utc_time = datetime.fromisoformat(utc_time_str)
-                                        utc_time = pytz.utc.localize(utc_time)
-                                        taipei_time = utc_time.astimezone(taipei_tz)
-                                        record_info['date'] = taipei_time.strftime('%Y-%m-%d')
-                                        record_info['time'] = taipei_time.strftime('%H:%M')
-                                        print(f"  - 時間轉換(ISO): UTC {date_text} -> 台北 {taipei_time.strftime('%Y-%m-%d %H:%M')}")
-                                        converted = True
-                                    except Exception as iso_error:
-                                        print(f"  - ISO時間轉換失敗: {iso_error}")
-                                        pass
-                                
-                                # 格式2: 一般日期時間格式 (2024/01/01 12:00)
-                                if not converted:
-                                    datetime_match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})\s+(\d{1,2}:\d{2})', date_text)
-                                    if datetime_match:
-                                        try:
-                                            date_part = datetime_match.group(1).replace('/', '-')
-                                            time_part = datetime_match.group(2)
-                                            # 假設網頁顯示的是UTC時間，轉換為台北時間
-                                            utc_datetime = datetime.strptime(f"{date_part} {time_part}", '%Y-%m-%d %H:%M')
-                                            utc_datetime = pytz.utc.localize(utc_datetime)
-                                            taipei_time = utc_datetime.astimezone(taipei_tz)
-                                            record_info['date'] = taipei_time.strftime('%Y-%m-%d')
-                                            record_info['time'] = taipei_time.strftime('%H:%M')
-                                            print(f"  - 時間轉換(一般): UTC {date_text} -> 台北 {taipei_time.strftime('%Y-%m-%d %H:%M')}")
-                                            converted = True
-                                        except Exception as datetime_error:
-                                            print(f"  - 一般時間轉換失敗: {datetime_error}")
-                                            pass
-                                
-                                # 格式3: 只有日期 (2024/01/01)
-                                if not converted:
-                                    date_match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})', date_text)
-                                    if date_match:
-                                        try:
-                                            date_part = date_match.group(1).replace('/', '-')
-                                            record_info['date'] = date_part
-                                            record_info['time'] = 'N/A'
-                                            print(f"  - 日期處理: {date_part}")
-                                            converted = True
-                                        except:
-                                            pass
-                                
-                                # 如果都無法轉換，直接使用原始文字
-                                if not converted:
-                                    record_info['date'] = date_text
-                                    record_info['time'] = date_text
-                                    print(f"  - 使用原始時間: {date_text}")
-                                    
-                            except Exception as tz_error:
-                                print(f"  - 時區轉換失敗: {str(tz_error)}")
-                                record_info['date'] = date_text
-                                record_info['time'] = date_text
-                except Exception as date_error:
-                    print(f"  - 提取時間資訊失敗: {str(date_error)}")
-                    pass
-                
-                # 嘗試提取路線資訊
-                try:
-                    route_selectors = ['.route', '.origin', '.destination', '[class*="route"]']
-                    for selector in route_selectors:
-                        route_elements = record.query_selector_all(selector)
-                        for elem in route_elements:
-                            route_text = elem.inner_text().strip()
-                            if route_text and len(route_text) > 2:
-                                record_info['route'] = route_text
-                                break
-                        if record_info['route'] != 'N/A':
-                            break
-                except:
-                    pass
-                
-                # 嘗試提取車輛和司機資訊
-                try:
-                    # 車號
-                    for pattern in ['車號', '車牌', '車輛']:
-                        if pattern in record_text:
-                            match = re.search(f'{pattern}[：:]\\s*([A-Z0-9\\-]+)', record_text)
-                            if match:
-                                record_info['vehicle'] = match.group(1)
-                                break
-                    
-                    # 司機姓名
-                    for pattern in ['司機', '駕駛', '指派司機']:
-                        if pattern in record_text:
-                            match = re.search(f'{pattern}[：:]\\s*([^\\s\\n]+)', record_text)
-                            if match:
-                                record_info['driver'] = match.group(1)
-                                break
-                    
-                    # 聯絡電話
-                    phone_match = re.search(r'(\d{2,4}-?\d{6,8}|\d{10})', record_text)
-                    if phone_match:
-                        record_info['contact'] = phone_match.group(1)
-                        
-                except Exception as e:
-                    print(f"  - 提取車輛資訊時發生錯誤: {str(e)}")
-                
-                dispatch_results.append(record_info)
-                print(f"  - 成功添加派車記錄: {record_info['status']}")
-                
-            except Exception as e:
-                print(f"處理記錄 {i+1} 時發生錯誤: {str(e)}")
-                continue
-        
-        # 保存結果
-        results_data = {
-            'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_records': len(unique_records),
-            'dispatch_records': len(dispatch_results),
-            'results': dispatch_results
-        }
-        
-        # 保存到檔案
-        results_file = 'dispatch_results.json'
-        try:
-            with open(results_file, 'w', encoding='utf-8') as f:
-                json.dump(results_data, f, ensure_ascii=False, indent=2)
-            print(f"結果已保存到 {results_file}")
-        except Exception as e:
-            print(f"保存結果檔案時發生錯誤: {str(e)}")
-        
-        # 拍攝截圖
-        try:
-            screenshot_filename = f"dispatch_results_{current_time.strftime('%Y%m%d_%H%M%S')}.png"
-            driver['page'].screenshot(path=screenshot_filename)
-            print(f"截圖已保存: {screenshot_filename}")
-        except Exception as e:
-            print(f"截圖保存失敗: {str(e)}")
         
-        print(f"派車結果分析完成 - 找到 {len(dispatch_results)} 筆已派車記錄")
-        
-        return {
-            'success': True,
-            'data': results_data,
-            'message': f'成功分析 {len(unique_records)} 筆記錄，找到 {len(dispatch_results)} 筆已派車記錄'
-        }
+        dispatch_results = order_dom.classify_orders(raw_records)
+        return _finish_dispatch_results(None, len(raw_records), dispatch_results, current_time, 'snapshot',
+                                        account['id'])
         
     except Exception as e:
         error_msg = f"取得派車結果時發生錯誤: {str(e)}"
         print(error_msg)
         
         # 錯誤截圖
-        try:
-            if driver:
-                error_screenshot = f"dispatch_error_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                driver['page'].screenshot(path=error_screenshot)
-                print(f"錯誤截圖已保存: {error_screenshot}")
-        except:
-            pass
+        if driver:
+            screenshot_store.capture(driver, 'dispatch_error', failure=True)
         
         return {'success': False, 'error': error_msg}
     
@@ -1499,1337 +798,883 @@ def fetch_dispatch_results():
         if driver:
             close_driver(driver)
 
-def make_reservation():
-    driver = None
-    screenshot_count = 0
-    
-    def take_screenshot(description):
-        nonlocal screenshot_count
-        try:
-            screenshot_count += 1
-            filename = f'step_{screenshot_count:03d}_{description}.png'
-            if driver:
-                driver['page'].screenshot(path=filename)
-                print(f"截圖 {screenshot_count}: {description} - {filename}")
-            return filename
-        except Exception as e:
-            print(f"截圖失敗: {e}")
-            return None
-    
+# 預約流程的等待條件（參數為元素的條件以 wait_engine.wait_for_element 使用）
+INPUT_FOCUSED_JS = "el => document.activeElement === el"
+INPUT_EMPTY_JS = "el => el.value === ''"
+PAC_VISIBLE_JS = "() => Array.from(document.querySelectorAll('.pac-item')).some(el => el.offsetParent !== null)"
+PAC_SELECTED_JS = "() => document.querySelector('.pac-item-selected') !== null"
+# 日期選單中符合 YYYY-MM-DD 的選項位置（選項文字或值包含該日期，或以 YYYY/MM/DD 表示），找不到時為 -1
+DATE_OPTION_JS = """(el, date) => {
+    const alt = date.replace(/-/g, '/');
+    return Array.from(el.options).findIndex(o =>
+        [o.value, o.text].some(t => t.includes(date) || t.includes(alt)));
+}"""
+
+def pickup_typed_js(query):
+    """輸入框已含上車地點關鍵字的等待條件"""
+    return f"el => el.value.includes({json.dumps(query[:2], ensure_ascii=False)})"
+
+def pickup_chosen_js(query):
+    """選擇建議後，輸入框的值會由關鍵字換成 Google 地點名稱與地址"""
+    query = json.dumps(query, ensure_ascii=False)
+    return f"el => el.value.trim() !== '' && el.value.trim() !== {query}"
+
+def open_new_reservation(driver):
+    """回到「新增預約」表單（連續預約時上一趟停在完成畫面，找不到按鈕時先回首頁）"""
     try:
-        print("=== 開始執行預約流程 ===")
-        print("開始初始化 WebDriver...")
-        driver = setup_driver()
-        
-        if driver is None:
-            print("WebDriver 初始化失敗，無法繼續")
-            return False
-            
-        print("WebDriver 初始化完成")
-        
-        # 設置視窗大小為高解析度
-        print("設置視窗大小為 1920x1080...")
-        driver['page'].set_viewport_size({'width': 1920, 'height': 1080})
-        print("視窗大小設置完成")
-        
-        print("正在載入網頁...")
+        driver['page'].click('text=新增預約', timeout=5000)
+    except Exception as e:
+        print(f"找不到新增預約按鈕，回到首頁再試: {e}")
         driver['get']("https://www.ntpc.ltc-car.org/")
-        print("網頁載入完成")
-        take_screenshot("page_loaded")
-        
-        # 等待頁面完全載入
-        print("等待頁面完全載入...")
         driver['page'].wait_for_load_state("networkidle")
-        print("頁面已完全載入")
-        take_screenshot("page_complete")
+        driver['page'].click('text=新增預約')
+    driver['page'].wait_for_load_state("networkidle")
+
+def fill_option_stepwise(driver, spec, name):
+    """逐步設定預約選項的一個欄位（form_fill 一次填寫失敗時的備用方式），成功時回傳 True"""
+    try:
+        page = driver['page']
+        if name == 'date':
+            date_select = page.locator('select').first
+            if spec['date'] in ('last', 'first'):
+                # 選擇最後（或第一）個日期選項
+                date_options = date_select.locator('option')
+                (date_options.last if spec['date'] == 'last' else date_options.first).click()
+                return True
+            option_index = date_select.evaluate(DATE_OPTION_JS, reservation_spec.resolve_date(spec['date']))
+            if option_index < 0:
+                return False
+            date_select.select_option(index=option_index)
+        elif name in ('hour', 'minute'):
+            time_selects = page.locator('select').all()
+            position = 1 if name == 'hour' else 2
+            if len(time_selects) <= position:
+                return False
+            time_selects[position].select_option(spec[name])
+        elif name == 'companions':
+            page.select_option('select', spec['companions'])
+        else:
+            page.click(f"text={spec[name]}")
+        print(f"逐步設定 {name}: {spec[name]}")
+        return True
+    except Exception as e:
+        print(f"逐步設定 {name} 失敗: {e}")
+        return False
+
+def submit_prepared(driver, date_field):
+    """放號時刻要做的事：設定日期、下一步、送出預約，回傳點擊送出預約當下的 time.monotonic()"""
+    failed, report = form_fill.fill(driver, [date_field])
+    if failed:
+        raise RuntimeError(f"設定預約日期 {date_field['date']} 失敗: {report.get('date')}")
+    print("點擊下一步，確認預約資訊")
+    driver['page'].click('text=下一步，確認預約資訊')
+    # 確認頁的送出按鈕一出現就記錄時間並點擊
+    submit_button = driver['page'].locator('text=送出預約').first
+    submit_button.wait_for(state='visible')
+    print("點擊送出預約")
+    clicked = time.monotonic()
+    submit_button.click()
+    return clicked
+
+def book_trip(driver, spec, take_screenshot, submit_at=None):
+    """在已登入的頁面上依預約設定（reservation_spec.normalize 的結果）完成一趟預約
+
+    submit_at: 預先就緒模式的放號時間（台北時區 datetime）。
+    指定時在放號前開啟新增預約，先完成上下車地點與日期以外的選項，
+    等到該時刻才設定日期（submit_prepared）並送出。
+    新增預約頁在載入時依當天日期產生日期選單（今天 +3 ~ +14 天），放號前開啟的選單是前一天的範圍，
+    因此目標時段以放號當天計算，選單中沒有目標日期時在送出時補上。
+    """
+    # 開始預約流程
+    print(f"開始預約流程: {spec['name']}")
+    pickup = spec['pickup']
+    typed_js = pickup_typed_js(pickup['query'])
+    chosen_js = pickup_chosen_js(pickup['query'])
+    try:
+        # 5. 點擊「新增預約」
+        print("點擊新增預約")
+        open_new_reservation(driver)
+        take_screenshot("new_reservation")
+        
+        # 以一次頁面讀取確認日期時段選項，沒有可預約的時段時不必填寫其他欄位；
+        # 預先就緒模式的選單仍是放號前一天的範圍，改以放號當天計算
+        page_slots = slot_precheck.read_slots(driver) if submit_at is None else None
+        slot, message = slot_precheck.plan(spec, page_slots, slot_precheck.release_day(submit_at))
+        if message:
+            print(f"⚠️ {message}")
+        if slot is None:
+            take_screenshot("slot_unavailable")
+            return False
+        spec = slot_precheck.apply(spec, slot)
+        print(f"🎯 目標時段 {slot['date']} {slot['hour']}:{slot['minute']}{'（備用時段）' if slot['fallback'] else ''}")
         
-        # 處理浮動視窗 - 點擊「我知道了」按鈕
-        print("檢查並處理浮動視窗...")
-        try:
-            # 等待浮動視窗出現
-            driver['page'].wait_for_selector('text=我知道了', timeout=10000)
-            print("找到浮動視窗，點擊「我知道了」按鈕")
-            driver['page'].click('text=我知道了')
-            print("「我知道了」按鈕點擊成功")
-            take_screenshot("popup_closed")
-        except Exception as e:
-            print(f"沒有找到浮動視窗或點擊失敗: {e}")
-            take_screenshot("no_popup_found")
+        # 6. 上車地點選擇（預設為「醫療院所」）
+        print(f"選擇上車地點：{pickup['type']}")
         
-        # 登入步驟
-        print("開始登入流程...")
+        # 確保選擇第一個下拉選單作為上車地點
         try:
-            # 等待登入表單載入
-            driver['page'].wait_for_selector('input[type="text"]', timeout=10000)
-            print("登入表單已載入")
-            take_screenshot("login_form")
-            
-            # 輸入身分證字號
-            print("輸入身分證字號: A102574899")
-            driver['page'].fill('input[type="text"]', 'A102574899')
-            
-            # 輸入密碼
-            print("輸入密碼: visi319VISI")
-            driver['page'].fill('input[type="password"]', 'visi319VISI')
-            
-            # 點擊民眾登入按鈕 - 使用更精確的選擇器
-            print("點擊民眾登入按鈕")
-            take_screenshot("before_login_click")
-            
-            # 嘗試多種不同類型的登入按鈕選擇器
-            login_selectors = [
-                # 一般按鈕
-                'button:has-text("民眾登入")',
-                'button[value*="民眾登入"]',
-                'button[name*="login"]',
-                
-                # input 按鈕
-                'input[type="submit"]:has-value("民眾登入")',
-                'input[type="button"]:has-value("民眾登入")',
-                'input[value="民眾登入"]',
-                'input[value*="登入"]',
-                
-                # 連結
-                'a:has-text("民眾登入")',
-                'a[href*="login"]',
-                
-                # 表單提交
-                'form input[type="submit"]',
-                'form button[type="submit"]',
-                
-                # 通用文字匹配
-                'text=民眾登入',
-                ':text("民眾登入")',
-                '*:has-text("民眾登入")',
-                
-                # CSS 類別
-                '.login-btn',
-                '.btn-login',
-                '.submit-btn',
-                '.btn[onclick*="login"]',
-                
-                # ID 選擇器
-                '#login-btn',
-                '#loginBtn',
-                '#submit',
-                '#login',
-                
-                # 更廣泛的匹配
-                '[onclick*="login"]',
-                '[onclick*="submit"]'
-            ]
-            
-            login_clicked = False
-            
-            for selector in login_selectors:
-                try:
-                    print(f"嘗試登入按鈕選擇器: {selector}")
-                    
-                    # 檢查元素是否存在
-                    element = driver['page'].locator(selector).first
-                    if element.count() > 0:
-                        print(f"找到元素: {selector}")
-                        
-                        # 檢查元素是否可見
-                        if element.is_visible():
-                            print(f"元素可見，嘗試點擊: {selector}")
-                            element.click()
-                            print(f"登入按鈕點擊成功: {selector}")
-                            login_clicked = True
-                            break
-                        else:
-                            print(f"元素存在但不可見: {selector}")
-                    else:
-                        print(f"元素不存在: {selector}")
-                        
-                except Exception as e:
-                    print(f"登入按鈕選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果還是沒點擊成功，嘗試更激進的方法
-            if not login_clicked:
-                print("所有標準方法失敗，嘗試更激進的方法...")
-                
-                try:
-                    # 方法1: 檢查所有按鈕的文字內容
-                    print("檢查所有按鈕...")
-                    all_buttons = driver['page'].locator('button, input[type="button"], input[type="submit"]').all()
-                    for i, button in enumerate(all_buttons):
-                        try:
-                            if button.is_visible():
-                                button_text = button.text_content() or button.get_attribute('value') or ''
-                                print(f"按鈕 {i}: '{button_text}'")
-                                if '登入' in button_text or 'login' in button_text.lower():
-                                    print(f"找到疑似登入按鈕，點擊: {button_text}")
-                                    button.click()
-                                    login_clicked = True
-                                    break
-                        except Exception as e:
-                            print(f"檢查按鈕 {i} 失敗: {e}")
-                            continue
-                except Exception as e:
-                    print(f"檢查所有按鈕失敗: {e}")
-                
-                # 方法2: 嘗試提交表單
-                if not login_clicked:
-                    try:
-                        print("嘗試直接提交登入表單...")
-                        forms = driver['page'].locator('form').all()
-                        for i, form in enumerate(forms):
-                            try:
-                                print(f"提交表單 {i}")
-                                # 使用 JavaScript 提交表單
-                                driver['page'].evaluate(f'document.forms[{i}].submit()')
-                                login_clicked = True
-                                break
-                            except Exception as e:
-                                print(f"提交表單 {i} 失敗: {e}")
-                                continue
-                    except Exception as e:
-                        print(f"表單提交失敗: {e}")
-                
-                # 方法3: 使用 JavaScript 尋找並點擊
-                if not login_clicked:
-                    try:
-                        print("使用 JavaScript 尋找登入按鈕...")
-                        js_script = """
-                        // 尋找包含"登入"文字的元素
-                        const elements = Array.from(document.querySelectorAll('*'));
-                        for (let elem of elements) {
-                            const text = elem.textContent || elem.value || '';
-                            if (text.includes('登入') || text.includes('民眾')) {
-                                if (elem.tagName === 'BUTTON' || elem.tagName === 'INPUT' || elem.tagName === 'A') {
-                                    console.log('找到登入元素:', elem);
-                                    elem.click();
-                                    return true;
-                                }
-                            }
-                        }
-                        return false;
-                        """
-                        result = driver['page'].evaluate(js_script)
-                        if result:
-                            print("JavaScript 點擊成功")
-                            login_clicked = True
-                    except Exception as e:
-                        print(f"JavaScript 點擊失敗: {e}")
-            
-            if login_clicked:
-                print("登入按鈕點擊完成")
-                take_screenshot("login_clicked")
+            # 尋找第一個可見的下拉選單
+            first_select = driver['page'].locator('select').first
+            if first_select.count() > 0 and first_select.is_visible():
+                # 檢查選項
+                options = first_select.locator('option').all()
+                option_texts = [opt.text_content() or '' for opt in options]
+                print(f"第一個選單的選項: {option_texts}")
+                
+                if pickup['type'] in option_texts:
+                    first_select.select_option(pickup['type'])
+                    print(f"第一個選單成功選擇：{pickup['type']}")
+                else:
+                    print(f"第一個選單沒有{pickup['type']}選項，嘗試其他方式...")
+                    # 嘗試通用選擇
+                    driver['page'].select_option('select', pickup['type'])
             else:
-                print("警告：無法找到或點擊登入按鈕")
-                take_screenshot("login_click_failed")
-            
-            # 等待登入成功浮動視窗
-            print("等待登入成功訊息...")
+                print("找不到第一個下拉選單，嘗試通用選擇...")
+                driver['page'].select_option('select', pickup['type'])
+        except Exception as e:
+            print(f"選擇上車地點失敗: {e}")
+            # 後備方案
             try:
-                # 專門針對浮動視窗的選擇器 - 按照成功率排序
-                modal_selectors = [
-                    # ✅ 已驗證有效的選擇器（優先使用）
-                    '.dialog:has-text("登入成功")',  # 實測成功
-                    
-                    # 🔄 備用選擇器
-                    '.modal:has-text("登入成功")',
-                    '.popup:has-text("登入成功")',
-                    '.alert:has-text("登入成功")',
-                    '[role="dialog"]:has-text("登入成功")',
-                    '.swal-modal:has-text("登入成功")',
-                    '.modal-content:has-text("登入成功")',
-                    '.ui-dialog:has-text("登入成功")'
-                ]
-                
-                # 先嘗試找到浮動視窗
-                modal_found = False
-                modal_element = None
+                driver['page'].select_option('select', pickup['type'])
+            except Exception as e2:
+                print(f"後備方案也失敗: {e2}")
+        
+        take_screenshot("pickup_location")
+        
+        # 7. 輸入上車地點（預設為「亞東紀念醫院」）並選擇第一個搜尋結果
+        print("尋找上車地點輸入框...")
+        
+        # 嘗試多種搜尋框選擇器
+        input_selectors = [
+            # 通用地點輸入框
+            'input[placeholder*="地點"]',
+            'input[placeholder*="起點"]',
+            'input[placeholder*="上車"]',
+            'input[placeholder*="出發"]',
+            'input[placeholder*="from"]',
+            'input[placeholder*="起始"]',
+            
+            # 根據 name 屬性
+            'input[name*="pickup"]',
+            'input[name*="origin"]',
+            'input[name*="from"]',
+            'input[name*="start"]',
+            'input[name*="departure"]',
+            
+            # 根據 ID
+            '#pickup-location',
+            '#origin',
+            '#from-location',
+            '#start-location',
+            '#departure',
+            
+            # 根據 class
+            '.pickup-input',
+            '.origin-input',
+            '.location-input',
+            '.address-input',
+            
+            # 通用輸入框（按順序）
+            'form input[type="text"]:nth-of-type(1)',
+            'form input[type="text"]:first-of-type',
+            'input[type="text"]:nth-of-type(1)',
+            'input[type="text"]:first-of-type',
+            
+            # 更廣泛的搜尋
+            'input[type="text"]'
+        ]
+        
+        pickup_input = None
+        input_found = False
+        
+        for selector in input_selectors:
+            try:
+                print(f"嘗試搜尋框選擇器: {selector}")
+                elements = driver['page'].locator(selector).all()
                 
-                for selector in modal_selectors:
+                for i, element in enumerate(elements):
                     try:
-                        print(f"尋找浮動視窗: {selector}")
-                        modal_element = driver['page'].wait_for_selector(selector, timeout=5000)
-                        print(f"找到登入成功浮動視窗: {selector}")
-                        modal_found = True
-                        break
+                        if element.is_visible() and element.is_enabled():
+                            # 檢查是否為上車地點相關的輸入框
+                            placeholder = element.get_attribute('placeholder') or ''
+                            name = element.get_attribute('name') or ''
+                            id_attr = element.get_attribute('id') or ''
+                            class_attr = element.get_attribute('class') or ''
+                            
+                            print(f"找到輸入框 {i}: placeholder='{placeholder}', name='{name}', id='{id_attr}', class='{class_attr}'")
+                            
+                            # 如果是明確的上車地點輸入框，優先使用
+                            if any(keyword in (placeholder + name + id_attr + class_attr).lower() 
+                                  for keyword in ['地點', '起點', '上車', '出發', 'pickup', 'origin', 'from', 'start']):
+                                pickup_input = element
+                                input_found = True
+                                print(f"找到上車地點輸入框: {selector} (索引 {i})")
+                                break
+                            elif not pickup_input:  # 如果還沒找到明確的，先暫存這個
+                                pickup_input = element
                     except Exception as e:
-                        print(f"浮動視窗選擇器 {selector} 未找到: {e}")
+                        print(f"檢查輸入框 {i} 失敗: {e}")
                         continue
                 
-                # 如果沒找到特定的浮動視窗，嘗試通用的登入成功訊息
-                if not modal_found:
-                    generic_selectors = [
-                        'text=登入成功',
-                        ':text("登入成功")',
-                        '*:has-text("登入成功")'
-                    ]
-                    
-                    for selector in generic_selectors:
-                        try:
-                            print(f"尋找通用登入成功訊息: {selector}")
-                            driver['page'].wait_for_selector(selector, timeout=3000)
-                            print(f"找到登入成功訊息: {selector}")
-                            modal_found = True
-                            break
-                        except Exception as e:
-                            print(f"通用選擇器 {selector} 未找到: {e}")
-                            continue
-                
-                if modal_found:
-                    # 截圖記錄找到登入成功訊息
-                    take_screenshot("login_success_modal_found")
-                    
-                    # 等待一下讓浮動視窗完全顯示
-                    driver['page'].wait_for_timeout(1000)
-                    
-                    # 尋找確定按鈕 - 專門針對浮動視窗內的按鈕（按照成功率排序）
-                    confirm_selectors = [
-                        # ✅ 已驗證有效的選擇器（優先使用）
-                        'span.dialog-button',  # 實測成功
-                        
-                        # 🔄 備用選擇器
-                        '.dialog button:has-text("確定")',
-                        '.modal button:has-text("確定")',
-                        '.popup button:has-text("確定")',
-                        '.alert button:has-text("確定")',
-                        '[role="dialog"] button:has-text("確定")',
-                        '.swal-button:has-text("確定")',
-                        '.modal-footer button:has-text("確定")',
-                        '.ui-dialog-buttonset button:has-text("確定")',
-                        'button:has-text("確定")',
-                        'text=確定',
-                        '.btn:has-text("確定")',
-                        'input[value="確定"]'
-                    ]
-                    
-                    confirm_clicked = False
-                    for confirm_selector in confirm_selectors:
-                        try:
-                            print(f"嘗試點擊確定按鈕: {confirm_selector}")
-                            # 等待按鈕可見
-                            button = driver['page'].wait_for_selector(confirm_selector, timeout=3000)
-                            if button.is_visible():
-                                button.click()
-                                print(f"確定按鈕點擊成功: {confirm_selector}")
-                                confirm_clicked = True
-                        except Exception as e:
-                            print(f"確定按鈕 {confirm_selector} 點擊失敗: {e}")
-                            continue
-                    
-                    if not confirm_clicked:
-                        print("未找到確定按鈕，嘗試點擊任何可見的按鈕")
-                        try:
-                            # 嘗試點擊浮動視窗中的任何按鈕
-                            buttons = driver['page'].locator('button').all()
-                            for button in buttons:
-                                if button.is_visible():
-                                    button_text = button.text_content()
-                                    print(f"發現按鈕: {button_text}")
-                                    if any(word in button_text for word in ['確定', 'OK', '好', '關閉']):
-                                        button.click()
-                                        print(f"點擊按鈕: {button_text}")
-                                        confirm_clicked = True
-                                        break
-                        except Exception as e:
-                            print(f"嘗試點擊其他按鈕失敗: {e}")
-                    
-                    if not confirm_clicked:
-                        print("所有按鈕點擊嘗試失敗，嘗試按 ESC 鍵關閉浮動視窗")
-                        driver['page'].keyboard.press('Escape')
-                    
-                    print("登入成功確認完成")
-                    take_screenshot("login_success_confirmed")
-                else:
-                    print("沒有找到登入成功浮動視窗，可能已經登入成功或登入失敗")
-                    take_screenshot("no_login_success_modal")
+                if input_found:
+                    break
                     
             except Exception as e:
-                print(f"登入成功檢測過程發生錯誤: {e}")
-                take_screenshot("login_success_detection_error")
-            
-            # 等待登入完成
-            print("等待登入完成...")
-            driver['page'].wait_for_load_state("networkidle")
-            print("登入流程完成")
-            take_screenshot("login_complete")
-            
-        except Exception as e:
-            print(f"登入過程發生錯誤: {e}")
-            take_screenshot("login_error")
+                print(f"搜尋框選擇器 {selector} 失敗: {e}")
+                continue
+        
+        if not pickup_input:
+            print("警告：無法找到上車地點輸入框")
+            take_screenshot("no_input_found")
             return False
         
-        # 開始預約流程
-        print("開始預約流程...")
+        print(f"輸入上車地點：{pickup['query']}")
         try:
-            # 5. 點擊「新增預約」
-            print("點擊新增預約")
-            driver['page'].click('text=新增預約')
-            driver['page'].wait_for_load_state("networkidle")
-            take_screenshot("new_reservation")
-            
-            # 6. 上車地點選擇「醫療院所」
-            print("選擇上車地點：醫療院所")
-            
-            # 確保選擇第一個下拉選單作為上車地點
-            try:
-                # 尋找第一個可見的下拉選單
-                first_select = driver['page'].locator('select').first
-                if first_select.count() > 0 and first_select.is_visible():
-                    # 檢查選項
-                    options = first_select.locator('option').all()
-                    option_texts = [opt.text_content() or '' for opt in options]
-                    print(f"第一個選單的選項: {option_texts}")
-                    
-                    if '醫療院所' in option_texts:
-                        first_select.select_option('醫療院所')
-                        print("第一個選單成功選擇：醫療院所")
-                    else:
-                        print("第一個選單沒有醫療院所選項，嘗試其他方式...")
-                        # 嘗試通用選擇
-                        driver['page'].select_option('select', '醫療院所')
-                else:
-                    print("找不到第一個下拉選單，嘗試通用選擇...")
-                    driver['page'].select_option('select', '醫療院所')
-            except Exception as e:
-                print(f"選擇上車地點失敗: {e}")
-                # 後備方案
-                try:
-                    driver['page'].select_option('select', '醫療院所')
-                except Exception as e2:
-                    print(f"後備方案也失敗: {e2}")
-            
-            take_screenshot("pickup_location")
-            
-            # 7. 輸入「亞東紀念醫院」並選擇第一個搜尋結果
-            print("尋找上車地點輸入框...")
-            
-            # 嘗試多種搜尋框選擇器
-            input_selectors = [
-                # 通用地點輸入框
-                'input[placeholder*="地點"]',
-                'input[placeholder*="起點"]',
-                'input[placeholder*="上車"]',
-                'input[placeholder*="出發"]',
-                'input[placeholder*="from"]',
-                'input[placeholder*="起始"]',
-                
-                # 根據 name 屬性
-                'input[name*="pickup"]',
-                'input[name*="origin"]',
-                'input[name*="from"]',
-                'input[name*="start"]',
-                'input[name*="departure"]',
-                
-                # 根據 ID
-                '#pickup-location',
-                '#origin',
-                '#from-location',
-                '#start-location',
-                '#departure',
-                
-                # 根據 class
-                '.pickup-input',
-                '.origin-input',
-                '.location-input',
-                '.address-input',
-                
-                # 通用輸入框（按順序）
-                'form input[type="text"]:nth-of-type(1)',
-                'form input[type="text"]:first-of-type',
-                'input[type="text"]:nth-of-type(1)',
-                'input[type="text"]:first-of-type',
-                
-                # 更廣泛的搜尋
-                'input[type="text"]'
-            ]
-            
-            pickup_input = None
-            input_found = False
-            
-            for selector in input_selectors:
-                try:
-                    print(f"嘗試搜尋框選擇器: {selector}")
-                    elements = driver['page'].locator(selector).all()
-                    
-                    for i, element in enumerate(elements):
-                        try:
-                            if element.is_visible() and element.is_enabled():
-                                # 檢查是否為上車地點相關的輸入框
-                                placeholder = element.get_attribute('placeholder') or ''
-                                name = element.get_attribute('name') or ''
-                                id_attr = element.get_attribute('id') or ''
-                                class_attr = element.get_attribute('class') or ''
-                                
-                                print(f"找到輸入框 {i}: placeholder='{placeholder}', name='{name}', id='{id_attr}', class='{class_attr}'")
-                                
-                                # 如果是明確的上車地點輸入框，優先使用
-                                if any(keyword in (placeholder + name + id_attr + class_attr).lower() 
-                                      for keyword in ['地點', '起點', '上車', '出發', 'pickup', 'origin', 'from', 'start']):
-                                    pickup_input = element
-                                    input_found = True
-                                    print(f"找到上車地點輸入框: {selector} (索引 {i})")
-                                    break
-                                elif not pickup_input:  # 如果還沒找到明確的，先暫存這個
-                                    pickup_input = element
-                        except Exception as e:
-                            print(f"檢查輸入框 {i} 失敗: {e}")
-                            continue
-                    
-                    if input_found:
-                        break
-                        
-                except Exception as e:
-                    print(f"搜尋框選擇器 {selector} 失敗: {e}")
-                    continue
+            # 確保輸入框有焦點
+            pickup_input.click()
+            wait_engine.wait_for_element(driver, 'hospital_input_focused', pickup_input, INPUT_FOCUSED_JS, 500)
             
-            if not pickup_input:
-                print("警告：無法找到上車地點輸入框")
-                take_screenshot("no_input_found")
-                return False
+            # 清空輸入框
+            pickup_input.clear()
+            wait_engine.wait_for_element(driver, 'hospital_input_cleared', pickup_input, INPUT_EMPTY_JS, 500)
             
-            print("輸入上車地點：亞東紀念醫院")
+            # 使用多種方式輸入
             try:
-                # 確保輸入框有焦點
-                pickup_input.click()
-                driver['page'].wait_for_timeout(500)
-                
-                # 清空輸入框
-                pickup_input.clear()
-                driver['page'].wait_for_timeout(500)
-                
-                # 使用多種方式輸入
-                try:
-                    # 方法1: 使用 fill
-                    pickup_input.fill('亞東紀念醫院')
-                    driver['page'].wait_for_timeout(1000)
-                    
-                    # 檢查是否成功輸入
+                # 方法1: 使用 fill
+                pickup_input.fill(pickup['query'])
+                wait_engine.wait_for_element(driver, 'hospital_input_filled', pickup_input, typed_js, 1000)
+                
+                # 檢查是否成功輸入
+                current_value = pickup_input.input_value()
+                print(f"輸入後的值: '{current_value}'")
+                
+                if pickup['query'][:2] not in current_value:
+                    print("fill 方法可能失敗，嘗試 type 方法...")
+                    pickup_input.clear()
+                    pickup_input.type(pickup['query'])
+                    wait_engine.wait_for_element(driver, 'hospital_input_typed', pickup_input, typed_js, 1000)
                     current_value = pickup_input.input_value()
-                    print(f"輸入後的值: '{current_value}'")
-                    
-                    if '亞東' not in current_value:
-                        print("fill 方法可能失敗，嘗試 type 方法...")
-                        pickup_input.clear()
-                        pickup_input.type('亞東紀念醫院')
-                        driver['page'].wait_for_timeout(1000)
+                    print(f"type 後的值: '{current_value}'")
+                    
+                    if pickup['query'][:2] not in current_value:
+                        print("type 方法也失敗，嘗試 JavaScript...")
+                        # 使用 JavaScript 直接設置值
+                        script = """
+                        (element, value) => {
+                            element.value = value;
+                            element.dispatchEvent(new Event('input', { bubbles: true }));
+                            element.dispatchEvent(new Event('change', { bubbles: true }));
+                        }
+                        """
+                        pickup_input.evaluate(script, pickup['query'])
+                        wait_engine.wait_for_element(driver, 'hospital_input_scripted', pickup_input, typed_js, 1000)
                         current_value = pickup_input.input_value()
-                        print(f"type 後的值: '{current_value}'")
-                        
-                        if '亞東' not in current_value:
-                            print("type 方法也失敗，嘗試 JavaScript...")
-                            # 使用 JavaScript 直接設置值
-                            script = """
-                            (element) => {
-                                element.value = '亞東紀念醫院';
-                                element.dispatchEvent(new Event('input', { bubbles: true }));
-                                element.dispatchEvent(new Event('change', { bubbles: true }));
-                            }
-                            """
-                            pickup_input.evaluate(script)
-                            driver['page'].wait_for_timeout(1000)
-                            current_value = pickup_input.input_value()
-                            print(f"JavaScript 後的值: '{current_value}'")
-                    
-                except Exception as e:
-                    print(f"輸入過程發生錯誤: {e}")
-                
-                take_screenshot("hospital_input_filled")
+                        print(f"JavaScript 後的值: '{current_value}'")
                 
             except Exception as e:
-                print(f"輸入亞東紀念醫院失敗: {e}")
-                take_screenshot("hospital_input_failed")
-                return False
+                print(f"輸入過程發生錯誤: {e}")
             
-            # 等待 Google 搜尋結果出現並選擇第一個
-            print("等待並選擇搜尋結果...")
-            driver['page'].wait_for_timeout(2000)  # 給搜尋結果時間載入
+            take_screenshot("hospital_input_filled")
             
-            # 使用最簡單可靠的方法：鍵盤導航
-            success = False
+        except Exception as e:
+            print(f"輸入{pickup['query']}失敗: {e}")
+            take_screenshot("hospital_input_failed")
+            return False
+        
+        # 先以快取直接選擇上次的建議（建議清單一出現就點擊）
+        success = False
+        suggestion_items = []
+        final_value = autocomplete_cache.pick(driver, pickup_input, pickup['query'])
+        if final_value is not None and reservation_spec.pickup_selected(final_value, spec):
+            success = True
+        elif final_value is not None:
+            # 快取的建議不符合上車地點，作廢後重新輸入，避免每次都選到同一個錯誤的建議
+            autocomplete_cache.invalidate(pickup['query'], f"選擇後的值不符合上車地點: '{final_value}'")
+            pickup_input.fill(pickup['query'])
+        elif autocomplete_cache.lookup(pickup['query']) is None and pickup_input.input_value() != pickup['query']:
+            # 快取作廢時輸入框可能已被換掉，重新輸入讓建議清單再出現
+            pickup_input.fill(pickup['query'])
+        
+        # 等待 Google 搜尋結果出現並選擇第一個
+        if not success:
+            print("等待並選擇搜尋結果...")
+            wait_engine.wait_for_condition(driver, 'hospital_suggestions_shown', PAC_VISIBLE_JS, 2000)  # 等待 Google 建議選項出現
+            suggestion_items = autocomplete_cache.suggestions(driver)
+        
+        # 使用最簡單可靠的方法：鍵盤導航
+        if not success:
             try:
                 print("使用鍵盤方法選擇第一個搜尋結果...")
-                
+            
                 # 確保輸入框有焦點
                 pickup_input.click()
-                driver['page'].wait_for_timeout(1000)
-                
+                wait_engine.wait_for_element(driver, 'hospital_input_refocused', pickup_input, INPUT_FOCUSED_JS, 1000)
+            
                 # 方法1: 直接按向下箭頭和 Enter
                 print("方法1: 按向下箭頭選擇第一個結果...")
                 driver['page'].keyboard.press('ArrowDown')
-                driver['page'].wait_for_timeout(1500)
+                wait_engine.wait_for_condition(driver, 'hospital_suggestion_highlighted', PAC_SELECTED_JS, 1500)
                 take_screenshot("arrow_down_pressed")
-                
+            
                 # 按 Enter 確認
                 driver['page'].keyboard.press('Enter')
-                driver['page'].wait_for_timeout(2000)
+                wait_engine.wait_for_element(driver, 'hospital_suggestion_chosen', pickup_input, chosen_js, 2000)
                 take_screenshot("enter_pressed")
-                
+            
                 # 檢查輸入框值是否變化
                 final_value = pickup_input.input_value()
                 print(f"鍵盤選擇後輸入框的值: '{final_value}'")
-                
+            
                 # 使用相同的寬鬆判斷條件（中英文關鍵字）
-                keywords = ['亞東', '醫院', '紀念', 'Far Eastern', 'Memorial', 'Hospital', 'FEMH']
-                addr_keywords = ['台北', '新北', '板橋', 'Taipei', 'New Taipei']
                 if final_value and final_value.strip():
-                    if (any(keyword in final_value for keyword in keywords) or
-                        (len(final_value.strip()) >= len('亞東紀念醫院') and final_value.strip() != '亞東紀念醫院') or
-                        any(addr_keyword in final_value for addr_keyword in addr_keywords)):
+                    if reservation_spec.pickup_selected(final_value, spec):
                         print("鍵盤方法成功！")
                         success = True
                     else:
                         print("鍵盤方法可能未成功，值未顯著變化")
                 else:
                     print("鍵盤方法可能未成功，值為空")
-                
+            
             except Exception as e:
                 print(f"鍵盤方法失敗: {e}")
-            
-            # 方法2: 如果鍵盤方法失敗，嘗試點擊第一個可見的搜尋結果
-            if not success:
-                try:
-                    print("方法2: 嘗試點擊第一個可見的搜尋結果...")
-                    
-                    # 簡單的選擇器，按優先級排序
-                    simple_selectors = [
-                        '.pac-item:first-child',
-                        '.autocomplete-dropdown li:first-child', 
-                        '.suggestions li:first-child',
-                        '[role="option"]:first-child',
-                        'ul li:first-child'
-                    ]
-                    
-                    for selector in simple_selectors:
-                        try:
-                            element = driver['page'].locator(selector).first
-                            if element.count() > 0 and element.is_visible():
-                                print(f"找到並點擊: {selector}")
-                                element.click()
-                                driver['page'].wait_for_timeout(2000)
-                                
-                                # 檢查是否成功
-                                final_value = pickup_input.input_value()
-                                # 使用相同的寬鬆判斷條件（中英文關鍵字）
-                                if final_value and final_value.strip():
-                                    keywords = ['亞東', '醫院', '紀念', 'Far Eastern', 'Memorial', 'Hospital', 'FEMH']
-                                    addr_keywords = ['台北', '新北', '板橋', 'Taipei', 'New Taipei']
-                                    if (any(keyword in final_value for keyword in keywords) or
-                                        (len(final_value.strip()) >= len('亞東紀念醫院') and final_value.strip() != '亞東紀念醫院') or
-                                        any(addr_keyword in final_value for addr_keyword in addr_keywords)):
-                                        print("點擊方法成功！")
-                                        success = True
-                                    break
-                        except Exception as e:
-                            print(f"選擇器 {selector} 失敗: {e}")
-                            continue
-                            
-                except Exception as e:
-                    print(f"點擊方法失敗: {e}")
-            
-            # 方法3: 最後手段 - 檢查所有可見的列表項目
-            if not success:
-                try:
-                    print("方法3: 檢查所有列表項目...")
-                    all_lis = driver['page'].locator('li:visible').all()
-                    for i, li in enumerate(all_lis[:5]):  # 只檢查前5個
-                        try:
-                            text = li.text_content() or ''
-                            print(f"列表項目 {i}: '{text}'")
-                            if '亞東' in text and '醫院' in text:
-                                print(f"找到相關項目，點擊: {text}")
-                                li.click()
-                                driver['page'].wait_for_timeout(2000)
-                                
-                                final_value = pickup_input.input_value()
-                                # 使用相同的寬鬆判斷條件（中英文關鍵字）
-                                if final_value and final_value.strip():
-                                    keywords = ['亞東', '醫院', '紀念', 'Far Eastern', 'Memorial', 'Hospital', 'FEMH']
-                                    addr_keywords = ['台北', '新北', '板橋', 'Taipei', 'New Taipei']
-                                    if (any(keyword in final_value for keyword in keywords) or
-                                        (len(final_value.strip()) >= len('亞東紀念醫院') and final_value.strip() != '亞東紀念醫院') or
-                                        any(addr_keyword in final_value for addr_keyword in addr_keywords)):
-                                        print("列表點擊成功！")
-                                        success = True
-                                    break
-                        except Exception as e:
-                            continue
-                except Exception as e:
-                    print(f"列表檢查失敗: {e}")
-            
-            if success:
-                print("✅ 搜尋結果選擇成功")
-                take_screenshot("pickup_location_selected")
-            else:
-                print("⚠️ 搜尋結果選擇失敗，但繼續執行...")
-                take_screenshot("pickup_selection_failed")
-            
-            # 8. 下車地點選擇「住家」
-            print("=== 開始選擇下車地點：住家 ===")
-            
-            # 等待頁面穩定
-            driver['page'].wait_for_timeout(1000)
-            
-            # 重新獲取所有選單，確保是最新的狀態
-            all_selects = driver['page'].locator('select').all()
-            total_selects = len(all_selects)
-            print(f"頁面上總共有 {total_selects} 個下拉選單")
-            
-            dropoff_success = False
-            
-            # 詳細檢查每個選單
-            for i, select_elem in enumerate(all_selects):
-                try:
-                    if not select_elem.is_visible():
-                        print(f"選單 {i}: 不可見，跳過")
-                        continue
-                        
-                    # 獲取選單屬性
-                    name = select_elem.get_attribute('name') or ''
-                    id_attr = select_elem.get_attribute('id') or ''
-                    class_attr = select_elem.get_attribute('class') or ''
-                    
-                    print(f"選單 {i}: name='{name}', id='{id_attr}', class='{class_attr}'")
-                    
-                    # 獲取選單的所有選項
-                    options = select_elem.locator('option').all()
-                    option_texts = []
-                    for option in options:
-                        text = option.text_content() or ''
-                        if text.strip():  # 只記錄非空選項
-                            option_texts.append(text.strip())
-                    
-                    print(f"選單 {i} 的選項: {option_texts}")
-                    
-                    # 判斷邏輯：
-                    # 1. 如果是第一個選單且有「醫療院所」選項，很可能是上車地點，跳過
-                    # 2. 如果有「住家」選項，且不是第一個選單，嘗試選擇
-                    
-                    if i == 0 and '醫療院所' in option_texts:
-                        print(f"選單 {i}: 包含'醫療院所'，判斷為上車地點選單，跳過")
-                        continue
-                    
-                    if '住家' in option_texts:
-                        print(f"選單 {i}: 包含'住家'選項，嘗試設定為下車地點...")
-                        try:
-                            # 先檢查當前選中的值
-                            current_value = select_elem.input_value()
-                            print(f"選單 {i} 當前值: '{current_value}'")
-                            
-                            # 找到住家選項的索引
-                            home_index = None
-                            for j, option_text in enumerate(option_texts):
-                                if option_text == '住家':
-                                    home_index = j
-                                    break
-                            
-                            if home_index is not None:
-                                print(f"住家選項在索引 {home_index}")
-                                
-                                # 嘗試多種選擇方法
-                                success = False
-                                
-                                # 方法1: 使用文字值選擇
-                                try:
-                                    select_elem.select_option('住家')
-                                    driver['page'].wait_for_timeout(500)
-                                    new_value = select_elem.input_value()
-                                    print(f"方法1 (文字值) 選擇後的值: '{new_value}'")
-                                    if new_value == '住家' or (new_value and new_value != current_value):
-                                        success = True
-                                except Exception as e:
-                                    print(f"方法1 (文字值) 失敗: {e}")
-                                
-                                # 方法2: 使用索引值選擇
-                                if not success:
-                                    try:
-                                        select_elem.select_option(index=home_index)
-                                        driver['page'].wait_for_timeout(500)
-                                        new_value = select_elem.input_value()
-                                        print(f"方法2 (索引值) 選擇後的值: '{new_value}'")
-                                        if new_value and new_value != current_value:
-                                            success = True
-                                    except Exception as e:
-                                        print(f"方法2 (索引值) 失敗: {e}")
-                                
-                                # 方法3: 使用數字值選擇（通常住家是索引1）
-                                if not success:
-                                    try:
-                                        # 嘗試用數字值
-                                        select_elem.select_option(str(home_index))
-                                        driver['page'].wait_for_timeout(500)
-                                        new_value = select_elem.input_value()
-                                        print(f"方法3 (數字值) 選擇後的值: '{new_value}'")
-                                        if new_value and new_value != current_value:
-                                            success = True
-                                    except Exception as e:
-                                        print(f"方法3 (數字值) 失敗: {e}")
-                                
-                                # 方法4: 使用 value 屬性選擇
-                                if not success:
-                                    try:
-                                        # 獲取住家選項的 value 屬性
-                                        home_option = select_elem.locator('option').nth(home_index)
-                                        option_value = home_option.get_attribute('value')
-                                        print(f"住家選項的 value 屬性: '{option_value}'")
-                                        
-                                        if option_value:
-                                            select_elem.select_option(value=option_value)
-                                            driver['page'].wait_for_timeout(500)
-                                            new_value = select_elem.input_value()
-                                            print(f"方法4 (value屬性) 選擇後的值: '{new_value}'")
-                                            if new_value and new_value != current_value:
-                                                success = True
-                                    except Exception as e:
-                                        print(f"方法4 (value屬性) 失敗: {e}")
-                                
-                                # 驗證最終結果
-                                if success:
-                                    final_value = select_elem.input_value()
-                                    print(f"✅ 選單 {i} 成功選擇住家作為下車地點，最終值: '{final_value}'")
-                                    dropoff_success = True
-                                    break
-                                else:
-                                    print(f"❌ 選單 {i} 所有方法都失敗，無法選擇住家")
-                            else:
-                                print(f"❌ 在選單 {i} 中找不到住家選項的索引")
-                                
-                        except Exception as e:
-                            print(f"❌ 選單 {i} 選擇住家時發生錯誤: {e}")
-                            continue
-                    else:
-                        print(f"選單 {i}: 沒有'住家'選項，跳過")
-                        
-                except Exception as e:
-                    print(f"檢查選單 {i} 時發生錯誤: {e}")
-                    continue
-            
-            # 如果沒有成功，嘗試更具體的選擇器
-            if not dropoff_success:
-                print("通過索引方式未成功，嘗試具體的下車地點選擇器...")
-                
-                specific_selectors = [
-                    'select[name*="dropoff"]',  # 包含 dropoff 的 name
-                    'select[name*="destination"]',  # 包含 destination 的 name  
-                    'select[name*="to"]',  # 包含 to 的 name
-                    'select[name*="end"]',  # 包含 end 的 name
-                    'select[id*="dropoff"]',  # 包含 dropoff 的 id
-                    'select[id*="destination"]',  # 包含 destination 的 id
-                    'select:nth-of-type(2)',  # 第二個 select 元素
-                    'select:last-of-type'  # 最後一個 select 元素
+        
+        # 方法2: 如果鍵盤方法失敗，嘗試點擊第一個可見的搜尋結果
+        if not success:
+            try:
+                print("方法2: 嘗試點擊第一個可見的搜尋結果...")
+                
+                # 簡單的選擇器，按優先級排序
+                simple_selectors = [
+                    '.pac-item:first-child',
+                    '.autocomplete-dropdown li:first-child', 
+                    '.suggestions li:first-child',
+                    '[role="option"]:first-child',
+                    'ul li:first-child'
                 ]
                 
-                for selector in specific_selectors:
+                for selector in simple_selectors:
                     try:
-                        print(f"嘗試選擇器: {selector}")
                         element = driver['page'].locator(selector).first
-                        
                         if element.count() > 0 and element.is_visible():
-                            # 檢查選項
-                            options = element.locator('option').all()
-                            option_texts = [opt.text_content() or '' for opt in options if opt.text_content()]
-                            print(f"選擇器 {selector} 的選項: {option_texts}")
+                            print(f"找到並點擊: {selector}")
+                            element.click()
+                            wait_engine.wait_for_element(driver, 'hospital_suggestion_clicked', pickup_input, chosen_js, 2000)
                             
-                            if '住家' in option_texts:
-                                print(f"在選擇器 {selector} 中找到住家，嘗試選擇...")
-                                element.select_option('住家')
-                                driver['page'].wait_for_timeout(500)
-                                
-                                # 驗證
-                                new_value = element.input_value()
-                                if new_value == '住家':
-                                    print(f"✅ 選擇器 {selector} 成功選擇住家")
-                                    dropoff_success = True
-                                    break
-                                    
+                            # 檢查是否成功
+                            final_value = pickup_input.input_value()
+                            # 使用相同的寬鬆判斷條件（中英文關鍵字）
+                            if reservation_spec.pickup_selected(final_value, spec):
+                                print("點擊方法成功！")
+                                success = True
+                                break
                     except Exception as e:
                         print(f"選擇器 {selector} 失敗: {e}")
                         continue
-            
-            if dropoff_success:
-                print("✅ 下車地點'住家'選擇成功")
+                        
+            except Exception as e:
+                print(f"點擊方法失敗: {e}")
+        
+        # 方法3: 最後手段 - 檢查所有可見的列表項目
+        if not success:
+            try:
+                print("方法3: 檢查所有列表項目...")
+                all_lis = driver['page'].locator('li:visible').all()
+                for i, li in enumerate(all_lis[:5]):  # 只檢查前5個
+                    try:
+                        text = li.text_content() or ''
+                        print(f"列表項目 {i}: '{text}'")
+                        if all(keyword in text for keyword in pickup['match'][:2]):
+                            print(f"找到相關項目，點擊: {text}")
+                            li.click()
+                            wait_engine.wait_for_element(driver, 'hospital_list_item_clicked', pickup_input, chosen_js, 2000)
+                            
+                            final_value = pickup_input.input_value()
+                            # 使用相同的寬鬆判斷條件（中英文關鍵字）
+                            if reservation_spec.pickup_selected(final_value, spec):
+                                print("列表點擊成功！")
+                                success = True
+                                break
+                    except Exception as e:
+                        continue
+            except Exception as e:
+                print(f"列表檢查失敗: {e}")
+        
+        if success:
+            print("✅ 搜尋結果選擇成功")
+            if suggestion_items:
+                autocomplete_cache.remember(pickup['query'], suggestion_items, pickup_input.input_value())
+            take_screenshot("pickup_location_selected")
+        else:
+            print("⚠️ 搜尋結果選擇失敗，但繼續執行...")
+            take_screenshot("pickup_selection_failed")
+        
+        # 8. 下車地點選擇「住家」
+        print("=== 開始選擇下車地點：住家 ===")
+        
+        # 等待頁面穩定
+        wait_engine.wait_for_network_quiet(driver, 'pickup_settled', 1000)
+        
+        # 重新獲取所有選單，確保是最新的狀態
+        all_selects = driver['page'].locator('select').all()
+        total_selects = len(all_selects)
+        print(f"頁面上總共有 {total_selects} 個下拉選單")
+        
+        dropoff_success = False
+        
+        # 詳細檢查每個選單
+        for i, select_elem in enumerate(all_selects):
+            try:
+                if not select_elem.is_visible():
+                    print(f"選單 {i}: 不可見，跳過")
+                    continue
+                    
+                # 獲取選單屬性
+                name = select_elem.get_attribute('name') or ''
+                id_attr = select_elem.get_attribute('id') or ''
+                class_attr = select_elem.get_attribute('class') or ''
                 
-                # 8.1 處理住家地址自動填入
-                print("=== 處理住家地址自動填入 ===")
+                print(f"選單 {i}: name='{name}', id='{id_attr}', class='{class_attr}'")
                 
-                # 等待頁面響應下車地點選擇
-                driver['page'].wait_for_timeout(1500)
+                # 獲取選單的所有選項
+                options = select_elem.locator('option').all()
+                option_texts = []
+                for option in options:
+                    text = option.text_content() or ''
+                    if text.strip():  # 只記錄非空選項
+                        option_texts.append(text.strip())
                 
-                # 尋找下車地點地址輸入框（注意：要避開上車地點的地址框）
-                address_input = None
+                print(f"選單 {i} 的選項: {option_texts}")
                 
-                # 更精確的下車地點地址框選擇器
-                dropoff_address_selectors = [
-                    # 明確的下車地點地址框
-                    'input[name*="getOff"][name*="address"]',
-                    'input[name*="dropoff"][name*="address"]',
-                    'input[name*="destination"][name*="address"]',
-                    'input[id*="getOff"][id*="address"]',
-                    'input[id*="dropoff"][id*="address"]',
-                    'input[id*="destination"][id*="address"]',
-                    
-                    # 根據位置關係找到下車地點附近的地址框
-                    '#getOff_location + input',  # getOff_location 選單後面的輸入框
-                    '#getOff_location ~ input',  # getOff_location 選單同級的輸入框
-                    'select[name="getOff_location"] + input',
-                    'select[name="getOff_location"] ~ input',
-                ]
+                # 判斷邏輯：
+                # 1. 如果是第一個選單且有上車地點類型（例如「醫療院所」）選項，很可能是上車地點，跳過
+                # 2. 如果有「住家」選項，且不是第一個選單，嘗試選擇
                 
-                print("尋找下車地點地址輸入框...")
-                for selector in dropoff_address_selectors:
+                if i == 0 and pickup['type'] in option_texts:
+                    print(f"選單 {i}: 包含'{pickup['type']}'，判斷為上車地點選單，跳過")
+                    continue
+                
+                if '住家' in option_texts:
+                    print(f"選單 {i}: 包含'住家'選項，嘗試設定為下車地點...")
                     try:
-                        print(f"嘗試下車地點地址選擇器: {selector}")
-                        elements = driver['page'].locator(selector).all()
+                        # 先檢查當前選中的值
+                        current_value = select_elem.input_value()
+                        print(f"選單 {i} 當前值: '{current_value}'")
                         
-                        for i, element in enumerate(elements):
-                            if element.is_visible() and element.is_enabled():
-                                placeholder = element.get_attribute('placeholder') or ''
-                                name = element.get_attribute('name') or ''
-                                id_attr = element.get_attribute('id') or ''
-                                
-                                print(f"找到地址輸入框 {selector}[{i}]: placeholder='{placeholder}', name='{name}', id='{id_attr}'")
-                                
-                                # 確保不是上車地點的地址框
-                                if not any(keyword in (name + id_attr).lower() 
-                                          for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start']):
-                                    address_input = element
-                                    print(f"✅ 確認為下車地點地址框: {selector}[{i}]")
-                                    break
-                                else:
-                                    print(f"❌ 跳過上車地點地址框: {selector}[{i}]")
+                        # 找到住家選項的索引
+                        home_index = None
+                        for j, option_text in enumerate(option_texts):
+                            if option_text == '住家':
+                                home_index = j
+                                break
                         
-                        if address_input:
-                            break
+                        if home_index is not None:
+                            print(f"住家選項在索引 {home_index}")
+                            
+                            # 依成績表的順序嘗試各種選擇方法
+                            ctx = {'select': select_elem, 'home_index': home_index, 'current_value': current_value}
+                            success = dropoff_strategies.run(driver, 'home_select', ctx) is not None
+                            
+                            # 驗證最終結果
+                            if success:
+                                final_value = select_elem.input_value()
+                                print(f"✅ 選單 {i} 成功選擇住家作為下車地點，最終值: '{final_value}'")
+                                dropoff_success = True
+                                break
+                            else:
+                                print(f"❌ 選單 {i} 所有方法都失敗，無法選擇住家")
+                        else:
+                            print(f"❌ 在選單 {i} 中找不到住家選項的索引")
                             
                     except Exception as e:
-                        print(f"檢查下車地點地址選擇器 {selector} 失敗: {e}")
+                        print(f"❌ 選單 {i} 選擇住家時發生錯誤: {e}")
                         continue
-                
-                # 如果沒找到明確的下車地點地址框，使用通用方法但更謹慎
-                if not address_input:
-                    print("未找到明確的下車地點地址框，檢查所有可見地址輸入框...")
-                    
-                    all_inputs = driver['page'].locator('input[type="text"]').all()
-                    for i, element in enumerate(all_inputs):
-                        try:
-                            if element.is_visible() and element.is_enabled():
-                                placeholder = element.get_attribute('placeholder') or ''
-                                name = element.get_attribute('name') or ''
-                                id_attr = element.get_attribute('id') or ''
-                                
-                                print(f"輸入框 {i}: placeholder='{placeholder}', name='{name}', id='{id_attr}'")
-                                
-                                # 檢查是否可能是地址框，但不是上車地點的
-                                is_address_like = any(keyword in (placeholder + name + id_attr).lower() 
-                                                    for keyword in ['地址', '住址', 'address'])
-                                is_pickup_related = any(keyword in (name + id_attr).lower() 
-                                                      for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start'])
-                                
-                                if is_address_like and not is_pickup_related:
-                                    # 額外檢查：如果是第二個或之後的地址框，更可能是下車地點
-                                    if i > 0:  # 不是第一個輸入框
-                                        address_input = element
-                                        print(f"✅ 選擇第 {i} 個地址框作為下車地點地址框")
-                                        break
-                        except Exception as e:
-                            print(f"檢查輸入框 {i} 失敗: {e}")
-                            continue
-                
-                if address_input:
-                    print("找到下車地點地址輸入框，檢查自動填入狀態...")
+                else:
+                    print(f"選單 {i}: 沒有'住家'選項，跳過")
                     
-                    # 只檢查自動填入狀態，不手動填入
-                    max_wait_attempts = 8
-                    auto_filled = False
+            except Exception as e:
+                print(f"檢查選單 {i} 時發生錯誤: {e}")
+                continue
+        
+        # 如果沒有成功，嘗試更具體的選擇器
+        if not dropoff_success:
+            print("通過索引方式未成功，嘗試具體的下車地點選擇器...")
+            
+            specific_selectors = [
+                'select[name*="dropoff"]',  # 包含 dropoff 的 name
+                'select[name*="destination"]',  # 包含 destination 的 name  
+                'select[name*="to"]',  # 包含 to 的 name
+                'select[name*="end"]',  # 包含 end 的 name
+                'select[id*="dropoff"]',  # 包含 dropoff 的 id
+                'select[id*="destination"]',  # 包含 destination 的 id
+                'select:nth-of-type(2)',  # 第二個 select 元素
+                'select:last-of-type'  # 最後一個 select 元素
+            ]
+            
+            for selector in specific_selectors:
+                try:
+                    print(f"嘗試選擇器: {selector}")
+                    element = driver['page'].locator(selector).first
                     
-                    for attempt in range(max_wait_attempts):
-                        try:
-                            current_value = address_input.input_value() or ''
-                            print(f"檢查自動填入 {attempt+1}/{max_wait_attempts}: 當前值='{current_value}'")
+                    if element.count() > 0 and element.is_visible():
+                        # 檢查選項
+                        options = element.locator('option').all()
+                        option_texts = [opt.text_content() or '' for opt in options if opt.text_content()]
+                        print(f"選擇器 {selector} 的選項: {option_texts}")
+                        
+                        if '住家' in option_texts:
+                            print(f"在選擇器 {selector} 中找到住家，嘗試選擇...")
+                            element.select_option('住家')
+                            wait_engine.wait_for_element(driver, 'dropoff_home_selected', element, dropoff_strategies.HOME_SELECTED_JS, 500)
                             
-                            # 如果有值且長度合理，認為是自動填入成功
-                            if current_value.strip() and len(current_value.strip()) > 3:
-                                print(f"✅ 下車地點地址已自動填入: '{current_value}'")
-                                auto_filled = True
+                            # 驗證
+                            new_value = element.input_value()
+                            if new_value == '住家':
+                                print(f"✅ 選擇器 {selector} 成功選擇住家")
+                                dropoff_success = True
                                 break
-                            
-                            # 輕微觸發檢查（但不填入值）
-                            if attempt < 3:
-                                try:
-                                    address_input.click()
-                                    driver['page'].wait_for_timeout(500)
-                                except:
-                                    pass
                                 
-                            driver['page'].wait_for_timeout(1000)
+                except Exception as e:
+                    print(f"選擇器 {selector} 失敗: {e}")
+                    continue
+        
+        if dropoff_success:
+            print("✅ 下車地點'住家'選擇成功")
+            
+            # 8.1 處理住家地址自動填入
+            print("=== 處理住家地址自動填入 ===")
+            
+            # 等待頁面響應下車地點選擇
+            wait_engine.wait_for_network_quiet(driver, 'dropoff_home_applied', 1500)
+            
+            # 尋找下車地點地址輸入框（注意：要避開上車地點的地址框）
+            address_input = None
+            
+            # 更精確的下車地點地址框選擇器
+            dropoff_address_selectors = [
+                # 明確的下車地點地址框
+                'input[name*="getOff"][name*="address"]',
+                'input[name*="dropoff"][name*="address"]',
+                'input[name*="destination"][name*="address"]',
+                'input[id*="getOff"][id*="address"]',
+                'input[id*="dropoff"][id*="address"]',
+                'input[id*="destination"][id*="address"]',
+                
+                # 根據位置關係找到下車地點附近的地址框
+                '#getOff_location + input',  # getOff_location 選單後面的輸入框
+                '#getOff_location ~ input',  # getOff_location 選單同級的輸入框
+                'select[name="getOff_location"] + input',
+                'select[name="getOff_location"] ~ input',
+            ]
+            
+            print("尋找下車地點地址輸入框...")
+            for selector in dropoff_address_selectors:
+                try:
+                    print(f"嘗試下車地點地址選擇器: {selector}")
+                    elements = driver['page'].locator(selector).all()
+                    
+                    for i, element in enumerate(elements):
+                        if element.is_visible() and element.is_enabled():
+                            placeholder = element.get_attribute('placeholder') or ''
+                            name = element.get_attribute('name') or ''
+                            id_attr = element.get_attribute('id') or ''
+                            
+                            print(f"找到地址輸入框 {selector}[{i}]: placeholder='{placeholder}', name='{name}', id='{id_attr}'")
                             
-                        except Exception as e:
-                            print(f"檢查自動填入狀態失敗: {e}")
-                            driver['page'].wait_for_timeout(1000)
+                            # 確保不是上車地點的地址框
+                            if not any(keyword in (name + id_attr).lower() 
+                                      for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start']):
+                                address_input = element
+                                print(f"✅ 確認為下車地點地址框: {selector}[{i}]")
+                                break
+                            else:
+                                print(f"❌ 跳過上車地點地址框: {selector}[{i}]")
                     
-                    if auto_filled:
-                        print("✅ 下車地點地址自動填入正常")
-                        take_screenshot("dropoff_address_auto_filled")
-                    else:
-                        print("⚠️ 下車地點地址未自動填入，嘗試替代方案...")
-                        take_screenshot("dropoff_address_empty")
-                        
-                        # 替代方案1：重新選擇住家選項觸發自動填入
-                        print("替代方案1：重新選擇住家選項")
-                        try:
-                            home_select = driver['page'].locator('select').filter(has_text='住家').first
-                            if home_select.is_visible():
-                                home_select.select_option('住家')
-                                driver['page'].wait_for_timeout(2000)
-                                
-                                # 再次檢查地址是否填入
-                                current_value = address_input.input_value() or ''
-                                if current_value.strip():
-                                    print(f"✅ 重新選擇後地址自動填入: '{current_value}'")
-                                    auto_filled = True
-                        except Exception as e:
-                            print(f"替代方案1失敗: {e}")
-                        
-                        # 替代方案2：點擊地址框並等待自動完成
-                        if not auto_filled:
-                            print("替代方案2：點擊地址框觸發自動完成")
-                            try:
-                                address_input.click()
-                                driver['page'].wait_for_timeout(1000)
-                                address_input.focus()
-                                driver['page'].wait_for_timeout(2000)
-                                
-                                current_value = address_input.input_value() or ''
-                                if current_value.strip():
-                                    print(f"✅ 點擊觸發後地址自動填入: '{current_value}'")
-                                    auto_filled = True
-                            except Exception as e:
-                                print(f"替代方案2失敗: {e}")
-                        
-                        # 替代方案3：檢查是否有「使用住家地址」按鈕
-                        if not auto_filled:
-                            print("替代方案3：尋找使用住家地址按鈕")
-                            try:
-                                use_home_buttons = [
-                                    'button:has-text("使用住家地址")',
-                                    'button:has-text("使用預設地址")',
-                                    'a:has-text("使用住家地址")',
-                                    'a:has-text("使用預設地址")',
-                                    '[data-action*="home"]',
-                                    '[data-action*="default"]'
-                                ]
-                                
-                                for selector in use_home_buttons:
-                                    try:
-                                        button = driver['page'].locator(selector).first
-                                        if button.is_visible():
-                                            print(f"找到使用住家地址按鈕: {selector}")
-                                            button.click()
-                                            driver['page'].wait_for_timeout(2000)
-                                            
-                                            current_value = address_input.input_value() or ''
-                                            if current_value.strip():
-                                                print(f"✅ 使用住家地址按鈕後地址填入: '{current_value}'")
-                                                auto_filled = True
-                                                break
-                                    except:
-                                        continue
-                            except Exception as e:
-                                print(f"替代方案3失敗: {e}")
-                        
-                        # 替代方案4：手動填入常見的住家地址
-                        if not auto_filled:
-                            print("替代方案4：手動填入預設住家地址")
-                            try:
-                                # 常見的預設住家地址
-                                default_home_addresses = [
-                                    "新北市板橋區文化路一段188巷44號",
-                                    "新北市新莊區中正路1號",
-                                    "新北市三重區重新路1號"
-                                ]
-                                
-                                # 先嘗試填入第一個地址
-                                test_address = default_home_addresses[0]
-                                address_input.fill(test_address)
-                                driver['page'].wait_for_timeout(1000)
-                                
-                                current_value = address_input.input_value() or ''
-                                if current_value.strip():
-                                    print(f"✅ 手動填入住家地址: '{current_value}'")
-                                    auto_filled = True
-                            except Exception as e:
-                                print(f"替代方案4失敗: {e}")
-                        
-                        # 替代方案5：檢查系統是否有地址選擇下拉選單
-                        if not auto_filled:
-                            print("替代方案5：尋找住家地址選擇下拉選單")
-                            try:
-                                # 尋找可能的地址選擇下拉選單
-                                address_selects = driver['page'].locator('select').all()
-                                for i, select_elem in enumerate(address_selects):
-                                    if select_elem.is_visible():
-                                        options = select_elem.locator('option').all()
-                                        option_texts = [opt.inner_text() for opt in options if opt.is_visible()]
-                                        
-                                        print(f"地址選擇器 {i} 選項: {option_texts}")
-                                        
-                                        # 如果包含地址相關選項
-                                        for option_text in option_texts:
-                                            if any(keyword in option_text for keyword in ['地址', '住址', '新北市', '板橋', '新莊']):
-                                                print(f"找到住家地址選項: {option_text}")
-                                                select_elem.select_option(option_text)
-                                                driver['page'].wait_for_timeout(2000)
-                                                
-                                                current_value = address_input.input_value() or ''
-                                                if current_value.strip():
-                                                    print(f"✅ 選擇地址選項後填入: '{current_value}'")
-                                                    auto_filled = True
-                                                
-                                        if auto_filled:
-                                            break
-                            except Exception as e:
-                                print(f"替代方案5失敗: {e}")
-                        
-                        # 替代方案6：使用JavaScript觸發事件和表單驗證
-                        if not auto_filled:
-                            print("替代方案6：使用JavaScript觸發住家地址填入")
-                            try:
-                                # JavaScript 程式碼來觸發住家地址自動填入的多種方法
-                                js_trigger_script = """
-                                // 嘗試觸發住家地址自動填入的多種方法
-                                function triggerHomeAddressFill() {
-                                    // 方法1: 找到住家選項並觸發change事件
-                                    const homeSelects = document.querySelectorAll('select option[value*="住家"], select option[text*="住家"]');
-                                    homeSelects.forEach(option => {
-                                        if (option.textContent.includes('住家')) {
-                                            const select = option.parentElement;
-                                            select.value = option.value;
-                                            select.dispatchEvent(new Event('change', {bubbles: true}));
-                                            console.log('觸發住家選項change事件');
-                                        }
-                                    });
-                                    
-                                    // 方法2: 尋找並填入已保存的住家地址
-                                    const addressInputs = document.querySelectorAll('input[type="text"]');
-                                    addressInputs.forEach((input, index) => {
-                                        const name = (input.name || '').toLowerCase();
-                                        const id = (input.id || '').toLowerCase();
-                                        const placeholder = (input.placeholder || '').toLowerCase();
-                                        
-                                        // 檢查是否是地址相關輸入框且不是上車地點
-                                        const isAddressInput = ['地址', '住址', 'address'].some(keyword => 
-                                            name.includes(keyword) || id.includes(keyword) || placeholder.includes(keyword)
-                                        );
-                                        const isPickupInput = ['pickup', 'origin', 'from', 'start'].some(keyword => 
-                                            name.includes(keyword) || id.includes(keyword)
-                                        );
-                                        
-                                        if (isAddressInput && !isPickupInput && index > 0) {
-                                            // 嘗試從localStorage或sessionStorage獲取住家地址
-                                            const savedAddress = localStorage.getItem('homeAddress') || 
-                                                               sessionStorage.getItem('homeAddress') ||
-                                                               '新北市板橋區文化路一段188巷44號';
-                                            
-                                            if (!input.value.trim()) {
-                                                input.value = savedAddress;
-                                                input.dispatchEvent(new Event('input', {bubbles: true}));
-                                                input.dispatchEvent(new Event('change', {bubbles: true}));
-                                                console.log('填入住家地址:', savedAddress);
-                                                return savedAddress;
-                                            }
-                                        }
-                                    });
-                                    
-                                    // 方法3: 觸發表單驗證事件
-                                    const forms = document.querySelectorAll('form');
-                                    forms.forEach(form => {
-                                        form.dispatchEvent(new Event('validate', {bubbles: true}));
-                                    });
-                                    
-                                    return '嘗試JavaScript觸發完成';
-                                }
-                                
-                                return triggerHomeAddressFill();
-                                """
-                                
-                                # 執行JavaScript
-                                result = driver['page'].evaluate(js_trigger_script)
-                                print(f"JavaScript執行結果: {result}")
-                                
-                                driver['page'].wait_for_timeout(3000)  # 等待處理
-                                
-                                # 檢查地址是否已填入
-                                current_value = address_input.input_value() or ''
-                                if current_value.strip():
-                                    print(f"✅ JavaScript觸發後地址填入: '{current_value}'")
-                                    auto_filled = True
-                            except Exception as e:
-                                print(f"替代方案6失敗: {e}")
+                    if address_input:
+                        break
                         
-                        if auto_filled:
-                            print("✅ 替代方案成功，下車地點地址已填入")
-                            take_screenshot("dropoff_address_alternative_success")
-                        else:
-                            print("⚠️ 所有替代方案都失敗，但預約可能仍可繼續")
-                            take_screenshot("dropoff_address_all_failed")
-                            
-                            # 檢查是否真的需要地址（有些情況下選擇住家就夠了）
-                            final_value = address_input.input_value() or ''
-                            print(f"最終地址框狀態: '{final_value}'")
+                except Exception as e:
+                    print(f"檢查下車地點地址選擇器 {selector} 失敗: {e}")
+                    continue
+            
+            # 如果沒找到明確的下車地點地址框，使用通用方法但更謹慎
+            if not address_input:
+                print("未找到明確的下車地點地址框，檢查所有可見地址輸入框...")
+                
+                all_inputs = driver['page'].locator('input[type="text"]').all()
+                for i, element in enumerate(all_inputs):
+                    try:
+                        if element.is_visible() and element.is_enabled():
+                            placeholder = element.get_attribute('placeholder') or ''
+                            name = element.get_attribute('name') or ''
+                            id_attr = element.get_attribute('id') or ''
                             
-                            # 嘗試繼續預約流程，看看系統是否會報錯
-                            print("嘗試繼續預約流程（地址可能不是必填）")
+                            print(f"輸入框 {i}: placeholder='{placeholder}', name='{name}', id='{id_attr}'")
                             
-                            # 替代方案7：檢查表單驗證要求
-                            print("替代方案7：檢查表單驗證要求")
-                            try:
-                                # 檢查地址框是否有required屬性
-                                is_required = address_input.get_attribute('required') is not None
-                                has_asterisk = '*' in (address_input.get_attribute('placeholder') or '')
-                                
-                                print(f"地址框是否必填: required={is_required}, 有星號={has_asterisk}")
-                                
-                                if not is_required and not has_asterisk:
-                                    print("✅ 地址框非必填，可以繼續預約流程")
-                                else:
-                                    print("⚠️ 地址框可能是必填，但嘗試強制填入最基本地址")
-                                    # 最後嘗試：填入最簡單的地址
-                                    simple_address = "新北市"
-                                    address_input.fill(simple_address)
-                                    driver['page'].wait_for_timeout(1000)
-                                    
-                                    final_check = address_input.input_value() or ''
-                                    if final_check.strip():
-                                        print(f"✅ 強制填入基本地址成功: '{final_check}'")
-                                        auto_filled = True
-                                    
-                            except Exception as e:
-                                print(f"替代方案7失敗: {e}")
+                            # 檢查是否可能是地址框，但不是上車地點的
+                            is_address_like = any(keyword in (placeholder + name + id_attr).lower() 
+                                                for keyword in ['地址', '住址', 'address'])
+                            is_pickup_related = any(keyword in (name + id_attr).lower() 
+                                                  for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start'])
                             
-                            # 記錄最終狀態
-                            if auto_filled:
-                                print("✅ 最終成功填入住家地址")
-                                take_screenshot("final_address_success")
-                            else:
-                                print("❌ 所有方法都無法填入地址，但繼續預約流程")
-                                print("   系統可能不需要地址，或會在後續步驟要求填入")
-                                take_screenshot("final_address_failed")
-                                
-                                # 檢查是否可以找到跳過地址的選項
-                                try:
-                                    skip_options = [
-                                        'button:has-text("跳過")',
-                                        'button:has-text("略過")',
-                                        'a:has-text("稍後填入")',
-                                        'input[type="checkbox"]:has(~ label:has-text("暫不填入"))'
-                                    ]
-                                    
-                                    for skip_selector in skip_options:
-                                        try:
-                                            skip_element = driver['page'].locator(skip_selector).first
-                                            if skip_element.is_visible():
-                                                print(f"找到跳過選項: {skip_selector}")
-                                                skip_element.click()
-                                                print("✅ 已點擊跳過地址填入")
-                                                break
-                                        except:
-                                            continue
-                                except:
-                                    pass
+                            if is_address_like and not is_pickup_related:
+                                # 額外檢查：如果是第二個或之後的地址框，更可能是下車地點
+                                if i > 0:  # 不是第一個輸入框
+                                    address_input = element
+                                    print(f"✅ 選擇第 {i} 個地址框作為下車地點地址框")
+                                    break
+                    except Exception as e:
+                        print(f"檢查輸入框 {i} 失敗: {e}")
+                        continue
+            
+            if address_input:
+                print("找到下車地點地址輸入框，依成績表的順序嘗試填入方法...")
+                winner = dropoff_strategies.run(driver, 'home_address', {'address_input': address_input})
                 
+                if winner == 'wait_autofill':
+                    print("✅ 下車地點地址自動填入正常")
+                    take_screenshot("dropoff_address_auto_filled")
+                elif winner:
+                    print(f"✅ 替代方案 {winner} 成功，下車地點地址已填入")
+                    take_screenshot("dropoff_address_alternative_success")
                 else:
-                    print("⚠️ 未找到下車地點地址輸入框，可能系統不需要手動輸入地址")
-                    take_screenshot("no_dropoff_address_input_found")
-            
-            take_screenshot("dropoff_location_final")
-            
-            # 9. 預約日期/時段選擇
-            print("選擇預約日期/時段")
-            # 選擇最後一個日期選項
-            date_selects = driver['page'].locator('select').all()
-            if len(date_selects) >= 3:
-                # 選擇最後一個日期
-                last_date_option = date_selects[0].locator('option').last
-                last_date_option.click()
-                
-                # 選擇時間 16
-                time_selects = driver['page'].locator('select').all()
-                if len(time_selects) >= 2:
-                    time_selects[1].select_option('16')
-                
-                # 選擇分鐘 40
-                if len(time_selects) >= 3:
-                    time_selects[2].select_option('40')
-            take_screenshot("datetime_selected")
-            
-            # 10. 於預約時間前後30分鐘到達 選擇「不同意」
-            print("選擇不同意前後30分鐘到達")
-            driver['page'].click('text=不同意')
-            take_screenshot("time_window")
-            
-            # 11. 陪同人數 選擇「1人(免費)」
-            print("選擇陪同人數：1人(免費)")
-            driver['page'].select_option('select', '1人(免費)')
-            take_screenshot("companion")
-            
-            # 12. 同意共乘 選擇「否」
-            print("選擇不同意共乘")
-            driver['page'].click('text=否')
-            take_screenshot("carpool")
-            
-            # 13. 搭乘輪椅上車 選擇「是」
-            print("選擇搭乘輪椅上車：是")
-            driver['page'].click('text=是')
-            take_screenshot("wheelchair")
-            
-            # 14. 大型輪椅 選擇「否」
-            print("選擇大型輪椅：否")
-            driver['page'].click('text=否')
-            take_screenshot("large_wheelchair")
+                    print("❌ 所有方法都無法填入地址，但繼續預約流程")
+                    print("   系統可能不需要地址，或會在後續步驟要求填入")
+                    take_screenshot("final_address_failed")
+                    
+                    # 檢查是否可以找到跳過地址的選項
+                    try:
+                        skip_options = [
+                            'button:has-text("跳過")',
+                            'button:has-text("略過")',
+                            'a:has-text("稍後填入")',
+                            'input[type="checkbox"]:has(~ label:has-text("暫不填入"))'
+                        ]
+                        
+                        for skip_selector in skip_options:
+                            try:
+                                skip_element = driver['page'].locator(skip_selector).first
+                                if skip_element.is_visible():
+                                    print(f"找到跳過選項: {skip_selector}")
+                                    skip_element.click()
+                                    print("✅ 已點擊跳過地址填入")
+                                    break
+                            except:
+                                continue
+                    except:
+                        pass
             
+            else:
+                print("⚠️ 未找到下車地點地址輸入框，可能系統不需要手動輸入地址")
+                take_screenshot("no_dropoff_address_input_found")
+        
+        take_screenshot("dropoff_location_final")
+        
+        # 9–14. 預約日期/時段與各選項：一次在頁面中設定，再一次讀回確認
+        print(f"填寫預約選項：{spec['date']} {spec['time']}、{spec['time_window']}前後30分鐘、"
+              f"陪同 {spec['companions']}、共乘 {spec['carpool']}、輪椅 {spec['wheelchair']}、"
+              f"大型輪椅 {spec['large_wheelchair']}")
+        fields = form_fill.reservation_fields(spec)
+        if submit_at is not None:
+            # 預先就緒模式：日期留到放號時刻才設定，選單中沒有時補上選項
+            date_field = dict(fields[0], label=slot_precheck.date_label(spec['date']))
+            fields = fields[1:]
+        failed, _ = form_fill.fill(driver, fields)
+        
+        # 一次填寫沒有完成的欄位改用原本的逐步方式
+        for name in failed:
+            if not fill_option_stepwise(driver, spec, name):
+                take_screenshot(f"{name}_failed")
+                if name == 'date':
+                    print(f"❌ 沒有可預約的日期 {spec['date']}")
+                    return False
+        take_screenshot("options_filled")
+        
+        if submit_at is not None:
+            # 15–16. 預先就緒完成，等到放號時刻只設定日期、下一步並送出預約
+            print(f"⏳ 預先就緒完成，等待放號時間 {submit_at.strftime('%Y-%m-%d %H:%M:%S')}")
+            take_screenshot("armed")
+            fire_at(
+                submit_at,
+                lambda: submit_prepared(driver, date_field),
+                keepalive=lambda: driver['page'].evaluate('document.readyState')
+            )
+            driver['page'].wait_for_load_state("networkidle")
+            take_screenshot("submit_reservation")
+        else:
             # 15. 點擊「下一步，確認預約資訊」
             print("點擊下一步，確認預約資訊")
             driver['page'].click('text=下一步，確認預約資訊')
             driver['page'].wait_for_load_state("networkidle")
             take_screenshot("confirm_info")
             
-            # 16. 點擊「送出預約」
-            print("點擊送出預約")
-            driver['page'].click('text=送出預約')
-            driver['page'].wait_for_load_state("networkidle")
-            take_screenshot("submit_reservation")
-            
-            # 17. 檢查「已完成預約」畫面
-            print("檢查預約完成狀態...")
-            try:
-                driver['page'].wait_for_selector('text=已完成預約', timeout=10000)
-                print("預約成功完成！")
-                take_screenshot("reservation_success")
-                return True
-            except Exception as e:
-                print(f"沒有找到預約完成訊息: {e}")
-                take_screenshot("reservation_unknown")
-                return False
-                
+            # 16. 點擊「送出預約」
+            print("點擊送出預約")
+            driver['page'].click('text=送出預約')
+            driver['page'].wait_for_load_state("networkidle")
+            take_screenshot("submit_reservation")
+        
+        # 17. 檢查「已完成預約」畫面
+        print("檢查預約完成狀態...")
+        try:
+            driver['page'].wait_for_selector('text=已完成預約', timeout=10000)
+            print("預約成功完成！")
+            take_screenshot("reservation_success")
+            return True
         except Exception as e:
-            print(f"預約過程發生錯誤: {e}")
-            take_screenshot("reservation_error")
+            print(f"沒有找到預約完成訊息: {e}")
+            take_screenshot("reservation_unknown")
             return False
+            
+    except Exception as e:
+        print(f"預約過程發生錯誤: {e}")
+        take_screenshot("reservation_error")
+        return False
+
+def run_reservations(specs=None, account=None, submit_at=None):
+    """以同一個已登入的瀏覽器依序完成多趟預約
+
+    specs: 預約設定清單，未指定時由 reservation_spec.load_specs 載入帳號的設定。
+    每趟結束後回到「新增預約」繼續下一趟，單趟失敗不影響後續。
+    submit_at: 預先就緒模式的放號時間，只有第一趟預先填好表單等待放號，之後的各趟在放號後依序接著預約。
+    回傳 {'success', 'bookings': [{'name', 'success', 'elapsed_ms', 'wait_ms'}], 'total_ms'}，
+    elapsed_ms 不含等待放號的時間（wait_ms）；沒有可預約時段而未執行的預約附上 error。
+    """
+    driver = None
+    screenshot_count = 0
+    succeeded = False
+    started = time.perf_counter()
+    report = {'success': False, 'bookings': [], 'total_ms': 0}
+    
+    def take_screenshot(description):
+        nonlocal screenshot_count
+        try:
+            screenshot_count += 1
+            if driver:
+                entry = screenshot_store.capture(driver, f'step_{screenshot_count:03d}_{description}')
+                return entry['file'] if entry else None
+            return None
+        except Exception as e:
+            print(f"截圖失敗: {e}")
+            return None
+    
+    try:
+        print("=== 開始執行預約流程 ===")
+        account = account or get_account()
+        if specs is None:
+            specs = reservation_spec.load_specs(account['id'])
+        else:
+            specs = [reservation_spec.normalize(spec) for spec in specs]
+        if not specs:
+            print(f"帳號 {account['id']} 沒有預約設定")
+            return report
+        print(f"共 {len(specs)} 趟預約: {', '.join(spec['name'] for spec in specs)}")
+        
+        # 先算出每趟的目標時段，沒有可預約時段（也沒有可用的備用時段）的不必走預約流程
+        # （預先就緒模式在放號前執行，以放號當天的日期範圍計算）
+        bookable = []
+        for spec in specs:
+            slot, message = slot_precheck.plan(spec, today=slot_precheck.release_day(submit_at))
+            if slot is None:
+                print(f"❌ 預約 {spec['name']}: {message}")
+                report['bookings'].append({'name': spec['name'], 'success': False, 'elapsed_ms': 0, 'wait_ms': 0,
+                                           'error': message})
+            else:
+                bookable.append(spec)
+        if not bookable:
+            return report
+        specs = bookable
         
-        return True
+        print("開始初始化 WebDriver...")
+        driver = setup_driver(flow='reservation', account_id=account['id'])
+        
+        if driver is None:
+            print("WebDriver 初始化失敗，無法繼續")
+            return report
+            
+        print("WebDriver 初始化完成")
+        
+        # 設置視窗大小為高解析度
+        print("設置視窗大小為 1920x1080...")
+        driver['page'].set_viewport_size({'width': 1920, 'height': 1080})
+        print("視窗大小設置完成")
+        
+        # 還原登入快取（必須在載入網站之前）
+        restored = restore_session(driver, account['id'])
+        
+        print("正在載入網頁...")
+        driver['get']("https://www.ntpc.ltc-car.org/")
+        print("網頁載入完成")
+        take_screenshot("page_loaded")
+        
+        # 等待頁面完全載入
+        print("等待頁面完全載入...")
+        driver['page'].wait_for_load_state("networkidle")
+        print("頁面已完全載入")
+        take_screenshot("page_complete")
+        
+        # 處理浮動視窗 - 點擊「我知道了」按鈕
+        print("檢查並處理浮動視窗...")
+        try:
+            # 等待浮動視窗出現
+            driver['page'].wait_for_selector('text=我知道了', timeout=10000)
+            print("找到浮動視窗，點擊「我知道了」按鈕")
+            driver['page'].click('text=我知道了')
+            print("「我知道了」按鈕點擊成功")
+            take_screenshot("popup_closed")
+        except Exception as e:
+            print(f"沒有找到浮動視窗或點擊失敗: {e}")
+            take_screenshot("no_popup_found")
+        
+        # 登入步驟（有有效的登入快取時略過）
+        print("開始登入流程...")
+        try:
+            ensure_logged_in(driver, take_screenshot, account, restored)
+        except Exception as e:
+            print(f"登入過程發生錯誤: {e}")
+            take_screenshot("login_error")
+            return report
+        
+        # 依序預約，每趟計時（預先就緒模式只有第一趟需要等待放號）
+        for index, spec in enumerate(specs):
+            booking_submit_at = submit_at if index == 0 else None
+            if booking_submit_at is not None:
+                prearm.last_report = None
+            booking_started = time.perf_counter()
+            success = book_trip(driver, spec, take_screenshot, booking_submit_at)
+            elapsed_ms = round((time.perf_counter() - booking_started) * 1000)
+            # 等待放號的時間另外記錄，elapsed_ms 只算實際操作的時間
+            wait_ms = 0
+            if booking_submit_at is not None and prearm.last_report:
+                wait_ms = round(max(prearm.last_report['armed_seconds'], 0) * 1000)
+            report['bookings'].append({'name': spec['name'], 'success': success,
+                                       'elapsed_ms': elapsed_ms - wait_ms, 'wait_ms': wait_ms})
+            print(f"{'✅' if success else '❌'} 預約 {spec['name']}: {elapsed_ms - wait_ms} ms"
+                  f"{f'（另等待放號 {wait_ms} ms）' if wait_ms else ''}")
+        
+        succeeded = all(booking['success'] for booking in report['bookings'])
+        report['success'] = succeeded
+        return report
         
     except Exception as e:
         print(f"預約流程發生錯誤: {e}")
         if driver:
             take_screenshot("error")
-        return False
+        return report
         
     finally:
-        # 清理資源
+        # 清理資源（失敗時先寫入緩衝區中的截圖）
         if driver:
-            try:
-                driver['browser'].close()
-                driver['playwright'].stop()
-                print("WebDriver 已關閉")
-            except:
-                pass
+            if not succeeded:
+                screenshot_store.mark_failed(driver.get('screenshots'))
+            close_driver(driver)
+            print("WebDriver 已關閉")
+        report['total_ms'] = round((time.perf_counter() - started) * 1000)
+        done = sum(1 for booking in report['bookings'] if booking['success'])
+        print(f"📋 預約完成 {done}/{len(report['bookings'])} 趟，總耗時 {report['total_ms']} ms")
+
+def make_reservation(submit_at=None):
+    """執行預約流程（依帳號的預約設定，沒有設定檔時為原本的單趟預約），全部成功時回傳 True"""
+    return run_reservations(submit_at=submit_at)['success']
 
 @app.route('/')
 def index():
@@ -3011,7 +1856,7 @@ def index():
                         <span class="icon">🔍</span>查看尋找派車結果截圖
                     </a>
                     <a href="/dispatch-result-file" class="button">
-                        <span class="icon">📄</span>查看派車結果本地檔案
+                        <span class="icon">📄</span>查看派車歷史
                     </a>
                 </div>
             </div>
@@ -3042,14 +1887,16 @@ def index():
     </html>
     '''
 
+def _screenshot_img(frame, alt):
+    """截圖的 <img>：有縮圖時顯示縮圖，點擊開啟原圖"""
+    src = frame['thumb'] or frame['file']
+    return (f'<a href="/screenshot/{frame["file"]}" target="_blank">'
+            f'<img src="/screenshot/{src}" alt="{alt}" loading="lazy"></a>')
+
 @app.route('/screenshots')
 def screenshots():
-    import os
-    import glob
-    
-    # 獲取所有截圖檔案
-    screenshot_files = glob.glob('step_*.png')
-    screenshot_files.sort()
+    # 最近三次預約流程的截圖
+    frames = screenshot_store.recent_frames('reservation', runs=3)
     
     html = '''
     <!DOCTYPE html>
@@ -3080,14 +1927,14 @@ def screenshots():
             <h1>預約過程截圖</h1>
     '''
     
-    if screenshot_files:
-        for file_path in screenshot_files:
-            filename = os.path.basename(file_path)
-            description = filename.replace('.png', '').replace('step_', '').replace('_', ' ')
+    if frames:
+        for frame in frames:
+            description = frame['name'].replace('step_', '').replace('_', ' ')
             html += f'''
             <div class="screenshot">
                 <h3>{description}</h3>
-                <img src="/screenshot/{filename}" alt="{description}">
+                <p>{frame['taken_at']}</p>
+                {_screenshot_img(frame, description)}
             </div>
             '''
     else:
@@ -3101,9 +1948,12 @@ def screenshots():
     
     return html
 
-@app.route('/screenshot/<filename>')
+@app.route('/screenshot/<path:filename>')
 def get_screenshot(filename):
     try:
+        # 截圖目錄中的截圖，其次為舊版直接寫在工作目錄的 PNG
+        if os.path.isfile(os.path.join(screenshot_store.SCREENSHOT_DIR, filename)):
+            return send_from_directory(screenshot_store.SCREENSHOT_DIR, filename)
         return send_from_directory('.', filename)
     except Exception as e:
         print(f"讀取截圖失敗: {e}")
@@ -3177,9 +2027,13 @@ def test():
 def reservation():
     try:
         print("=== 開始執行預約流程 ===")
-        result = make_reservation()
-        print(f"=== 預約流程執行結果: {result} ===")
-        return jsonify({"success": result, "message": "預約流程執行完成"})
+        if flow_engine() == 'async':
+            # 預約流程為同步程式碼，由非同步引擎等待瀏覽器池執行結果
+            report = async_engine.run(blocking_job, run_browser_job, run_reservations)
+        else:
+            report = run_browser_job(run_reservations)
+        print(f"=== 預約流程執行結果: {report['success']} ===")
+        return jsonify(dict(report, message="預約流程執行完成"))
     except Exception as e:
         import traceback
         error_msg = f"預約流程執行失敗: {str(e)}"
@@ -3417,7 +2271,20 @@ def fetch_dispatch():
     """執行派車結果查詢"""
     try:
         print("=== 開始執行派車結果查詢流程 ===")
-        result = fetch_dispatch_results()
+        if dispatch_mode() == 'http':
+            # 不開瀏覽器，直接呼叫網站 API
+            result = dispatch_http.fetch_dispatch_results()
+        elif flow_engine() == 'async':
+            # accounts=all 或以逗號分隔的帳號：多帳號並行查詢
+            accounts_param = request.args.get('accounts')
+            if accounts_param:
+                account_ids = None if accounts_param == 'all' else accounts_param.split(',')
+                result = async_engine.run(dispatch_queries, account_ids)
+            else:
+                result = async_engine.run(dispatch_queries, [get_account()['id']])
+                result = next(iter(result['accounts'].values()), {'success': False, 'error': '找不到帳號'})
+        else:
+            result = run_browser_job(fetch_dispatch_results)
         print(f"=== 派車結果查詢執行結果: {result} ===")
         return jsonify(result)
     except Exception as e:
@@ -3434,7 +2301,124 @@ def run_address_test():
     try:
         data = request.get_json()
         test_type = data.get('type', 'full')
-        
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+    
+    # 在常駐瀏覽器池上執行測試
+    return run_browser_job(address_test_job, test_type)
+
+def open_address_form(driver, test_log):
+    """測試用：登入、新增預約、選擇上車地點與住家，回傳 (下車地址輸入框, 錯誤訊息)"""
+    # 基本導航和登入流程
+    test_log("導航到預約系統...")
+    driver['page'].goto("https://www.ntpc.ltc-car.org/")
+    driver['page'].wait_for_load_state("networkidle")
+    
+    # 處理初始彈窗
+    try:
+        driver['page'].click('text=我知道了', timeout=3000)
+        test_log("✅ 已處理初始彈窗")
+    except:
+        test_log("⚠️ 沒有初始彈窗")
+    
+    # 登入
+    test_log("開始登入...")
+    account = get_account()
+    driver['page'].fill('#username', account['id'])
+    driver['page'].fill('#password', account['password'])
+    driver['page'].click('button:has-text("民眾登入")')
+    
+    # 處理登入成功彈窗
+    try:
+        driver['page'].wait_for_selector('text=登入成功', timeout=5000)
+        driver['page'].click('button:has-text("確定")')
+        test_log("✅ 登入成功")
+    except:
+        test_log("⚠️ 沒有登入成功彈窗")
+    
+    # 導航到新增預約
+    test_log("導航到新增預約...")
+    driver['page'].click('text=新增預約')
+    driver['page'].wait_for_load_state("networkidle")
+    
+    # 設置上車地點
+    test_log("設置上車地點為醫療院所...")
+    driver['page'].select_option('select', '醫療院所')
+    
+    # 搜尋醫院
+    test_log("搜尋亞東紀念醫院...")
+    search_input = driver['page'].locator('input[placeholder*="搜尋"]').first
+    search_input.fill('亞東紀念醫院')
+    wait_engine.wait_for_condition(driver, 'test_hospital_suggestions', PAC_VISIBLE_JS, 2000)
+    
+    try:
+        driver['page'].keyboard.press('ArrowDown')
+        driver['page'].keyboard.press('Enter')
+        test_log("✅ 已選擇亞東紀念醫院")
+    except:
+        test_log("⚠️ 選擇醫院可能失敗")
+    
+    # 選擇住家作為下車地點
+    test_log("選擇住家作為下車地點...")
+    home_selects = driver['page'].locator('select').all()
+    home_selected = False
+    
+    for i, select_elem in enumerate(home_selects):
+        try:
+            if select_elem.is_visible():
+                options = select_elem.locator('option').all()
+                option_texts = [opt.inner_text() for opt in options if opt.is_visible()]
+                
+                if '住家' in option_texts and i > 0:  # 不是第一個選單
+                    test_log(f"在選單 {i} 中找到住家，選擇...")
+                    select_elem.select_option('住家')
+                    wait_engine.wait_for_network_quiet(driver, 'test_home_selected', 2000)
+                    home_selected = True
+                    test_log("✅ 住家選擇成功")
+                    break
+        except Exception as e:
+            test_log(f"選單 {i} 檢查失敗: {e}")
+            continue
+    
+    if not home_selected:
+        test_log("❌ 未能選擇住家")
+        return None, '無法選擇住家選項'
+    
+    # 現在開始測試地址填入
+    test_log("=== 開始測試住家地址填入方法 ===")
+    
+    # 找到地址輸入框
+    address_inputs = driver['page'].locator('input[type="text"]').all()
+    target_address_input = None
+    
+    for i, input_elem in enumerate(address_inputs):
+        try:
+            if input_elem.is_visible() and input_elem.is_enabled():
+                placeholder = input_elem.get_attribute('placeholder') or ''
+                name = input_elem.get_attribute('name') or ''
+                id_attr = input_elem.get_attribute('id') or ''
+                
+                is_address = any(keyword in (placeholder + name + id_attr).lower() 
+                               for keyword in ['地址', '住址', 'address'])
+                is_pickup = any(keyword in (name + id_attr).lower() 
+                              for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start'])
+                
+                if is_address and not is_pickup and i > 0:
+                    target_address_input = input_elem
+                    test_log(f"✅ 找到地址輸入框 {i}: {placeholder}")
+                    break
+        except:
+            continue
+    
+    if not target_address_input:
+        test_log("❌ 未找到地址輸入框")
+        return None, '無法找到地址輸入框'
+    
+    return target_address_input, None
+
+def address_test_job(test_type):
+    """住家地址填入測試流程"""
+    try:
         # 執行地址測試的邏輯
         global test_logs, test_status
         test_logs = []
@@ -3445,113 +2429,13 @@ def run_address_test():
             print(f"[ADDRESS_TEST] {message}")
         
         # 設置瀏覽器
-        driver = setup_driver()
+        driver = setup_driver(flow='reservation')
         test_log("瀏覽器已啟動")
         
         try:
-            # 基本導航和登入流程
-            test_log("導航到預約系統...")
-            driver['page'].goto("https://www.ntpc.ltc-car.org/")
-            driver['page'].wait_for_load_state("networkidle")
-            
-            # 處理初始彈窗
-            try:
-                driver['page'].click('text=我知道了', timeout=3000)
-                test_log("✅ 已處理初始彈窗")
-            except:
-                test_log("⚠️ 沒有初始彈窗")
-            
-            # 登入
-            test_log("開始登入...")
-            driver['page'].fill('#username', 'A102574899')
-            driver['page'].fill('#password', 'visi319VISI')
-            driver['page'].click('button:has-text("民眾登入")')
-            
-            # 處理登入成功彈窗
-            try:
-                driver['page'].wait_for_selector('text=登入成功', timeout=5000)
-                driver['page'].click('button:has-text("確定")')
-                test_log("✅ 登入成功")
-            except:
-                test_log("⚠️ 沒有登入成功彈窗")
-            
-            # 導航到新增預約
-            test_log("導航到新增預約...")
-            driver['page'].click('text=新增預約')
-            driver['page'].wait_for_load_state("networkidle")
-            
-            # 設置上車地點
-            test_log("設置上車地點為醫療院所...")
-            driver['page'].select_option('select', '醫療院所')
-            
-            # 搜尋醫院
-            test_log("搜尋亞東紀念醫院...")
-            search_input = driver['page'].locator('input[placeholder*="搜尋"]').first
-            search_input.fill('亞東紀念醫院')
-            driver['page'].wait_for_timeout(2000)
-            
-            try:
-                driver['page'].keyboard.press('ArrowDown')
-                driver['page'].keyboard.press('Enter')
-                test_log("✅ 已選擇亞東紀念醫院")
-            except:
-                test_log("⚠️ 選擇醫院可能失敗")
-            
-            # 選擇住家作為下車地點
-            test_log("選擇住家作為下車地點...")
-            home_selects = driver['page'].locator('select').all()
-            home_selected = False
-            
-            for i, select_elem in enumerate(home_selects):
-                try:
-                    if select_elem.is_visible():
-                        options = select_elem.locator('option').all()
-                        option_texts = [opt.inner_text() for opt in options if opt.is_visible()]
-                        
-                        if '住家' in option_texts and i > 0:  # 不是第一個選單
-                            test_log(f"在選單 {i} 中找到住家，選擇...")
-                            select_elem.select_option('住家')
-                            driver['page'].wait_for_timeout(2000)
-                            home_selected = True
-                            test_log("✅ 住家選擇成功")
-                            break
-                except Exception as e:
-                    test_log(f"選單 {i} 檢查失敗: {e}")
-                    continue
-            
-            if not home_selected:
-                test_log("❌ 未能選擇住家")
-                return {'success': False, 'error': '無法選擇住家選項'}
-            
-            # 現在開始測試地址填入
-            test_log("=== 開始測試住家地址填入方法 ===")
-            
-            # 找到地址輸入框
-            address_inputs = driver['page'].locator('input[type="text"]').all()
-            target_address_input = None
-            
-            for i, input_elem in enumerate(address_inputs):
-                try:
-                    if input_elem.is_visible() and input_elem.is_enabled():
-                        placeholder = input_elem.get_attribute('placeholder') or ''
-                        name = input_elem.get_attribute('name') or ''
-                        id_attr = input_elem.get_attribute('id') or ''
-                        
-                        is_address = any(keyword in (placeholder + name + id_attr).lower() 
-                                       for keyword in ['地址', '住址', 'address'])
-                        is_pickup = any(keyword in (name + id_attr).lower() 
-                                      for keyword in ['pickup', 'pickUp', 'origin', 'from', 'start'])
-                        
-                        if is_address and not is_pickup and i > 0:
-                            target_address_input = input_elem
-                            test_log(f"✅ 找到地址輸入框 {i}: {placeholder}")
-                            break
-                except:
-                    continue
-            
-            if not target_address_input:
-                test_log("❌ 未找到地址輸入框")
-                return {'success': False, 'error': '無法找到地址輸入框'}
+            target_address_input, error = open_address_form(driver, test_log)
+            if error:
+                return {'success': False, 'error': error}
             
             # 執行測試
             test_results = {}
@@ -3569,13 +2453,14 @@ def run_address_test():
                         test_results['quick'] = True
                         break
                     
-                    driver['page'].wait_for_timeout(1000)
+                    wait_engine.wait_for_element(driver, 'test_address_autofill', target_address_input, dropoff_strategies.ADDRESS_FILLED_JS, 1000)
                 else:
                     test_log("❌ 快速檢測 - 沒有自動填入")
                     test_results['quick'] = False
                 
-                take_screenshot("quick_test_result")
-                screenshots.append({'name': '快速測試結果', 'filename': f'quick_test_result_{int(time.time())}.png'})
+                screenshot_file = take_screenshot(driver, "quick_test_result")
+                if screenshot_file:
+                    screenshots.append({'name': '快速測試結果', 'filename': screenshot_file})
             
             else:
                 # 完整測試：測試所有方法
@@ -3590,7 +2475,7 @@ def run_address_test():
                         test_log(f"✅ 方法1成功: '{current_value}'")
                         method1_success = True
                         break
-                    driver['page'].wait_for_timeout(1000)
+                    wait_engine.wait_for_element(driver, 'test_address_autofill', target_address_input, dropoff_strategies.ADDRESS_FILLED_JS, 1000)
                 
                 test_results['method1'] = method1_success
                 if not method1_success:
@@ -3602,7 +2487,7 @@ def run_address_test():
                     try:
                         home_select = driver['page'].locator('select').filter(has_text='住家').first
                         home_select.select_option('住家')
-                        driver['page'].wait_for_timeout(2000)
+                        wait_engine.wait_for_element(driver, 'test_address_reselect', target_address_input, dropoff_strategies.ADDRESS_FILLED_JS, 2000)
                         
                         new_value = target_address_input.input_value() or ''
                         if new_value.strip():
@@ -3620,9 +2505,9 @@ def run_address_test():
                     test_log("測試方法3: 點擊觸發")
                     try:
                         target_address_input.click()
-                        driver['page'].wait_for_timeout(1000)
+                        wait_engine.wait_for_element(driver, 'test_address_clicked', target_address_input, INPUT_FOCUSED_JS, 1000)
                         target_address_input.focus()
-                        driver['page'].wait_for_timeout(2000)
+                        wait_engine.wait_for_element(driver, 'test_address_focused', target_address_input, dropoff_strategies.ADDRESS_FILLED_JS, 2000)
                         
                         new_value = target_address_input.input_value() or ''
                         if new_value.strip():
@@ -3641,7 +2526,7 @@ def run_address_test():
                     try:
                         test_address = "新北市板橋區文化路一段188巷44號"
                         target_address_input.fill(test_address)
-                        driver['page'].wait_for_timeout(1000)
+                        wait_engine.wait_for_element(driver, 'test_address_manual', target_address_input, dropoff_strategies.ADDRESS_FILLED_JS, 1000)
                         
                         new_value = target_address_input.input_value() or ''
                         if new_value.strip():
@@ -3654,8 +2539,9 @@ def run_address_test():
                         test_log(f"❌ 方法4失敗: {e}")
                         test_results['method4'] = False
                 
-                take_screenshot("full_test_result")
-                screenshots.append({'name': '完整測試結果', 'filename': f'full_test_result_{int(time.time())}.png'})
+                screenshot_file = take_screenshot(driver, "full_test_result")
+                if screenshot_file:
+                    screenshots.append({'name': '完整測試結果', 'filename': screenshot_file})
             
             test_status = "測試完成"
             
@@ -3667,46 +2553,169 @@ def run_address_test():
             }
             
         finally:
-            driver['page'].close()
-            driver['browser'].close()
+            close_driver(driver)
             
     except Exception as e:
         test_status = f"測試失敗: {e}"
         return {'success': False, 'error': str(e)}
 
+# 地址測試頁面的方法編號對應的住家地址策略（dropoff_strategies 的 home_address 階段）
+SINGLE_METHOD_STRATEGIES = {
+    '1': 'wait_autofill',
+    '2': 'reselect_home',
+    '3': 'click_trigger',
+    '4': 'manual_fill',
+    '5': 'address_option',
+    '6': 'js_trigger',
+    '7': 'minimal_fill'
+}
+
 @app.route('/run-single-method-test', methods=['POST'])
 def run_single_method_test():
-    """執行單一方法測試"""
+    """執行單一方法測試（結果記進下車地點策略成績表）"""
     try:
         data = request.get_json()
         method = data.get('method', '1')
+        if method not in SINGLE_METHOD_STRATEGIES:
+            return {'success': False, 'error': f'未知的方法 {method}'}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+    
+    # 在常駐瀏覽器池上執行測試
+    return run_browser_job(single_method_test_job, method)
+
+def single_method_test_job(method):
+    """登入並開到住家地址後，只執行一個住家地址策略"""
+    global test_logs, test_status
+    test_logs = []
+    test_status = "測試進行中..."
+    
+    def test_log(message):
+        test_logs.append(message)
+        print(f"[ADDRESS_TEST] {message}")
+    
+    driver = None
+    try:
+        name = SINGLE_METHOD_STRATEGIES[method]
+        label = dropoff_strategies.get_strategy('home_address', name)['label']
+        driver = setup_driver(flow='reservation')
+        test_log("瀏覽器已啟動")
         
-        # 這裡可以實現單一方法的測試邏輯
-        # 為了簡化，先返回模擬結果
-        
-        method_descriptions = {
-            '1': '等待自動填入',
-            '2': '重新選擇住家',
-            '3': '點擊觸發',
-            '4': '手動填入',
-            '5': '地址選單',
-            '6': 'JavaScript觸發',
-            '7': '表單驗證檢查'
-        }
+        target_address_input, error = open_address_form(driver, test_log)
+        if error:
+            return {'success': False, 'error': error}
         
-        # 模擬測試結果
-        import random
-        success = random.choice([True, False])
-        result = f"方法 {method} ({method_descriptions.get(method, '未知')}) "
-        result += "測試成功" if success else "測試失敗"
+        success, elapsed_ms = dropoff_strategies.run_one(
+            driver, 'home_address', name, {'address_input': target_address_input})
+        value = target_address_input.input_value() or ''
+        result = f"方法 {method} ({label}) " + ("測試成功" if success else "測試失敗")
+        result += f"，耗時 {elapsed_ms:.0f} ms，地址框: '{value}'"
+        test_log(result)
+        test_status = "測試完成"
         
-        return {
+        response = {
             'success': success,
-            'result': result
+            'result': result,
+            'elapsed_ms': round(elapsed_ms),
+            'logs': test_logs,
+            'scoreboard': dropoff_strategies.scoreboard()['home_address']
         }
+        if not success:
+            response['error'] = result
+        return response
         
     except Exception as e:
+        test_status = f"測試失敗: {e}"
         return {'success': False, 'error': str(e)}
+    finally:
+        if driver:
+            close_driver(driver)
+
+@app.route('/browser-pool-stats')
+def browser_pool_stats():
+    """常駐瀏覽器池統計資訊"""
+    try:
+        stats = browser_pool.stats()
+        stats['launch_profile'] = launch_profile.timings()
+        stats['async_engine'] = async_engine.stats()
+        stats['profile_cache'] = {
+            'enabled': profile_cache.enabled(),
+            'runs': profile_cache.recent_runs
+        }
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/request-filter-stats')
+def request_filter_stats():
+    """最近幾次執行的請求攔截統計"""
+    try:
+        return jsonify({
+            'mode': request_filter.filter_mode(),
+            'runs': list(request_filter.recent_runs)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/wait-stats')
+def wait_stats():
+    """最近幾次執行的等待統計（實際等待時間與原本固定等待的比較）"""
+    try:
+        return jsonify({
+            'ceiling_factor': wait_engine.ceiling_factor(),
+            'runs': list(wait_engine.recent_runs)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/selector-stats')
+def selector_stats():
+    """選擇器解析統計（快取命中、完整掃描、找不到的次數）"""
+    try:
+        return jsonify(selector_resolver.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/dropoff-strategy-stats')
+def dropoff_strategy_stats():
+    """下車地點策略成績表（每個策略的嘗試、成功次數、耗時與目前的嘗試順序）"""
+    try:
+        return jsonify(dropoff_strategies.scoreboard())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/autocomplete-stats')
+def autocomplete_stats():
+    """地點搜尋建議快取統計（命中、未命中、作廢、記住的次數）與記住的搜尋關鍵字"""
+    try:
+        return jsonify(autocomplete_cache.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/screenshot-stats')
+def screenshot_stats():
+    """最近幾次執行的截圖統計（張數、重複略過、寫入位元組、拍攝耗時）與截圖目錄用量"""
+    try:
+        return jsonify({
+            'format': screenshot_store.output_format(),
+            'pillow': screenshot_store.Image is not None,
+            'usage': screenshot_store.usage(),
+            'runs': list(screenshot_store.recent_runs)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/dispatch-delta')
+def dispatch_delta():
+    """最近一次派車查詢與前一次的差異（新增、變更、取消、完成）"""
+    try:
+        account_id = request.args.get('account') or get_account()['id']
+        return jsonify({
+            'account': account_id,
+            'delta': dispatch_sync.last_delta(account_id)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/test-status')
 def test_status():
@@ -3727,22 +2736,8 @@ test_status = "待機中"
 @app.route('/dispatch-screenshots')
 def dispatch_screenshots():
     """查看尋找派車結果截圖"""
-    import os
-    import glob
-    
-    # 獲取所有派車截圖檔案（包含新的6步驟流程截圖）
-    screenshot_patterns = [
-        'dispatch_*.png',       # 舊格式：dispatch_results_*, dispatch_error_*
-        'step*_*.png',          # 新格式：step1_homepage_*, step3_before_login_* 等
-        'debug_*.png'           # 除錯截圖
-    ]
-    
-    screenshot_files = []
-    for pattern in screenshot_patterns:
-        screenshot_files.extend(glob.glob(pattern))
-    
-    # 按檔案名稱排序，讓步驟順序更清楚
-    screenshot_files.sort()
+    # 最近一次派車查詢的截圖（依拍攝順序）
+    frames = screenshot_store.recent_frames('dispatch', runs=1)
     
     html = '''
     <!DOCTYPE html>
@@ -3780,38 +2775,29 @@ def dispatch_screenshots():
             </div>
     '''
     
-    if screenshot_files:
+    if frames:
+        duplicates = sum(1 for frame in frames if frame['duplicate'])
         html += f'''
             <div class="stats">
-                <strong>📊 統計資訊：</strong>共找到 {len(screenshot_files)} 張派車抓取截圖
+                <strong>📊 統計資訊：</strong>共 {len(frames)} 張派車抓取截圖（{frames[0]['run_id']}），
+                其中 {duplicates} 張與既有畫面相同未另存
             </div>
         '''
         
-        for file_path in screenshot_files:
-            filename = os.path.basename(file_path)
-            
-            # 根據檔名格式進行不同的處理
-            if filename.startswith('step'):
-                # 新格式: step1_homepage_20250623_181234.png
-                description = filename.replace('.png', '').replace('step', 'step').replace('_', ' ')
-                # 移除時間戳記部分 (最後的日期時間)
-                import re
-                description = re.sub(r'\s\d{8}\s\d{6}$', '', description)
-            elif filename.startswith('dispatch_'):
-                # 舊格式: dispatch_results_20250623_181234.png
-                description = filename.replace('.png', '').replace('dispatch_', '').replace('_', ' ')
-                # 移除時間戳記部分
-                import re
-                description = re.sub(r'\s\d{8}\s\d{6}$', '', description)
-            elif filename.startswith('debug_'):
-                # 除錯格式: debug_page_20250623_181234.png
-                description = filename.replace('.png', '').replace('debug_', 'debug ').replace('_', ' ')
-                # 移除時間戳記部分
-                import re
-                description = re.sub(r'\s\d{8}\s\d{6}$', '', description)
+        for frame in frames:
+            name = frame['name']
+            
+            # 根據截圖名稱進行不同的處理
+            if name.startswith('step'):
+                # 例如 step1_homepage、step_001_page_loaded
+                description = name.replace('_', ' ')
+            elif name.startswith('dispatch_'):
+                # 例如 dispatch_results、dispatch_error
+                description = name.replace('dispatch_', '').replace('_', ' ')
+            elif name.startswith('debug_'):
+                description = name.replace('debug_', 'debug ').replace('_', ' ')
             else:
-                # 其他格式
-                description = filename.replace('.png', '').replace('_', ' ')
+                description = name.replace('_', ' ')
             
             # 美化描述文字 - 支援新舊兩種截圖格式
             description_map = {
@@ -3852,7 +2838,7 @@ def dispatch_screenshots():
             html += f'''
             <div class="screenshot">
                 <h3>{display_description}</h3>
-                <img src="/screenshot/{filename}" alt="{display_description}" loading="lazy">
+                {_screenshot_img(frame, display_description)}
             </div>
             '''
     else:
@@ -3872,12 +2858,30 @@ def dispatch_screenshots():
     
     return html
 
+def _dispatch_record_lines(records):
+    """把派車記錄排成純文字，每筆記錄一段"""
+    lines = []
+    for i, record in enumerate(records, 1):
+        lines.append(f"{i}. {record.get('date', 'N/A')} {record.get('time', 'N/A')}  {record.get('status', 'N/A')}")
+        lines.append(f"   路線: {record.get('route', 'N/A')}")
+        lines.append(f"   司機: {record.get('driver', 'N/A')}  車號: {record.get('vehicle', 'N/A')}  聯絡電話: {record.get('contact', 'N/A')}")
+        if record.get('account'):
+            lines.append(f"   帳號: {record['account']}")
+    return html_escape('\n'.join(lines))
+
 @app.route('/latest-dispatch')
 def latest_dispatch():
-    """顯示最新派車結果"""
+    """顯示最新派車結果（由派車歷史查詢最近一次的結果）"""
     try:
-        with open('search_result.txt', 'r', encoding='utf-8') as f:
-            content = f.read()
+        run = dispatch_store.latest_run(request.args.get('account'))
+    except Exception as e:
+        print(f"讀取派車歷史失敗: {e}")
+        run = None
+
+    if run is not None:
+        content = (f"查詢時間: {run['timestamp']}（帳號: {run['account']}，來源: {run['source'] or 'N/A'}）\n"
+                   f"總記錄數: {run['total_records']}，派車記錄: {run['dispatch_records']}\n\n")
+        content = html_escape(content) + (_dispatch_record_lines(run['results']) or '沒有已派車的記錄')
         
         return f'''
         <!DOCTYPE html>
@@ -3927,39 +2931,40 @@ def latest_dispatch():
         </html>
         '''
         
-    except FileNotFoundError:
-        return '''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>最新派車結果</title>
-            <meta charset="utf-8">
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                .back-button { 
-                    background-color: #2196F3; 
-                    color: white; 
-                    padding: 10px 20px; 
-                    text-decoration: none; 
-                    border-radius: 4px; 
-                    display: inline-block; 
-                    margin-bottom: 20px; 
-                }
-            </style>
-        </head>
-        <body>
-            <a href="/" class="back-button">返回首頁</a>
-            <h1>📋 最新派車結果</h1>
-            <p>❌ 暫無派車結果檔案，請先執行派車查詢</p>
-        </body>
-        </html>
-        '''
+    return '''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>最新派車結果</title>
+        <meta charset="utf-8">
+        <style>
+            body { font-family: Arial, sans-serif; margin: 20px; }
+            .back-button { 
+                background-color: #2196F3; 
+                color: white; 
+                padding: 10px 20px; 
+                text-decoration: none; 
+                border-radius: 4px; 
+                display: inline-block; 
+                margin-bottom: 20px; 
+            }
+        </style>
+    </head>
+    <body>
+        <a href="/" class="back-button">返回首頁</a>
+        <h1>📋 最新派車結果</h1>
+        <p>❌ 暫無派車結果，請先執行派車查詢</p>
+    </body>
+    </html>
+    '''
 
 @app.route('/dispatch-result-file')
 def dispatch_result_file():
-    """查看派車結果本地檔案"""
-    import os
-    from datetime import datetime
+    """查看派車歷史（?from=&to= 日期區間、?account= 帳號、?status= 狀態）"""
+    account_id = request.args.get('account') or None
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    status = request.args.get('status') or None
     
     html = '''
     <!DOCTYPE html>
@@ -3967,7 +2972,7 @@ def dispatch_result_file():
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>派車結果本地檔案</title>
+        <title>派車歷史</title>
         <style>
             body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }
             .container { max-width: 1000px; margin: 0 auto; }
@@ -4014,51 +3019,46 @@ def dispatch_result_file():
         <div class="container">
             <div class="header">
                 <a href="/" class="back-button">返回首頁</a>
-                <h1>📄 派車結果本地檔案</h1>
-                <p>顯示 search_result.txt 檔案的內容，包含最新的派車查詢結果。</p>
+                <h1>📄 派車歷史</h1>
+                <p>每筆訂單最近一次查詢到的派車記錄，可用 ?from=YYYY-MM-DD&amp;to=YYYY-MM-DD&amp;account=&amp;status= 篩選。</p>
             </div>
     '''
     
     try:
-        file_path = 'search_result.txt'
+        records = dispatch_store.latest_per_order(account_id, date_from, date_to, status)
+        counts = dispatch_store.status_counts(account_id, date_from, date_to)
+        runs = dispatch_store.recent_runs(account_id, limit=1)
         
-        if os.path.exists(file_path):
-            # 獲取檔案資訊
-            file_size = os.path.getsize(file_path)
-            modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            
+        if records or runs:
+            counts_text = '、'.join(f"{html_escape(str(name))} {count} 筆" for name, count in counts.items()) or '無'
+            last_run = f"{runs[0]['timestamp']}（{html_escape(runs[0]['account'])}）" if runs else 'N/A'
             html += f'''
             <div class="file-info">
-                <strong>📁 檔案資訊：</strong><br>
-                📄 檔案名稱：{file_path}<br>
-                📏 檔案大小：{file_size} bytes<br>
-                🕒 最後修改：{modified_time.strftime("%Y-%m-%d %H:%M:%S")}
+                <strong>📊 統計：</strong><br>
+                📅 日期區間：{html_escape(date_from or '不限')} ~ {html_escape(date_to or '不限')}<br>
+                📋 狀態筆數：{counts_text}<br>
+                🕒 最近一次查詢：{last_run}
             </div>
             '''
             
-            # 讀取檔案內容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
             html += f'''
             <div class="content">
-                <div class="file-content">{content}</div>
+                <div class="file-content">{_dispatch_record_lines(records) or '沒有符合條件的派車記錄'}</div>
             </div>
             '''
         else:
             html += '''
             <div class="no-file">
-                <h2>📭 檔案不存在</h2>
-                <p>search_result.txt 檔案不存在。</p>
-                <p>請先執行「🔄 抓取派車結果」功能來生成檔案。</p>
+                <h2>📭 尚無派車歷史</h2>
+                <p>請先執行「🔄 抓取派車結果」功能。</p>
             </div>
             '''
             
     except Exception as e:
         html += f'''
         <div class="no-file">
-            <h2>❌ 讀取檔案失敗</h2>
-            <p>無法讀取檔案：{str(e)}</p>
+            <h2>❌ 讀取派車歷史失敗</h2>
+            <p>無法查詢派車歷史：{html_escape(str(e))}</p>
         </div>
         '''
     
@@ -4070,6 +3070,22 @@ def dispatch_result_file():
     
     return html
 
+@app.route('/dispatch-history')
+def dispatch_history():
+    """派車歷史查詢（JSON）：每筆訂單最近一次的記錄與狀態筆數"""
+    try:
+        account_id = request.args.get('account') or None
+        date_from = request.args.get('from') or None
+        date_to = request.args.get('to') or None
+        return jsonify({
+            'records': dispatch_store.latest_per_order(account_id, date_from, date_to, request.args.get('status') or None),
+            'status_counts': dispatch_store.status_counts(account_id, date_from, date_to),
+            'runs': dispatch_store.recent_runs(account_id)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     host = '0.0.0.0' if os.environ.get('RENDER') else '127.0.0.1'
@@ -4079,4 +3095,9 @@ if __name__ == '__main__':
     print(f"Debug mode: {debug}")
     print(f"Render environment: {bool(os.environ.get('RENDER'))}")
     
+    # 服務啟動時預先啟動常駐瀏覽器，避免第一次任務冷啟動
+    # （debug 模式下只在重新載入後的子行程中預熱）
+    if os.environ.get('BROWSER_POOL_WARMUP', '1') == '1' and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        browser_pool.warm_up()
+    
     app.run(host=host, port=port, debug=debug) 
\ No newline at end of file
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+非同步 Playwright 引擎
+
+在一條專屬執行緒上執行單一 asyncio 事件迴圈，使用 playwright.async_api
+共用一個 Chromium，多個帳號的派車查詢以協程並行（以 semaphore 限制同時數量），
+每個協程只占用一個 BrowserContext。
+
+Flask 路由與排程腳本透過 run() / submit() 把協程丟進事件迴圈並等待結果。
+
+預約流程仍是同步程式碼（數千行的表單操作），在引擎中以 run_blocking()
+交給常駐瀏覽器池的工作執行緒執行，事件迴圈只負責等待結果。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytz
+from playwright.async_api import async_playwright
+
+import dispatch_records
+import dispatch_store
+import dispatch_sync
+import launch_profile
+import order_capture
+import order_dom
+import screenshot_store
+import session_cache
+import wait_engine
+from accounts import load_accounts, get_account
+from request_filter import install_request_filter_async, finish_run
+
+SITE_URL = "https://www.ntpc.ltc-car.org/"
+ORDER_PAGE_URL = "https://www.ntpc.ltc-car.org/ReservationOrder/"
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+ORDER_MENU_SELECTORS = [
+    '.page:nth-child(2) .pc_header li:nth-child(2)',
+    'a:has-text("訂單查詢")',
+    'text=訂單查詢'
+]
+
+
+class AsyncEngine:
+    """單一事件迴圈、共用瀏覽器、並行數有上限的非同步引擎"""
+
+    def __init__(self, browser_args, context_options=None, max_concurrency=3):
+        self.browser_args = browser_args
+        self.context_options = context_options or {}
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._semaphore = None
+
+        self._stats = {
+            'jobs_submitted': 0,
+            'jobs_completed': 0,
+            'jobs_failed': 0,
+            'active_flows': 0,
+            'peak_concurrency': 0,
+            'browser_launches': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # 事件迴圈
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._loop_main, name='async-engine', daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    def _loop_main(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._browser_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def submit(self, coro_func, *args, **kwargs):
+        """把協程丟進事件迴圈，回傳 concurrent.futures.Future"""
+        self._ensure_loop()
+        self._stats['jobs_submitted'] += 1
+        return asyncio.run_coroutine_threadsafe(self._track(coro_func(self, *args, **kwargs)), self._loop)
+
+    def run(self, coro_func, *args, timeout=None, **kwargs):
+        """執行協程並等待結果（可在 Flask 執行緒或排程腳本中呼叫）"""
+        return self.submit(coro_func, *args, **kwargs).result(timeout=timeout)
+
+    async def _track(self, coro):
+        try:
+            result = await coro
+            self._stats['jobs_completed'] += 1
+            return result
+        except BaseException:
+            self._stats['jobs_failed'] += 1
+            raise
+
+    async def run_blocking(self, func, *args):
+        """在事件迴圈之外執行同步函式（例如同步的預約流程）並等待結果"""
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: func(*args))
+
+    # ------------------------------------------------------------------
+    # 瀏覽器
+    # ------------------------------------------------------------------
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            if self._playwright is None:
+                print("🚀 非同步引擎：啟動 Playwright")
+                self._playwright = await async_playwright().start()
+
+            # 啟動設定的解析可能需要探測（同步 API），交給執行緒池
+            profile = await self.run_blocking(launch_profile.resolve, None, self.browser_args)
+            started = time.perf_counter()
+            try:
+                self._browser = await self._playwright.chromium.launch(**launch_profile.launch_options(profile))
+            except Exception:
+                # 與同步流程相同：快取的設定無法啟動時丟棄，下次重新探測
+                launch_profile.invalidate()
+                raise
+            self._stats['browser_launches'] += 1
+            print(f"✅ 非同步引擎：瀏覽器啟動完成（{(time.perf_counter() - started) * 1000:.0f} ms）")
+            return self._browser
+
+    async def _close_browser(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def shutdown(self):
+        """關閉瀏覽器並停止事件迴圈"""
+        if self._loop is None or not self._thread or not self._thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._close_browser(), self._loop).result(timeout=30)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+    def stats(self):
+        data = dict(self._stats)
+        data.update({
+            'max_concurrency': self.max_concurrency,
+            'loop_running': bool(self._thread and self._thread.is_alive()),
+            'browser_connected': bool(self._browser and self._browser.is_connected()),
+        })
+        return data
+
+
+# ----------------------------------------------------------------------
+# 派車查詢協程
+# ----------------------------------------------------------------------
+
+async def _login(page, account):
+    """精簡的非同步登入流程（已驗證有效的選擇器）"""
+    await page.wait_for_selector('input[type="text"]', timeout=10000)
+    await page.fill('input[type="text"]', account['id'])
+    await page.fill('input[type="password"]', account['password'])
+
+    for selector in ['a.button-fill:nth-child(2)', 'a:has-text("民眾登入")', 'text=民眾登入']:
+        element = page.locator(selector).first
+        if await element.count() > 0 and await element.is_visible():
+            await element.click()
+            break
+    else:
+        raise Exception("找不到民眾登入按鈕")
+
+    await page.wait_for_selector('.dialog:has-text("登入成功")', timeout=10000)
+    await page.click('span.dialog-button')
+    await page.wait_for_load_state('networkidle')
+
+
+async def _open_order_page(page):
+    for selector in ORDER_MENU_SELECTORS:
+        element = page.locator(selector).first
+        try:
+            if await element.count() > 0 and await element.is_visible():
+                await element.click()
+                break
+        except Exception:
+            continue
+    else:
+        await page.goto(ORDER_PAGE_URL)
+
+    await page.wait_for_selector('.order_list, div.log', timeout=15000)
+
+
+async def _load_all_orders(page):
+    """等待訂單列表的記錄數量靜止（有載入更多控制項時才點擊），回傳最終筆數"""
+    settled = await page.evaluate(wait_engine.LIST_SETTLE_JS, {
+        'containers': order_dom.CONTAINER_SELECTORS,
+        'item': '.order_list, div.log',
+        'loadMoreTexts': wait_engine.LOAD_MORE_TEXTS,
+        'loadMoreSelectors': wait_engine.LOAD_MORE_SELECTORS,
+        'quietMs': 500,
+        'loadMoreMs': 1500,
+        'timeoutMs': 15000,
+        'maxClicks': 10,
+    })
+    return settled['count']
+
+
+async def _capture_payloads(capture):
+    """讀取已收到的訂單 API 回應內容（非同步 API），回傳 [(url, json)]"""
+    payloads = []
+    for response in capture.responses:
+        try:
+            payloads.append((response.url, await response.json()))
+        except Exception as e:
+            print(f"⚠️ 讀取訂單 API 回應失敗: {e}")
+    return payloads
+
+
+def _save_dispatch_results(results_data, account_id, statuses):
+    """同步、保存並記錄一次查詢結果（檔案與 SQLite 寫入，由 run_blocking 在事件迴圈之外執行）"""
+    dispatch_sync.sync_results(results_data, account_id, statuses)
+    dispatch_records.save_results(results_data, f"dispatch_results_{account_id}.json")
+    if account_id == get_account()['id']:
+        dispatch_records.save_results(results_data)
+    dispatch_store.record_run(results_data, account_id)
+
+
+def _finish_flow(request_filter, screenshots):
+    """輸出攔截與截圖統計並寫入檔案（由 run_blocking 在事件迴圈之外執行）"""
+    finish_run(request_filter)
+    screenshot_store.finish_run(screenshots)
+
+
+async def dispatch_query(engine, account):
+    """單一帳號的派車查詢，回傳與 fetch_dispatch_results 相同結構的結果"""
+    current_time = datetime.now(TAIPEI_TZ)
+
+    async with engine._semaphore:
+        engine._stats['active_flows'] += 1
+        engine._stats['peak_concurrency'] = max(engine._stats['peak_concurrency'], engine._stats['active_flows'])
+        context = None
+        request_filter = None
+        screenshots = screenshot_store.ScreenshotRun('dispatch')
+        try:
+            browser = await engine._ensure_browser()
+            context = await browser.new_context(**engine.context_options)
+            request_filter = await install_request_filter_async(context, 'dispatch')
+            capture = order_capture.install_order_capture(context)
+
+            restore = await engine.run_blocking(session_cache.prepare_restore, account['id'])
+            if restore:
+                if restore['cookies']:
+                    await context.add_cookies(restore['cookies'])
+                await context.add_init_script(restore['init_script'])
+
+            page = await context.new_page()
+            print(f"📱 [{account['id']}] 連線到首頁...")
+            await page.goto(SITE_URL)
+            await page.wait_for_load_state('networkidle')
+
+            try:
+                await page.click('text=我知道了', timeout=5000)
+            except Exception:
+                pass
+
+            if await page.locator('input[type="password"]').first.is_visible():
+                if restore:
+                    print(f"⚠️ [{account['id']}] 登入快取未生效，改走完整登入流程")
+                    await engine.run_blocking(session_cache.clear_session, account['id'])
+                print(f"🔐 [{account['id']}] 登入中...")
+                await _login(page, account)
+                storage_state = await context.storage_state()
+                session_storage = await page.evaluate(session_cache.SESSION_STORAGE_JS)
+                await engine.run_blocking(session_cache.store_session, account['id'], storage_state, session_storage)
+            else:
+                print(f"✅ [{account['id']}] 已使用登入快取，略過登入流程")
+
+            print(f"📋 [{account['id']}] 開啟訂單查詢...")
+            await _open_order_page(page)
+
+            api_result = None
+            statuses = None
+            if capture is not None:
+                api_result = order_capture.dispatch_results_from(await _capture_payloads(capture))
+            if api_result is not None:
+                source = 'api'
+                total_records, dispatch_results, statuses = api_result
+            else:
+                source = 'dom'
+                await _load_all_orders(page)
+                payload = await page.evaluate(order_dom.ORDER_EXTRACT_JS, order_dom.CONTAINER_SELECTORS)
+                total_records = len(payload['records'])
+                dispatch_results = order_dom.classify_orders(payload['records'])
+            results_data = dispatch_records.build_results(total_records, dispatch_results, current_time)
+            results_data['source'] = source
+            # 檔案與 SQLite 寫入不在事件迴圈上執行，避免阻塞其他帳號的查詢
+            await engine.run_blocking(_save_dispatch_results, results_data, account['id'], statuses)
+
+            try:
+                started = time.perf_counter()
+                data = await page.screenshot(**screenshot_store.screenshot_options())
+                await engine.run_blocking(screenshot_store.record, screenshots, f"dispatch_results_{account['id']}",
+                                          data, (time.perf_counter() - started) * 1000)
+            except Exception as e:
+                print(f"截圖保存失敗: {e}")
+
+            print(f"✅ [{account['id']}] 找到 {len(dispatch_results)} 筆已派車記錄（來源: {source}）")
+            return {
+                'success': True,
+                'data': results_data,
+                'source': source,
+                'delta': results_data['delta'],
+                'message': f'成功分析 {total_records} 筆記錄，找到 {len(dispatch_results)} 筆已派車記錄'
+            }
+
+        except Exception as e:
+            error_msg = f"取得派車結果時發生錯誤: {str(e)}"
+            print(f"❌ [{account['id']}] {error_msg}")
+            await engine.run_blocking(screenshot_store.mark_failed, screenshots)
+            return {'success': False, 'error': error_msg}
+
+        finally:
+            await engine.run_blocking(_finish_flow, request_filter, screenshots)
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            engine._stats['active_flows'] -= 1
+
+
+async def blocking_job(engine, func, *args):
+    """以協程包裝同步任務（例如透過瀏覽器池執行的預約流程）"""
+    return await engine.run_blocking(func, *args)
+
+
+async def dispatch_queries(engine, account_ids=None):
+    """多個帳號的派車查詢並行執行（共用同一個瀏覽器）"""
+    accounts = load_accounts()
+    if account_ids:
+        accounts = [a for a in accounts if a['id'] in account_ids]
+
+    results = await asyncio.gather(*(dispatch_query(engine, account) for account in accounts))
+    return {
+        'success': all(r.get('success') for r in results),
+        'accounts': {account['id']: result for account, result in zip(accounts, results)}
+    }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_async_engine(browser_args, context_options=None):
+    """建立行程層級的非同步引擎（由 app.py 在載入時呼叫一次）"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncEngine(
+                browser_args,
+                context_options,
+                max_concurrency=int(os.environ.get('ASYNC_ENGINE_CONCURRENCY', 3)),
+            )
+        return _engine
+
+
+def get_async_engine():
+    """取得行程層級的非同步引擎，尚未建立時回傳 None"""
+    return _engine
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+地點搜尋建議的快取
+
+預約流程每週都把同一個地點（例如亞東紀念醫院）輸入搜尋框，再以鍵盤、點擊等方式
+選擇 Google 地點建議。這裡記住每個搜尋關鍵字最後選中的建議：
+    text      建議項目的文字（.pac-item 的 textContent）
+    value     選擇後輸入框被換成的值（地點名稱與地址）
+    position  建議項目在清單中的位置
+
+之後的執行在建議清單一出現時（每個動畫影格檢查一次，不固定等待）就直接點擊
+同一個建議，並確認輸入框換成記住的值。清單中沒有該建議，或選擇後輸入框的值
+不同時，該筆快取作廢，改回原本的選擇方式，成功後再重新記住（autocomplete_cache.json）。
+"""
+
+import json
+import os
+import threading
+import time
+
+CACHE_FILE = os.environ.get('AUTOCOMPLETE_CACHE_FILE', 'autocomplete_cache.json')
+
+# 命中的建議項目以此屬性標記，供 Python 端建立 locator
+MARK_ATTRIBUTE = 'data-autocomplete-hit'
+
+SUGGESTION_SELECTOR = '.pac-item'
+
+# 目前可見的建議項目：完整文字與名稱（.pac-item-query，沒有時為完整文字）
+SUGGESTIONS_JS = '''
+(selector) => Array.from(document.querySelectorAll(selector))
+    .filter(el => el.offsetParent !== null)
+    .map(el => {
+        const text = (el.textContent || '').trim();
+        const main = el.querySelector('.pac-item-query');
+        return {text: text, main: main ? (main.textContent || '').trim() : text};
+    })
+'''
+
+# 建議清單出現後找出記住的建議（相同文字有多筆時取最接近記住位置的一筆）並加上標記；
+# 清單還沒出現時回傳 null 繼續等待，清單中沒有該建議時回傳 index -1
+PICK_JS = '''
+({selector, text, position, mark}) => {
+    const items = Array.from(document.querySelectorAll(selector)).filter(el => el.offsetParent !== null);
+    if (items.length === 0) return null;
+    let best = -1;
+    items.forEach((el, index) => {
+        if ((el.textContent || '').trim() !== text) return;
+        if (best < 0 || Math.abs(index - position) < Math.abs(best - position)) best = index;
+    });
+    document.querySelectorAll('[' + mark + ']').forEach(el => el.removeAttribute(mark));
+    if (best >= 0) items[best].setAttribute(mark, '1');
+    return {index: best, count: items.length};
+}
+'''
+
+_entries = None
+_lock = threading.Lock()
+
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'invalidations': 0,
+    'remembered': 0,
+}
+
+
+def _load():
+    global _entries
+    with _lock:
+        if _entries is None:
+            _entries = {}
+            if os.path.exists(CACHE_FILE):
+                try:
+                    with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                        _entries = json.load(f)
+                except Exception as e:
+                    print(f"讀取搜尋建議快取失敗: {e}")
+        return _entries
+
+
+def _save():
+    with _lock:
+        try:
+            tmp_path = CACHE_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, CACHE_FILE)
+        except Exception as e:
+            print(f"保存搜尋建議快取失敗: {e}")
+
+
+def lookup(query):
+    return _load().get(query)
+
+
+def invalidate(query, reason):
+    """作廢一筆快取"""
+    if _load().pop(query, None) is not None:
+        _stats['invalidations'] += 1
+        print(f"🗑️ 搜尋建議快取作廢（{query}）: {reason}")
+        _save()
+
+
+def suggestions(driver):
+    """目前可見的建議項目（選擇前先記下，成功後交給 remember）"""
+    try:
+        return driver['page'].evaluate(SUGGESTIONS_JS, SUGGESTION_SELECTOR)
+    except Exception as e:
+        print(f"讀取搜尋建議失敗: {e}")
+        return []
+
+
+def chosen_position(items, value):
+    """由選擇後輸入框的值推回選中的建議位置：名稱出現在值中的第一筆，都沒有時為第一筆"""
+    value = (value or '').strip()
+    for index, item in enumerate(items):
+        if item['main'] and item['main'] in value:
+            return index
+    return 0
+
+
+def remember(query, items, value):
+    """記住這次選中的建議，items 為選擇前的 suggestions()，value 為選擇後輸入框的值"""
+    value = (value or '').strip()
+    if not items or not value:
+        return None
+    position = chosen_position(items, value)
+    entry = {
+        'text': items[position]['text'],
+        'value': value,
+        'position': position,
+        'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    previous = _load().get(query)
+    if previous and all(previous.get(key) == entry[key] for key in ('text', 'value', 'position')):
+        return previous
+    _entries[query] = entry
+    _stats['remembered'] += 1
+    _save()
+    print(f"💾 記住搜尋建議（{query}）: 第 {position + 1} 筆 '{entry['text']}'")
+    return entry
+
+
+def pick(driver, input_locator, query, timeout_ms=3000):
+    """以快取直接選擇建議，成功時回傳輸入框的值；沒有快取或快取作廢時回傳 None"""
+    entry = lookup(query)
+    if entry is None:
+        _stats['misses'] += 1
+        return None
+
+    page = driver['page']
+    started = time.perf_counter()
+    arg = {'selector': SUGGESTION_SELECTOR, 'text': entry['text'], 'position': entry.get('position', 0),
+           'mark': MARK_ATTRIBUTE}
+    try:
+        result_handle = page.wait_for_function(PICK_JS, arg=arg, timeout=timeout_ms)
+        result = result_handle.json_value()
+        result_handle.dispose()
+    except Exception as e:
+        _stats['misses'] += 1
+        print(f"⚠️ 搜尋建議沒有出現（{query}）: {e}")
+        return None
+    if result['index'] < 0:
+        invalidate(query, f"{result['count']} 筆建議中沒有 '{entry['text']}'")
+        return None
+
+    expected = json.dumps(entry['value'], ensure_ascii=False)
+    handle = None
+    try:
+        page.locator(f'[{MARK_ATTRIBUTE}]').first.click()
+        handle = input_locator.element_handle(timeout=timeout_ms)
+        page.wait_for_function(f"el => el.value.trim() === {expected}", arg=handle, timeout=timeout_ms)
+    except Exception as e:
+        invalidate(query, f"選擇後輸入框不是 '{entry['value']}'（{e.__class__.__name__}）")
+        return None
+    finally:
+        if handle is not None:
+            handle.dispose()
+
+    _stats['hits'] += 1
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"⚡ 搜尋建議快取命中（{query}）: 第 {result['index'] + 1} 筆（{elapsed:.0f} ms）")
+    return entry['value']
+
+
+def stats():
+    data = dict(_stats)
+    data['queries'] = sorted(_load().keys())
+    return data
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+比較訂單展開（fetch_dispatch_results 第一階段）的兩種做法
+
+- legacy: 原本的全域版本，對整份文件查詢隱藏、摺疊與高度限制的元素，
+          每個元素邊讀 getComputedStyle 邊寫入樣式
+- scoped: order_dom.EXPAND_JS，只處理訂單容器，先讀後寫
+
+以保存的訂單頁（web-source-code/view-source_..._ReservationOrder_.html）為頁面其餘部分，
+另外插入一個 .ReservationOrder .main_content 容器與指定筆數的訂單（結構同網站範本），
+每一輪都重新載入頁面，量測頁面中的耗時（含強制計算版面）。
+
+使用方式：
+    python3 bench_expand.py --records 30 --rounds 20
+"""
+
+import argparse
+import statistics
+import sys
+
+from playwright.sync_api import sync_playwright
+
+import order_dom
+
+FIXTURE = 'web-source-code/view-source_https___www.ntpc.ltc-car.org_ReservationOrder_.html'
+
+# 原本 app.py 第一階段的腳本（移除 console.log，其餘不變）
+LEGACY_EXPAND_JS = '''
+() => {
+    const hiddenElements = document.querySelectorAll('*[style*="display: none"], *[style*="display:none"], *[style*="visibility: hidden"], *[style*="visibility:hidden"]');
+    hiddenElements.forEach(el => {
+        el.style.display = 'block';
+        el.style.visibility = 'visible';
+    });
+
+    const collapsedSelectors = ['[data-collapsed="true"]', '.collapsed', '.fold', '.folded', '.hidden', '.hide',
+                                '[aria-expanded="false"]', '[data-toggle="collapse"]'];
+    collapsedSelectors.forEach(selector => {
+        document.querySelectorAll(selector).forEach(el => {
+            el.style.display = 'block';
+            el.style.visibility = 'visible';
+            el.style.height = 'auto';
+            el.style.maxHeight = 'none';
+            el.style.overflow = 'visible';
+            if (el.dataset.collapsed) el.dataset.collapsed = 'false';
+            if (el.getAttribute('aria-expanded')) el.setAttribute('aria-expanded', 'true');
+            if (el.classList.contains('collapsed')) el.classList.remove('collapsed');
+            if (el.classList.contains('hidden')) el.classList.remove('hidden');
+            if (el.classList.contains('hide')) el.classList.remove('hide');
+        });
+    });
+
+    const limitedHeightElements = document.querySelectorAll('*[style*="max-height"], *[style*="height"]');
+    limitedHeightElements.forEach(el => {
+        const style = window.getComputedStyle(el);
+        if (style.maxHeight !== 'none' && style.maxHeight !== 'auto') {
+            el.style.maxHeight = 'none';
+            el.style.height = 'auto';
+        }
+    });
+    return {touched: null};
+}
+'''
+
+# 插入訂單容器與模擬的地圖 DOM（大量帶 inline 樣式的圖塊，與 Google Maps、Leaflet 類似）
+SETUP_JS = '''
+({records, tiles}) => {
+    const states = ['媒合中', '成立', '派車', '執行', '完成', '取消'];
+    const page = document.createElement('div');
+    page.className = 'ReservationOrder';
+    const main = document.createElement('div');
+    main.className = 'main_content';
+    for (let i = 0; i < records; i++) {
+        const current = i % states.length;
+        const spans = states.map((s, j) => `<span${j === current ? '' : ' style="display: none;"'}>${s}</span>`).join('');
+        main.insertAdjacentHTML('beforeend', `
+            <div class="order_list log dispatch">
+                <div class="state_tag">${spans}</div>
+                <div class="order_blocks date"><div class="text">2025/06/26 09:30</div></div>
+                <div class="order_time">2025/06/23 00:01</div>
+                <div class="order_blocks"><div class="order_title place">上車</div>
+                    <div class="location">住家</div><div class="address">新北市板橋區文化路一段${i}號</div></div>
+                <div class="toggle_area collapsed" style="display: none; max-height: 0px; overflow: hidden;">
+                    <p>指派司機: 王大明(0922333444)</p><p>車號: RAB-${1000 + i}</p>
+                </div>
+            </div>`);
+    }
+    page.appendChild(main);
+    document.body.appendChild(page);
+
+    const map = document.createElement('div');
+    map.className = 'gm-style';
+    for (let i = 0; i < tiles; i++) {
+        map.insertAdjacentHTML('beforeend',
+            `<div style="position: absolute; left: ${(i % 16) * 256}px; top: ${Math.floor(i / 16) * 256}px; width: 256px; height: 256px;">` +
+            `<img style="width: 256px; height: 256px; display: none;"><div class="leaflet-tile hide" style="max-height: 256px;"></div></div>`);
+    }
+    document.body.appendChild(map);
+    return document.getElementsByTagName('*').length;
+}
+'''
+
+TIMED_JS = '''
+({source, arg}) => {
+    const run = eval(source);
+    const started = performance.now();
+    const result = run(arg);
+    document.body.offsetHeight;  // 強制計算版面
+    return {elapsed_ms: performance.now() - started, touched: result.touched};
+}
+'''
+
+
+def run_rounds(page, html, name, source, args, rounds):
+    timings = []
+    touched = None
+    for _ in range(rounds):
+        page.set_content(html)
+        nodes = page.evaluate(SETUP_JS, {'records': args.records, 'tiles': args.tiles})
+        result = page.evaluate(TIMED_JS, {'source': source, 'arg': order_dom.CONTAINER_SELECTORS})
+        timings.append(result['elapsed_ms'])
+        touched = result['touched']
+    print(f"{name:>7}: 中位數 {statistics.median(timings):7.2f} ms，最慢 {max(timings):7.2f} ms"
+          f"（文件 {nodes} 個元素，處理 {touched if touched is not None else '?'} 個節點）")
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='比較訂單展開的全域與限定範圍版本')
+    parser.add_argument('--records', type=int, default=30, help='插入的訂單筆數')
+    parser.add_argument('--tiles', type=int, default=400, help='插入的地圖圖塊數量')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(args=['--no-sandbox', '--disable-dev-shm-usage'])
+        page = browser.new_page()
+        legacy = run_rounds(page, html, 'legacy', LEGACY_EXPAND_JS, args, args.rounds)
+        scoped = run_rounds(page, html, 'scoped', order_dom.EXPAND_JS, args, args.rounds)
+        browser.close()
+
+    if scoped:
+        print(f"限定範圍版本快 {legacy / scoped:.1f} 倍")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+記錄文字解析的微型效能比較
+
+- legacy: 原本逐筆流程的寫法，每個關鍵字清單各自以 `in` 掃描一次文字，
+          擷取欄位時以 f-string 組合正規表示式（依賴 re 模組的內部快取）
+- parser: record_parser.parse_record，預先編譯的正規表示式與一次掃描的關鍵字比對
+
+語料為 fixtures 中的訂單快照與錄下的 API 訂單轉成的記錄文字，
+兩種做法的結果必須完全相同才會輸出耗時。
+
+使用方式：
+    python3 bench_record_parser.py --repeat 200
+"""
+
+import argparse
+import json
+import re
+import sys
+import timeit
+
+import record_parser
+import snapshot_parser
+
+SNAPSHOT_FIXTURE = 'fixtures/order_snapshot_20250623_001000.html'
+ORDERS_FIXTURE = 'fixtures/dispatch_orders.json'
+
+STATE_WORDS = ['媒合中', '成立', '派車', '執行', '完成', '取消']
+STATE_CLASSES = ['accept', 'established', 'dispatch', 'implement', 'finish', 'cancel']
+PLACE_TAGS = {'0': '住家', '1': '醫療機構', '2': '長照機構'}
+
+
+def legacy_parse_record(text, classes=''):
+    """原本的判定與擷取寫法（作為比較基準與正確性對照）"""
+    if any(keyword in text for keyword in ['媒合中', '成立', '取消', '已取消', '待確認', '等待中']):
+        is_dispatch = False
+    elif any(cls in classes for cls in ['accept', 'established', 'cancel', 'waiting']):
+        is_dispatch = False
+    elif any(cls in classes for cls in ['dispatch', 'implement', 'finish']):
+        is_dispatch = True
+    else:
+        is_dispatch = any(keyword in text for keyword in ['派車', '執行', '完成', '已派車', '指派司機', '車號'])
+
+    if '派車' in text or 'dispatch' in classes:
+        status = '已派車'
+    elif '執行' in text or 'implement' in classes:
+        status = '執行中'
+    elif '完成' in text or 'finish' in classes:
+        status = '已完成'
+    else:
+        status = '派車相關'
+
+    parsed = {
+        'is_dispatch': is_dispatch,
+        'status': status,
+        'has_driver_info': any(keyword in text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話', '駕駛']),
+        'assigned': any(keyword in text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話']),
+        'date': 'N/A',
+        'time': 'N/A',
+        'vehicle': 'N/A',
+        'driver': 'N/A',
+        'contact': 'N/A',
+    }
+
+    match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})\s+(\d{1,2}:\d{2})', text)
+    if match:
+        parsed['date'], parsed['time'] = match.group(1).replace('/', '-'), match.group(2)
+    else:
+        match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})', text)
+        if match:
+            parsed['date'] = match.group(1).replace('/', '-')
+
+    for pattern in ['車號', '車牌', '車輛']:
+        match = re.search(f'{pattern}[：:]\\s*([A-Z0-9\\-]+)', text)
+        if match:
+            parsed['vehicle'] = match.group(1)
+            break
+    for pattern in ['司機', '駕駛', '指派司機']:
+        match = re.search(f'{pattern}[：:]\\s*([^\\s\\n]+)', text)
+        if match:
+            parsed['driver'] = match.group(1)
+            break
+    match = re.search(r'(\d{2,4}-?\d{6,8}|\d{10})', text)
+    if match:
+        parsed['contact'] = match.group(1)
+    return parsed
+
+
+def parser_parse_record(text, classes=''):
+    parsed = record_parser.parse_record(text, classes)
+    parsed['assigned'] = record_parser.is_assigned(parsed.pop('keywords'))
+    return parsed
+
+
+def _place(place):
+    return ' '.join(part for part in [PLACE_TAGS.get(str(place.get('Tag')), ''), place.get('Address') or ''] if part)
+
+
+def build_corpus():
+    """回傳 [(text, classes)]"""
+    corpus = []
+    with open(SNAPSHOT_FIXTURE, 'r', encoding='utf-8') as f:
+        _, raw_records = snapshot_parser.parse_snapshot(f.read())
+    for raw in raw_records:
+        corpus.append((f"{raw['text']}\n{raw['detail']}", raw['classes']))
+
+    with open(ORDERS_FIXTURE, 'r', encoding='utf-8') as f:
+        orders = json.load(f)['orders']
+    for order in orders:
+        status = order['Status']
+        lines = [STATE_WORDS[status], order['RideTime'].replace('T', ' ')[:16].replace('-', '/'),
+                 _place(order['PickUp']), _place(order['DropOff'])]
+        if order.get('DriverName'):
+            lines += [f"指派司機: {order['DriverName']}({order['DriverPhone']})", f"車號: {order['LicensePlateNumber']}"]
+        corpus.append(('\n'.join(lines), f"order_list log {STATE_CLASSES[status]}"))
+        # 沒有 CSS 類別、只靠文字判定的版本
+        corpus.append(('\n'.join(lines), ''))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='記錄文字解析的微型效能比較')
+    parser.add_argument('--repeat', type=int, default=200, help='整個語料重複解析的次數')
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus()
+    for text, classes in corpus:
+        expected = legacy_parse_record(text, classes)
+        actual = parser_parse_record(text, classes)
+        if expected != actual:
+            print(f"❌ 結果不同:\n{text}\nlegacy: {expected}\nparser: {actual}")
+            return 1
+
+    results = {}
+    for name, func in [('legacy', legacy_parse_record), ('parser', parser_parse_record)]:
+        seconds = min(timeit.repeat(lambda: [func(text, classes) for text, classes in corpus],
+                                    number=args.repeat, repeat=5))
+        results[name] = seconds / (args.repeat * len(corpus)) * 1e6
+        print(f"{name:>6}: 每筆 {results[name]:.2f} µs（{len(corpus)} 筆 × {args.repeat} 次）")
+    print(f"parser 為 legacy 的 {results['legacy'] / results['parser']:.2f} 倍速")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
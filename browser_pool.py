@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+常駐瀏覽器池
+
+由 Flask 服務持有，讓 Chromium 在多次任務之間保持啟動狀態，
+每個任務只取得一個全新的 BrowserContext，避免每次冷啟動 Playwright。
+
+Playwright 同步 API 綁定在建立它的執行緒上，因此每個瀏覽器（BROWSER_POOL_SIZE 個）
+各有一條專屬工作執行緒與自己的 Playwright 實例。需要瀏覽器的任務透過 run() 丟進共用的
+佇列，由閒置的工作執行緒取出，在該執行緒的瀏覽器上執行；最多同時執行 BROWSER_POOL_SIZE 個任務。
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright
+
+
+class _BrowserSlot:
+    """瀏覽器池中的單一瀏覽器實例"""
+
+    def __init__(self, index):
+        self.index = index
+        self.playwright = None
+        self.worker = None
+        self.browser = None
+        self.busy = False
+        self.uses = 0
+        self.active = 0
+        self.launched_at = None
+        self.last_released = None
+
+
+class BrowserPool:
+    """行程層級的 Chromium 瀏覽器池"""
+
+    def __init__(self, launch_browser, build_driver, size=1, max_uses=20, context_options=None):
+        # launch_browser(playwright) -> Browser
+        # build_driver(page, context, browser, playwright) -> driver 字典
+        self._launch_browser = launch_browser
+        self._build_driver = build_driver
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.context_options = context_options or {}
+
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        self._jobs = queue.Queue()
+        self._local = threading.local()
+        self._warm = False
+        self._lock = threading.Lock()
+        self._created_at = time.time()
+
+        self._stats = {
+            'launch_count': 0,
+            'reuse_count': 0,
+            'recycle_count': 0,
+            'crash_count': 0,
+            'jobs_completed': 0,
+            'jobs_failed': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # 工作執行緒
+    # ------------------------------------------------------------------
+
+    def _ensure_workers(self):
+        with self._lock:
+            for slot in self._slots:
+                if slot.worker is None or not slot.worker.is_alive():
+                    slot.worker = threading.Thread(target=self._worker_loop, args=(slot,),
+                                                   name=f'browser-pool-{slot.index}', daemon=True)
+                    slot.worker.start()
+
+    def _worker_loop(self, slot):
+        self._local.slot = slot
+        if self._warm:
+            try:
+                self._ensure_browser(slot)
+            except Exception as e:
+                print(f"⚠️ 瀏覽器池：瀏覽器 #{slot.index} 預先啟動失敗: {e}")
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            slot.busy = True
+            try:
+                result = func(*args, **kwargs)
+                future.set_result(result)
+                self._bump('jobs_completed')
+            except BaseException as e:
+                future.set_exception(e)
+                self._bump('jobs_failed')
+            finally:
+                slot.busy = False
+        self._shutdown_slot(slot)
+
+    def _current_slot(self):
+        return getattr(self._local, 'slot', None)
+
+    def in_worker(self):
+        """目前是否在瀏覽器池的工作執行緒上"""
+        return self._current_slot() is not None
+
+    def submit(self, func, *args, **kwargs):
+        """將任務丟進佇列，由閒置的工作執行緒執行，回傳 Future"""
+        self._ensure_workers()
+        future = Future()
+        self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """在工作執行緒上執行任務並等待結果"""
+        if self.in_worker():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def warm_up(self):
+        """預先啟動所有工作執行緒與瀏覽器，讓第一個任務不必等待冷啟動
+
+        每條工作執行緒在取任務之前先啟動自己的瀏覽器（只對尚未啟動的工作執行緒有效）。
+        """
+        self._warm = True
+        self._ensure_workers()
+
+    # ------------------------------------------------------------------
+    # 瀏覽器與上下文管理（僅能在工作執行緒上呼叫）
+    # ------------------------------------------------------------------
+
+    def _ensure_playwright(self, slot):
+        if slot.playwright is None:
+            print(f"🚀 瀏覽器池：工作執行緒 #{slot.index} 啟動 Playwright")
+            slot.playwright = sync_playwright().start()
+        return slot.playwright
+
+    def _ensure_browser(self, slot):
+        if slot.browser is not None and slot.browser.is_connected():
+            return False
+        if slot.browser is not None:
+            # 瀏覽器已斷線（崩潰），丟棄後重新啟動
+            print(f"⚠️ 瀏覽器池：瀏覽器 #{slot.index} 已斷線，重新啟動")
+            self._bump('crash_count')
+            self._close_browser(slot)
+        playwright = self._ensure_playwright(slot)
+        slot.browser = self._launch_browser(playwright)
+        slot.uses = 0
+        slot.launched_at = time.time()
+        self._bump('launch_count')
+        print(f"✅ 瀏覽器池：瀏覽器 #{slot.index} 啟動完成")
+        return True
+
+    def get_playwright(self):
+        """取得目前工作執行緒的 Playwright 實例（持久化設定檔模式使用）"""
+        if not self.in_worker():
+            raise RuntimeError("BrowserPool.get_playwright() 只能在瀏覽器池工作執行緒上呼叫")
+        return self._ensure_playwright(self._current_slot())
+
+    def acquire(self):
+        """從目前工作執行緒的瀏覽器取得一個全新的 BrowserContext，回傳 driver 字典"""
+        if not self.in_worker():
+            raise RuntimeError("BrowserPool.acquire() 只能在瀏覽器池工作執行緒上呼叫")
+
+        slot = self._current_slot()
+        launched = self._ensure_browser(slot)
+        if not launched:
+            self._bump('reuse_count')
+
+        try:
+            context = slot.browser.new_context(**self.context_options)
+            page = context.new_page()
+        except Exception as e:
+            # 建立上下文失敗通常代表瀏覽器已經不可用，回收後重試一次
+            print(f"⚠️ 瀏覽器池：建立上下文失敗，回收瀏覽器 #{slot.index}: {e}")
+            self._bump('crash_count')
+            self._recycle(slot)
+            self._ensure_browser(slot)
+            context = slot.browser.new_context(**self.context_options)
+            page = context.new_page()
+
+        slot.active += 1
+        driver = self._build_driver(page, context, slot.browser, slot.playwright)
+        driver['pool'] = self
+        driver['pool_slot'] = slot.index
+        return driver
+
+    def release(self, driver, crashed=False):
+        """歸還 driver：關閉上下文，視情況回收瀏覽器"""
+        slot = self._slots[driver['pool_slot']]
+        slot.active = max(0, slot.active - 1)
+        slot.uses += 1
+        slot.last_released = time.time()
+
+        try:
+            driver['context'].close()
+        except Exception as e:
+            print(f"⚠️ 瀏覽器池：關閉上下文失敗，視為瀏覽器崩潰: {e}")
+            crashed = True
+
+        if slot.browser is None:
+            return
+        if crashed or not slot.browser.is_connected():
+            self._bump('crash_count')
+            self._recycle(slot)
+        elif slot.uses >= self.max_uses and slot.active == 0:
+            print(f"♻️ 瀏覽器池：瀏覽器 #{slot.index} 已使用 {slot.uses} 次，回收")
+            self._recycle(slot)
+
+    def _recycle(self, slot):
+        self._close_browser(slot)
+        self._bump('recycle_count')
+
+    def _close_browser(self, slot):
+        try:
+            if slot.browser is not None:
+                slot.browser.close()
+        except Exception:
+            pass
+        slot.browser = None
+        slot.uses = 0
+        slot.active = 0
+
+    def _shutdown_slot(self, slot):
+        self._close_browser(slot)
+        if slot.playwright is not None:
+            try:
+                slot.playwright.stop()
+            except Exception:
+                pass
+            slot.playwright = None
+
+    def shutdown(self):
+        """停止所有工作執行緒並關閉所有瀏覽器"""
+        workers = [slot.worker for slot in self._slots if slot.worker is not None and slot.worker.is_alive()]
+        for _ in workers:
+            self._jobs.put(None)
+        for worker in workers:
+            worker.join(timeout=30)
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        """瀏覽器池統計資訊（啟動次數、重用次數、閒置時間等）"""
+        now = time.time()
+        slots = []
+        for slot in self._slots:
+            alive = slot.browser is not None and slot.browser.is_connected()
+            idle_since = slot.last_released or slot.launched_at
+            slots.append({
+                'index': slot.index,
+                'alive': alive,
+                'busy': slot.busy,
+                'uses': slot.uses,
+                'active_contexts': slot.active,
+                'uptime_seconds': round(now - slot.launched_at, 1) if alive and slot.launched_at else 0,
+                'idle_seconds': round(now - idle_since, 1) if alive and idle_since and slot.active == 0 else 0,
+            })
+        with self._lock:
+            data = dict(self._stats)
+        data.update({
+            'size': self.size,
+            'max_uses': self.max_uses,
+            'pending_jobs': self._jobs.qsize(),
+            'browsers_alive': sum(1 for s in slots if s['alive']),
+            'busy_workers': sum(1 for s in slots if s['busy']),
+            'pool_age_seconds': round(now - self._created_at, 1),
+            'slots': slots,
+        })
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def create_browser_pool(launch_browser, build_driver, context_options=None):
+    """建立行程層級的瀏覽器池（由 app.py 在載入時呼叫一次）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                launch_browser,
+                build_driver,
+                size=int(os.environ.get('BROWSER_POOL_SIZE', 1)),
+                max_uses=int(os.environ.get('BROWSER_POOL_MAX_USES', 20)),
+                context_options=context_options,
+            )
+        return _pool
+
+
+def get_browser_pool():
+    """取得行程層級的瀏覽器池，尚未建立時回傳 None"""
+    return _pool
@@ -6,10 +6,13 @@ Zeabur Cron Job 排程腳本 - 派車結果查詢
 使用方式：
 - 在 zeabur.toml 中設定 cron job
 - 此腳本會直接調用派車結果查詢功能，無需 HTTP 請求
+- 加上 --engine async 使用非同步引擎，--accounts all 可多帳號並行查詢
+- 加上 --mode http 不開瀏覽器，直接呼叫網站 API 查詢
 """
 
 import sys
 import os
+import argparse
 import logging
 from datetime import datetime
 import pytz
@@ -27,8 +30,20 @@ logging.basicConfig(
     ]
 )
 
-def main():
+def parse_args(argv=None):
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='排程派車結果查詢')
+    parser.add_argument('--engine', choices=['sync', 'async'], default=os.environ.get('FLOW_ENGINE', 'sync'),
+                        help='流程引擎（預設: 環境變數 FLOW_ENGINE 或 sync）')
+    parser.add_argument('--mode', choices=['browser', 'http'], default=os.environ.get('DISPATCH_MODE', 'browser'),
+                        help='查詢方式（預設: 環境變數 DISPATCH_MODE 或 browser）')
+    parser.add_argument('--accounts', default=None,
+                        help='非同步引擎或 HTTP 模式要查詢的帳號：all 或以逗號分隔的身分證字號（預設: 預設帳號）')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """主要執行函數"""
+    args = parse_args(argv)
     try:
         # 使用台北時區記錄時間
         taipei_tz = pytz.timezone('Asia/Taipei')
@@ -37,11 +52,44 @@ def main():
         logging.info("=== 開始執行排程派車結果查詢 ===")
         logging.info(f"執行時間: {current_time.strftime('%Y-%m-%d %H:%M:%S')} (台北時區)")
         
-        # 導入 app.py 中的派車結果查詢函數
-        from app import fetch_dispatch_results
-        
-        # 執行派車結果查詢
-        result = fetch_dispatch_results()
+        if args.mode == 'http':
+            # 不開瀏覽器：以 HTTP 呼叫網站 API
+            from accounts import get_account
+            from dispatch_http import fetch_dispatch_results
+            
+            account_ids = [get_account()['id']]
+            if args.accounts == 'all':
+                from accounts import load_accounts
+                account_ids = [account['id'] for account in load_accounts()]
+            elif args.accounts:
+                account_ids = args.accounts.split(',')
+            
+            for account_id in account_ids:
+                account_result = fetch_dispatch_results(get_account(account_id))
+                logging.info(f"帳號 {account_id}: {account_result.get('message') or account_result.get('error')}")
+            result = account_result
+        elif args.engine == 'async':
+            # 非同步引擎：多個帳號共用一個瀏覽器並行查詢
+            from app import async_engine
+            from async_engine import dispatch_queries
+            
+            account_ids = None
+            if args.accounts and args.accounts != 'all':
+                account_ids = args.accounts.split(',')
+            elif not args.accounts:
+                from accounts import get_account
+                account_ids = [get_account()['id']]
+            
+            result = async_engine.run(dispatch_queries, account_ids)
+            for account_id, account_result in result['accounts'].items():
+                logging.info(f"帳號 {account_id}: {account_result.get('message') or account_result.get('error')}")
+            async_engine.shutdown()
+        else:
+            # 導入 app.py 中的派車結果查詢函數
+            from app import fetch_dispatch_results
+            
+            # 執行派車結果查詢
+            result = fetch_dispatch_results()
         
         if result:
             logging.info("✅ 排程派車結果查詢執行成功")
@@ -6,10 +6,14 @@ Zeabur Cron Job 排程腳本
 使用方式：
 - 在 zeabur.toml 中設定 cron job
 - 此腳本會直接調用預約功能，無需 HTTP 請求
+- 加上 --prearm 啟用預先就緒模式：提前啟動瀏覽器並登入，
+  先填好與日期無關的欄位，於 --submit-at 指定的時刻（台北時間）設定日期並送出；多趟預約時其餘各趟接著依序送出
 """
 
 import sys
 import os
+import time
+import argparse
 import logging
 from datetime import datetime
 
@@ -26,17 +30,49 @@ logging.basicConfig(
     ]
 )
 
-def main():
+def parse_args(argv=None):
+    """解析命令列參數"""
+    import prearm
+    
+    parser = argparse.ArgumentParser(description='排程預約')
+    parser.add_argument('--prearm', action='store_true',
+                        help='預先就緒模式：提前完成表單，於指定時刻送出')
+    parser.add_argument('--submit-at', default=prearm.default_submit_at(),
+                        help='送出時間，台北時間 HH:MM[:SS] 或 ISO 格式（預設: 環境變數 RESERVATION_SUBMIT_AT 或 00:01:00）')
+    parser.add_argument('--prearm-minutes', type=float, default=prearm.prearm_minutes(),
+                        help='提前幾分鐘開始準備（預設: 環境變數 PREARM_MINUTES 或 5）')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """主要執行函數"""
+    args = parse_args(argv)
     try:
         logging.info("=== 開始執行排程預約 ===")
         logging.info(f"執行時間: {datetime.now()}")
         
+        import prearm
+        submit_at = None
+        if args.prearm:
+            submit_at = prearm.parse_submit_at(args.submit_at)
+            logging.info(f"預先就緒模式：送出時間 {submit_at.strftime('%Y-%m-%d %H:%M:%S')} (台北時區)")
+            
+            # 排程可能比需要的更早觸發，等到送出前 N 分鐘才開始準備
+            lead_seconds = prearm.seconds_until(submit_at) - args.prearm_minutes * 60
+            if lead_seconds > 0:
+                logging.info(f"距離開始準備還有 {lead_seconds:.0f} 秒，先行等待")
+                time.sleep(lead_seconds)
+        
         # 導入 app.py 中的預約函數
         from app import make_reservation
         
         # 執行預約
-        result = make_reservation()
+        result = make_reservation(submit_at=submit_at)
+        
+        if prearm.last_report:
+            report = prearm.last_report
+            logging.info(f"放號時刻誤差: {report['drift_ms']} ms（目標 {report['target']}，實際 {report['fired_at']}）")
+            if report['submit_drift_ms'] is not None:
+                logging.info(f"送出時間誤差: {report['submit_drift_ms']} ms（點擊送出預約於 {report['submitted_at']}）")
         
         if result:
             logging.info("✅ 排程預約執行成功")
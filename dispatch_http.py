@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+不開瀏覽器的派車查詢
+
+派車查詢只需要讀取資料，卻要啟動整個 Chromium（約 300 MB、30 秒以上）。
+這裡直接呼叫網站的 /api/v1 後端（與網頁相同的 API，見 web-source-code/index-949f5202.js）：
+- POST Account/SignIn                      （登入，Data.TokenInfo.Token）
+- GET  Order?Perpage=&CurrentPage=         （訂單查詢，Data.Records + Data.Pagination）
+- GET  Order/{Id}                          （訂單明細，網頁展開訂單時才載入司機與車號）
+
+連線以共用的 requests.Session（keep-alive 連線池）發送。token 優先使用
+登入快取（session_cache）或本行程先前取得的 token，失效（401）時才重新登入。
+結果結構與 fetch_dispatch_results() 相同，派車判定沿用 order_capture。
+
+離線測試與效能比較可改用 dispatch_stub_server.py 重播錄下的 API 回應：
+    python3 dispatch_stub_server.py --port 8765 &
+    python3 dispatch_http.py --api-base http://127.0.0.1:8765/api/v1 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytz
+import requests
+from requests.adapters import HTTPAdapter
+
+import dispatch_records
+import dispatch_store
+import dispatch_sync
+import order_capture
+import session_cache
+from accounts import get_account
+
+API_BASE = os.environ.get('DISPATCH_API_BASE', session_cache.API_BASE)
+
+# 每頁筆數：網頁固定 5 筆，直接呼叫時一次取較多以減少請求數
+PER_PAGE = int(os.environ.get('DISPATCH_HTTP_PERPAGE', 50))
+
+# 連線池大小（同一主機的 keep-alive 連線數）
+POOL_SIZE = 4
+
+REQUEST_TIMEOUT = 15
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+_sessions = {}
+_tokens = {}
+_lock = threading.Lock()
+
+
+class DispatchHttpError(Exception):
+    """API 回應不是預期的格式或登入失敗"""
+
+
+def get_session(api_base=None):
+    """取得 api_base 共用的 requests.Session（同一行程內重複使用連線）"""
+    api_base = api_base or API_BASE
+    with _lock:
+        session = _sessions.get(api_base)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept': 'application/json', 'Content-Type': 'application/json'})
+            _sessions[api_base] = session
+        return session
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _data(response, name):
+    """檢查回應並取出 Data"""
+    if response.status_code != 200:
+        raise DispatchHttpError(f"{name} 失敗: HTTP {response.status_code}")
+    try:
+        payload = response.json()
+    except ValueError:
+        raise DispatchHttpError(f"{name} 回應不是 JSON")
+    if not payload.get('Success', True):
+        raise DispatchHttpError(f"{name} 失敗: {payload.get('Message')}")
+    return payload.get('Data')
+
+
+def sign_in(account, api_base=None):
+    """以帳號密碼登入，回傳 token"""
+    api_base = api_base or API_BASE
+    response = get_session(api_base).post(
+        f"{api_base}/Account/SignIn",
+        json={'Account': account['id'].upper(), 'Password': account['password']},
+        timeout=REQUEST_TIMEOUT
+    )
+    data = _data(response, '登入') or {}
+    token = (data.get('TokenInfo') or {}).get('Token')
+    if not token:
+        raise DispatchHttpError("登入回應中沒有 token")
+    print(f"🔐 帳號 {account['id']} 已透過 API 登入")
+    return token
+
+
+def _cached_token(account_id):
+    """本行程先前取得的 token，其次為瀏覽器流程保存的登入快取"""
+    if account_id in _tokens:
+        return _tokens[account_id], '行程內'
+    data = session_cache.load_session(account_id)
+    token_info = (data or {}).get('token_info') or {}
+    if token_info.get('Token'):
+        return token_info['Token'], '登入快取'
+    return None, None
+
+
+def _get(api_base, path, token, params=None):
+    return get_session(api_base).get(
+        f"{api_base}/{path}",
+        params=params,
+        headers={'Authorization': f"Bearer {token}"},
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+def _order_page(api_base, token, page):
+    response = _get(api_base, 'Order', token, {'Perpage': PER_PAGE, 'CurrentPage': page})
+    if response.status_code == 401:
+        return None
+    data = _data(response, '訂單查詢')
+    if not isinstance(data, dict) or 'Records' not in data:
+        raise DispatchHttpError("訂單查詢回應缺少 Records")
+    return data
+
+
+def fetch_orders(account, api_base=None):
+    """取得帳號的所有訂單（逐頁），回傳 (token, 訂單列表)"""
+    api_base = api_base or API_BASE
+    token, source = _cached_token(account['id'])
+    data = _order_page(api_base, token, 1) if token else None
+    if data is None:
+        if token:
+            print(f"⚠️ {source}的 token 已失效，重新登入")
+        token = sign_in(account, api_base)
+        data = _order_page(api_base, token, 1)
+        if data is None:
+            raise DispatchHttpError("登入後仍無法取得訂單（401）")
+    else:
+        print(f"✅ 使用{source}的 token")
+    _tokens[account['id']] = token
+
+    orders = list(data.get('Records') or [])
+    total_pages = (data.get('Pagination') or {}).get('TotalPage') or 1
+    for page in range(2, total_pages + 1):
+        page_data = _order_page(api_base, token, page)
+        if page_data is None:
+            raise DispatchHttpError(f"第 {page} 頁訂單查詢失敗（401）")
+        orders.extend(page_data.get('Records') or [])
+    return token, orders
+
+
+def merge_details(orders, token, api_base=None):
+    """已派車的訂單補上明細（司機、車號），與網頁展開訂單時相同"""
+    api_base = api_base or API_BASE
+    for order in orders:
+        if order.get('Status') != order_capture.DISPATCH_STATUS:
+            continue
+        try:
+            detail = _data(_get(api_base, f"Order/{order['Id']}", token, {'id': order['Id']}), '訂單明細')
+            if isinstance(detail, dict):
+                order.update(detail)
+        except (DispatchHttpError, requests.RequestException) as e:
+            print(f"⚠️ 訂單 {order.get('Id')} 明細取得失敗: {e}")
+    return orders
+
+
+def fetch_dispatch_results(account=None, api_base=None, save=True):
+    """以 HTTP 取得派車結果，回傳與 app.fetch_dispatch_results 相同結構的結果"""
+    account = account or get_account()
+    current_time = datetime.now(TAIPEI_TZ)
+    started = time.perf_counter()
+    print(f"[{current_time.strftime('%Y-%m-%d %H:%M:%S')}] 開始以 HTTP 取得派車結果")
+
+    try:
+        token, orders = fetch_orders(account, api_base)
+        merge_details(orders, token, api_base)
+        dispatch_results = order_capture.classify_orders(orders)
+        for record_info in dispatch_results:
+            print(f"  - 第 {record_info['index']} 筆為派車記錄: {record_info['status']} {record_info['date']} {record_info['time']}")
+
+        results_data = dispatch_records.build_results(len(orders), dispatch_results, current_time)
+        results_data['source'] = 'http'
+        if save:
+            dispatch_sync.sync_results(results_data, account['id'], order_capture.order_statuses(orders))
+            dispatch_records.save_results(results_data, f"dispatch_results_{account['id']}.json")
+            if account['id'] == get_account()['id']:
+                dispatch_records.save_results(results_data)
+            dispatch_store.record_run(results_data, account['id'])
+
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"派車結果分析完成（來源: http，{elapsed:.0f} ms）- 找到 {len(dispatch_results)} 筆已派車記錄")
+        return {
+            'success': True,
+            'data': results_data,
+            'source': 'http',
+            'delta': results_data.get('delta'),
+            'message': f'成功分析 {len(orders)} 筆記錄，找到 {len(dispatch_results)} 筆已派車記錄'
+        }
+
+    except (DispatchHttpError, requests.RequestException) as e:
+        error_msg = f"取得派車結果時發生錯誤: {str(e)}"
+        print(f"❌ {error_msg}")
+        return {'success': False, 'error': error_msg}
+
+
+def record_fixture(path, account=None, api_base=None):
+    """把目前的訂單（含明細）寫成 dispatch_stub_server.py 可重播的檔案"""
+    account = account or get_account()
+    token, orders = fetch_orders(account, api_base)
+    merge_details(orders, token, api_base)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'recorded_at': datetime.now(TAIPEI_TZ).isoformat(), 'orders': orders}, f, ensure_ascii=False, indent=2)
+    print(f"💾 已錄下 {len(orders)} 筆訂單: {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='不開瀏覽器的派車查詢')
+    parser.add_argument('--api-base', default=API_BASE, help=f'API 位址（預設: {API_BASE}）')
+    parser.add_argument('--account', default=None, help='身分證字號（預設: 預設帳號）')
+    parser.add_argument('--repeat', type=int, default=1, help='重複查詢次數，用於比較耗時')
+    parser.add_argument('--record', default=None, help='把訂單錄成重播用的檔案')
+    args = parser.parse_args(argv)
+
+    account = get_account(args.account)
+    if args.record:
+        record_fixture(args.record, account, args.api_base)
+        return 0
+
+    timings = []
+    result = None
+    for _ in range(max(1, args.repeat)):
+        started = time.perf_counter()
+        result = fetch_dispatch_results(account, args.api_base, save=args.repeat == 1)
+        timings.append((time.perf_counter() - started) * 1000)
+        if not result['success']:
+            break
+
+    if len(timings) > 1:
+        timings.sort()
+        print(f"⏱️ {len(timings)} 次查詢：最快 {timings[0]:.1f} ms，中位數 {timings[len(timings) // 2]:.1f} ms，"
+              f"最慢 {timings[-1]:.1f} ms")
+    print(result.get('message') or result.get('error'))
+    return 0 if result['success'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+派車查詢結果的組成與保存
+
+同步流程、非同步引擎、HTTP 查詢與快照解析共用的結果格式（dispatch_results.json）。
+派車判定與欄位擷取在 order_dom.classify_orders，規則本身在 record_parser。
+"""
+
+import json
+from datetime import datetime
+
+import pytz
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+RESULTS_FILE = 'dispatch_results.json'
+
+
+def build_results(total_records, dispatch_results, current_time=None):
+    """組成與 fetch_dispatch_results 相同的結果資料"""
+    current_time = current_time or datetime.now(TAIPEI_TZ)
+    return {
+        'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_records': total_records,
+        'dispatch_records': len(dispatch_results),
+        'results': dispatch_results
+    }
+
+
+def save_results(results_data, results_file=RESULTS_FILE):
+    """保存結果到檔案"""
+    try:
+        with open(results_file, 'w', encoding='utf-8') as f:
+            json.dump(results_data, f, ensure_ascii=False, indent=2)
+        print(f"結果已保存到 {results_file}")
+    except Exception as e:
+        print(f"保存結果檔案時發生錯誤: {str(e)}")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+派車查詢歷史（SQLite）
+
+每次派車查詢與其中每筆派車記錄都寫進內嵌的 SQLite（WAL 模式，讀取不會被寫入擋住）：
+- runs:    每次查詢（帳號、時間、來源、總筆數、派車筆數）
+- records: 每次查詢中的派車記錄，依日期、狀態、帳號建立索引
+
+查詢 API：
+- latest_run(account)                      最近一次查詢與其派車記錄
+- latest_per_order(account, date_from, date_to, status)
+                                           每筆訂單最近一次的記錄（API 與 DOM/快照來源的同一筆訂單
+                                           以訂單編號合併，見 _order_keys）
+- status_counts(account, date_from, date_to)
+                                           上述記錄依狀態的筆數
+
+/latest-dispatch、/dispatch-result-file 由這裡的查詢產生，不再整份讀取結果檔。
+
+使用方式（把既有的 dispatch_results*.json 匯入歷史）：
+    python3 dispatch_store.py --import dispatch_results.json dispatch_results_A123456789.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import dispatch_sync
+from accounts import get_account
+
+DB_FILE = os.environ.get('DISPATCH_DB_FILE', 'dispatch_history.db')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    source TEXT,
+    total_records INTEGER,
+    dispatch_records INTEGER
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    account TEXT NOT NULL,
+    order_key TEXT NOT NULL,
+    order_id INTEGER,
+    date TEXT,
+    time TEXT,
+    status TEXT,
+    route TEXT,
+    vehicle TEXT,
+    driver TEXT,
+    contact TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_account ON runs(account, id);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records(date, time);
+CREATE INDEX IF NOT EXISTS idx_records_status ON records(status);
+CREATE INDEX IF NOT EXISTS idx_records_account_order ON records(account, order_key, run_id);
+'''
+
+RECORD_COLUMNS = ('order_id', 'date', 'time', 'status', 'route', 'vehicle', 'driver', 'contact')
+
+# 每個執行緒各自一個連線（Flask 以多執行緒處理請求）
+_local = threading.local()
+
+
+def connect():
+    """取得目前執行緒的連線，第一次連線時建立資料表與索引"""
+    path = os.path.abspath(DB_FILE)
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == path:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def close():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def _order_keys(conn, account_id, records):
+    """每筆記錄的 (識別鍵, 訂單編號)
+
+    API 記錄有訂單編號（id:<Id>），DOM/快照記錄只有內容雜湊（h:<hash>）。
+    沒有編號的記錄沿用同一帳號先前以編號記錄過、日期時間路線相同的訂單；
+    有編號的記錄則把先前以內容雜湊記錄的同一筆訂單改成編號，
+    讓同一筆訂單不論來源都只有一個識別鍵。
+    """
+    known = {}
+    dates = sorted({record.get('date') for record in records if record.get('order_id') is None} - {None})
+    if dates:
+        rows = conn.execute(
+            'SELECT order_key, order_id, date, time, route FROM records WHERE account = ? AND order_id IS NOT NULL '
+            f"AND date IN ({', '.join('?' * len(dates))}) ORDER BY run_id", [account_id] + dates)
+        for row in rows:
+            known[dispatch_sync.content_key(dict(row))] = (row['order_key'], row['order_id'])
+
+    keys = []
+    for record in records:
+        content_key = dispatch_sync.content_key(record)
+        if record.get('order_id') is None:
+            keys.append(known.get(content_key, (content_key, None)))
+            continue
+        key = dispatch_sync.order_key(record)
+        conn.execute('UPDATE records SET order_key = ?, order_id = ? WHERE account = ? AND order_key = ?',
+                     (key, record['order_id'], account_id, content_key))
+        keys.append((key, record['order_id']))
+    return keys
+
+
+def record_run(results_data, account_id):
+    """寫入一次查詢與其派車記錄，回傳 run id（寫入失敗時只印出錯誤並回傳 None）"""
+    try:
+        conn = connect()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO runs (account, timestamp, source, total_records, dispatch_records) VALUES (?, ?, ?, ?, ?)',
+                (account_id, results_data.get('timestamp'), results_data.get('source'),
+                 results_data.get('total_records'), results_data.get('dispatch_records')))
+            run_id = cursor.lastrowid
+            records = results_data.get('results') or []
+            conn.executemany(
+                'INSERT INTO records (run_id, account, order_key, order_id, date, time, status, route, vehicle, '
+                'driver, contact, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, account_id) + key
+                 + tuple(record.get(column) for column in RECORD_COLUMNS[1:])
+                 + (json.dumps(record, ensure_ascii=False),)
+                 for record, key in zip(records, _order_keys(conn, account_id, records))])
+        return run_id
+    except sqlite3.Error as e:
+        print(f"寫入派車歷史失敗: {e}")
+        return None
+
+
+def _record(row):
+    record = json.loads(row['data'])
+    record['account'] = row['account']
+    record['run_id'] = row['run_id']
+    return record
+
+
+def latest_run(account_id=None):
+    """最近一次查詢（未指定帳號時為所有帳號中最近的一次），附上該次的派車記錄"""
+    conn = connect()
+    if account_id is None:
+        run = conn.execute('SELECT * FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+    else:
+        run = conn.execute('SELECT * FROM runs WHERE account = ? ORDER BY id DESC LIMIT 1', (account_id,)).fetchone()
+    if run is None:
+        return None
+    result = dict(run)
+    rows = conn.execute('SELECT * FROM records WHERE run_id = ? ORDER BY id', (run['id'],)).fetchall()
+    result['results'] = [_record(row) for row in rows]
+    return result
+
+
+def _filters(account_id, date_from, date_to, status=None):
+    clauses, params = [], []
+    if account_id is not None:
+        clauses.append('account = ?')
+        params.append(account_id)
+    if date_from:
+        clauses.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        clauses.append('date <= ?')
+        params.append(date_to)
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def latest_per_order(account_id=None, date_from=None, date_to=None, status=None):
+    """每筆訂單最近一次被查到的記錄（依預約日期、時間排序），日期為 YYYY-MM-DD 的閉區間"""
+    where, params = _filters(account_id, date_from, date_to)
+    sql = ('SELECT r.* FROM records r JOIN ('
+           f'SELECT account, order_key, MAX(run_id) AS run_id FROM records{where} GROUP BY account, order_key'
+           ') latest ON r.account = latest.account AND r.order_key = latest.order_key AND r.run_id = latest.run_id')
+    if status:
+        sql += ' WHERE r.status = ?'
+        params.append(status)
+    sql += ' ORDER BY r.date, r.time, r.account'
+    return [_record(row) for row in connect().execute(sql, params).fetchall()]
+
+
+def status_counts(account_id=None, date_from=None, date_to=None):
+    """每筆訂單最近一次記錄的狀態筆數，{狀態: 筆數}"""
+    where, params = _filters(account_id, date_from, date_to)
+    sql = ('SELECT r.status, COUNT(*) AS count FROM records r JOIN ('
+           f'SELECT account, order_key, MAX(run_id) AS run_id FROM records{where} GROUP BY account, order_key'
+           ') latest ON r.account = latest.account AND r.order_key = latest.order_key AND r.run_id = latest.run_id'
+           ' GROUP BY r.status ORDER BY count DESC')
+    return {row['status']: row['count'] for row in connect().execute(sql, params).fetchall()}
+
+
+def recent_runs(account_id=None, limit=20):
+    where, params = _filters(account_id, None, None)
+    rows = connect().execute(f'SELECT * FROM runs{where} ORDER BY id DESC LIMIT ?', params + [limit]).fetchall()
+    return [dict(row) for row in rows]
+
+
+def import_files(paths, account_id=None):
+    """把既有的結果檔匯入歷史（檔名 dispatch_results_<帳號>.json 時以檔名的帳號為準）"""
+    imported = 0
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        file_account = name[len('dispatch_results_'):] if name.startswith('dispatch_results_') else None
+        with open(path, 'r', encoding='utf-8') as f:
+            results_data = json.load(f)
+        if record_run(results_data, file_account or account_id or get_account()['id']) is not None:
+            imported += 1
+            print(f"📥 已匯入 {path}（{results_data.get('dispatch_records', 0)} 筆派車記錄）")
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='派車查詢歷史')
+    parser.add_argument('--import', dest='import_paths', nargs='+', default=None, help='匯入既有的結果檔')
+    parser.add_argument('--account', default=None, help='身分證字號（預設: 所有帳號）')
+    parser.add_argument('--from', dest='date_from', default=None, help='起始日期 YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', default=None, help='結束日期 YYYY-MM-DD')
+    args = parser.parse_args(argv)
+
+    if args.import_paths:
+        import_files(args.import_paths, args.account)
+        return 0
+
+    for record in latest_per_order(args.account, args.date_from, args.date_to):
+        print(f"{record['account']} {record['date']} {record['time']} {record['status']} "
+              f"{record.get('route', 'N/A')} {record.get('driver', 'N/A')} {record.get('vehicle', 'N/A')}")
+    print(json.dumps(status_counts(args.account, args.date_from, args.date_to), ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+重播訂單 API 的本機假伺服器
+
+以錄下的訂單（dispatch_http.py --record 產生，預設 fixtures/dispatch_orders.json）
+模擬網站 /api/v1 中派車查詢用到的端點，讓 dispatch_http 可以離線測試與比較耗時：
+- POST /api/v1/Account/SignIn
+- GET  /api/v1/Order?Perpage=&CurrentPage=   （列表不含司機、車號，與網站相同）
+- GET  /api/v1/Order/{Id}
+
+使用方式：
+    python3 dispatch_stub_server.py --port 8765 --latency-ms 80
+"""
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_FIXTURE = 'fixtures/dispatch_orders.json'
+
+STUB_TOKEN = 'stub-token'
+
+# 列表中不提供、要由明細端點取得的欄位
+DETAIL_FIELDS = ['DriverName', 'DriverPhone', 'LicensePlateNumber']
+
+
+def load_fixture(path=DEFAULT_FIXTURE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['orders']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+
+    def _authorized(self):
+        return self.headers.get('Authorization') == f"Bearer {STUB_TOKEN}"
+
+    def do_POST(self):
+        self._delay()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.server.requests.append(('POST', self.path))
+
+        if urlsplit(self.path).path == '/api/v1/Account/SignIn':
+            if not body.get('Account') or not body.get('Password'):
+                self._send(400, {'Success': False, 'Message': '帳號或密碼錯誤'})
+                return
+            self._send(200, {
+                'Success': True,
+                'Message': '登入成功',
+                'Data': {'IsFirstLogin': False, 'TokenInfo': {'Token': STUB_TOKEN, 'RefreshToken': 'stub-refresh'}}
+            })
+            return
+        self._send(404, {'Success': False, 'Message': 'Not Found'})
+
+    def do_GET(self):
+        self._delay()
+        parts = urlsplit(self.path)
+        self.server.requests.append(('GET', self.path))
+        if not self._authorized():
+            self._send(401, {'Success': False, 'Message': 'Unauthorized'})
+            return
+
+        orders = self.server.orders
+        if parts.path == '/api/v1/Order':
+            query = parse_qs(parts.query)
+            per_page = int(query.get('Perpage', ['5'])[0])
+            current = int(query.get('CurrentPage', ['1'])[0])
+            page = orders[(current - 1) * per_page:current * per_page]
+            records = [{k: v for k, v in order.items() if k not in DETAIL_FIELDS} for order in page]
+            self._send(200, {
+                'Success': True,
+                'Data': {
+                    'Records': records,
+                    'Pagination': {'CurrentPage': current, 'TotalPage': max(1, math.ceil(len(orders) / per_page))}
+                }
+            })
+            return
+
+        match = re.match(r'^/api/v1/Order/(\d+)$', parts.path)
+        if match:
+            for order in orders:
+                if str(order['Id']) == match.group(1):
+                    self._send(200, {'Success': True, 'Data': order})
+                    return
+        self._send(404, {'Success': False, 'Message': 'Not Found'})
+
+
+def start_server(orders=None, host='127.0.0.1', port=0, latency_ms=0):
+    """在背景執行緒啟動假伺服器，回傳 (server, api_base)；port 為 0 時自動選擇"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.orders = orders if orders is not None else load_fixture()
+    server.latency_ms = latency_ms
+    server.requests = []
+    threading.Thread(target=server.serve_forever, name='dispatch-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='重播訂單 API 的本機假伺服器')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help=f'錄下的訂單檔（預設: {DEFAULT_FIXTURE}）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=int, default=0, help='每個回應延遲的毫秒數（模擬網路）')
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.orders = load_fixture(args.fixture)
+    server.latency_ms = args.latency_ms
+    server.requests = []
+    print(f"🧪 假伺服器: http://{args.host}:{args.port}/api/v1（{len(server.orders)} 筆訂單）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
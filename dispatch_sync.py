@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+派車結果的增量同步
+
+每次查詢的派車記錄以穩定的訂單識別（API 的訂單編號；DOM/快照沒有編號時
+以日期、時間、路線的雜湊）為鍵，與上次保存的狀態（dispatch_state.json）比對，
+只輸出這次的變化：
+- new:       新出現的派車
+- changed:   同一筆訂單的欄位有變化（例如換了司機、車號）
+- cancelled: 上次還在、這次不見且已取消（或預約時間未到就消失）的派車
+- completed: 上次還在、這次不見且已進入執行/完成（或預約時間已過）的派車
+
+同一筆訂單被多個選擇器重複擷取時，以識別鍵去重。
+下游頁面與通知改讀 /dispatch-delta 的變化，不必處理整份結果。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytz
+
+STATE_FILE = os.environ.get('DISPATCH_STATE_FILE', 'dispatch_state.json')
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+# 不列入變化比較的欄位（位置、樣式會隨頁面改變，訂單編號只有 API 來源才有）
+IGNORED_FIELDS = {'index', 'css_classes', 'order_id'}
+
+CANCELLED_STATUSES = {'取消', '已取消'}
+
+_lock = threading.Lock()
+
+
+def content_key(record):
+    """以日期、時間、路線組成的識別鍵"""
+    identity = '|'.join(str(record.get(field) or '') for field in ('date', 'time', 'route'))
+    return 'h:' + hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+
+
+def order_key(record):
+    """訂單的穩定識別鍵：有訂單編號時使用編號，否則使用內容雜湊"""
+    if record.get('order_id') is not None:
+        return f"id:{record['order_id']}"
+    return content_key(record)
+
+
+def _align(previous, current):
+    """來源不同（API 有編號、快照沒有）時，以內容雜湊對應上次的同一筆訂單"""
+    by_content = {content_key(record): key for key, record in previous.items()}
+    aligned = dict(previous)
+    for key, record in current.items():
+        if key in aligned:
+            continue
+        old_key = by_content.get(content_key(record))
+        if old_key is not None and old_key not in current:
+            aligned[key] = aligned.pop(old_key)
+    return aligned
+
+
+def _comparable(record):
+    return {k: v for k, v in record.items() if k not in IGNORED_FIELDS}
+
+
+def load_state(account_id=None):
+    """讀取保存的狀態（指定帳號時只回傳該帳號）"""
+    state = {}
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"讀取派車同步狀態失敗: {e}")
+    if account_id is None:
+        return state
+    return state.get(account_id) or {'records': {}, 'last_delta': None}
+
+
+def _save_state(state):
+    tmp_path = STATE_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def _removed_reason(key, record, statuses, today):
+    """判斷消失的派車是取消還是已完成"""
+    status = (statuses or {}).get(key)
+    if status is not None:
+        return 'cancelled' if status in CANCELLED_STATUSES else 'completed'
+    # 沒有全部訂單的狀態時，以預約日期判斷：日期未到就消失視為取消
+    date = record.get('date') or ''
+    if date and date != 'N/A' and date < today:
+        return 'completed'
+    return 'cancelled'
+
+
+def diff(previous, current, statuses=None, today=None):
+    """比較上次與這次的派車記錄（皆為 {key: record}），回傳變化"""
+    today = today or datetime.now(TAIPEI_TZ).strftime('%Y-%m-%d')
+    delta = {'new': [], 'changed': [], 'cancelled': [], 'completed': [], 'unchanged': 0}
+
+    for key, record in current.items():
+        old = previous.get(key)
+        if old is None:
+            delta['new'].append({'key': key, 'record': record})
+            continue
+        old_fields, new_fields = _comparable(old), _comparable(record)
+        changes = {field: [old_fields.get(field), new_fields.get(field)]
+                   for field in sorted(set(old_fields) | set(new_fields))
+                   if old_fields.get(field) != new_fields.get(field)}
+        if changes:
+            delta['changed'].append({'key': key, 'record': record, 'changes': changes})
+        else:
+            delta['unchanged'] += 1
+
+    for key, record in previous.items():
+        if key not in current:
+            delta[_removed_reason(key, record, statuses, today)].append({'key': key, 'record': record})
+
+    return delta
+
+
+def summary(delta):
+    return {name: (len(delta[name]) if isinstance(delta[name], list) else delta[name])
+            for name in ('new', 'changed', 'cancelled', 'completed', 'unchanged')}
+
+
+def sync_results(results_data, account_id, statuses=None):
+    """把這次的派車結果同步到保存的狀態，回傳變化（並在 results_data 附上變化摘要）
+
+    statuses: {識別鍵: 狀態文字}，有全部訂單的狀態時（API）用來區分取消與完成
+    """
+    current = {}
+    for record in results_data.get('results') or []:
+        current.setdefault(order_key(record), record)
+    duplicates = len(results_data.get('results') or []) - len(current)
+    if duplicates:
+        results_data['results'] = list(current.values())
+        results_data['dispatch_records'] = len(current)
+
+    with _lock:
+        state = load_state()
+        account_state = state.get(account_id) or {'records': {}}
+        previous = _align(account_state.get('records') or {}, current)
+        delta = diff(previous, current, statuses)
+        delta['timestamp'] = results_data.get('timestamp')
+        delta['source'] = results_data.get('source')
+
+        state[account_id] = {
+            'updated_at': results_data.get('timestamp'),
+            'records': current,
+            'last_delta': delta,
+        }
+        try:
+            _save_state(state)
+        except Exception as e:
+            print(f"保存派車同步狀態失敗: {e}")
+
+    counts = summary(delta)
+    results_data['delta'] = counts
+    print(f"🔁 派車同步: 新增 {counts['new']}、變更 {counts['changed']}、取消 {counts['cancelled']}、"
+          f"完成 {counts['completed']}、未變 {counts['unchanged']}" + (f"（重複記錄 {duplicates} 筆）" if duplicates else ''))
+    return delta
+
+
+def last_delta(account_id):
+    return load_state(account_id).get('last_delta')
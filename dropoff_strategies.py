@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+下車地點「住家」的選擇策略與成績表
+
+原本的流程對住家選單與住家地址各有一串固定順序的方法，前一個失敗才換下一個。
+這裡把每個方法登記為策略，分成兩個階段：
+    home_select   在住家選單中選到「住家」（文字、索引、數字值、value 屬性）
+    home_address  選擇住家後讓下車地址填入（等待自動填入、重新選擇、點擊觸發……）
+
+每次嘗試的成功與否、耗時都記進成績表（dropoff_scoreboard.json），
+之後的執行依「預期成功耗時」＝ 平均耗時 ÷ 成功率（拉普拉斯平滑）由小到大嘗試，
+還沒有紀錄的策略以原本的等待預算估計。
+會填入假地址的最後手段（fallback）不參與排序，永遠排在最後並維持原本的順序，
+避免「一定會成功」的手動填入被學成第一個選擇。
+
+/run-single-method-test 以 run_one 單獨執行一個策略，結果同樣記進成績表。
+"""
+
+import json
+import os
+import threading
+import time
+
+import wait_engine
+
+SCOREBOARD_FILE = os.environ.get('DROPOFF_SCOREBOARD_FILE', 'dropoff_scoreboard.json')
+
+INPUT_FOCUSED_JS = "el => document.activeElement === el"
+HOME_SELECTED_JS = "el => el.selectedIndex >= 0 && el.options[el.selectedIndex].text.trim() === '住家'"
+ADDRESS_AUTOFILLED_JS = "el => el.value.trim().length > 3"
+ADDRESS_FILLED_JS = "el => el.value.trim() !== ''"
+
+# 原本流程中手動填入的預設住家地址
+DEFAULT_HOME_ADDRESS = "新北市板橋區文化路一段188巷44號"
+
+# 嘗試觸發住家地址自動填入的多種方法（原本的替代方案6）
+JS_TRIGGER_SCRIPT = """
+() => {
+    // 方法1: 找到住家選項並觸發change事件
+    const homeSelects = document.querySelectorAll('select option[value*="住家"], select option[text*="住家"]');
+    homeSelects.forEach(option => {
+        if (option.textContent.includes('住家')) {
+            const select = option.parentElement;
+            select.value = option.value;
+            select.dispatchEvent(new Event('change', {bubbles: true}));
+        }
+    });
+
+    // 方法2: 尋找並填入已保存的住家地址
+    const addressInputs = document.querySelectorAll('input[type="text"]');
+    for (let index = 0; index < addressInputs.length; index++) {
+        const input = addressInputs[index];
+        const name = (input.name || '').toLowerCase();
+        const id = (input.id || '').toLowerCase();
+        const placeholder = (input.placeholder || '').toLowerCase();
+        const isAddressInput = ['地址', '住址', 'address'].some(keyword =>
+            name.includes(keyword) || id.includes(keyword) || placeholder.includes(keyword));
+        const isPickupInput = ['pickup', 'origin', 'from', 'start'].some(keyword =>
+            name.includes(keyword) || id.includes(keyword));
+        if (isAddressInput && !isPickupInput && index > 0 && !input.value.trim()) {
+            // 嘗試從localStorage或sessionStorage獲取住家地址
+            const savedAddress = localStorage.getItem('homeAddress') ||
+                                 sessionStorage.getItem('homeAddress') ||
+                                 '%s';
+            input.value = savedAddress;
+            input.dispatchEvent(new Event('input', {bubbles: true}));
+            input.dispatchEvent(new Event('change', {bubbles: true}));
+            return savedAddress;
+        }
+    }
+
+    // 方法3: 觸發表單驗證事件
+    document.querySelectorAll('form').forEach(form => {
+        form.dispatchEvent(new Event('validate', {bubbles: true}));
+    });
+    return '嘗試JavaScript觸發完成';
+}
+""" % DEFAULT_HOME_ADDRESS
+
+STAGES = ('home_select', 'home_address')
+
+# {階段: [策略]}，依登記順序（即原本的嘗試順序）
+_registry = {stage: [] for stage in STAGES}
+
+_scoreboard = None
+_lock = threading.Lock()
+
+
+def strategy(stage, name, label, budget_ms, fallback=False):
+    """登記策略；策略為 fn(driver, ctx)，成功時回傳真值
+
+    budget_ms: 原本的等待預算，沒有紀錄時用來估計耗時
+    fallback:  最後手段，不參與排序
+    """
+    def register(fn):
+        _registry[stage].append({'name': name, 'label': label, 'budget_ms': budget_ms,
+                                 'fallback': fallback, 'run': fn})
+        return fn
+    return register
+
+
+def strategies(stage):
+    return list(_registry[stage])
+
+
+def get_strategy(stage, name):
+    for item in _registry[stage]:
+        if item['name'] == name:
+            return item
+    raise KeyError(f"沒有策略 {stage}/{name}")
+
+
+# ===== 成績表 =====
+
+def _load():
+    global _scoreboard
+    with _lock:
+        if _scoreboard is None:
+            _scoreboard = {}
+            if os.path.exists(SCOREBOARD_FILE):
+                try:
+                    with open(SCOREBOARD_FILE, 'r', encoding='utf-8') as f:
+                        _scoreboard = json.load(f)
+                except Exception as e:
+                    print(f"讀取下車地點策略成績表失敗: {e}")
+        return _scoreboard
+
+
+def _save():
+    with _lock:
+        try:
+            tmp_path = SCOREBOARD_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_scoreboard, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, SCOREBOARD_FILE)
+        except Exception as e:
+            print(f"保存下車地點策略成績表失敗: {e}")
+
+
+def record(stage, name, success, elapsed_ms):
+    """記錄一次嘗試（不寫檔，由 run / run_one 結束時寫入）"""
+    board = _load()
+    with _lock:
+        score = board.setdefault(stage, {}).setdefault(
+            name, {'attempts': 0, 'successes': 0, 'total_ms': 0, 'last_success': None})
+        score['attempts'] += 1
+        score['total_ms'] += round(elapsed_ms)
+        if success:
+            score['successes'] += 1
+            score['last_success'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def expected_ms(stage, item):
+    """預期成功耗時：平均耗時 ÷ 成功率（拉普拉斯平滑），沒有紀錄時為原本的等待預算"""
+    score = _load().get(stage, {}).get(item['name'])
+    if not score or not score['attempts']:
+        return float(item['budget_ms'])
+    rate = (score['successes'] + 1) / (score['attempts'] + 2)
+    return score['total_ms'] / score['attempts'] / rate
+
+
+def ordered(stage):
+    """本次的嘗試順序：一般策略依預期成功耗時排序，最後手段維持原本順序排在最後"""
+    items = strategies(stage)
+    learned = sorted((item for item in items if not item['fallback']), key=lambda item: expected_ms(stage, item))
+    return learned + [item for item in items if item['fallback']]
+
+
+def _attempt(driver, stage, item, ctx):
+    started = time.perf_counter()
+    try:
+        success = bool(item['run'](driver, ctx))
+    except Exception as e:
+        print(f"{item['label']} 失敗: {e}")
+        success = False
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    record(stage, item['name'], success, elapsed_ms)
+    print(f"{'✅' if success else '❌'} {stage}/{item['name']}（{item['label']}）{elapsed_ms:.0f} ms")
+    return success, elapsed_ms
+
+
+def run(driver, stage, ctx):
+    """依成績表的順序嘗試，回傳成功的策略名稱（都失敗時回傳 None）"""
+    order = ordered(stage)
+    print(f"🧭 {stage} 嘗試順序: {', '.join(item['name'] for item in order)}")
+    winner = None
+    for item in order:
+        success, _ = _attempt(driver, stage, item, ctx)
+        if success:
+            winner = item['name']
+            break
+    _save()
+    return winner
+
+
+def run_one(driver, stage, name, ctx):
+    """單獨執行一個策略，回傳 (是否成功, 耗時 ms)"""
+    result = _attempt(driver, stage, get_strategy(stage, name), ctx)
+    _save()
+    return result
+
+
+def scoreboard():
+    """各策略的成績與目前的嘗試順序"""
+    board = _load()
+    data = {}
+    for stage in STAGES:
+        data[stage] = [dict(board.get(stage, {}).get(item['name'], {'attempts': 0, 'successes': 0, 'total_ms': 0}),
+                            name=item['name'], label=item['label'], fallback=item['fallback'],
+                            expected_ms=round(expected_ms(stage, item)))
+                       for item in ordered(stage)]
+    return data
+
+
+# ===== home_select：ctx = {'select', 'home_index', 'current_value'} =====
+
+def _home_selected(driver, ctx, require_home=False):
+    select_elem = ctx['select']
+    wait_engine.wait_for_element(driver, 'dropoff_home_selected', select_elem, HOME_SELECTED_JS, 500)
+    new_value = select_elem.input_value()
+    print(f"選擇後的值: '{new_value}'")
+    return (require_home and new_value == '住家') or bool(new_value and new_value != ctx['current_value'])
+
+
+@strategy('home_select', 'by_text', '文字值', 500)
+def select_by_text(driver, ctx):
+    ctx['select'].select_option('住家')
+    return _home_selected(driver, ctx, require_home=True)
+
+
+@strategy('home_select', 'by_index', '索引值', 500)
+def select_by_index(driver, ctx):
+    ctx['select'].select_option(index=ctx['home_index'])
+    return _home_selected(driver, ctx)
+
+
+@strategy('home_select', 'by_number', '數字值', 500)
+def select_by_number(driver, ctx):
+    ctx['select'].select_option(str(ctx['home_index']))
+    return _home_selected(driver, ctx)
+
+
+@strategy('home_select', 'by_value', 'value 屬性', 500)
+def select_by_value(driver, ctx):
+    option_value = ctx['select'].locator('option').nth(ctx['home_index']).get_attribute('value')
+    print(f"住家選項的 value 屬性: '{option_value}'")
+    if not option_value:
+        return False
+    ctx['select'].select_option(value=option_value)
+    return _home_selected(driver, ctx)
+
+
+# ===== home_address：ctx = {'address_input'} =====
+
+def _address_value(ctx):
+    return (ctx['address_input'].input_value() or '').strip()
+
+
+@strategy('home_address', 'wait_autofill', '等待自動填入', 8000)
+def wait_autofill(driver, ctx):
+    address_input = ctx['address_input']
+    max_wait_attempts = 8
+    for attempt in range(max_wait_attempts):
+        current_value = _address_value(ctx)
+        print(f"檢查自動填入 {attempt+1}/{max_wait_attempts}: 當前值='{current_value}'")
+        # 如果有值且長度合理，認為是自動填入成功
+        if len(current_value) > 3:
+            print(f"✅ 下車地點地址已自動填入: '{current_value}'")
+            return True
+        # 輕微觸發檢查（但不填入值）
+        if attempt < 3:
+            try:
+                address_input.click()
+                wait_engine.wait_for_element(driver, 'dropoff_address_clicked', address_input, INPUT_FOCUSED_JS, 500)
+            except Exception:
+                pass
+        wait_engine.wait_for_element(driver, 'dropoff_address_autofill', address_input, ADDRESS_AUTOFILLED_JS, 1000)
+    return False
+
+
+@strategy('home_address', 'reselect_home', '重新選擇住家', 2000)
+def reselect_home(driver, ctx):
+    home_select = driver['page'].locator('select').filter(has_text='住家').first
+    if not home_select.is_visible():
+        return False
+    home_select.select_option('住家')
+    wait_engine.wait_for_element(driver, 'dropoff_address_reselect', ctx['address_input'], ADDRESS_FILLED_JS, 2000)
+    return bool(_address_value(ctx))
+
+
+@strategy('home_address', 'click_trigger', '點擊觸發', 3000)
+def click_trigger(driver, ctx):
+    address_input = ctx['address_input']
+    address_input.click()
+    wait_engine.wait_for_element(driver, 'dropoff_address_clicked', address_input, INPUT_FOCUSED_JS, 1000)
+    address_input.focus()
+    wait_engine.wait_for_element(driver, 'dropoff_address_focused', address_input, ADDRESS_FILLED_JS, 2000)
+    return bool(_address_value(ctx))
+
+
+@strategy('home_address', 'home_button', '使用住家地址按鈕', 2000)
+def home_button(driver, ctx):
+    use_home_buttons = [
+        'button:has-text("使用住家地址")',
+        'button:has-text("使用預設地址")',
+        'a:has-text("使用住家地址")',
+        'a:has-text("使用預設地址")',
+        '[data-action*="home"]',
+        '[data-action*="default"]'
+    ]
+    for selector in use_home_buttons:
+        try:
+            button = driver['page'].locator(selector).first
+            if button.is_visible():
+                print(f"找到使用住家地址按鈕: {selector}")
+                button.click()
+                wait_engine.wait_for_element(driver, 'dropoff_address_home_button', ctx['address_input'], ADDRESS_FILLED_JS, 2000)
+                if _address_value(ctx):
+                    return True
+        except Exception:
+            continue
+    return False
+
+
+@strategy('home_address', 'address_option', '地址選單', 2000)
+def address_option(driver, ctx):
+    for i, select_elem in enumerate(driver['page'].locator('select').all()):
+        if not select_elem.is_visible():
+            continue
+        option_texts = [opt.inner_text() for opt in select_elem.locator('option').all() if opt.is_visible()]
+        print(f"地址選擇器 {i} 選項: {option_texts}")
+        for option_text in option_texts:
+            if any(keyword in option_text for keyword in ['地址', '住址', '新北市', '板橋', '新莊']):
+                print(f"找到住家地址選項: {option_text}")
+                select_elem.select_option(option_text)
+                wait_engine.wait_for_element(driver, 'dropoff_address_option', ctx['address_input'], ADDRESS_FILLED_JS, 2000)
+                if _address_value(ctx):
+                    return True
+    return False
+
+
+@strategy('home_address', 'manual_fill', '手動填入', 1000, fallback=True)
+def manual_fill(driver, ctx):
+    ctx['address_input'].fill(DEFAULT_HOME_ADDRESS)
+    wait_engine.wait_for_element(driver, 'dropoff_address_manual', ctx['address_input'], ADDRESS_FILLED_JS, 1000)
+    return bool(_address_value(ctx))
+
+
+@strategy('home_address', 'js_trigger', 'JavaScript觸發', 3000, fallback=True)
+def js_trigger(driver, ctx):
+    result = driver['page'].evaluate(JS_TRIGGER_SCRIPT)
+    print(f"JavaScript執行結果: {result}")
+    wait_engine.wait_for_element(driver, 'dropoff_address_script', ctx['address_input'], ADDRESS_FILLED_JS, 3000)
+    return bool(_address_value(ctx))
+
+
+@strategy('home_address', 'minimal_fill', '表單驗證檢查', 1000, fallback=True)
+def minimal_fill(driver, ctx):
+    address_input = ctx['address_input']
+    is_required = address_input.get_attribute('required') is not None
+    has_asterisk = '*' in (address_input.get_attribute('placeholder') or '')
+    print(f"地址框是否必填: required={is_required}, 有星號={has_asterisk}")
+    if not is_required and not has_asterisk:
+        print("✅ 地址框非必填，可以繼續預約流程")
+        return False
+    # 地址框必填時填入最基本的地址
+    address_input.fill("新北市")
+    wait_engine.wait_for_element(driver, 'dropoff_address_minimal', address_input, ADDRESS_FILLED_JS, 1000)
+    return bool(_address_value(ctx))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+預約選項頁的一次性填寫
+
+原本步驟 9–14 各自呼叫 locator('select').all()、select_option、click('text=...')，
+每一步都是一次以上的 Playwright IPC 往返，還各拍一張截圖。這裡把「欄位 → 值」
+整份送進頁面，在一次 evaluate 中依序設定（選單設定值後觸發 input/change，
+選項以 click() 觸發 Vue 的事件處理，每個欄位之間讓 Vue 完成重新渲染），
+再以一次 evaluate 讀回表單狀態確認。
+
+欄位格式：
+    {'name': 'date', 'select': 'date', 'position': 'last'}       日期選單的最後（first 為第一）個選項
+    {'name': 'date', 'select': 'date', 'date': '2025-06-30'}     日期選單中符合該日期的選項
+    {'name': 'date', 'select': 'date', 'date': '2025-06-30', 'label': '2025-06-30(週一)'}
+                                                                 同上，選單中沒有時以 label 為文字加入該日期再選擇
+    {'name': 'hour', 'select': 'hour', 'text': '16'}             日期選單之後的第一個選單（minute 為第二個）
+    {'name': 'companions', 'text': '1人(免費)'}                  含有該選項的選單
+    {'name': 'carpool', 'question': '共乘', 'choice': '否'}      題目附近文字為「否」的選項（radio、label、按鈕）
+
+日期、時、分選單為 #appointment_date、#appointment_hour、#appointment_minutes；
+沒有這些 id 時日期取選項看起來像日期的選單（都沒有時為第一個選單，原本的行為），時、分為其後的兩個選單。
+"""
+
+import time
+
+import reservation_spec
+
+# 設定過的元素以此屬性標記欄位名稱，確認時直接讀回
+MARK_ATTRIBUTE = 'data-form-fill'
+
+# 各選項題目的關鍵字（用來區分同樣文字的選項，例如共乘與大型輪椅的「否」）
+QUESTIONS = {
+    'time_window': '前後30分鐘',
+    'carpool': '共乘',
+    'wheelchair': '搭乘輪椅',
+    'large_wheelchair': '大型輪椅',
+}
+
+COMMON_JS = '''
+    const norm = t => (t || '').replace(/\\s+/g, ' ').trim();
+    const visible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    const radioOf = el => {
+        if (el.matches('input')) return el;
+        const label = el.closest('label');
+        return (label && label.control) || el.querySelector('input[type=radio], input[type=checkbox]')
+            || (label && label.querySelector('input'));
+    };
+'''
+
+FILL_JS = '''
+async ({fields, mark}) => {
+''' + COMMON_JS + '''
+    const tick = () => new Promise(resolve => setTimeout(resolve, 0));
+    const fire = (el, types) => types.forEach(type => el.dispatchEvent(new Event(type, {bubbles: true})));
+    const isDate = t => /\\d{4}[-/]\\d{1,2}[-/]\\d{1,2}/.test(t);
+
+    const findSelect = field => {
+        const all = Array.from(document.querySelectorAll('select'));
+        const date = document.querySelector('#appointment_date')
+            || all.find(s => Array.from(s.options).some(o => isDate(o.value + ' ' + o.text)));
+        if (field.select === 'date') return date || all[0];
+        if (field.select === 'hour' || field.select === 'minute') {
+            const byId = document.getElementById(field.select === 'hour' ? 'appointment_hour' : 'appointment_minutes');
+            if (byId) return byId;
+            const start = date ? all.indexOf(date) : 0;
+            return all[start + (field.select === 'hour' ? 1 : 2)];
+        }
+        return all.find(s => visible(s) && Array.from(s.options).some(o => norm(o.text) === field.text))
+            || all.find(s => Array.from(s.options).some(o => o.value === field.text));
+    };
+
+    const optionIndex = (select, field) => {
+        const options = Array.from(select.options);
+        if (field.position === 'last') return options.length - 1;
+        if (field.position === 'first') return options.length ? 0 : -1;
+        if (field.date) {
+            const alt = field.date.replace(/-/g, '/');
+            return options.findIndex(o => [o.value, o.text].some(t => t.includes(field.date) || t.includes(alt)));
+        }
+        const index = options.findIndex(o => norm(o.text) === field.text);
+        return index >= 0 ? index : options.findIndex(o => o.value === field.text);
+    };
+
+    // 題目附近文字為 choice 的選項：取最接近題目文字的一個，已設定過的 radio 群組不重複使用
+    const usedGroups = new Set();
+    const findChoice = field => {
+        const candidates = Array.from(document.querySelectorAll('label, button, a, span, div, input[type=radio]'))
+            .filter(el => el.matches('input') ? el.value === field.choice
+                : norm(el.textContent) === field.choice && !Array.from(el.children).some(c => norm(c.textContent) === field.choice))
+            .filter(el => el.matches('input') || visible(el));
+        let best = null, bestSize = Infinity;
+        for (const el of candidates) {
+            const radio = radioOf(el);
+            if (radio && radio.name && usedGroups.has(radio.name)) continue;
+            let size = Infinity;
+            if (field.question) {
+                for (let node = el; node && node !== document.body; node = node.parentElement) {
+                    const text = norm(node.textContent);
+                    if (text.includes(field.question)) { size = text.length; break; }
+                }
+            }
+            if (!best || size < bestSize) { best = el; bestSize = size; }
+        }
+        return best;
+    };
+
+    document.querySelectorAll('[' + mark + ']').forEach(el => el.removeAttribute(mark));
+    const results = {};
+    for (const field of fields) {
+        try {
+            if (field.choice !== undefined) {
+                const el = findChoice(field);
+                if (!el) { results[field.name] = {found: false, error: '找不到選項 ' + field.choice}; continue; }
+                el.setAttribute(mark, field.name);
+                const radio = radioOf(el);
+                if (radio && radio.name) usedGroups.add(radio.name);
+                el.click();
+                results[field.name] = {found: true, expected: field.choice};
+            } else {
+                const select = findSelect(field);
+                if (!select) { results[field.name] = {found: false, error: '找不到選單'}; continue; }
+                let index = optionIndex(select, field);
+                if (index < 0 && field.label && field.date) {
+                    // 選單在放號前產生時還沒有這一天，補上選項（值與頁面相同為 YYYY-MM-DD）
+                    select.add(new Option(field.label, field.date));
+                    index = select.options.length - 1;
+                }
+                if (index < 0) { results[field.name] = {found: false, error: '選單中沒有符合的選項'}; continue; }
+                select.setAttribute(mark, field.name);
+                select.selectedIndex = index;
+                fire(select, ['input', 'change']);
+                results[field.name] = {found: true, expected: select.options[index].value};
+            }
+        } catch (e) {
+            results[field.name] = {found: false, error: String(e)};
+        }
+        // 讓 Vue 完成這個欄位觸發的重新渲染（例如換日期後重建時段選單）再設定下一個
+        await tick();
+    }
+    return results;
+}
+'''
+
+# 一次讀回所有標記過的欄位：選單的值、選項對應 radio 的勾選狀態
+VERIFY_JS = '''
+({expected, mark}) => {
+''' + COMMON_JS + '''
+    const state = {};
+    for (const [name, value] of Object.entries(expected)) {
+        const el = document.querySelector('[' + mark + '="' + name + '"]');
+        if (!el) { state[name] = {ok: false, actual: null}; continue; }
+        if (el.matches('select')) {
+            const option = el.options[el.selectedIndex];
+            state[name] = {ok: el.value === value, actual: option ? norm(option.text) : null};
+            continue;
+        }
+        const radio = radioOf(el);
+        // 沒有對應 radio 的自訂元件無法讀回，點擊成功即視為完成
+        state[name] = radio ? {ok: radio.checked, actual: radio.checked ? value : null}
+                            : {ok: true, actual: value, unverified: true};
+    }
+    return state;
+}
+'''
+
+
+def reservation_fields(spec):
+    """預約設定（reservation_spec.normalize 的結果）對應的步驟 9–14 欄位"""
+    date_field = {'name': 'date', 'select': 'date'}
+    if spec['date'] in ('last', 'first'):
+        date_field['position'] = spec['date']
+    else:
+        date_field['date'] = reservation_spec.resolve_date(spec['date'])
+    return [
+        date_field,
+        {'name': 'hour', 'select': 'hour', 'text': spec['hour']},
+        {'name': 'minute', 'select': 'minute', 'text': spec['minute']},
+        {'name': 'time_window', 'question': QUESTIONS['time_window'], 'choice': spec['time_window']},
+        {'name': 'companions', 'text': spec['companions']},
+        {'name': 'carpool', 'question': QUESTIONS['carpool'], 'choice': spec['carpool']},
+        {'name': 'wheelchair', 'question': QUESTIONS['wheelchair'], 'choice': spec['wheelchair']},
+        {'name': 'large_wheelchair', 'question': QUESTIONS['large_wheelchair'], 'choice': spec['large_wheelchair']},
+    ]
+
+
+def failed_fields(results, state):
+    """設定失敗或讀回不符的欄位名稱（依欄位順序）"""
+    failed = []
+    for name, result in results.items():
+        if not result.get('found') or not state.get(name, {}).get('ok'):
+            failed.append(name)
+    return failed
+
+
+def fill(driver, fields):
+    """一次設定所有欄位並讀回確認，回傳 (失敗的欄位名稱, 每個欄位的結果)
+
+    頁面中的呼叫本身失敗時，所有欄位都視為失敗。
+    """
+    page = driver['page']
+    started = time.perf_counter()
+    try:
+        results = page.evaluate(FILL_JS, {'fields': fields, 'mark': MARK_ATTRIBUTE})
+        expected = {name: result['expected'] for name, result in results.items() if result.get('found')}
+        state = page.evaluate(VERIFY_JS, {'expected': expected, 'mark': MARK_ATTRIBUTE})
+    except Exception as e:
+        print(f"⚠️ 表單一次填寫失敗: {e}")
+        return [field['name'] for field in fields], {}
+
+    report = {name: dict(result, **state.get(name, {})) for name, result in results.items()}
+    failed = failed_fields(results, state)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"📝 表單一次填寫 {len(fields) - len(failed)}/{len(fields)} 個欄位（{elapsed:.0f} ms）")
+    for name in failed:
+        print(f"   ❌ {name}: {report.get(name)}")
+    return failed, report
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Chromium 啟動設定（launch profile）快取
+
+在映像建置或服務啟動時解析一次：選定的執行檔路徑、瀏覽器版本、
+驗證過可以啟動的參數組合，存到 launch_profile.json。
+之後每次啟動直接沿用，只有快取中的執行檔不見了（或參數設定改變）才重新探測。
+
+    python3 launch_profile.py          # 解析並寫入快取
+    python3 launch_profile.py --force  # 忽略既有快取重新探測
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROFILE_FILE = os.environ.get('LAUNCH_PROFILE_FILE', 'launch_profile.json')
+
+LAUNCH_TIMEOUT = 20000
+
+# 最佳化的瀏覽器參數（app.py、profile_cache 與映像建置時的探測共用）
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection',
+    '--memory-pressure-off',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-software-rasterizer',
+    '--single-process',
+    '--no-zygote',
+    '--disable-setuid-sandbox'
+]
+
+# 瀏覽器上下文設定（app.py、profile_cache 與非同步引擎共用）
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    # 新增預約頁以瀏覽器時區計算可預約日期，固定為台北時區，放號時刻才會換到新的日期範圍
+    'timezone_id': 'Asia/Taipei'
+}
+
+# 預設路徑不可用時依序搜尋的位置
+CHROMIUM_PATTERNS = [
+    '/root/.cache/ms-playwright/chromium-*/chrome-linux/chrome',
+    '/ms-playwright/chromium-*/chrome-linux/chrome',
+    '~/.cache/ms-playwright/chromium-*/chrome-linux/chrome',
+    '/usr/bin/chromium',
+    '/usr/bin/chromium-browser'
+]
+
+# 系統瀏覽器交給 Playwright 預設方式啟動，不指定 executable_path
+SYSTEM_CHROMIUM_PATHS = ['/usr/bin/chromium', '/usr/bin/chromium-browser']
+
+# 完整參數無法啟動時，依序移除這些在部分 Chromium 版本上會造成崩潰的參數
+FRAGILE_ARGS = ['--single-process', '--no-zygote']
+
+# 持久化使用者資料目錄被鎖定或無法使用時的錯誤訊息（與執行檔、參數無關，不丟棄快取）
+PROFILE_DIR_ERRORS = [
+    'ProcessSingleton',
+    'SingletonLock',
+    'profile appears to be in use',
+    'user data directory is already in use',
+]
+
+_profile = None
+
+# 最近一次解析與啟動的耗時（毫秒）
+_timings = {
+    'resolver_ms': None,
+    'resolver_source': None,
+    'launch_ms': None,
+    'launch_count': 0,
+}
+
+
+def _args_digest(requested_args):
+    return hashlib.sha1('\n'.join(requested_args).encode('utf-8')).hexdigest()[:12]
+
+
+def find_chromium_path(playwright):
+    """尋找可用的 Chromium 執行檔路徑"""
+    chromium_path = None
+
+    # 方法1: 使用 Playwright 預設路徑
+    try:
+        chromium_path = playwright.chromium.executable_path
+        print(f"🔍 Playwright 預設路徑: {chromium_path}")
+
+        if os.path.exists(chromium_path):
+            print("✅ 使用 Playwright 預設路徑")
+        else:
+            print("⚠️ Playwright 預設路徑不存在，尋找替代路徑...")
+            chromium_path = None
+    except Exception as e:
+        print(f"⚠️ 無法取得 Playwright 預設路徑: {e}")
+        chromium_path = None
+
+    # 方法2: 如果預設路徑不可用，手動搜尋
+    if not chromium_path:
+        print("🔍 搜尋可用的瀏覽器路徑...")
+        for pattern in CHROMIUM_PATTERNS:
+            matches = sorted(glob.glob(os.path.expanduser(pattern)))
+            if matches:
+                chromium_path = matches[-1]
+                print(f"✅ 找到可用瀏覽器: {chromium_path}")
+                break
+
+        if not chromium_path:
+            raise Exception("找不到任何可用的 Chromium 瀏覽器")
+
+    print(f"🎯 最終使用瀏覽器路徑: {chromium_path}")
+    return chromium_path
+
+
+def launch_options(profile):
+    """由啟動設定產生 chromium.launch() 的參數（同步與非同步 API 共用）"""
+    kwargs = {
+        'headless': True,
+        'args': profile['args'],
+        'timeout': LAUNCH_TIMEOUT,
+    }
+    if profile.get('executable_path') and profile['executable_path'] not in SYSTEM_CHROMIUM_PATHS:
+        kwargs['executable_path'] = profile['executable_path']
+    return kwargs
+
+
+def _validate_args(playwright, executable_path, requested_args):
+    """實際啟動一次瀏覽器，找出可以啟動的參數組合並取得版本"""
+    candidates = [list(requested_args)]
+    reduced = list(requested_args)
+    for fragile in FRAGILE_ARGS:
+        if fragile in reduced:
+            reduced = [a for a in reduced if a != fragile]
+            candidates.append(list(reduced))
+
+    last_error = None
+    for args in candidates:
+        profile = {'executable_path': executable_path, 'args': args}
+        try:
+            browser = playwright.chromium.launch(**launch_options(profile))
+        except Exception as e:
+            print(f"⚠️ 參數組合無法啟動（{len(args)} 個參數）: {e}")
+            last_error = e
+            continue
+        try:
+            version = browser.version
+        finally:
+            browser.close()
+        dropped = [a for a in requested_args if a not in args]
+        if dropped:
+            print(f"⚠️ 已移除無法使用的參數: {dropped}")
+        return args, version
+
+    raise Exception(f"所有參數組合都無法啟動瀏覽器: {last_error}")
+
+
+def _binary_version(executable_path):
+    """不啟動 Playwright，直接詢問執行檔版本（驗證失敗時的備用資訊）"""
+    try:
+        result = subprocess.run([executable_path, '--version'], capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def probe(playwright, requested_args, validate=True):
+    """重新探測執行檔、版本與可用參數
+
+    playwright 為 None 時（例如非同步引擎）暫時啟動一個同步 Playwright 探測。
+    """
+    if playwright is None:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as own_playwright:
+            return probe(own_playwright, requested_args, validate)
+
+    executable_path = find_chromium_path(playwright)
+    if validate:
+        args, version = _validate_args(playwright, executable_path, requested_args)
+    else:
+        args, version = list(requested_args), _binary_version(executable_path)
+
+    return {
+        'executable_path': executable_path,
+        'version': version,
+        'args': args,
+        'requested_args_digest': _args_digest(requested_args),
+        'validated': validate,
+        'playwright_browsers_path': os.environ.get('PLAYWRIGHT_BROWSERS_PATH'),
+        'resolved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def load_profile():
+    """讀取快取的啟動設定"""
+    if not os.path.exists(PROFILE_FILE):
+        return None
+    try:
+        with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"讀取啟動設定快取 {PROFILE_FILE} 失敗: {e}")
+        return None
+
+
+def save_profile(profile):
+    """寫入啟動設定快取"""
+    try:
+        tmp_path = PROFILE_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, PROFILE_FILE)
+    except Exception as e:
+        print(f"寫入啟動設定快取失敗: {e}")
+
+
+def _profile_usable(profile, requested_args):
+    if not profile:
+        return False
+    if profile.get('requested_args_digest') != _args_digest(requested_args):
+        print("ℹ️ 瀏覽器參數設定已變更，重新探測")
+        return False
+    if not os.path.exists(profile.get('executable_path') or ''):
+        print(f"⚠️ 快取的瀏覽器執行檔已不存在: {profile.get('executable_path')}，重新探測")
+        return False
+    return True
+
+
+def resolve(playwright, requested_args, force=False):
+    """取得啟動設定：優先使用記憶體/檔案快取，必要時才重新探測"""
+    global _profile
+
+    started = time.perf_counter()
+    source = 'memory'
+    profile = None if force else _profile
+
+    if not _profile_usable(profile, requested_args):
+        profile = None if force else load_profile()
+        source = 'file'
+        if not _profile_usable(profile, requested_args):
+            profile = probe(playwright, requested_args)
+            save_profile(profile)
+            source = 'probe'
+
+    _profile = profile
+    _timings['resolver_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _timings['resolver_source'] = source
+    if source != 'memory':
+        print(f"🧭 啟動設定來源: {source}，解析耗時 {_timings['resolver_ms']} ms "
+              f"（Chromium {profile.get('version')}）")
+    return profile
+
+
+def invalidate():
+    """丟棄快取（例如啟動失敗時），下次啟動重新探測"""
+    global _profile
+    _profile = None
+    try:
+        os.remove(PROFILE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def launch(playwright, requested_args):
+    """依快取的啟動設定啟動 Chromium，分別記錄解析與啟動耗時"""
+    profile = resolve(playwright, requested_args)
+
+    started = time.perf_counter()
+    try:
+        browser = playwright.chromium.launch(**launch_options(profile))
+    except Exception:
+        # 快取的設定無法啟動時丟棄，下次重新探測
+        invalidate()
+        raise
+    _timings['launch_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _timings['launch_count'] += 1
+    print(f"⏱️ 瀏覽器啟動耗時 {_timings['launch_ms']} ms（解析 {_timings['resolver_ms']} ms）")
+    return browser
+
+
+def _profile_dir_error(error, user_data_dir):
+    """啟動失敗是否出在使用者資料目錄（被鎖定或無法寫入），而不是執行檔或參數"""
+    if os.path.exists(user_data_dir) and not os.access(user_data_dir, os.W_OK):
+        return True
+    message = str(error)
+    return any(keyword in message for keyword in PROFILE_DIR_ERRORS)
+
+
+def launch_persistent(playwright, requested_args, user_data_dir, context_options=None):
+    """以持久化使用者資料目錄啟動 Chromium，回傳 BrowserContext"""
+    profile = resolve(playwright, requested_args)
+
+    kwargs = launch_options(profile)
+    kwargs.update(context_options or {})
+
+    started = time.perf_counter()
+    try:
+        context = playwright.chromium.launch_persistent_context(user_data_dir, **kwargs)
+    except Exception as e:
+        if _profile_dir_error(e, user_data_dir):
+            # 使用者資料目錄被其他瀏覽器佔用或無法寫入，啟動設定本身沒有問題，保留快取
+            print(f"⚠️ 持久化設定檔 {user_data_dir} 正在使用中或無法寫入，保留啟動設定快取")
+        else:
+            # 快取的執行檔或參數無法啟動時丟棄，下次重新探測
+            invalidate()
+        raise
+    _timings['launch_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _timings['launch_count'] += 1
+    print(f"⏱️ 瀏覽器啟動耗時 {_timings['launch_ms']} ms（解析 {_timings['resolver_ms']} ms，持久化設定檔）")
+    return context
+
+
+def timings():
+    """最近一次解析與啟動的耗時與目前使用的設定"""
+    data = dict(_timings)
+    if _profile:
+        data['executable_path'] = _profile.get('executable_path')
+        data['version'] = _profile.get('version')
+        data['args'] = _profile.get('args')
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='解析並快取 Chromium 啟動設定')
+    parser.add_argument('--force', action='store_true', help='忽略既有快取重新探測')
+    args = parser.parse_args(argv)
+
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as playwright:
+        profile = resolve(playwright, BROWSER_ARGS, force=args.force)
+
+    print(json.dumps(profile, ensure_ascii=False, indent=2))
+    print(f"✅ 啟動設定已寫入 {PROFILE_FILE}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+從網站 API 回應擷取訂單
+
+網站（web-source-code/index-949f5202.js）的訂單頁由 https://www.ntpc.ltc-car.org/api/v1
+載入資料：
+- GET Order?Perpage=&CurrentPage=          （訂單查詢，Data.Records + Data.Pagination）
+- GET Order/History?Perpage=&CurrentPage=  （歷史紀錄）
+
+首頁的 GET Order/RecentRecord（近期訂單）只是部分資料，不列入。
+
+訂單的 Status：0 媒合中、1 成立、2 派車、3 執行、4 完成、5 取消。
+
+在上下文上訂閱 response 事件，訂單頁載入時收下這些回應，直接由 JSON 產生
+dispatch_results.json，不再解析 Vue 渲染後的 DOM。回應不完整（沒有收到、
+或分頁沒有全部載入）時由呼叫端改用 DOM 擷取。
+
+模式（環境變數 DISPATCH_SOURCE）：api（預設，API 優先、DOM 備用）/ dom（只用 DOM）
+"""
+
+import os
+import re
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytz
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+ORDER_API_PATTERN = re.compile(r'/api/v1/Order(?:/History)?(?:\?|$)')
+
+STATUS_LABELS = {0: '媒合中', 1: '成立', 2: '派車', 3: '執行', 4: '完成', 5: '取消'}
+# 與訂單頁的 CSS 類別相同（order_list log dispatch 等）
+STATUS_CLASSES = {0: 'accept', 1: 'established', 2: 'dispatch', 3: 'implement', 4: 'finish', 5: 'cancel'}
+DISPATCH_STATUS = 2
+
+# 地點類別（API 可能回傳數字或字串）
+PLACE_TAGS = {'0': '住家', '1': '醫療機構', '2': '長照機構'}
+
+
+def enabled():
+    """是否優先使用 API 回應（環境變數 DISPATCH_SOURCE）"""
+    return os.environ.get('DISPATCH_SOURCE', 'api').lower() == 'api'
+
+
+class OrderCapture:
+    """收集單一上下文中訂單 API 的回應"""
+
+    def __init__(self):
+        self.responses = []
+
+    def handle_response(self, response):
+        # 事件處理中只保存回應物件，內容在流程中再讀取
+        try:
+            if response.request.method == 'GET' and response.ok and ORDER_API_PATTERN.search(response.url):
+                self.responses.append(response)
+        except Exception:
+            pass
+
+    def payloads(self):
+        """讀取已收到的回應內容（同步 API），回傳 [(url, json)]"""
+        payloads = []
+        for response in self.responses:
+            try:
+                payloads.append((response.url, response.json()))
+            except Exception as e:
+                print(f"⚠️ 讀取訂單 API 回應失敗: {e}")
+        return payloads
+
+
+def install_order_capture(context):
+    """在 BrowserContext 上訂閱訂單 API 回應，DISPATCH_SOURCE=dom 時回傳 None"""
+    if not enabled():
+        return None
+    capture = OrderCapture()
+    context.on('response', capture.handle_response)
+    return capture
+
+
+def _endpoint(url):
+    parts = urlsplit(url)
+    return parts.path.rstrip('/'), parse_qs(parts.query).get('CurrentPage', ['1'])[0]
+
+
+def parse_payloads(payloads):
+    """合併收到的回應，回傳 {'orders', 'complete', 'endpoints'}
+
+    同一筆訂單（Id）以最後收到的資料為準。分頁端點只收到部分頁面時 complete 為 False。
+    """
+    orders = {}
+    pages = {}
+    total_pages = {}
+
+    for url, payload in payloads:
+        if not isinstance(payload, dict) or not payload.get('Success', True):
+            continue
+        data = payload.get('Data')
+        endpoint, current_page = _endpoint(url)
+
+        if not isinstance(data, dict) or 'Records' not in data:
+            continue
+        records = data.get('Records') or []
+        pages.setdefault(endpoint, set()).add(current_page)
+        pagination = data.get('Pagination') or {}
+        total_pages[endpoint] = pagination.get('TotalPage') or 1
+
+        for record in records:
+            if isinstance(record, dict) and record.get('Id') is not None:
+                orders[record['Id']] = record
+
+    complete = bool(pages) and all(len(pages[endpoint]) >= total_pages[endpoint] for endpoint in pages)
+    return {
+        'orders': list(orders.values()),
+        'complete': complete,
+        'endpoints': sorted(pages),
+    }
+
+
+def parse_ride_time(value):
+    """RideTime 為 ISO 格式；沒有時區資訊時即為台北時間"""
+    if not value:
+        return 'N/A', 'N/A'
+    text = re.sub(r'\.\d+', '', str(value).strip()).replace('Z', '+00:00')
+    try:
+        ride_time = datetime.fromisoformat(text)
+    except ValueError:
+        return str(value), str(value)
+    if ride_time.tzinfo is not None:
+        ride_time = ride_time.astimezone(TAIPEI_TZ)
+    return ride_time.strftime('%Y-%m-%d'), ride_time.strftime('%H:%M')
+
+
+def _place(place):
+    if not isinstance(place, dict):
+        return ''
+    tag = PLACE_TAGS.get(str(place.get('Tag')), '')
+    return ' '.join(part for part in [tag, place.get('Address') or ''] if part)
+
+
+def build_record(index, order):
+    """由 API 訂單資料組成 record_info（結構與 DOM 擷取相同，另外附上訂單編號）"""
+    status = order.get('Status')
+    date, time_text = parse_ride_time(order.get('RideTime'))
+    route = ' → '.join(part for part in [_place(order.get('PickUp')), _place(order.get('DropOff'))] if part)
+
+    return {
+        'index': index,
+        'order_id': order.get('Id'),
+        'status': STATUS_LABELS.get(status, str(status)),
+        'date': date,
+        'time': time_text,
+        'route': route or 'N/A',
+        'vehicle': order.get('LicensePlateNumber') or 'N/A',
+        'driver': order.get('DriverName') or 'N/A',
+        'contact': order.get('DriverPhone') or order.get('ContactPhone') or 'N/A',
+        'has_driver_info': bool(order.get('DriverName') or order.get('LicensePlateNumber')),
+        'css_classes': f"order_list log {STATUS_CLASSES.get(status, '')}".strip()
+    }
+
+
+def classify_orders(orders):
+    """Status == 2 為已派車，回傳派車記錄列表"""
+    results = []
+    for i, order in enumerate(orders):
+        if order.get('Status') == DISPATCH_STATUS:
+            results.append(build_record(i + 1, order))
+    return results
+
+
+def order_statuses(orders):
+    """所有訂單的狀態 {識別鍵: 狀態文字}，供 dispatch_sync 區分取消與完成"""
+    return {f"id:{order.get('Id')}": STATUS_LABELS.get(order.get('Status'), str(order.get('Status')))
+            for order in orders if order.get('Id') is not None}
+
+
+def dispatch_results_from(payloads):
+    """由回應內容產生 (總筆數, 派車記錄, 訂單狀態)；資料不完整時回傳 None"""
+    parsed = parse_payloads(payloads)
+    if not parsed['complete']:
+        if parsed['endpoints']:
+            print(f"⚠️ 訂單 API 回應不完整（{parsed['endpoints']}），改用 DOM 擷取")
+        else:
+            print("⚠️ 沒有收到訂單 API 回應，改用 DOM 擷取")
+        return None
+    print(f"📡 由訂單 API 取得 {len(parsed['orders'])} 筆訂單（{', '.join(parsed['endpoints'])}）")
+    return len(parsed['orders']), classify_orders(parsed['orders']), order_statuses(parsed['orders'])
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+訂單列表的批次擷取
+
+原本 fetch_dispatch_results 對每筆訂單各自呼叫 inner_html、get_attribute、
+多個 query_selector 與 inner_text，一般的訂單列表要數百次 Playwright 往返。
+這裡用一次 evaluate 走過 .ReservationOrder .main_content，
+回傳精簡的純資料陣列，之後的判定全部在 Python 端完成，不再呼叫瀏覽器。
+
+網站的訂單範本（web-source-code/index-949f5202.js）：
+- .state_tag 內有媒合中 / 成立 / 派車 / 執行 / 完成 / 取消 六個 span，以 v-show 只顯示目前狀態
+- .order_blocks.date .text 為預約日期/時段，.order_time 為下單時間
+- 上、下車地點為 .order_blocks 中的 .location 與 .address
+- 展開區塊中有「指派司機: 姓名(電話)」與「車號:」
+"""
+
+import re
+from datetime import datetime
+
+import pytz
+
+import record_parser
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+STATE_WORDS = ['媒合中', '成立', '派車', '執行', '完成', '取消']
+
+# 訂單列表的容器（依序嘗試）
+CONTAINER_SELECTORS = ['.ReservationOrder .main_content', '.main_content', '.ReservationOrder', '.wrap2', 'main', 'body']
+
+# 展開訂單容器內被隱藏或摺疊的內容（參數為 CONTAINER_SELECTORS）。
+# 只在訂單容器內查詢（不碰 Google Maps、Leaflet 等其他 DOM），
+# 先讀取所有需要的樣式再一起寫入，整個過程只計算一次版面。
+# .state_tag 內的狀態標籤以 v-show 只顯示目前狀態，不展開。
+EXPAND_JS = '''
+containerSelectors => {
+    const started = performance.now();
+    let root = null;
+    let containerSelector = null;
+    for (const selector of containerSelectors) {
+        root = document.querySelector(selector);
+        if (root) { containerSelector = selector; break; }
+    }
+    if (!root) return {container: null, touched: 0, hidden: 0, collapsed: 0, height_limited: 0, elapsed_ms: 0};
+
+    const skip = el => el.closest('.state_tag') !== null;
+    const collapseSelector = ['[data-collapsed="true"]', '.collapsed', '.fold', '.folded', '.hidden', '.hide',
+                              '[aria-expanded="false"]', '[data-toggle="collapse"]'].join(', ');
+
+    // 讀取階段：只讀，不修改 DOM
+    const hidden = Array.from(root.querySelectorAll('[style*="display: none"], [style*="display:none"], ' +
+                                                    '[style*="visibility: hidden"], [style*="visibility:hidden"]'))
+        .filter(el => !skip(el));
+    const collapsed = Array.from(root.querySelectorAll(collapseSelector)).filter(el => !skip(el));
+    const heightLimited = Array.from(root.querySelectorAll('[style*="max-height"], [style*="height"]'))
+        .filter(el => {
+            const maxHeight = window.getComputedStyle(el).maxHeight;
+            return maxHeight !== 'none' && maxHeight !== 'auto';
+        });
+
+    // 寫入階段
+    const touched = new Set();
+    hidden.forEach(el => {
+        el.style.display = 'block';
+        el.style.visibility = 'visible';
+        touched.add(el);
+    });
+    collapsed.forEach(el => {
+        el.style.display = 'block';
+        el.style.visibility = 'visible';
+        el.style.height = 'auto';
+        el.style.maxHeight = 'none';
+        el.style.overflow = 'visible';
+        if (el.dataset.collapsed) el.dataset.collapsed = 'false';
+        if (el.getAttribute('aria-expanded')) el.setAttribute('aria-expanded', 'true');
+        el.classList.remove('collapsed', 'hidden', 'hide');
+        touched.add(el);
+    });
+    heightLimited.forEach(el => {
+        el.style.maxHeight = 'none';
+        el.style.height = 'auto';
+        touched.add(el);
+    });
+
+    return {
+        container: containerSelector,
+        touched: touched.size,
+        hidden: hidden.length,
+        collapsed: collapsed.length,
+        height_limited: heightLimited.length,
+        elapsed_ms: Math.round((performance.now() - started) * 10) / 10
+    };
+}
+'''
+
+# 一次擷取所有訂單（參數為 CONTAINER_SELECTORS；選擇器順序與去重規則沿用原本的逐筆流程）
+ORDER_EXTRACT_JS = '''
+containerSelectors => {
+    let container = null;
+    let containerSelector = null;
+    for (const selector of containerSelectors) {
+        container = document.querySelector(selector);
+        if (container) { containerSelector = selector; break; }
+    }
+
+    const recordSelectors = ['.order_list', 'div.order_list', 'div.log', '.log',
+                             '[class*="order_list"]', '[class*="log"]', '.order'];
+    const seen = new Set();
+    const elements = [];
+    for (const selector of recordSelectors) {
+        const found = container.querySelectorAll(selector);
+        found.forEach(el => { if (!seen.has(el)) { seen.add(el); elements.push(el); } });
+        if (selector === 'div.log' && found.length > 0) break;
+    }
+
+    const shown = el => window.getComputedStyle(el).display !== 'none';
+    // 收合區塊可能不可見，以文字節點逐行組成內容（innerText 會略過）
+    const textLines = root => {
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        const lines = [];
+        while (walker.nextNode()) {
+            const line = walker.currentNode.nodeValue.trim();
+            if (line) lines.push(line);
+        }
+        return lines.join('\\n');
+    };
+    const textOf = (root, selector) => {
+        const el = root.querySelector(selector);
+        return el ? (el.innerText || el.textContent || '').trim() : '';
+    };
+
+    const records = elements.map(el => {
+        const stateTag = el.querySelector('.state_tag, [class*="state"], [class*="status"], .status');
+        let stateText = '';
+        let activeState = null;
+        if (stateTag) {
+            stateText = (stateTag.innerText || '').trim();
+            // v-show 只顯示目前狀態；也接受帶 active 等類別的標示
+            const visibleSpans = Array.from(stateTag.children).filter(shown);
+            const chosen = stateTag.querySelector('.active, .current, .selected, .highlight')
+                || (visibleSpans.length === 1 ? visibleSpans[0] : null);
+            if (chosen) activeState = (chosen.innerText || chosen.textContent || '').trim();
+        }
+
+        const places = Array.from(el.querySelectorAll('.order_blocks'))
+            .filter(block => block.querySelector('.order_title.place'))
+            .map(block => [textOf(block, '.location'), textOf(block, '.address')].filter(Boolean).join(' '));
+
+        let route = '';
+        for (const selector of ['.route', '.origin', '.destination', '[class*="route"]']) {
+            const text = textOf(el, selector);
+            if (text.length > 2) { route = text; break; }
+        }
+
+        let timeText = '';
+        for (const selector of ['.order_blocks.date .text', '.order_date', '.booking-date', '.appointment-time',
+                                '[class*="date"]', '[class*="time"]', '[class*="appointment"]',
+                                '.ride-time', '.reservation-time', '.schedule-time']) {
+            timeText = textOf(el, selector);
+            if (timeText) break;
+        }
+
+        const contactButton = el.querySelector('[aria-label^="聯絡車隊"]');
+        const contactMatch = contactButton ? contactButton.getAttribute('aria-label').match(/\\(([^)]+)\\)/) : null;
+        const toggle = el.querySelector('.toggle_area');
+
+        let vueStatus = null;
+        if (el.__vue__ && el.__vue__.Status !== undefined) vueStatus = el.__vue__.Status;
+
+        return {
+            classes: el.className || '',
+            text: el.innerText || el.textContent || '',
+            state_text: stateText,
+            active_state: activeState,
+            vue_status: vueStatus,
+            time_text: timeText,
+            create_time: textOf(el, '.order_time'),
+            route: route,
+            places: places,
+            contact_phone: contactMatch ? contactMatch[1] : '',
+            detail: toggle ? textLines(toggle) : ''
+        };
+    });
+
+    return {container: containerSelector, records: records};
+}
+'''
+
+# 沒有時間元素時，從記錄文字擷取時間的格式（依序嘗試）
+TIME_TEXT_PATTERNS = [
+    r'(\d{4}[-/]\d{1,2}[-/]\d{1,2}\s+\d{1,2}:\d{2})',
+    r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})',
+    r'(\d{1,2}:\d{2})',
+    r'預約時間[：:]\s*([^\n\r]+)',
+    r'時段[：:]\s*([^\n\r]+)',
+]
+
+
+def expand_hidden(page):
+    """展開訂單容器內隱藏、摺疊的內容，回傳處理的節點數與耗時"""
+    return page.evaluate(EXPAND_JS, CONTAINER_SELECTORS)
+
+
+def convert_time_text(date_text):
+    """把網頁上的時間文字轉成台北時間的 (日期, 時間)
+
+    沿用原本的規則：網頁顯示的日期時間視為 UTC；只有日期時時間為 N/A；
+    無法解析時兩者都使用原始文字。
+    """
+    iso_match = re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})Z?', date_text)
+    if iso_match:
+        utc_time = pytz.utc.localize(datetime.fromisoformat(iso_match.group(1)))
+        taipei_time = utc_time.astimezone(TAIPEI_TZ)
+        return taipei_time.strftime('%Y-%m-%d'), taipei_time.strftime('%H:%M')
+
+    datetime_match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})\s+(\d{1,2}:\d{2})', date_text)
+    if datetime_match:
+        date_part = datetime_match.group(1).replace('/', '-')
+        utc_time = datetime.strptime(f"{date_part} {datetime_match.group(2)}", '%Y-%m-%d %H:%M')
+        taipei_time = pytz.utc.localize(utc_time).astimezone(TAIPEI_TZ)
+        return taipei_time.strftime('%Y-%m-%d'), taipei_time.strftime('%H:%M')
+
+    date_match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})', date_text)
+    if date_match:
+        return date_match.group(1).replace('/', '-'), 'N/A'
+
+    return date_text, date_text
+
+
+def _time_text(raw):
+    if raw.get('time_text'):
+        return raw['time_text']
+    for pattern in TIME_TEXT_PATTERNS:
+        match = re.search(pattern, raw.get('text') or '')
+        if match:
+            return match.group(1).strip()
+    return ''
+
+
+def _dispatch_state(raw, parsed):
+    """回傳 (是否派車, 精確狀態文字)，無法精確判定時精確狀態為 None；parsed 為 record_parser.parse_record 的結果"""
+    if raw.get('vue_status') is not None:
+        return raw['vue_status'] == 2, None
+
+    active_state = raw.get('active_state')
+    state_text = raw.get('state_text') or ''
+    if active_state in STATE_WORDS:
+        return active_state == '派車', state_text or active_state
+    if state_text:
+        if '派車' not in state_text:
+            return False, state_text
+        # 狀態文字包含派車但無法確定目前狀態時，以司機資訊判定
+        return record_parser.is_assigned(parsed['keywords']), state_text
+
+    return parsed['is_dispatch'], None
+
+
+def build_record(index, raw, parsed, state_text=None):
+    """由擷取的原始資料與 parse_record 的結果組成 record_info（結構與原本逐筆流程相同）"""
+    record_info = {
+        'index': index,
+        'status': state_text or parsed['status'],
+        'date': 'N/A',
+        'time': 'N/A',
+        'route': 'N/A',
+        'vehicle': parsed['vehicle'],
+        'driver': parsed['driver'],
+        'contact': parsed['contact'],
+        'has_driver_info': parsed['has_driver_info'],
+        'css_classes': raw.get('classes') or ''
+    }
+
+    date_text = _time_text(raw)
+    if date_text:
+        try:
+            record_info['date'], record_info['time'] = convert_time_text(date_text)
+        except ValueError:
+            record_info['date'] = record_info['time'] = date_text
+
+    if raw.get('route'):
+        record_info['route'] = raw['route']
+    elif raw.get('places'):
+        record_info['route'] = ' → '.join(raw['places'])
+
+    if raw.get('contact_phone'):
+        record_info['contact'] = raw['contact_phone']
+
+    return record_info
+
+
+def classify_orders(raw_records):
+    """在 Python 端判定派車狀態並擷取欄位，回傳派車記錄列表"""
+    results = []
+    for i, raw in enumerate(raw_records):
+        # 每筆記錄只解析一次，判定與欄位擷取共用
+        parsed = record_parser.parse_record(raw.get('text') or '', raw.get('classes') or '', raw.get('detail') or '')
+        is_dispatch, state_text = _dispatch_state(raw, parsed)
+        if is_dispatch:
+            results.append(build_record(i + 1, raw, parsed, state_text))
+    return results
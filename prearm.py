@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+預先就緒（pre-armed）預約模式的計時工具
+
+在放號時間之前完成瀏覽器啟動、登入，並填好表單中與日期無關的欄位，
+以高解析度單調時鐘（time.monotonic）等待到指定時刻，只設定日期並送出，
+並回報放號時刻與實際點擊「送出預約」的時間相對目標時間的誤差。
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+# 距離目標時間多少秒內改用忙碌等待，避免 sleep 的排程誤差
+SPIN_WINDOW_SECONDS = 0.05
+
+# 長時間等待時，每隔多少秒呼叫一次 keepalive，讓頁面與連線保持活躍
+KEEPALIVE_INTERVAL_SECONDS = 60
+
+REPORT_FILE = 'prearm_report.json'
+
+# 最近一次送出的計時報告
+last_report = None
+
+
+def parse_submit_at(value, now=None):
+    """解析送出時間
+
+    支援 'HH:MM'、'HH:MM:SS'（台北時間，取下一個到達的時刻）
+    以及完整的 ISO 格式日期時間。
+    """
+    now = now or datetime.now(TAIPEI_TZ)
+    value = value.strip()
+
+    if 'T' in value or '-' in value:
+        target = datetime.fromisoformat(value)
+        if target.tzinfo is None:
+            target = TAIPEI_TZ.localize(target)
+        return target
+
+    parts = [int(p) for p in value.split(':')]
+    while len(parts) < 3:
+        parts.append(0)
+    hour, minute, second = parts[:3]
+    target = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target
+
+
+def seconds_until(target):
+    """距離目標時間還有幾秒（以台北時間計）"""
+    return (target - datetime.now(TAIPEI_TZ)).total_seconds()
+
+
+def hold_until(target, keepalive=None):
+    """以單調時鐘等待到目標時間
+
+    只在開始時讀取一次牆上時鐘換算成單調時鐘的期限，
+    之後不受系統時間調整影響。回傳 (期限的單調時間, 開始等待時的剩餘秒數)。
+    """
+    remaining = seconds_until(target)
+    deadline = time.monotonic() + remaining
+
+    if remaining <= 0:
+        print(f"⚠️ 目標時間已過 {-remaining:.3f} 秒，立即送出")
+        return deadline, remaining
+
+    print(f"⏳ 等待 {remaining:.3f} 秒後送出（目標 {target.strftime('%Y-%m-%d %H:%M:%S')}）")
+    last_keepalive = time.monotonic()
+
+    while True:
+        left = deadline - time.monotonic()
+        if left <= SPIN_WINDOW_SECONDS:
+            break
+
+        if keepalive and time.monotonic() - last_keepalive >= KEEPALIVE_INTERVAL_SECONDS:
+            try:
+                keepalive()
+            except Exception as e:
+                print(f"keepalive 失敗: {e}")
+            last_keepalive = time.monotonic()
+
+        # 粗略睡眠，最多睡到忙碌等待視窗之前
+        time.sleep(min(left - SPIN_WINDOW_SECONDS, 1.0))
+
+    # 最後一小段使用忙碌等待，讓送出時間盡量貼近目標
+    while time.monotonic() < deadline:
+        pass
+
+    return deadline, remaining
+
+
+def fire_at(target, action, keepalive=None):
+    """等待到目標時間後執行 action，回傳計時報告
+
+    action 回傳送出點擊當下的 time.monotonic() 時，報告一併記錄實際送出的時間
+    （submitted_at）與其相對目標時間的誤差（submit_drift_ms）。
+    """
+    global last_report
+
+    deadline, armed_seconds = hold_until(target, keepalive=keepalive)
+
+    fired_mono = time.monotonic()
+    fired_wall = datetime.now(TAIPEI_TZ)
+    error = None
+    submit_mono = None
+    try:
+        submit_mono = action()
+    except Exception as e:
+        error = str(e)
+    returned_mono = time.monotonic()
+
+    report = {
+        'target': target.isoformat(),
+        'fired_at': fired_wall.isoformat(),
+        'armed_seconds': round(armed_seconds, 3),
+        # 正值代表晚於目標時間送出
+        'drift_ms': round((fired_mono - deadline) * 1000, 3),
+        'wall_drift_ms': round((fired_wall - target).total_seconds() * 1000, 3),
+        'action_ms': round((returned_mono - fired_mono) * 1000, 3),
+        'submitted_at': None,
+        'submit_drift_ms': None,
+        'error': error,
+    }
+    if submit_mono is not None:
+        report['submitted_at'] = (fired_wall + timedelta(seconds=submit_mono - fired_mono)).isoformat()
+        report['submit_drift_ms'] = round((submit_mono - deadline) * 1000, 3)
+    last_report = report
+
+    print(f"🎯 放號時刻誤差: {report['drift_ms']} ms（牆上時鐘 {report['wall_drift_ms']} ms），"
+          f"執行耗時 {report['action_ms']} ms")
+    if report['submit_drift_ms'] is not None:
+        print(f"🎯 送出時間誤差: {report['submit_drift_ms']} ms（點擊送出預約於 {report['submitted_at']}）")
+
+    try:
+        with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"保存送出計時報告失敗: {e}")
+
+    if error:
+        raise RuntimeError(error)
+    return report
+
+
+def default_submit_at():
+    """預設的送出時間（環境變數 RESERVATION_SUBMIT_AT，台北時間）"""
+    return os.environ.get('RESERVATION_SUBMIT_AT', '00:01:00')
+
+
+def prearm_minutes():
+    """提前幾分鐘開始準備（環境變數 PREARM_MINUTES）"""
+    return float(os.environ.get('PREARM_MINUTES', 5))
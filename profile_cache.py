@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+持久化瀏覽器設定檔（HTTP 快取與 V8 程式碼快取）
+
+預設每次執行都是全新的無痕上下文，網站的 JS/CSS bundle 會在最繁忙的放號時刻
+重新下載、重新解析。開啟 PERSISTENT_PROFILE=1 後，每個帳號使用一個受管理的
+user-data 目錄，HTTP 快取與 Code Cache 在多次執行之間保留。
+
+- 總大小超過 PROFILE_CACHE_MAX_MB 時，從最久未使用的設定檔開始清除快取
+- python3 profile_cache.py --prewarm 可在放號前數小時預先載入網站，填滿快取
+- 每次執行以 CDP 網路事件統計快取命中率
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+SITE_URL = "https://www.ntpc.ltc-car.org/"
+
+PROFILE_ROOT = os.environ.get('PROFILE_CACHE_DIR', 'browser_profiles')
+
+# 設定檔目錄中屬於快取、可以安全刪除的子目錄
+CACHE_SUBDIRS = [
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+]
+
+# 最後使用時間標記檔
+LAST_USED_MARKER = '.last_used'
+
+# 最近幾次執行的快取統計
+recent_runs = []
+MAX_RECENT_RUNS = 20
+
+
+def enabled():
+    """是否開啟持久化設定檔模式（環境變數 PERSISTENT_PROFILE）"""
+    return os.environ.get('PERSISTENT_PROFILE', '0') == '1'
+
+
+def max_bytes():
+    """所有設定檔的大小上限"""
+    return int(float(os.environ.get('PROFILE_CACHE_MAX_MB', 300)) * 1024 * 1024)
+
+
+def profile_dir(account_id):
+    return os.path.abspath(os.path.join(PROFILE_ROOT, account_id))
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _last_used(path):
+    try:
+        return os.path.getmtime(os.path.join(path, LAST_USED_MARKER))
+    except OSError:
+        return 0
+
+
+def touch(account_id):
+    """更新設定檔的最後使用時間"""
+    path = profile_dir(account_id)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LAST_USED_MARKER), 'w') as f:
+        f.write(time.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def clear_cache(account_id):
+    """刪除單一設定檔的快取（保留其他瀏覽器資料）"""
+    path = profile_dir(account_id)
+    for subdir in CACHE_SUBDIRS:
+        shutil.rmtree(os.path.join(path, subdir), ignore_errors=True)
+
+
+def enforce_size_cap(keep=None):
+    """總大小超過上限時，從最久未使用的設定檔開始清除
+
+    先清除快取子目錄，仍超過上限時才刪除整個設定檔。keep 指定的帳號不會被整個刪除。
+    回傳清除後的總大小。
+    """
+    if not os.path.isdir(PROFILE_ROOT):
+        return 0
+
+    limit = max_bytes()
+    profiles = []
+    for name in os.listdir(PROFILE_ROOT):
+        path = os.path.join(PROFILE_ROOT, name)
+        if os.path.isdir(path):
+            profiles.append((name, path, _dir_size(path)))
+
+    total = sum(size for _, _, size in profiles)
+    if total <= limit:
+        return total
+
+    print(f"🧹 設定檔總大小 {total / 1024 / 1024:.1f} MB 超過上限 {limit / 1024 / 1024:.0f} MB，開始清除")
+    profiles.sort(key=lambda item: _last_used(item[1]))
+
+    for name, path, size in profiles:
+        if total <= limit:
+            break
+        clear_cache(name)
+        new_size = _dir_size(path)
+        total -= size - new_size
+        print(f"🧹 已清除 {name} 的快取（{(size - new_size) / 1024 / 1024:.1f} MB）")
+
+    for name, path, _ in profiles:
+        if total <= limit:
+            break
+        if name == keep:
+            continue
+        size = _dir_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        print(f"🧹 已刪除設定檔 {name}（{size / 1024 / 1024:.1f} MB）")
+
+    return total
+
+
+class CacheMeter:
+    """以 CDP 網路事件統計單次執行的快取命中率"""
+
+    def __init__(self, account_id):
+        self.account_id = account_id
+        self.started_at = time.time()
+        self.responses = 0
+        self.from_cache = 0
+        self.revalidated = 0
+        self.network_bytes = 0
+        self.cached_bytes = 0
+        self._cached_ids = set()
+
+    def attach(self, context, page):
+        cdp = context.new_cdp_session(page)
+        cdp.send('Network.enable')
+        cdp.on('Network.requestServedFromCache', self._on_served_from_cache)
+        cdp.on('Network.responseReceived', self._on_response)
+        cdp.on('Network.loadingFinished', self._on_finished)
+        return self
+
+    def _on_served_from_cache(self, event):
+        self._cached_ids.add(event['requestId'])
+
+    def _on_response(self, event):
+        response = event.get('response', {})
+        if response.get('url', '').startswith('data:'):
+            return
+        self.responses += 1
+        if response.get('fromDiskCache') or response.get('fromPrefetchCache') or event['requestId'] in self._cached_ids:
+            self.from_cache += 1
+            self._cached_ids.add(event['requestId'])
+        elif response.get('status') == 304:
+            self.revalidated += 1
+
+    def _on_finished(self, event):
+        size = event.get('encodedDataLength') or 0
+        if event['requestId'] in self._cached_ids:
+            self.cached_bytes += size
+        else:
+            self.network_bytes += size
+
+    def summary(self):
+        hit_ratio = self.from_cache / self.responses if self.responses else 0
+        return {
+            'account': self.account_id,
+            'responses': self.responses,
+            'from_cache': self.from_cache,
+            'revalidated_304': self.revalidated,
+            'hit_ratio': round(hit_ratio, 3),
+            'network_bytes': self.network_bytes,
+            'cached_bytes': self.cached_bytes,
+            'duration_seconds': round(time.time() - self.started_at, 1),
+        }
+
+
+def launch(playwright, account_id, requested_args, context_options=None):
+    """啟動帳號專屬的持久化設定檔，回傳 (context, page, meter)"""
+    import launch_profile
+
+    os.makedirs(PROFILE_ROOT, exist_ok=True)
+    path = profile_dir(account_id)
+    print(f"📦 使用持久化設定檔: {path}")
+    context = launch_profile.launch_persistent(playwright, requested_args, path, context_options)
+    page = context.pages[0] if context.pages else context.new_page()
+    touch(account_id)
+
+    meter = None
+    try:
+        meter = CacheMeter(account_id).attach(context, page)
+    except Exception as e:
+        print(f"⚠️ 無法統計快取命中率: {e}")
+    return context, page, meter
+
+
+def finish_run(meter, account_id=None):
+    """結束一次執行：輸出快取命中率並執行大小上限"""
+    summary = None
+    if meter is not None:
+        summary = meter.summary()
+        recent_runs.append(summary)
+        del recent_runs[:-MAX_RECENT_RUNS]
+        print(f"📦 快取命中率 {summary['hit_ratio'] * 100:.1f}%"
+              f"（{summary['from_cache']}/{summary['responses']} 個回應，"
+              f"304 重新驗證 {summary['revalidated_304']} 個，"
+              f"網路傳輸 {summary['network_bytes'] / 1024:.1f} KB）")
+    try:
+        enforce_size_cap(keep=account_id)
+    except Exception as e:
+        print(f"⚠️ 設定檔大小檢查失敗: {e}")
+    return summary
+
+
+def prewarm(account_ids):
+    """預先載入網站，讓放號時刻的 bundle 直接從快取讀取"""
+    from playwright.sync_api import sync_playwright
+    from launch_profile import BROWSER_ARGS, CONTEXT_OPTIONS
+
+    results = []
+    with sync_playwright() as playwright:
+        for account_id in account_ids:
+            print(f"🔥 預熱帳號 {account_id} 的設定檔...")
+            context, page, meter = launch(playwright, account_id, BROWSER_ARGS, CONTEXT_OPTIONS)
+            try:
+                page.goto(SITE_URL)
+                page.wait_for_load_state('networkidle')
+                # 第二次載入確認快取已生效
+                page.reload()
+                page.wait_for_load_state('networkidle')
+            finally:
+                context.close()
+            results.append(finish_run(meter, account_id))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='持久化瀏覽器設定檔')
+    parser.add_argument('--prewarm', action='store_true', help='預先載入網站填滿快取')
+    parser.add_argument('--account', help='只處理指定帳號（預設為所有帳號）')
+    parser.add_argument('--enforce', action='store_true', help='只執行大小上限清除')
+    args = parser.parse_args(argv)
+
+    if args.enforce:
+        total = enforce_size_cap()
+        print(f"設定檔總大小: {total / 1024 / 1024:.1f} MB")
+        return 0
+
+    if args.prewarm:
+        if not enabled():
+            print("ℹ️ 未開啟持久化設定檔模式（PERSISTENT_PROFILE=1），略過預熱")
+            return 0
+        from accounts import load_accounts
+        account_ids = [args.account] if args.account else [a['id'] for a in load_accounts()]
+        prewarm(account_ids)
+        return 0
+
+    parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
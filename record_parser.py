@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+訂單記錄文字的解析規則
+
+派車判定（跳過/派車關鍵字、CSS 類別）、狀態標籤、司機資訊關鍵字，
+以及車號、司機、電話、日期的擷取規則都集中在這裡：
+- 正規表示式在載入模組時編譯一次，不再於每筆記錄中以 f-string 組合
+- 所有關鍵字合併成一個交替式，一次掃描記錄文字就得到出現過的關鍵字集合，
+  各關鍵字清單的判斷改為集合運算，不再對同一段文字重複搜尋
+
+對外的 API 為 parse_record(text, classes, detail)；order_dom 每筆記錄只呼叫一次，判定與擷取都沿用其結果。
+效能比較見 bench_record_parser.py。
+"""
+
+import re
+
+# 明確不是派車的狀態
+SKIP_KEYWORDS = ('媒合中', '成立', '取消', '已取消', '待確認', '等待中')
+SKIP_CLASSES = ('accept', 'established', 'cancel', 'waiting')
+
+# 派車相關的狀態
+DISPATCH_KEYWORDS = ('派車', '執行', '完成', '已派車', '指派司機', '車號')
+DISPATCH_CLASSES = ('dispatch', 'implement', 'finish')
+
+# 記錄中有司機資訊
+DRIVER_INFO_KEYWORDS = ('指派司機', '司機姓名', '車號', '聯絡電話', '駕駛')
+
+# 狀態標籤包含派車但無法確定目前狀態時，以這些關鍵字判定是否已指派司機
+ASSIGNED_KEYWORDS = ('指派司機', '司機姓名', '車號', '聯絡電話')
+
+# 狀態標籤文字（依優先順序）
+STATUS_LABELS = (('派車', 'dispatch', '已派車'), ('執行', 'implement', '執行中'), ('完成', 'finish', '已完成'))
+
+_ALL_KEYWORDS = sorted(set(SKIP_KEYWORDS + DISPATCH_KEYWORDS + DRIVER_INFO_KEYWORDS + ASSIGNED_KEYWORDS
+                           + tuple(keyword for keyword, _, _ in STATUS_LABELS)), key=len, reverse=True)
+
+# 所有關鍵字的交替式（較長的優先）
+KEYWORD_PATTERN = re.compile('|'.join(map(re.escape, _ALL_KEYWORDS)))
+
+# 在同一位置較長的關鍵字勝出時，一併記下它所包含的較短關鍵字（例如「已派車」包含「派車」）
+_CONTAINED = {keyword: frozenset(other for other in _ALL_KEYWORDS if other in keyword) for keyword in _ALL_KEYWORDS}
+
+_SKIP = frozenset(SKIP_KEYWORDS)
+_DISPATCH = frozenset(DISPATCH_KEYWORDS)
+_DRIVER_INFO = frozenset(DRIVER_INFO_KEYWORDS)
+_ASSIGNED = frozenset(ASSIGNED_KEYWORDS)
+
+# 車號：一次找出所有標籤，再依標籤的優先順序取值（擷取內容不含中文，標籤之間不會重疊）
+VEHICLE_LABELS = ('車號', '車牌', '車輛')
+VEHICLE_PATTERN = re.compile(r'(車號|車牌|車輛)[：:]\s*([A-Z0-9\-]+)')
+
+# 司機：擷取內容可能包含其他標籤，依序嘗試（先符合的標籤優先）
+DRIVER_PATTERNS = [re.compile(label + r'[：:]\s*([^\s\n]+)') for label in ('司機', '駕駛', '指派司機')]
+
+# 電話：只在連續的數字、連字號片段中搜尋，避免在日期、地址的每個數字上回溯
+PHONE_PATTERN = re.compile(r'(\d{2,4}-?\d{6,8}|\d{10})')
+PHONE_CANDIDATE = re.compile(r'\d[\d-]{7,}')
+
+DATETIME_PATTERN = re.compile(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})\s+(\d{1,2}:\d{2})')
+DATE_PATTERN = re.compile(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})')
+
+
+def scan(text):
+    """一次掃描文字，回傳出現過的關鍵字集合
+
+    每次從上一個命中的下一個字元繼續搜尋，重疊的關鍵字（例如「派車號」中的「車號」）也不會漏掉。
+    """
+    text = text or ''
+    found = set()
+    search = KEYWORD_PATTERN.search
+    match = search(text)
+    while match is not None:
+        found |= _CONTAINED[match.group()]
+        match = search(text, match.start() + 1)
+    return found
+
+
+def is_dispatch(found, classes):
+    """依關鍵字集合與 CSS 類別判斷是否為派車相關記錄"""
+    if found & _SKIP:
+        return False
+    if any(cls in classes for cls in SKIP_CLASSES):
+        return False
+    if any(cls in classes for cls in DISPATCH_CLASSES):
+        return True
+    return bool(found & _DISPATCH)
+
+
+def status_label(found, classes):
+    for keyword, cls, label in STATUS_LABELS:
+        if keyword in found or cls in classes:
+            return label
+    return '派車相關'
+
+
+def has_driver_info(found):
+    return bool(found & _DRIVER_INFO)
+
+
+def is_assigned(found):
+    return bool(found & _ASSIGNED)
+
+
+def extract_contact_fields(text):
+    """從記錄文字擷取車號、司機與聯絡電話"""
+    fields = {'vehicle': 'N/A', 'driver': 'N/A', 'contact': 'N/A'}
+
+    vehicles = {}
+    for label, value in VEHICLE_PATTERN.findall(text):
+        vehicles.setdefault(label, value)
+    for label in VEHICLE_LABELS:
+        if label in vehicles:
+            fields['vehicle'] = vehicles[label]
+            break
+
+    for pattern in DRIVER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            fields['driver'] = match.group(1)
+            break
+
+    for candidate in PHONE_CANDIDATE.finditer(text):
+        match = PHONE_PATTERN.search(candidate.group())
+        if match:
+            fields['contact'] = match.group(1)
+            break
+
+    return fields
+
+
+def extract_datetime(text):
+    """從記錄文字擷取日期與時間（台北時間）"""
+    match = DATETIME_PATTERN.search(text)
+    if match:
+        return match.group(1).replace('/', '-'), match.group(2)
+    match = DATE_PATTERN.search(text)
+    if match:
+        return match.group(1).replace('/', '-'), 'N/A'
+    return 'N/A', 'N/A'
+
+
+def parse_record(text, classes='', detail=''):
+    """解析單筆記錄文字，回傳判定結果與擷取的欄位
+
+    detail 為展開區塊的文字（司機、車號等），只用於司機資訊與車號、司機、電話的擷取，
+    派車判定、狀態標籤與 keywords 只看 text。每段文字只掃描一次。
+    """
+    text = text or ''
+    classes = classes or ''
+    found = scan(text)
+    full_text, full_found = text, found
+    if detail:
+        full_text, full_found = f"{text}\n{detail}", found | scan(detail)
+    date, time_text = extract_datetime(text)
+    parsed = {
+        'is_dispatch': is_dispatch(found, classes),
+        'status': status_label(found, classes),
+        'has_driver_info': has_driver_info(full_found),
+        'date': date,
+        'time': time_text,
+        'keywords': found,
+    }
+    parsed.update(extract_contact_fields(full_text))
+    return parsed
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+請求攔截層
+
+自動化流程不需要圖片、字型、LINE SDK、地圖等第三方資源，
+依流程（預約 / 派車查詢）的允許清單攔截或以空內容替代，
+並統計每次執行被攔截的請求數與位元組數。
+
+模式（環境變數 REQUEST_FILTER_MODE）：
+- block:   攔截（預設）
+- observe: 只記錄會被攔截的請求，不實際攔截，用來累積資源大小紀錄
+- off:     不安裝攔截層
+
+被攔截的請求拿不到回應大小，因此平時放行的回應會把 content-length
+記到 request_sizes.json，攔截時用這份紀錄估算省下的位元組數。
+
+Playwright 的 route 會停用 HTTP 快取，持久化設定檔模式（profile_cache）
+改用 CDP 的 Network.setBlockedURLs，只依 cdp_block_urls 攔截，不提供替代內容。
+"""
+
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+SITE_HOST = 'www.ntpc.ltc-car.org'
+
+SIZE_LEDGER_FILE = os.environ.get('REQUEST_SIZE_LEDGER', 'request_sizes.json')
+
+# LINE LIFF SDK 的替代內容：網站只在 LINE 登入相關操作才會呼叫 liff
+LIFF_STUB = """
+window.liff = {
+    init: function () { return Promise.resolve(); },
+    isLoggedIn: function () { return false; },
+    isInClient: function () { return false; },
+    getAccessToken: function () { return null; },
+    login: function () {},
+    logout: function () {}
+};
+"""
+
+# CDP 封鎖清單無法依資源類型判斷，改用副檔名
+STATIC_ASSET_URLS = [
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*.mp4*', '*.mp3*', '*.webm*',
+]
+
+# 各流程的規則
+#   block_types: 依資源類型攔截
+#   allow_hosts: 允許的主機（正規表示式），其他主機一律攔截
+#   stubs:       (URL 正規表示式, 內容類型, 內容) 以替代內容回應，避免 <script> 載入失敗
+#   cdp_block_urls: 持久化設定檔模式使用的封鎖清單（CDP 萬用字元格式）
+FLOW_RULES = {
+    # 預約需要 Google Places 自動完成（醫院名稱搜尋）
+    'reservation': {
+        'block_types': {'image', 'media', 'font'},
+        'allow_hosts': [
+            re.escape(SITE_HOST),
+            r'maps\.googleapis\.com',
+            r'maps\.gstatic\.com',
+        ],
+        'stubs': [
+            (r'static\.line-scdn\.net/liff/', 'application/javascript', LIFF_STUB),
+        ],
+        'cdp_block_urls': STATIC_ASSET_URLS + [
+            '*static.line-scdn.net/*',
+            '*fonts.googleapis.com/*',
+            '*fonts.gstatic.com/*',
+        ],
+    },
+    # 派車查詢只讀取訂單列表，不需要地圖
+    'dispatch': {
+        'block_types': {'image', 'media', 'font'},
+        'allow_hosts': [
+            re.escape(SITE_HOST),
+        ],
+        'stubs': [
+            (r'static\.line-scdn\.net/liff/', 'application/javascript', LIFF_STUB),
+            (r'/googleMapsLoader\.js', 'application/javascript', ''),
+        ],
+        'cdp_block_urls': STATIC_ASSET_URLS + [
+            '*static.line-scdn.net/*',
+            '*fonts.googleapis.com/*',
+            '*fonts.gstatic.com/*',
+            '*/googleMapsLoader.js*',
+            '*maps.googleapis.com/*',
+            '*maps.gstatic.com/*',
+        ],
+    },
+    # 未指定流程時只攔截靜態資源
+    'default': {
+        'block_types': {'image', 'media', 'font'},
+        'allow_hosts': None,
+        'stubs': [],
+        'cdp_block_urls': STATIC_ASSET_URLS,
+    },
+}
+
+# 最近幾次執行的統計
+recent_runs = deque(maxlen=20)
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def filter_mode():
+    """目前的攔截模式"""
+    return os.environ.get('REQUEST_FILTER_MODE', 'block').lower()
+
+
+def _ledger_key(url):
+    # 忽略查詢字串，讓帶版本參數的同一資源共用紀錄
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _load_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = {}
+            if os.path.exists(SIZE_LEDGER_FILE):
+                try:
+                    with open(SIZE_LEDGER_FILE, 'r', encoding='utf-8') as f:
+                        _ledger = json.load(f)
+                except Exception as e:
+                    print(f"讀取資源大小紀錄失敗: {e}")
+        return _ledger
+
+
+def _save_ledger():
+    with _ledger_lock:
+        if not _ledger:
+            return
+        try:
+            tmp_path = SIZE_LEDGER_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_ledger, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, SIZE_LEDGER_FILE)
+        except Exception as e:
+            print(f"保存資源大小紀錄失敗: {e}")
+
+
+class RequestFilter:
+    """安裝在單一 BrowserContext 上的攔截層與統計"""
+
+    def __init__(self, flow, mode):
+        self.flow = flow if flow in FLOW_RULES else 'default'
+        self.mode = mode
+        rules = FLOW_RULES[self.flow]
+        self.block_types = rules['block_types']
+        self.allow_hosts = None
+        if rules['allow_hosts'] is not None:
+            self.allow_hosts = re.compile(r'^(?:' + '|'.join(rules['allow_hosts']) + r')$')
+        self.stubs = [(re.compile(pattern), content_type, body) for pattern, content_type, body in rules['stubs']]
+        self.cdp_block_urls = rules['cdp_block_urls']
+        self._cdp_requests = {}
+        self.ledger = _load_ledger()
+        self.started_at = time.time()
+
+        self.stats = {
+            'flow': self.flow,
+            'mode': self.mode,
+            'allowed_requests': 0,
+            'allowed_bytes': 0,
+            'blocked_requests': 0,
+            'blocked_bytes': 0,
+            'blocked_unknown_size': 0,
+            'stubbed_requests': 0,
+            'blocked_by_type': {},
+            'blocked_by_host': {},
+        }
+
+    def decide(self, url, resource_type):
+        """回傳 ('allow', None) / ('abort', None) / ('stub', (內容類型, 內容))"""
+        if url.startswith('data:') or url.startswith('blob:'):
+            return 'allow', None
+
+        for pattern, content_type, body in self.stubs:
+            if pattern.search(url):
+                return 'stub', (content_type, body)
+
+        if resource_type in self.block_types:
+            return 'abort', None
+
+        host = urlsplit(url).hostname or ''
+        if self.allow_hosts is not None and not self.allow_hosts.match(host):
+            return 'abort', None
+
+        return 'allow', None
+
+    def _record_blocked(self, url, resource_type):
+        self.stats['blocked_requests'] += 1
+        by_type = self.stats['blocked_by_type']
+        by_type[resource_type] = by_type.get(resource_type, 0) + 1
+        host = urlsplit(url).hostname or ''
+        by_host = self.stats['blocked_by_host']
+        by_host[host] = by_host.get(host, 0) + 1
+
+        size = self.ledger.get(_ledger_key(url))
+        if size is None:
+            self.stats['blocked_unknown_size'] += 1
+        else:
+            self.stats['blocked_bytes'] += size
+
+    def handle_route(self, route, request):
+        # 回傳 route 操作的結果：非同步 API 下是 coroutine，由 handle_route_async 負責 await
+        action, payload = self.decide(request.url, request.resource_type)
+
+        if action == 'allow':
+            self.stats['allowed_requests'] += 1
+            return route.continue_()
+
+        if action == 'stub':
+            self.stats['stubbed_requests'] += 1
+        self._record_blocked(request.url, request.resource_type)
+
+        if self.mode == 'observe':
+            return route.continue_()
+        if action == 'stub':
+            content_type, body = payload
+            return route.fulfill(status=200, content_type=content_type, body=body)
+        return route.abort('blockedbyclient')
+
+    async def handle_route_async(self, route, request):
+        """非同步 API 的 route 處理函式"""
+        await self.handle_route(route, request)
+
+    def handle_response(self, response):
+        """記錄放行回應的大小，供之後估算攔截省下的位元組數"""
+        try:
+            length = response.headers.get('content-length')
+            if length is None:
+                return
+            size = int(length)
+        except Exception:
+            return
+        self.ledger[_ledger_key(response.url)] = size
+        action, _ = self.decide(response.url, response.request.resource_type)
+        if action == 'allow':
+            self.stats['allowed_bytes'] += size
+
+    def install_cdp(self, context, page):
+        """以 CDP 封鎖清單攔截（不影響 HTTP 快取）"""
+        cdp = context.new_cdp_session(page)
+        cdp.send('Network.enable')
+        cdp.on('Network.requestWillBeSent', self._on_cdp_request)
+        cdp.on('Network.responseReceived', self._on_cdp_response)
+        if self.mode == 'block':
+            cdp.send('Network.setBlockedURLs', {'urls': self.cdp_block_urls})
+
+    def _cdp_blocked(self, url):
+        return any(fnmatch.fnmatchcase(url, pattern) for pattern in self.cdp_block_urls)
+
+    def _on_cdp_request(self, event):
+        url = event['request']['url']
+        if url.startswith('data:') or url.startswith('blob:'):
+            return
+        if self._cdp_blocked(url):
+            self._record_blocked(url, event.get('type', 'Other').lower())
+        else:
+            self.stats['allowed_requests'] += 1
+            self._cdp_requests[event['requestId']] = url
+
+    def _on_cdp_response(self, event):
+        url = self._cdp_requests.pop(event['requestId'], None)
+        if url is None:
+            return
+        headers = {k.lower(): v for k, v in event['response'].get('headers', {}).items()}
+        try:
+            size = int(headers['content-length'])
+        except (KeyError, ValueError):
+            return
+        self.ledger[_ledger_key(url)] = size
+        self.stats['allowed_bytes'] += size
+
+    def summary(self):
+        data = dict(self.stats)
+        data['duration_seconds'] = round(time.time() - self.started_at, 1)
+        return data
+
+
+def install_request_filter(context, flow=None, cdp_page=None):
+    """在 BrowserContext 上安裝攔截層，mode 為 off 時回傳 None
+
+    cdp_page: 持久化設定檔模式傳入頁面，改用 CDP 封鎖清單以保留 HTTP 快取
+    """
+    mode = filter_mode()
+    if mode == 'off':
+        return None
+
+    request_filter = RequestFilter(flow, mode)
+    if cdp_page is not None:
+        request_filter.install_cdp(context, cdp_page)
+    else:
+        context.route('**/*', request_filter.handle_route)
+        context.on('response', request_filter.handle_response)
+    backend = 'CDP' if cdp_page is not None else 'route'
+    print(f"🧹 已安裝請求攔截層（流程: {request_filter.flow}，模式: {mode}，{backend}）")
+    return request_filter
+
+
+async def install_request_filter_async(context, flow=None):
+    """install_request_filter 的非同步 API 版本（非同步引擎使用），mode 為 off 時回傳 None"""
+    mode = filter_mode()
+    if mode == 'off':
+        return None
+
+    request_filter = RequestFilter(flow, mode)
+    await context.route('**/*', request_filter.handle_route_async)
+    context.on('response', request_filter.handle_response)
+    print(f"🧹 已安裝請求攔截層（流程: {request_filter.flow}，模式: {mode}，route）")
+    return request_filter
+
+
+def finish_run(request_filter):
+    """結束一次執行：輸出統計、保存資源大小紀錄"""
+    if request_filter is None:
+        return None
+    summary = request_filter.summary()
+    recent_runs.append(summary)
+    _save_ledger()
+
+    verb = '可攔截' if summary['mode'] == 'observe' else '已攔截'
+    print(f"🧹 {verb} {summary['blocked_requests']} 個請求，"
+          f"約 {summary['blocked_bytes'] / 1024:.1f} KB"
+          f"（{summary['blocked_unknown_size']} 個大小未知），"
+          f"放行 {summary['allowed_requests']} 個請求 {summary['allowed_bytes'] / 1024:.1f} KB")
+    return summary
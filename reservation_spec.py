@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+預約內容的宣告式設定
+
+每趟預約以一筆設定描述，放在 reservation_specs.json（或 .yaml，需要 PyYAML）：
+
+[
+    {
+        "name": "週一回診",
+        "account": "A123456789",
+        "pickup": {"type": "醫療院所", "query": "亞東紀念醫院"},
+        "dropoff": {"type": "住家"},
+        "date": "last",
+        "time": "16:40",
+        "time_window": "不同意",
+        "companions": "1人(免費)",
+        "carpool": "否",
+        "wheelchair": "是",
+        "large_wheelchair": "否",
+        "fallback": {"date": "+13", "time": "16:40"}
+    }
+]
+
+- 省略的欄位沿用 DEFAULT_SPEC（原本寫死在 make_reservation 的內容）
+- account 省略時屬於預設帳號
+- date: last（最後一個日期選項）、first（第一個）、+N（台北時間 N 天後）或 YYYY-MM-DD
+- time: HH:MM，分鐘必須是 5 的倍數（頁面只提供每 5 分鐘的時段）
+- fallback: 主要時段不可預約時改用的備用時段（date、time，省略的沿用主要時段），見 slot_precheck
+- pickup.query 為地點搜尋的關鍵字，pickup.match 為判斷搜尋結果已選取的關鍵字
+- 目前的表單流程只支援「搜尋地點 → 住家」，下車地點必須是住家
+
+沒有設定檔時只執行一趟 DEFAULT_SPEC，與原本的行為相同。
+"""
+
+import copy
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytz
+
+from accounts import get_account
+
+SPECS_FILE = os.environ.get('RESERVATION_SPECS_FILE', 'reservation_specs.json')
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+DEFAULT_SPEC = {
+    'name': 'default',
+    'pickup': {
+        'type': '醫療院所',
+        'query': '亞東紀念醫院',
+        'match': ['亞東', '醫院', '紀念', 'Far Eastern', 'Memorial', 'Hospital', 'FEMH'],
+    },
+    'dropoff': {'type': '住家'},
+    'date': 'last',
+    'time': '16:40',
+    'time_window': '不同意',
+    'companions': '1人(免費)',
+    'carpool': '否',
+    'wheelchair': '是',
+    'large_wheelchair': '否',
+    'fallback': None,
+}
+
+# 搜尋結果選取後，地點名稱之外可接受的地址關鍵字
+ADDRESS_KEYWORDS = ['台北', '新北', '板橋', 'Taipei', 'New Taipei']
+
+YES_NO = ('是', '否')
+TIME_WINDOW_CHOICES = ('同意', '不同意')
+
+DATE_RULE_PATTERN = re.compile(r'^(last|first|\+\d+|\d{4}-\d{2}-\d{2})$')
+TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+
+class SpecError(ValueError):
+    """預約設定不正確"""
+
+
+def _date_rule(name, value):
+    date_rule = str(value)
+    if not DATE_RULE_PATTERN.match(date_rule):
+        raise SpecError(f"[{name}] 日期規則不正確（last / first / +N / YYYY-MM-DD）: {date_rule}")
+    return date_rule
+
+
+def _time(name, value):
+    """HH:MM 換成兩位數的 (時, 分)"""
+    match = TIME_PATTERN.match(str(value))
+    if not match:
+        raise SpecError(f"[{name}] 時間格式不正確（HH:MM）: {value}")
+    if int(match.group(2)) % 5:
+        raise SpecError(f"[{name}] 分鐘必須是 5 的倍數: {value}")
+    return f"{int(match.group(1)):02d}", match.group(2)
+
+
+def normalize(spec):
+    """補上預設值並檢查欄位，回傳新的設定（含 hour、minute）"""
+    if not isinstance(spec, dict):
+        raise SpecError(f"預約設定必須是物件: {spec!r}")
+    result = copy.deepcopy(DEFAULT_SPEC)
+    for key, value in spec.items():
+        if key in ('pickup', 'dropoff'):
+            if not isinstance(value, dict):
+                raise SpecError(f"{key} 必須是物件: {value!r}")
+            if value.get('type') and value['type'] != result[key].get('type'):
+                # 換了地點類型時不沿用預設的搜尋關鍵字
+                result[key] = {}
+            result[key].update(value)
+        else:
+            result[key] = value
+
+    name = result['name']
+    pickup, dropoff = result['pickup'], result['dropoff']
+    if not pickup.get('type'):
+        raise SpecError(f"[{name}] 缺少上車地點類型 pickup.type")
+    if not pickup.get('query'):
+        raise SpecError(f"[{name}] 缺少上車地點搜尋關鍵字 pickup.query")
+    if dropoff.get('type') != '住家' or dropoff.get('query'):
+        raise SpecError(f"[{name}] 目前只支援下車地點為住家: {dropoff!r}")
+    pickup['match'] = list(pickup.get('match') or [pickup['query'][:2], pickup['query']])
+
+    result['date'] = _date_rule(name, result['date'])
+    result['hour'], result['minute'] = _time(name, result['time'])
+
+    fallback = result['fallback']
+    if fallback is not None:
+        if not isinstance(fallback, dict):
+            raise SpecError(f"[{name}] fallback 必須是物件: {fallback!r}")
+        fallback = {'date': _date_rule(name, fallback.get('date', result['date'])),
+                    'time': fallback.get('time', result['time'])}
+        fallback['hour'], fallback['minute'] = _time(name, fallback['time'])
+        result['fallback'] = fallback
+
+    if result['time_window'] not in TIME_WINDOW_CHOICES:
+        raise SpecError(f"[{name}] time_window 必須是 {TIME_WINDOW_CHOICES}: {result['time_window']}")
+    for key in ('carpool', 'wheelchair', 'large_wheelchair'):
+        if result[key] not in YES_NO:
+            raise SpecError(f"[{name}] {key} 必須是 {YES_NO}: {result[key]}")
+    return result
+
+
+def resolve_date(rule, today=None):
+    """把日期規則換成 YYYY-MM-DD；last / first 依頁面上的選項決定，回傳 None"""
+    if rule in ('last', 'first'):
+        return None
+    if rule.startswith('+'):
+        today = today or datetime.now(TAIPEI_TZ).date()
+        return (today + timedelta(days=int(rule[1:]))).strftime('%Y-%m-%d')
+    return rule
+
+
+def pickup_selected(value, spec):
+    """上車地點搜尋結果是否已選取（輸入框的值換成地點名稱或地址）"""
+    value = (value or '').strip()
+    if not value:
+        return False
+    query = spec['pickup']['query']
+    return (any(keyword in value for keyword in spec['pickup']['match'])
+            or (len(value) >= len(query) and value != query)
+            or any(keyword in value for keyword in ADDRESS_KEYWORDS))
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise SpecError(f"讀取 {path} 需要 PyYAML（pip install pyyaml），或改用 JSON 格式")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def load_specs(account_id=None, path=None):
+    """載入帳號的預約設定（依檔案中的順序），沒有設定檔時回傳 [DEFAULT_SPEC]"""
+    path = path or SPECS_FILE
+    default_id = get_account()['id']
+    account_id = account_id or default_id
+    if not os.path.exists(path):
+        return [normalize({})] if account_id == default_id else []
+
+    data = _read(path) or []
+    if isinstance(data, dict):
+        data = data.get('specs') or []
+    specs = []
+    for index, spec in enumerate(data):
+        spec = dict(spec, name=spec.get('name') or f"spec{index + 1}") if isinstance(spec, dict) else spec
+        spec_account = spec.get('account') if isinstance(spec, dict) else None
+        if (spec_account or default_id) == account_id:
+            specs.append(normalize(spec))
+    return specs
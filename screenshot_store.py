@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+以內容雜湊保存的截圖
+
+原本每張截圖都是 1920x1080 的 PNG（180–350 KB）直接寫在工作目錄，
+同一次執行中常有完全相同的畫面（例如訂單查詢頁連續拍了三張）。這裡改為：
+- 以 JPEG（或 WebP）壓縮，品質由 SCREENSHOT_QUALITY 設定
+- 以 sha256 作為檔名保存在 objects/，相同內容只寫一次（跨執行也共用）
+- 與同一次執行的上一張畫面幾乎相同（dHash 距離 <= SCREENSHOT_NEAR_DISTANCE）時不另存，
+  直接引用上一張
+- 新畫面寫入時產生一次縮圖（thumbs/）
+- 每次執行的截圖清單寫在 runs/<run_id>.json，頁面由這裡列出
+
+WebP、縮圖與近似畫面判斷需要 Pillow；沒有安裝時由 Playwright 直接輸出 JPEG，
+只做完全相同內容的去重。
+
+每次執行結束時輸出截圖張數、寫入與略過的位元組數及拍攝耗時（/screenshot-stats）。
+
+SCREENSHOT_MODE=failure 時只在失敗時保存：拍下的畫面先放在記憶體中最近
+SCREENSHOT_BUFFER_SIZE 張的環狀緩衝區，步驟失敗（failure=True 的截圖、mark_failed）
+或執行以失敗結束時才寫入磁碟；成功的執行不寫任何截圖，流程中沒有截圖的檔案 I/O。
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SCREENSHOT_DIR = os.environ.get('SCREENSHOT_DIR', 'screenshots')
+SCREENSHOT_FORMAT = os.environ.get('SCREENSHOT_FORMAT', 'jpeg').lower()
+SCREENSHOT_QUALITY = int(os.environ.get('SCREENSHOT_QUALITY', '70'))
+SCREENSHOT_THUMB_WIDTH = int(os.environ.get('SCREENSHOT_THUMB_WIDTH', '320'))
+SCREENSHOT_NEAR_DISTANCE = int(os.environ.get('SCREENSHOT_NEAR_DISTANCE', '2'))
+SCREENSHOT_MODE = os.environ.get('SCREENSHOT_MODE', 'always').lower()
+SCREENSHOT_BUFFER_SIZE = int(os.environ.get('SCREENSHOT_BUFFER_SIZE', '10'))
+
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+
+# 最近幾次執行的截圖統計
+recent_runs = deque(maxlen=20)
+
+_write_lock = threading.Lock()
+
+
+def output_format():
+    """實際使用的格式：WebP 需要 Pillow，沒有時改用 JPEG"""
+    fmt = SCREENSHOT_FORMAT if SCREENSHOT_FORMAT in EXTENSIONS else 'jpeg'
+    if fmt == 'webp' and Image is None:
+        return 'jpeg'
+    return fmt
+
+
+def screenshot_options():
+    """page.screenshot 的參數（需要 Pillow 重新編碼成 WebP 時先取無損的 PNG）"""
+    fmt = output_format()
+    if fmt == 'jpeg':
+        return {'type': 'jpeg', 'quality': SCREENSHOT_QUALITY}
+    return {'type': 'png'}
+
+
+class ScreenshotRun:
+    """單次執行的截圖記錄"""
+
+    def __init__(self, flow=None, mode=None):
+        self.flow = flow or 'default'
+        self.mode = mode or SCREENSHOT_MODE
+        self.started_at = time.time()
+        self.run_id = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started_at))}_{self.flow}_{uuid.uuid4().hex[:6]}"
+        self.frames = []
+        self.last_dhash = None
+        self.last_entry = None
+        # failure 模式：尚未寫入的畫面 (name, data, capture_ms, taken_at)
+        self.buffer = deque(maxlen=SCREENSHOT_BUFFER_SIZE)
+        self.buffered = 0
+        self.buffered_ms = 0
+        self.failed = False
+
+    def summary(self):
+        written = [f for f in self.frames if f['duplicate'] is None]
+        return {
+            'run_id': self.run_id,
+            'flow': self.flow,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'format': output_format(),
+            'mode': self.mode,
+            'failed': self.failed,
+            'buffered': self.buffered,
+            'discarded': self.buffered - sum(1 for f in self.frames if f.get('buffered')),
+            'frames': len(self.frames),
+            'written': len(written),
+            'exact_duplicates': sum(1 for f in self.frames if f['duplicate'] == 'exact'),
+            'near_duplicates': sum(1 for f in self.frames if f['duplicate'] == 'near'),
+            'bytes_written': sum(f['bytes'] for f in written),
+            'bytes_skipped': sum(f['bytes'] for f in self.frames if f['duplicate'] is not None),
+            'capture_ms': round(sum(f['capture_ms'] for f in self.frames if not f.get('buffered')) + self.buffered_ms, 1),
+        }
+
+
+def _dhash(image):
+    """64 位元的差異雜湊：縮成 9x8 灰階後比較左右相鄰像素"""
+    pixels = list(image.convert('L').resize((9, 8)).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _object_path(digest, ext):
+    return os.path.join('objects', digest[:2], f"{digest}.{ext}")
+
+
+def _write(relative_path, data):
+    path = os.path.join(SCREENSHOT_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_thumbnail(image, digest):
+    thumb = image.convert('RGB')
+    thumb.thumbnail((SCREENSHOT_THUMB_WIDTH, SCREENSHOT_THUMB_WIDTH * 4))
+    buffer = io.BytesIO()
+    thumb.save(buffer, 'JPEG', quality=SCREENSHOT_QUALITY)
+    relative_path = os.path.join('thumbs', f"{digest}.jpg")
+    _write(relative_path, buffer.getvalue())
+    return relative_path
+
+
+def _save_run(run):
+    try:
+        _write(os.path.join('runs', f"{run.run_id}.json"),
+               json.dumps({'summary': run.summary(), 'frames': run.frames}, ensure_ascii=False, indent=2).encode('utf-8'))
+    except Exception as e:
+        print(f"保存截圖清單失敗: {e}")
+
+
+def store(run, name, data, capture_ms=0, taken_at=None):
+    """保存一張截圖（data 為 screenshot_options() 拍出的位元組），回傳這張截圖的記錄"""
+    fmt = output_format()
+    ext = EXTENSIONS[fmt]
+    image = None
+    if Image is not None:
+        image = Image.open(io.BytesIO(data))
+        if fmt == 'webp':
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=SCREENSHOT_QUALITY)
+            data = buffer.getvalue()
+
+    digest = hashlib.sha256(data).hexdigest()
+    dhash = _dhash(image) if image is not None else None
+    entry = {
+        'name': name,
+        'taken_at': taken_at or time.strftime('%Y-%m-%d %H:%M:%S'),
+        'hash': digest,
+        'file': _object_path(digest, ext),
+        'thumb': None,
+        'bytes': len(data),
+        'capture_ms': round(capture_ms, 1),
+        'duplicate': None,
+    }
+
+    previous = run.last_entry
+    near = (dhash is not None and run.last_dhash is not None and previous is not None
+            and bin(dhash ^ run.last_dhash).count('1') <= SCREENSHOT_NEAR_DISTANCE)
+    if near and previous['hash'] != digest:
+        # 與上一張幾乎相同：引用上一張的檔案
+        entry.update(duplicate='near', hash=previous['hash'], file=previous['file'], thumb=previous['thumb'])
+    else:
+        thumb_path = os.path.join('thumbs', f"{digest}.jpg")
+        with _write_lock:
+            if os.path.exists(os.path.join(SCREENSHOT_DIR, entry['file'])):
+                entry['duplicate'] = 'exact'
+            else:
+                _write(entry['file'], data)
+        if image is not None:
+            if not os.path.exists(os.path.join(SCREENSHOT_DIR, thumb_path)):
+                thumb_path = _write_thumbnail(image, digest)
+            entry['thumb'] = thumb_path
+
+    run.frames.append(entry)
+    run.last_entry = entry
+    if dhash is not None and entry['duplicate'] != 'near':
+        run.last_dhash = dhash
+    _save_run(run)
+    return entry
+
+
+def flush(run):
+    """把緩衝區中的畫面寫入磁碟（依拍攝順序），回傳寫入的記錄"""
+    entries = []
+    while run.buffer:
+        name, data, capture_ms, taken_at = run.buffer.popleft()
+        entry = store(run, name, data, capture_ms, taken_at)
+        entry['buffered'] = True
+        entries.append(entry)
+    if entries:
+        _save_run(run)
+        print(f"📸 已寫入失敗前的 {len(entries)} 張截圖: {', '.join(e['name'] for e in entries)}")
+    return entries
+
+
+def mark_failed(run):
+    """標記執行失敗並寫入緩衝區中的畫面"""
+    if run is None:
+        return []
+    run.failed = True
+    return flush(run)
+
+
+def record(run, name, data, capture_ms=0, failure=False):
+    """依截圖模式保存或暫存一張截圖
+
+    failure 模式下一般截圖只放進緩衝區，回傳的記錄沒有 file；
+    failure=True（錯誤畫面）時連同緩衝區中的畫面一起寫入。
+    """
+    if run.mode != 'failure':
+        return store(run, name, data, capture_ms)
+    run.buffer.append((name, data, capture_ms, time.strftime('%Y-%m-%d %H:%M:%S')))
+    run.buffered += 1
+    run.buffered_ms += capture_ms
+    if failure:
+        return mark_failed(run)[-1]
+    return {'name': name, 'file': None, 'thumb': None, 'bytes': len(data),
+            'capture_ms': round(capture_ms, 1), 'duplicate': None, 'buffered': True}
+
+
+def capture(driver, name, failure=False):
+    """拍攝 driver 頁面的截圖並依模式保存，回傳記錄（失敗時回傳 None）
+
+    failure: 這張是錯誤畫面（failure 模式下會觸發寫入）
+    """
+    run = driver.get('screenshots')
+    if run is None:
+        run = driver['screenshots'] = ScreenshotRun()
+    try:
+        started = time.perf_counter()
+        data = driver['page'].screenshot(**screenshot_options())
+        entry = record(run, name, data, (time.perf_counter() - started) * 1000, failure)
+    except Exception as e:
+        print(f"截圖失敗 ({name}): {e}")
+        return None
+    if entry['file'] is None:
+        return entry
+    note = {'exact': '（與既有截圖相同，未另存）', 'near': '（與上一張幾乎相同，未另存）'}.get(entry['duplicate'], '')
+    print(f"📸 截圖 {name}: {entry['file']} {entry['bytes'] // 1024} KB, {entry['capture_ms']:.0f} ms{note}")
+    return entry
+
+
+def finish_run(run, failed=False):
+    """結束一次執行：失敗時寫入緩衝區中的畫面，並輸出截圖的磁碟用量與拍攝耗時"""
+    if run is None:
+        return None
+    if failed or run.failed:
+        mark_failed(run)
+    if not run.frames and not run.buffered:
+        return None
+    summary = run.summary()
+    recent_runs.append(summary)
+    if run.frames:
+        _save_run(run)
+    if summary['discarded']:
+        print(f"📸 執行成功，捨棄緩衝區中的 {summary['discarded']} 張截圖（未寫入磁碟）")
+    print(f"📸 截圖 {summary['frames']} 張（{summary['format']}），寫入 {summary['written']} 張 "
+          f"{summary['bytes_written'] / 1024:.0f} KB，重複 {summary['exact_duplicates'] + summary['near_duplicates']} 張、"
+          f"略過 {summary['bytes_skipped'] / 1024:.0f} KB，拍攝共 {summary['capture_ms']:.0f} ms")
+    return summary
+
+
+def recent_frames(flow=None, runs=1):
+    """最近幾次執行（可限定流程）的截圖記錄，新的執行在前"""
+    runs_dir = os.path.join(SCREENSHOT_DIR, 'runs')
+    if not os.path.isdir(runs_dir):
+        return []
+    names = sorted((name for name in os.listdir(runs_dir) if name.endswith('.json')), reverse=True)
+    frames = []
+    for name in names:
+        run_id = name[:-len('.json')]
+        if flow is not None and f"_{flow}_" not in run_id:
+            continue
+        try:
+            with open(os.path.join(runs_dir, name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"讀取截圖清單失敗 {name}: {e}")
+            continue
+        frames.extend(dict(frame, run_id=run_id) for frame in manifest['frames'])
+        runs -= 1
+        if runs <= 0:
+            break
+    return frames
+
+
+def usage():
+    """截圖目錄的磁碟用量"""
+    totals = {'objects': 0, 'object_bytes': 0, 'thumbs': 0, 'thumb_bytes': 0}
+    for kind in ('objects', 'thumbs'):
+        for root, _, files in os.walk(os.path.join(SCREENSHOT_DIR, kind)):
+            for name in files:
+                totals[kind] += 1
+                totals[f"{kind[:-1]}_bytes"] += os.path.getsize(os.path.join(root, name))
+    return totals
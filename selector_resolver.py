@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+單次往返的選擇器解析
+
+原本的流程對每個候選選擇器各呼叫一次 locator().first、count()、is_visible()，
+每個呼叫都是一次 Playwright IPC 往返。這裡把整份候選清單一次送進頁面，
+在頁面中依序找出第一個可見的元素並加上標記，Python 端再用標記點擊（仍是真實的點擊事件）。
+
+候選清單支援純 CSS 以及流程中用到的 Playwright 寫法：
+    text=文字、:text("文字")、css:has-text("文字")、css:has-value("文字")
+其他無法在頁面中解析的寫法直接略過。
+
+每次成功解析後，以「頁面路徑 + DOM 結構指紋」為鍵記住獲勝的選擇器
+（selector_winners.json），之後的執行先嘗試上次的獲勝者，失敗才完整掃描。
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+
+WINNER_CACHE_FILE = os.environ.get('SELECTOR_CACHE_FILE', 'selector_winners.json')
+
+# 命中的元素以此屬性標記，供 Python 端建立 locator
+MARK_ATTRIBUTE = 'data-resolver-hit'
+
+# 在頁面中解析所有候選選擇器，回傳第一個可見的命中（沒有時回傳 null）
+RESOLVE_JS = '''
+({candidates, winners, mark, token}) => {
+    const hash = text => {
+        let h = 5381;
+        for (let i = 0; i < text.length; i++) h = ((h << 5) + h + text.charCodeAt(i)) | 0;
+        return (h >>> 0).toString(16);
+    };
+    // DOM 結構指紋：互動元素的數量與前幾個按鈕、連結的類別
+    const structure = ['input', 'button', 'a', 'form', 'select', '.dialog']
+        .map(s => s + ':' + document.querySelectorAll(s).length).join(',');
+    const classes = Array.from(document.querySelectorAll('button, a')).slice(0, 20)
+        .map(el => el.className).join('|');
+    const key = window.location.pathname + '#' + hash(structure + '|' + classes);
+
+    const visible = el => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const innermost = (elements, test) => elements.filter(el =>
+        !Array.from(el.children).some(child => test(child)));
+    const textOf = el => el.textContent || '';
+
+    const query = selector => {
+        let match = selector.match(/^text=(.+)$/) || selector.match(/^:text\\("(.+)"\\)$/);
+        if (match) {
+            const text = match[1].replace(/^"(.*)"$/, '$1');
+            const test = el => textOf(el).includes(text);
+            return innermost(Array.from(document.body.querySelectorAll('*')).filter(test), test);
+        }
+        match = selector.match(/^(.*):has-text\\("(.+)"\\)$/);
+        if (match) {
+            const test = el => textOf(el).includes(match[2]);
+            const elements = Array.from(document.querySelectorAll(match[1] || '*')).filter(test);
+            return match[1] && match[1] !== '*' ? elements : innermost(elements, test);
+        }
+        match = selector.match(/^(.*):has-value\\("(.+)"\\)$/);
+        if (match) {
+            return Array.from(document.querySelectorAll(match[1] || 'input'))
+                .filter(el => (el.value || '').includes(match[2]));
+        }
+        return Array.from(document.querySelectorAll(selector));
+    };
+
+    const order = candidates.map((selector, index) => index);
+    const cached = winners[key];
+    const cachedIndex = candidates.indexOf(cached);
+    if (cachedIndex >= 0) {
+        order.splice(order.indexOf(cachedIndex), 1);
+        order.unshift(cachedIndex);
+    }
+
+    for (const index of order) {
+        let elements;
+        try {
+            elements = query(candidates[index]);
+        } catch (e) {
+            continue;
+        }
+        const element = elements.find(visible);
+        if (element) {
+            document.querySelectorAll('[' + mark + ']').forEach(el => el.removeAttribute(mark));
+            element.setAttribute(mark, token);
+            return {selector: candidates[index], index: index, key: key, cached: index === cachedIndex};
+        }
+    }
+    return null;
+}
+'''
+
+_winners = None
+_lock = threading.Lock()
+_tokens = itertools.count(1)
+
+_stats = {
+    'resolves': 0,
+    'cache_hits': 0,
+    'sweeps': 0,
+    'misses': 0,
+    'round_trips': 0,
+}
+
+
+def _load_winners():
+    global _winners
+    with _lock:
+        if _winners is None:
+            _winners = {}
+            if os.path.exists(WINNER_CACHE_FILE):
+                try:
+                    with open(WINNER_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        _winners = json.load(f)
+                except Exception as e:
+                    print(f"讀取選擇器快取失敗: {e}")
+        return _winners
+
+
+def _save_winners():
+    with _lock:
+        try:
+            tmp_path = WINNER_CACHE_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_winners, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, WINNER_CACHE_FILE)
+        except Exception as e:
+            print(f"保存選擇器快取失敗: {e}")
+
+
+def _record(name, result):
+    _stats['resolves'] += 1
+    if result is None:
+        _stats['misses'] += 1
+        return
+    if result['cached']:
+        _stats['cache_hits'] += 1
+        return
+
+    _stats['sweeps'] += 1
+    winners = _load_winners().setdefault(name, {})
+    if winners.get(result['key'], {}).get('selector') != result['selector']:
+        winners[result['key']] = {
+            'selector': result['selector'],
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        _save_winners()
+
+
+def _arg(name, candidates):
+    winners = _load_winners().get(name, {})
+    return {
+        'candidates': list(candidates),
+        'winners': {key: item['selector'] for key, item in winners.items()},
+        'mark': MARK_ATTRIBUTE,
+        'token': f"{name}-{next(_tokens)}",
+    }
+
+
+def resolve(page, name, candidates, timeout=None):
+    """找出第一個可見的候選元素，回傳 (locator, selector)，找不到時回傳 (None, None)
+
+    name:    快取的名稱（例如 'login_button'）
+    timeout: 毫秒。指定時在頁面中持續輪詢直到任一候選出現，否則只檢查一次
+    """
+    arg = _arg(name, candidates)
+    started = time.perf_counter()
+    try:
+        if timeout:
+            handle = page.wait_for_function(RESOLVE_JS, arg=arg, timeout=timeout, polling=100)
+            result = handle.json_value()
+            _stats['round_trips'] += 2
+        else:
+            result = page.evaluate(RESOLVE_JS, arg)
+            _stats['round_trips'] += 1
+    except Exception as e:
+        if 'Timeout' not in type(e).__name__:
+            print(f"⚠️ 選擇器解析失敗（{name}）: {e}")
+        result = None
+
+    _record(name, result)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result is None:
+        print(f"🔎 {name}: {len(candidates)} 個候選都沒有可見的元素（{elapsed:.0f} ms）")
+        return None, None
+
+    source = '快取' if result['cached'] else '掃描'
+    print(f"🔎 {name}: {result['selector']}（{source}，{elapsed:.0f} ms）")
+    return page.locator(f'[{MARK_ATTRIBUTE}="{arg["token"]}"]'), result['selector']
+
+
+def click_first(page, name, candidates, timeout=None):
+    """點擊第一個可見的候選元素，回傳獲勝的選擇器，找不到時回傳 None"""
+    locator, selector = resolve(page, name, candidates, timeout)
+    if locator is None:
+        return None
+    locator.click()
+    return selector
+
+
+def forget(name=None):
+    """清除記住的獲勝者（name 為 None 時全部清除）"""
+    winners = _load_winners()
+    if name is None:
+        winners.clear()
+    else:
+        winners.pop(name, None)
+    _save_winners()
+
+
+def stats():
+    data = dict(_stats)
+    data['cached_names'] = sorted(_load_winners().keys())
+    return data
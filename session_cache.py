@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+登入狀態快取
+
+登入成功後把瀏覽器上下文的 storage state（cookies、localStorage）
+以及網站存放 token 的 sessionStorage（ntcitaxi_pageStore）依帳號存到磁碟，
+之後的執行先還原並用一次 API 請求驗證，失效時才走完整登入流程。
+
+網站的 token 由 /Account/RefreshToken 換發，可用
+    python3 session_cache.py --refresh
+定期換發，讓週一、週四的排程執行時仍是有效的登入狀態。
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import pytz
+import requests
+
+SITE_URL = "https://www.ntpc.ltc-car.org"
+API_BASE = f"{SITE_URL}/api/v1"
+
+# 網站 (pinia) 存放 tokenInfo 的 sessionStorage 鍵值
+TOKEN_STORE_KEY = 'ntcitaxi_pageStore'
+
+SESSION_DIR = os.environ.get('SESSION_CACHE_DIR', 'sessions')
+
+# token 剩餘時間少於此秒數時，還原前先換發
+REFRESH_MARGIN_SECONDS = int(os.environ.get('SESSION_REFRESH_MARGIN', 600))
+
+REQUEST_TIMEOUT = 10
+
+# 讀取頁面 sessionStorage 的腳本
+SESSION_STORAGE_JS = "() => Object.fromEntries(Object.entries(window.sessionStorage))"
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+
+def _session_path(account_id):
+    return os.path.join(SESSION_DIR, f"{account_id}.json")
+
+
+def _api_headers(token=None):
+    headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    return headers
+
+
+def _token_info_from_storage(session_storage):
+    """從 sessionStorage 的 pinia store 取出 tokenInfo"""
+    try:
+        store = json.loads(session_storage.get(TOKEN_STORE_KEY) or '{}')
+    except ValueError:
+        return None
+    token_info = store.get('tokenInfo')
+    if isinstance(token_info, dict) and token_info.get('Token'):
+        return token_info
+    return None
+
+
+def _parse_expires(value):
+    """解析 tokenInfo.Expires，沒有時區資訊時視為台北時間"""
+    if not value:
+        return None
+    text = str(value).strip().replace('Z', '+00:00')
+    # 伺服器可能回傳 7 位數的小數秒，fromisoformat 只接受 3 或 6 位數
+    text = re.sub(r'\.(\d+)', lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text)
+    try:
+        expires = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if expires.tzinfo is None:
+        expires = TAIPEI_TZ.localize(expires)
+    return expires
+
+
+def token_seconds_left(token_info):
+    """token 剩餘有效秒數，無法判斷時回傳 None"""
+    expires = _parse_expires(token_info.get('Expires'))
+    if expires is None:
+        return None
+    return (expires - datetime.now(TAIPEI_TZ)).total_seconds()
+
+
+def load_session(account_id):
+    """讀取快取的登入狀態"""
+    path = _session_path(account_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"讀取登入快取 {path} 失敗: {e}")
+        return None
+
+
+def _write_session(account_id, data):
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = _session_path(account_id)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def store_session(account_id, storage_state, session_storage):
+    """把已取得的 storage state 與 sessionStorage 寫入快取"""
+    token_info = _token_info_from_storage(session_storage)
+    if not token_info:
+        print("⚠️ 頁面中沒有 token，不保存登入快取")
+        return False
+
+    _write_session(account_id, {
+        'account': account_id,
+        'saved_at': datetime.now(TAIPEI_TZ).isoformat(),
+        'storage_state': storage_state,
+        'session_storage': session_storage,
+        'token_info': token_info,
+    })
+    print(f"💾 登入狀態已快取: {_session_path(account_id)}")
+    return True
+
+
+def save_session(driver, account_id):
+    """保存目前上下文的登入狀態"""
+    try:
+        storage_state = driver['context'].storage_state()
+        session_storage = driver['page'].evaluate(SESSION_STORAGE_JS)
+        return store_session(account_id, storage_state, session_storage)
+    except Exception as e:
+        print(f"保存登入快取失敗: {e}")
+        return False
+
+
+def clear_session(account_id):
+    """刪除失效的登入快取"""
+    try:
+        os.remove(_session_path(account_id))
+    except FileNotFoundError:
+        pass
+
+
+def validate_token(token):
+    """用一次輕量 API 請求確認 token 是否仍有效"""
+    try:
+        response = requests.get(
+            f"{API_BASE}/Account/UserProfile",
+            headers=_api_headers(token),
+            timeout=REQUEST_TIMEOUT
+        )
+        return response.status_code == 200
+    except requests.RequestException as e:
+        print(f"驗證 token 失敗: {e}")
+        return False
+
+
+def refresh_token(token_info):
+    """呼叫 /Account/RefreshToken 換發 token，回傳新的 tokenInfo"""
+    try:
+        response = requests.post(
+            f"{API_BASE}/Account/RefreshToken",
+            json={'RefreshToken': token_info.get('RefreshToken')},
+            headers=_api_headers(token_info.get('Token')),
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            print(f"換發 token 失敗: HTTP {response.status_code}")
+            return None
+        data = response.json()
+        if not data.get('Success') or not data.get('Data', {}).get('Token'):
+            print(f"換發 token 失敗: {data.get('Message')}")
+            return None
+        return data['Data']
+    except (requests.RequestException, ValueError) as e:
+        print(f"換發 token 失敗: {e}")
+        return None
+
+
+def _apply_token_info(data, token_info):
+    """把新的 tokenInfo 寫回快取資料（含 sessionStorage 中的 store）"""
+    data['token_info'] = token_info
+    session_storage = data.get('session_storage') or {}
+    try:
+        store = json.loads(session_storage.get(TOKEN_STORE_KEY) or '{}')
+    except ValueError:
+        store = {}
+    store['tokenInfo'] = token_info
+    session_storage[TOKEN_STORE_KEY] = json.dumps(store, ensure_ascii=False)
+    data['session_storage'] = session_storage
+    data['refreshed_at'] = datetime.now(TAIPEI_TZ).isoformat()
+
+
+def refresh_session(account_id, force=False):
+    """換發單一帳號快取中的 token，回傳更新後的快取資料"""
+    data = load_session(account_id)
+    if not data or not data.get('token_info'):
+        return None
+
+    seconds_left = token_seconds_left(data['token_info'])
+    if not force and seconds_left is not None and seconds_left > REFRESH_MARGIN_SECONDS:
+        return data
+
+    new_token_info = refresh_token(data['token_info'])
+    if not new_token_info:
+        return None
+
+    _apply_token_info(data, new_token_info)
+    _write_session(account_id, data)
+    print(f"🔄 帳號 {account_id} 的 token 已換發")
+    return data
+
+
+def _restore_script(session_storage, local_storage):
+    """產生還原 sessionStorage/localStorage 的 init script（每個分頁只還原一次）"""
+    payload = json.dumps({
+        'origin': SITE_URL,
+        'session': session_storage,
+        'local': local_storage,
+    }, ensure_ascii=False)
+    return f"""
+    (() => {{
+        const data = {payload};
+        if (window.location.origin !== data.origin) return;
+        if (window.sessionStorage.getItem('__session_cache_restored')) return;
+        Object.entries(data.session).forEach(([k, v]) => window.sessionStorage.setItem(k, v));
+        Object.entries(data.local).forEach(([k, v]) => window.localStorage.setItem(k, v));
+        window.sessionStorage.setItem('__session_cache_restored', '1');
+    }})();
+    """
+
+
+def prepare_restore(account_id):
+    """驗證（必要時換發）快取的登入狀態，回傳要套用到上下文的 cookies 與 init script
+
+    只做 HTTP 請求、不操作瀏覽器，同步與非同步引擎共用。
+    沒有可用的快取時回傳 None。
+    """
+    data = load_session(account_id)
+    if not data or not data.get('token_info'):
+        print("ℹ️ 沒有登入快取，需要完整登入")
+        return None
+
+    # 快要過期的 token 先換發
+    refreshed = refresh_session(account_id)
+    if refreshed:
+        data = refreshed
+
+    if not validate_token(data['token_info']['Token']):
+        # 驗證失敗時強制換發一次
+        refreshed = refresh_session(account_id, force=True)
+        if not refreshed or not validate_token(refreshed['token_info']['Token']):
+            print("⚠️ 登入快取已失效，需要完整登入")
+            clear_session(account_id)
+            return None
+        data = refreshed
+
+    storage_state = data.get('storage_state') or {}
+    local_storage = {}
+    for origin in storage_state.get('origins') or []:
+        if origin.get('origin') == SITE_URL:
+            local_storage = {item['name']: item['value'] for item in origin.get('localStorage', [])}
+
+    return {
+        'cookies': storage_state.get('cookies') or [],
+        'init_script': _restore_script(data.get('session_storage') or {}, local_storage),
+    }
+
+
+def restore_session(driver, account_id):
+    """還原快取的登入狀態到 driver 的上下文
+
+    必須在載入網站之前呼叫。token 失效且無法換發時回傳 False，
+    呼叫端應改走完整登入流程。
+    """
+    restore = prepare_restore(account_id)
+    if not restore:
+        return False
+
+    try:
+        if restore['cookies']:
+            driver['context'].add_cookies(restore['cookies'])
+        driver['context'].add_init_script(restore['init_script'])
+        print(f"✅ 已還原帳號 {account_id} 的登入快取")
+        return True
+    except Exception as e:
+        print(f"還原登入快取失敗: {e}")
+        return False
+
+
+def refresh_all_sessions(force=True):
+    """換發所有快取帳號的 token，讓登入狀態在排程之間保持有效"""
+    if not os.path.isdir(SESSION_DIR):
+        print("沒有任何登入快取")
+        return 0
+
+    refreshed = 0
+    for filename in sorted(os.listdir(SESSION_DIR)):
+        if not filename.endswith('.json'):
+            continue
+        account_id = filename[:-len('.json')]
+        if refresh_session(account_id, force=force):
+            refreshed += 1
+        else:
+            print(f"⚠️ 帳號 {account_id} 換發失敗，下次執行將重新登入")
+            clear_session(account_id)
+    return refreshed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='登入狀態快取')
+    parser.add_argument('--refresh', action='store_true', help='換發所有快取帳號的 token')
+    args = parser.parse_args(argv)
+
+    if args.refresh:
+        count = refresh_all_sessions()
+        print(f"已換發 {count} 個帳號的 token")
+        return 0
+
+    parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+預約日期與時段的預先檢查
+
+新增預約頁（/AddAppointment/）的日期、時段選單不是由 API 取得，而是頁面在載入時計算：
+    #appointment_date     今天 +3 ~ +14 天（值為 YYYY-MM-DD，文字為 YYYY-MM-DD(週X)）
+    #appointment_hour     00 ~ 23
+    #appointment_minutes  00 ~ 55，每 5 分鐘
+第一個選項都是值為空的「請選擇」。
+
+原本的流程要到填完上下車地點後才看日期選單，並直接點最後一個選項。
+這裡在開始之前先算出目標時段（plan），沒有可預約的時段時立即失敗，
+或改用預約設定中的備用時段（fallback）；開啟新增預約後再以一次頁面讀取（read_slots）
+確認頁面實際提供的選項（瀏覽器時區與台北不同時日期範圍會差一天），以頁面為準重新計算。
+預先就緒模式在放號前就開啟表單，選單仍是前一天的範圍，因此以放號當天（release_day）計算，
+放號時刻選單中沒有目標日期時以 date_label 的文字補上選項。
+"""
+
+from datetime import datetime, timedelta
+
+import reservation_spec
+
+FIRST_DAY = 3
+LAST_DAY = 14
+HOURS = [f"{hour:02d}" for hour in range(24)]
+MINUTES = [f"{minute:02d}" for minute in range(0, 60, 5)]
+WEEKDAYS = ['一', '二', '三', '四', '五', '六', '日']
+
+# 一次讀取日期、時、分三個選單的選項值（不含「請選擇」），選單不存在時回傳 null
+SLOTS_JS = '''
+() => {
+    const values = id => {
+        const select = document.getElementById(id);
+        return select ? Array.from(select.options).map(o => o.value).filter(v => v) : null;
+    };
+    const dates = values('appointment_date');
+    if (dates === null) return null;
+    return {dates: dates, hours: values('appointment_hour') || [], minutes: values('appointment_minutes') || []};
+}
+'''
+
+
+def computed_slots(today=None):
+    """依頁面的規則算出可預約的日期與時段（台北時間）"""
+    today = today or datetime.now(reservation_spec.TAIPEI_TZ).date()
+    return {
+        'dates': [(today + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(FIRST_DAY, LAST_DAY + 1)],
+        'hours': list(HOURS),
+        'minutes': list(MINUTES),
+    }
+
+
+def date_label(date):
+    """日期選項的文字（與頁面相同為 YYYY-MM-DD(週X)）"""
+    weekday = datetime.strptime(date, '%Y-%m-%d').weekday()
+    return f"{date}(週{WEEKDAYS[weekday]})"
+
+
+def release_day(submit_at=None):
+    """放號時刻（台北時間）的日期，沒有指定放號時刻時回傳 None（以今天計算）"""
+    if submit_at is None:
+        return None
+    return submit_at.astimezone(reservation_spec.TAIPEI_TZ).date()
+
+
+def read_slots(driver):
+    """以一次頁面讀取取得實際的日期與時段選項，讀不到時回傳 None"""
+    try:
+        slots = driver['page'].evaluate(SLOTS_JS)
+    except Exception as e:
+        print(f"讀取日期時段選單失敗: {e}")
+        return None
+    if not slots or not slots['dates']:
+        return None
+    return slots
+
+
+def _resolve(date_rule, hour, minute, slots, today=None):
+    dates = slots['dates']
+    if not dates:
+        return None, "沒有可預約的日期"
+    if date_rule == 'last':
+        date = dates[-1]
+    elif date_rule == 'first':
+        date = dates[0]
+    else:
+        date = reservation_spec.resolve_date(date_rule, today)
+        if date not in dates:
+            return None, f"{date} 不在可預約的日期 {dates[0]} ~ {dates[-1]} 內"
+    if hour not in slots['hours'] or minute not in slots['minutes']:
+        return None, f"{hour}:{minute} 不是可預約的時段"
+    return {'date': date, 'hour': hour, 'minute': minute}, None
+
+
+def plan(spec, slots=None, today=None):
+    """算出預約設定的目標時段，回傳 (時段, 訊息)
+
+    時段為 {'date', 'hour', 'minute', 'fallback'}；主要時段不可預約時改用 spec['fallback']，
+    兩者都不可預約時時段為 None，訊息說明原因。
+    """
+    slots = slots or computed_slots(today)
+    slot, reason = _resolve(spec['date'], spec['hour'], spec['minute'], slots, today)
+    if slot:
+        return dict(slot, fallback=False), None
+    fallback = spec.get('fallback')
+    if not fallback:
+        return None, reason
+    fallback_slot, fallback_reason = _resolve(fallback['date'], fallback['hour'], fallback['minute'], slots, today)
+    if fallback_slot:
+        return dict(fallback_slot, fallback=True), f"{reason}，改用備用時段"
+    return None, f"{reason}；備用時段 {fallback_reason}"
+
+
+def apply(spec, slot):
+    """把目標時段寫回預約設定（日期換成明確的 YYYY-MM-DD）"""
+    return dict(spec, date=slot['date'], hour=slot['hour'], minute=slot['minute'],
+                time=f"{slot['hour']}:{slot['minute']}")
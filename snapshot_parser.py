@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+訂單頁 HTML 快照的離線解析
+
+fetch_dispatch_results 在訂單列表載入、展開後只取一次訂單容器的 outerHTML
+（存到 snapshots/），之後就可以關閉瀏覽器，記錄在 Python 端以標準函式庫的
+html.parser 解析。解析結果與 order_dom.ORDER_EXTRACT_JS 的原始資料格式相同，
+派車判定沿用 order_dom.classify_orders（派車/執行/完成 關鍵字、目前狀態標籤、
+司機/車號/電話的擷取規則），因此可以直接以保存的快照做單元測試。
+
+歷史快照可在多個 CPU 核心上平行解析（回補歷史資料）：
+    python3 snapshot_parser.py snapshots/*.html --workers 4 --output backfill.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+
+import pytz
+
+import dispatch_records
+import order_dom
+
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+SNAPSHOT_DIR = os.environ.get('DISPATCH_SNAPSHOT_DIR', 'snapshots')
+
+# 取得訂單容器 outerHTML 的腳本（參數為 order_dom.CONTAINER_SELECTORS）
+SNAPSHOT_JS = '''
+containerSelectors => {
+    for (const selector of containerSelectors) {
+        const el = document.querySelector(selector);
+        if (el) return {container: selector, html: el.outerHTML};
+    }
+    return {container: null, html: document.documentElement.outerHTML};
+}
+'''
+
+# 不含結束標籤的元素
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# 不產生文字的元素
+SKIP_TEXT_TAGS = {'script', 'style', 'template'}
+
+# 記錄的識別類別（網站範本為 div.order_list.log）
+RECORD_CLASSES = {'order_list', 'log'}
+
+STATE_ACTIVE_CLASSES = {'active', 'current', 'selected', 'highlight'}
+
+TIME_SELECTORS = ['.order_blocks.date .text', '.order_date', '.booking-date', '.appointment-time',
+                  '[class*="date"]', '[class*="time"]', '[class*="appointment"]',
+                  '.ride-time', '.reservation-time', '.schedule-time']
+ROUTE_SELECTORS = ['.route', '.origin', '.destination', '[class*="route"]']
+
+HIDDEN_STYLE = re.compile(r'display\s*:\s*none')
+SNAPSHOT_TIME = re.compile(r'(\d{8}_\d{6})')
+
+
+class Node:
+    __slots__ = ('tag', 'attrs', 'classes', 'children', 'parent', 'text')
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.classes = set((self.attrs.get('class') or '').split())
+        self.children = []
+        self.parent = parent
+        self.text = None
+
+    @property
+    def hidden(self):
+        return bool(HIDDEN_STYLE.search(self.attrs.get('style') or ''))
+
+    def iter(self):
+        """深度優先走過所有子孫元素（不含文字節點與自己）"""
+        stack = [child for child in reversed(self.children) if child.tag]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if child.tag)
+
+    def lines(self, visible_only=False):
+        """逐行的文字內容；visible_only 時略過 display:none 的子樹（相當於 innerText）"""
+        lines = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.tag is None:
+                line = node.text.strip()
+                if line:
+                    lines.append(line)
+                continue
+            if node.tag in SKIP_TEXT_TAGS or (visible_only and node.hidden):
+                continue
+            stack.extend(reversed(node.children))
+        return lines
+
+    def inner_text(self):
+        return '\n'.join(self.lines(visible_only=True))
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#document')
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: (v or '') for k, v in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Node(tag, {k: (v or '') for k, v in attrs}, self.current))
+
+    def handle_endtag(self, tag):
+        # 找到對應的開始標籤才關閉，容忍不對稱的 HTML
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        text = Node(None, parent=self.current)
+        text.text = data
+        self.current.children.append(text)
+
+
+def parse_html(html):
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+# ----------------------------------------------------------------------
+# 精簡的 CSS 選擇器（標籤、.類別、[屬性*=|^=|=] 與子孫組合）
+# ----------------------------------------------------------------------
+
+_COMPOUND = re.compile(r'([a-zA-Z][\w-]*)|\.([\w-]+)|\[([\w-]+)(?:([*^]?=)"([^"]*)")?\]')
+
+
+def _compile_compound(text):
+    tests = []
+    for tag, cls, attr, op, value in _COMPOUND.findall(text):
+        if tag:
+            tests.append(lambda n, tag=tag: n.tag == tag)
+        elif cls:
+            tests.append(lambda n, cls=cls: cls in n.classes)
+        elif not op:
+            tests.append(lambda n, attr=attr: attr in n.attrs)
+        elif op == '*=':
+            tests.append(lambda n, attr=attr, value=value: value in (n.attrs.get(attr) or ''))
+        elif op == '^=':
+            tests.append(lambda n, attr=attr, value=value: (n.attrs.get(attr) or '').startswith(value))
+        else:
+            tests.append(lambda n, attr=attr, value=value: n.attrs.get(attr) == value)
+    return lambda n: all(test(n) for test in tests)
+
+
+_selector_cache = {}
+
+
+def _compile(selector):
+    compiled = _selector_cache.get(selector)
+    if compiled is None:
+        compiled = [[_compile_compound(part) for part in group.split()] for group in selector.split(',')]
+        _selector_cache[selector] = compiled
+    return compiled
+
+
+def _matches(node, chain, scope):
+    if not chain[-1](node):
+        return False
+    index = len(chain) - 2
+    ancestor = node.parent
+    while index >= 0 and ancestor is not None and ancestor is not scope:
+        if chain[index](ancestor):
+            index -= 1
+        ancestor = ancestor.parent
+    return index < 0
+
+
+def select(scope, selector):
+    """scope 內符合 selector 的元素（文件順序）"""
+    chains = _compile(selector)
+    return [node for node in scope.iter() if any(_matches(node, chain, scope) for chain in chains)]
+
+
+def select_one(scope, selector):
+    chains = _compile(selector)
+    for node in scope.iter():
+        if any(_matches(node, chain, scope) for chain in chains):
+            return node
+    return None
+
+
+def _text_of(scope, selector):
+    node = select_one(scope, selector)
+    return node.inner_text().strip() if node else ''
+
+
+# ----------------------------------------------------------------------
+# 記錄擷取（與 order_dom.ORDER_EXTRACT_JS 的輸出相同）
+# ----------------------------------------------------------------------
+
+def find_container(root):
+    for selector in order_dom.CONTAINER_SELECTORS:
+        node = select_one(root, selector)
+        if node is not None:
+            return selector, node
+    return None, root
+
+
+def _record_nodes(container):
+    records = []
+    for node in container.iter():
+        if node.classes & RECORD_CLASSES:
+            # 巢狀的記錄元素只取最外層
+            parent = node.parent
+            while parent is not None and parent is not container and not (parent.classes & RECORD_CLASSES):
+                parent = parent.parent
+            if parent is None or parent is container:
+                records.append(node)
+    return records
+
+
+def _state(record):
+    state_tag = select_one(record, '.state_tag, [class*="state"], [class*="status"]')
+    if state_tag is None:
+        return '', None
+    state_text = state_tag.inner_text().strip()
+    chosen = next((child for child in state_tag.children if child.tag and child.classes & STATE_ACTIVE_CLASSES), None)
+    if chosen is None:
+        visible = [child for child in state_tag.children if child.tag and not child.hidden]
+        chosen = visible[0] if len(visible) == 1 else None
+    return state_text, (chosen.inner_text().strip() if chosen else None)
+
+
+def extract_record(node):
+    """單筆記錄元素轉成原始資料（欄位同 ORDER_EXTRACT_JS）"""
+    state_text, active_state = _state(node)
+
+    places = []
+    for block in select(node, '.order_blocks'):
+        if select_one(block, '.order_title.place'):
+            places.append(' '.join(part for part in [_text_of(block, '.location'), _text_of(block, '.address')] if part))
+
+    route = ''
+    for selector in ROUTE_SELECTORS:
+        text = _text_of(node, selector)
+        if len(text) > 2:
+            route = text
+            break
+
+    time_text = ''
+    for selector in TIME_SELECTORS:
+        time_text = _text_of(node, selector)
+        if time_text:
+            break
+
+    contact_phone = ''
+    button = select_one(node, '[aria-label^="聯絡車隊"]')
+    if button is not None:
+        match = re.search(r'\(([^)]+)\)', button.attrs.get('aria-label') or '')
+        contact_phone = match.group(1) if match else ''
+
+    toggle = select_one(node, '.toggle_area')
+    return {
+        'classes': node.attrs.get('class') or '',
+        'text': node.inner_text(),
+        'state_text': state_text,
+        'active_state': active_state,
+        'vue_status': None,
+        'time_text': time_text,
+        'create_time': _text_of(node, '.order_time'),
+        'route': route,
+        'places': places,
+        'contact_phone': contact_phone,
+        'detail': '\n'.join(toggle.lines()) if toggle is not None else '',
+    }
+
+
+def parse_snapshot(html):
+    """解析快照，回傳 (容器選擇器, 原始記錄列表)"""
+    container_selector, container = find_container(parse_html(html))
+    return container_selector, [extract_record(node) for node in _record_nodes(container)]
+
+
+# ----------------------------------------------------------------------
+# 快照的保存與批次解析
+# ----------------------------------------------------------------------
+
+def capture_snapshot(page, current_time):
+    """取一次訂單容器的 outerHTML 並保存，回傳 (html, 檔案路徑)"""
+    payload = page.evaluate(SNAPSHOT_JS, order_dom.CONTAINER_SELECTORS)
+    path = None
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = os.path.join(SNAPSHOT_DIR, f"dispatch_{current_time.strftime('%Y%m%d_%H%M%S')}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(payload['html'])
+        print(f"📸 訂單快照已保存: {path}（{len(payload['html']) // 1024} KB）")
+    except Exception as e:
+        print(f"保存訂單快照失敗: {e}")
+    return payload['html'], path
+
+
+def _snapshot_time(path):
+    match = SNAPSHOT_TIME.search(os.path.basename(path))
+    if match:
+        return TAIPEI_TZ.localize(datetime.strptime(match.group(1), '%Y%m%d_%H%M%S'))
+    return datetime.fromtimestamp(os.path.getmtime(path), TAIPEI_TZ)
+
+
+def parse_file(path):
+    """解析單一快照檔，回傳與 dispatch_results.json 相同結構的結果（附上檔名）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        _, raw_records = parse_snapshot(f.read())
+    results = order_dom.classify_orders(raw_records)
+    data = dispatch_records.build_results(len(raw_records), results, _snapshot_time(path))
+    data['snapshot'] = path
+    data['source'] = 'snapshot'
+    return data
+
+
+def parse_files(paths, workers=None):
+    """在多個行程中平行解析快照檔（依檔名排序回傳）"""
+    paths = sorted(paths)
+    if workers == 1 or len(paths) <= 1:
+        return [parse_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_file, paths, chunksize=max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='訂單頁 HTML 快照的離線解析')
+    parser.add_argument('paths', nargs='*', help=f'快照檔（預設: {SNAPSHOT_DIR}/ 中的所有 .html）')
+    parser.add_argument('--workers', type=int, default=None, help='平行解析的行程數（預設: CPU 核心數）')
+    parser.add_argument('--output', default=None, help='把結果寫入 JSON 檔')
+    args = parser.parse_args(argv)
+
+    paths = args.paths
+    if not paths and os.path.isdir(SNAPSHOT_DIR):
+        paths = [os.path.join(SNAPSHOT_DIR, name) for name in os.listdir(SNAPSHOT_DIR) if name.endswith('.html')]
+    if not paths:
+        print("沒有快照檔")
+        return 1
+
+    started = datetime.now()
+    results = parse_files(paths, args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+    for data in results:
+        print(f"{data['snapshot']}: {data['total_records']} 筆記錄，{data['dispatch_records']} 筆已派車")
+    print(f"✅ 解析 {len(results)} 個快照，耗時 {elapsed:.2f} 秒")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果已保存到 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
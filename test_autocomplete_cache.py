@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+測試地點搜尋建議快取的記住與作廢
+快取寫到暫存目錄，不影響實際的 autocomplete_cache.json
+"""
+
+import json
+import os
+import tempfile
+
+import autocomplete_cache
+
+ITEMS = [
+    {'text': '亞東紀念醫院急診新北市板橋區南雅南路二段', 'main': '亞東紀念醫院急診'},
+    {'text': '亞東紀念醫院新北市板橋區南雅南路二段21號', 'main': '亞東紀念醫院'},
+]
+
+
+def test_remember_and_invalidate():
+    original = autocomplete_cache.CACHE_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        autocomplete_cache.CACHE_FILE = os.path.join(tmp, 'autocomplete_cache.json')
+        autocomplete_cache._entries = None
+        try:
+            value = '亞東紀念醫院, 220新北市板橋區南雅南路二段21號'
+            # 選中的是名稱出現在輸入框值中的第二筆，而不是第一筆
+            assert autocomplete_cache.chosen_position(ITEMS, value) == 1
+            entry = autocomplete_cache.remember('亞東紀念醫院', ITEMS, value)
+            assert entry['position'] == 1 and entry['text'] == ITEMS[1]['text'] and entry['value'] == value
+
+            with open(autocomplete_cache.CACHE_FILE, 'r', encoding='utf-8') as f:
+                assert json.load(f)['亞東紀念醫院']['position'] == 1
+            # 沒有建議或值為空時不記住
+            assert autocomplete_cache.remember('臺大醫院', [], value) is None
+            assert autocomplete_cache.remember('臺大醫院', ITEMS, ' ') is None
+
+            autocomplete_cache.invalidate('亞東紀念醫院', '測試')
+            assert autocomplete_cache.lookup('亞東紀念醫院') is None
+            assert autocomplete_cache.stats()['invalidations'] == 1
+        finally:
+            autocomplete_cache.CACHE_FILE = original
+            autocomplete_cache._entries = None
+
+
+if __name__ == "__main__":
+    test_remember_and_invalidate()
+    print("✅ autocomplete_cache 測試通過")
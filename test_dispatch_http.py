@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+測試不開瀏覽器的派車查詢
+以 dispatch_stub_server 重播 fixtures/dispatch_orders.json，不需要連線到網站
+"""
+
+import dispatch_http
+from dispatch_stub_server import start_server
+
+ACCOUNT = {'id': 'A123456789', 'password': 'secret'}
+
+
+def test_fetch_dispatch_results():
+    server, api_base = start_server()
+    try:
+        dispatch_http._tokens.clear()
+        dispatch_http.PER_PAGE = 4
+        result = dispatch_http.fetch_dispatch_results(ACCOUNT, api_base, save=False)
+
+        assert result['success'], result
+        assert result['source'] == 'http'
+        data = result['data']
+        assert data['total_records'] == 6
+        assert data['dispatch_records'] == 2
+        assert {r['order_id'] for r in data['results']} == {90211, 90188}
+
+        record = next(r for r in data['results'] if r['order_id'] == 90211)
+        assert record['date'] == '2025-06-26'
+        assert record['time'] == '09:30'
+        assert record['driver'] == '王大明'
+        assert record['vehicle'] == 'RAB-1234'
+        assert record['route'] == '住家 新北市板橋區文化路一段100號 → 醫療機構 亞東紀念醫院'
+
+        # 兩頁訂單 + 兩筆明細 + 一次登入
+        assert sum(1 for method, _ in server.requests if method == 'POST') == 1
+        assert len(server.requests) == 5
+    finally:
+        server.shutdown()
+        dispatch_http.PER_PAGE = 50
+
+
+def test_token_reused():
+    server, api_base = start_server()
+    try:
+        dispatch_http._tokens.clear()
+        dispatch_http.fetch_dispatch_results(ACCOUNT, api_base, save=False)
+        dispatch_http.fetch_dispatch_results(ACCOUNT, api_base, save=False)
+        assert sum(1 for method, _ in server.requests if method == 'POST') == 1
+    finally:
+        server.shutdown()
+
+
+def test_expired_token_signs_in_again():
+    server, api_base = start_server()
+    try:
+        dispatch_http._tokens[ACCOUNT['id']] = 'expired-token'
+        result = dispatch_http.fetch_dispatch_results(ACCOUNT, api_base, save=False)
+        assert result['success'], result
+        assert dispatch_http._tokens[ACCOUNT['id']] == 'stub-token'
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_fetch_dispatch_results()
+    test_token_reused()
+    test_expired_token_signs_in_again()
+    print("✅ dispatch_http 測試通過")
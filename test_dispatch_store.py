@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+測試派車查詢歷史（SQLite）
+資料庫建在暫存目錄，不影響實際的 dispatch_history.db
+"""
+
+import os
+import tempfile
+
+import dispatch_store
+
+
+def _record(order_id, date, time_text, status='已派車', driver='王大明'):
+    return {'index': 1, 'order_id': order_id, 'status': status, 'date': date, 'time': time_text,
+            'route': 'A → B', 'vehicle': 'RAB-1234', 'driver': driver, 'contact': '0229561234'}
+
+
+def _results(timestamp, *records):
+    return {'timestamp': timestamp, 'source': 'api', 'total_records': 6,
+            'dispatch_records': len(records), 'results': list(records)}
+
+
+def _with_db(test):
+    def run():
+        original = dispatch_store.DB_FILE
+        with tempfile.TemporaryDirectory() as tmp:
+            dispatch_store.DB_FILE = os.path.join(tmp, 'dispatch_history.db')
+            try:
+                test()
+            finally:
+                dispatch_store.close()
+                dispatch_store.DB_FILE = original
+    run.__name__ = test.__name__
+    return run
+
+
+@_with_db
+def test_wal_and_indexes():
+    conn = dispatch_store.connect()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_records_date', 'idx_records_status', 'idx_records_account_order'} <= indexes
+    plan = ' '.join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM records WHERE date >= '2025-06-01' AND date <= '2025-06-30'"))
+    assert 'idx_records_date' in plan
+
+
+@_with_db
+def test_queries():
+    dispatch_store.record_run(_results('2025-06-23 00:10:00', _record(1, '2025-06-26', '09:30'),
+                                       _record(2, '2025-06-27', '10:00')), 'A123456789')
+    dispatch_store.record_run(_results('2025-06-26 00:10:00', _record(1, '2025-06-26', '09:30', '執行中', '陳志明'),
+                                       _record(3, '2025-07-01', '08:00')), 'A123456789')
+    dispatch_store.record_run(_results('2025-06-26 00:11:00', _record(9, '2025-06-28', '14:00')), 'B987654321')
+
+    latest = dispatch_store.latest_run('A123456789')
+    assert latest['timestamp'] == '2025-06-26 00:10:00'
+    assert [r['order_id'] for r in latest['results']] == [1, 3]
+    assert dispatch_store.latest_run()['account'] == 'B987654321'
+
+    # 每筆訂單只取最近一次，依日期排序
+    records = dispatch_store.latest_per_order('A123456789')
+    assert [r['order_id'] for r in records] == [1, 2, 3]
+    assert records[0]['driver'] == '陳志明' and records[0]['status'] == '執行中'
+
+    june = dispatch_store.latest_per_order(date_from='2025-06-01', date_to='2025-06-30')
+    assert [r['order_id'] for r in june] == [1, 2, 9]
+    assert [r['order_id'] for r in dispatch_store.latest_per_order(status='執行中')] == [1]
+
+    assert dispatch_store.status_counts('A123456789') == {'已派車': 2, '執行中': 1}
+    assert dispatch_store.status_counts(date_from='2025-06-27') == {'已派車': 3}
+    assert [run['account'] for run in dispatch_store.recent_runs(limit=2)] == ['B987654321', 'A123456789']
+
+
+@_with_db
+def test_same_order_across_sources():
+    # API 有訂單編號、快照沒有：同一筆訂單不論先後都只算一次
+    snapshot = _record(None, '2025-06-26', '09:30')
+    dispatch_store.record_run(_results('2025-06-23 00:10:00', snapshot, _record(None, '2025-06-27', '10:00')),
+                              'A123456789')
+    dispatch_store.record_run(_results('2025-06-24 00:10:00', _record(1, '2025-06-26', '09:30')), 'A123456789')
+    dispatch_store.record_run(_results('2025-06-25 00:10:00', dict(snapshot, driver='陳志明')), 'A123456789')
+
+    records = dispatch_store.latest_per_order('A123456789')
+    assert [(r['date'], r['driver']) for r in records] == [('2025-06-26', '陳志明'), ('2025-06-27', '王大明')]
+    keys = {row[0] for row in dispatch_store.connect().execute('SELECT order_key FROM records')}
+    assert 'id:1' in keys and len(keys) == 2
+
+
+if __name__ == "__main__":
+    test_wal_and_indexes()
+    test_queries()
+    test_same_order_across_sources()
+    print("✅ dispatch_store 測試通過")
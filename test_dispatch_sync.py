@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+測試派車結果的增量同步
+狀態寫到暫存目錄，不影響實際的 dispatch_state.json
+"""
+
+import os
+import tempfile
+
+import dispatch_sync
+
+
+def _record(order_id, date, time_text, route, driver='王大明', index=1):
+    return {'index': index, 'order_id': order_id, 'date': date, 'time': time_text,
+            'route': route, 'driver': driver, 'vehicle': 'RAB-1234', 'css_classes': 'order_list'}
+
+
+def _results(*records):
+    return {'timestamp': '2025-06-23 00:10:00', 'source': 'api', 'dispatch_records': len(records),
+            'results': list(records)}
+
+
+def _with_state_file(test):
+    def run():
+        original = dispatch_sync.STATE_FILE
+        with tempfile.TemporaryDirectory() as tmp:
+            dispatch_sync.STATE_FILE = os.path.join(tmp, 'dispatch_state.json')
+            try:
+                test()
+            finally:
+                dispatch_sync.STATE_FILE = original
+    run.__name__ = test.__name__
+    return run
+
+
+def test_order_key():
+    assert dispatch_sync.order_key({'order_id': 90211}) == 'id:90211'
+    a = dispatch_sync.order_key({'date': '2025-06-26', 'time': '09:30', 'route': 'A → B'})
+    b = dispatch_sync.order_key({'date': '2025-06-26', 'time': '09:30', 'route': 'A → B', 'index': 7})
+    assert a == b and a.startswith('h:')
+
+
+@_with_state_file
+def test_sync_detects_changes():
+    first = _results(_record(1, '2025-06-26', '09:30', 'A → B'), _record(2, '2025-06-27', '10:00', 'B → A'))
+    delta = dispatch_sync.sync_results(first, 'A123456789')
+    assert len(delta['new']) == 2
+    assert first['delta']['new'] == 2
+
+    # 1 換了司機（位置也變了，但位置不算變化），2 消失且已取消，3 新增
+    second = _results(_record(1, '2025-06-26', '09:30', 'A → B', driver='陳志明', index=3),
+                      _record(3, '2025-06-28', '08:00', 'A → C'))
+    delta = dispatch_sync.sync_results(second, 'A123456789', {'id:1': '派車', 'id:2': '取消', 'id:3': '派車'})
+    assert [item['key'] for item in delta['new']] == ['id:3']
+    assert [item['key'] for item in delta['changed']] == ['id:1']
+    assert delta['changed'][0]['changes'] == {'driver': ['王大明', '陳志明']}
+    assert [item['key'] for item in delta['cancelled']] == ['id:2']
+    assert delta['completed'] == []
+    assert dispatch_sync.last_delta('A123456789')['cancelled'][0]['key'] == 'id:2'
+
+    # 其他帳號的狀態互不影響
+    assert dispatch_sync.last_delta('B987654321') is None
+
+
+@_with_state_file
+def test_removed_without_statuses_uses_date():
+    dispatch_sync.sync_results(_results(_record(None, '2025-06-20', '09:30', 'A → B'),
+                                        _record(None, '2099-01-01', '09:30', 'A → C')), 'A123456789')
+    delta = dispatch_sync.sync_results(_results(), 'A123456789')
+    assert len(delta['completed']) == 1 and delta['completed'][0]['record']['date'] == '2025-06-20'
+    assert len(delta['cancelled']) == 1 and delta['cancelled'][0]['record']['date'] == '2099-01-01'
+
+
+@_with_state_file
+def test_duplicates_and_source_switch():
+    record = _record(None, '2025-06-26', '09:30', 'A → B')
+    results = _results(record, dict(record, index=2))
+    dispatch_sync.sync_results(results, 'A123456789')
+    # 同一筆被重複擷取時只保留一筆
+    assert results['dispatch_records'] == 1 and len(results['results']) == 1
+
+    # 下一次由 API 取得（有訂單編號），仍視為同一筆訂單
+    delta = dispatch_sync.sync_results(_results(_record(90211, '2025-06-26', '09:30', 'A → B')), 'A123456789')
+    assert delta['new'] == [] and delta['cancelled'] == [] and delta['changed'] == []
+    assert delta['unchanged'] == 1
+
+
+if __name__ == "__main__":
+    test_order_key()
+    test_sync_detects_changes()
+    test_removed_without_statuses_uses_date()
+    test_duplicates_and_source_switch()
+    print("✅ dispatch_sync 測試通過")
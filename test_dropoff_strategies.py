@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+測試下車地點策略的排序與成績表
+成績表寫到暫存目錄，不影響實際的 dropoff_scoreboard.json
+"""
+
+import json
+import os
+import tempfile
+
+import dropoff_strategies
+
+
+def _names(stage):
+    return [item['name'] for item in dropoff_strategies.ordered(stage)]
+
+
+def test_order_learns_from_scoreboard():
+    original = dropoff_strategies.SCOREBOARD_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        dropoff_strategies.SCOREBOARD_FILE = os.path.join(tmp, 'dropoff_scoreboard.json')
+        dropoff_strategies._scoreboard = None
+        try:
+            # 沒有紀錄時依原本的等待預算排序（預算相同時維持原本順序），最後手段排在最後
+            assert _names('home_select') == ['by_text', 'by_index', 'by_number', 'by_value']
+            assert _names('home_address')[-3:] == ['manual_fill', 'js_trigger', 'minimal_fill']
+
+            # 等待自動填入常常失敗又慢，點擊觸發快又穩定
+            for _ in range(5):
+                dropoff_strategies.record('home_address', 'wait_autofill', False, 8000)
+                dropoff_strategies.record('home_address', 'click_trigger', True, 300)
+            # 手動填入一定成功也不會被排到前面
+            for _ in range(5):
+                dropoff_strategies.record('home_address', 'manual_fill', True, 50)
+            names = _names('home_address')
+            assert names[0] == 'click_trigger'
+            assert names.index('wait_autofill') < names.index('manual_fill')
+            assert names[-3:] == ['manual_fill', 'js_trigger', 'minimal_fill']
+
+            # 成功率的平滑：一次失敗不會讓策略的預期耗時變成無限大
+            dropoff_strategies.record('home_select', 'by_value', False, 100)
+            by_value = dropoff_strategies.get_strategy('home_select', 'by_value')
+            assert dropoff_strategies.expected_ms('home_select', by_value) == 300
+
+            dropoff_strategies._save()
+            with open(dropoff_strategies.SCOREBOARD_FILE, 'r', encoding='utf-8') as f:
+                assert json.load(f)['home_address']['click_trigger']['successes'] == 5
+            board = dropoff_strategies.scoreboard()
+            assert board['home_address'][0]['name'] == 'click_trigger'
+        finally:
+            dropoff_strategies.SCOREBOARD_FILE = original
+            dropoff_strategies._scoreboard = None
+
+
+if __name__ == "__main__":
+    test_order_learns_from_scoreboard()
+    print("✅ dropoff_strategies 測試通過")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+測試預約選項頁一次性填寫的欄位對應與結果判定
+（頁面中的 JS 需要瀏覽器，這裡只測試 Python 端）
+"""
+
+import form_fill
+import reservation_spec
+
+
+def test_reservation_fields():
+    fields = form_fill.reservation_fields(reservation_spec.normalize({}))
+    by_name = {field['name']: field for field in fields}
+    assert [field['name'] for field in fields] == ['date', 'hour', 'minute', 'time_window', 'companions',
+                                                   'carpool', 'wheelchair', 'large_wheelchair']
+    assert by_name['date'] == {'name': 'date', 'select': 'date', 'position': 'last'}
+    assert (by_name['hour']['text'], by_name['minute']['text']) == ('16', '40')
+    # 共乘與大型輪椅都是「否」，以題目區分
+    assert by_name['carpool']['choice'] == by_name['large_wheelchair']['choice'] == '否'
+    assert by_name['carpool']['question'] != by_name['large_wheelchair']['question']
+
+    fields = form_fill.reservation_fields(reservation_spec.normalize({'date': '2025-06-30', 'time': '9:05'}))
+    assert fields[0]['date'] == '2025-06-30' and fields[1]['text'] == '09'
+
+
+def test_failed_fields():
+    results = {'date': {'found': True, 'expected': '2025-06-30'},
+               'hour': {'found': False, 'error': '找不到選單'},
+               'carpool': {'found': True, 'expected': '否'}}
+    state = {'date': {'ok': True}, 'carpool': {'ok': False, 'actual': None}}
+    assert form_fill.failed_fields(results, state) == ['hour', 'carpool']
+
+
+if __name__ == "__main__":
+    test_reservation_fields()
+    test_failed_fields()
+    print("✅ form_fill 測試通過")
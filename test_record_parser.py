@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+測試訂單記錄文字的解析規則
+與原本逐筆流程的判定寫法（_legacy_parse_record）逐筆比對結果
+"""
+
+import random
+import re
+
+import record_parser
+import snapshot_parser
+
+SNAPSHOT_FIXTURE = 'fixtures/order_snapshot_20250623_001000.html'
+
+
+def _legacy_parse_record(text, classes=''):
+    """原本的判定與擷取寫法（正確性對照）"""
+    if any(keyword in text for keyword in ['媒合中', '成立', '取消', '已取消', '待確認', '等待中']):
+        is_dispatch = False
+    elif any(cls in classes for cls in ['accept', 'established', 'cancel', 'waiting']):
+        is_dispatch = False
+    elif any(cls in classes for cls in ['dispatch', 'implement', 'finish']):
+        is_dispatch = True
+    else:
+        is_dispatch = any(keyword in text for keyword in ['派車', '執行', '完成', '已派車', '指派司機', '車號'])
+
+    if '派車' in text or 'dispatch' in classes:
+        status = '已派車'
+    elif '執行' in text or 'implement' in classes:
+        status = '執行中'
+    elif '完成' in text or 'finish' in classes:
+        status = '已完成'
+    else:
+        status = '派車相關'
+
+    parsed = {
+        'is_dispatch': is_dispatch,
+        'status': status,
+        'has_driver_info': any(keyword in text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話', '駕駛']),
+        'assigned': any(keyword in text for keyword in ['指派司機', '司機姓名', '車號', '聯絡電話']),
+        'date': 'N/A',
+        'time': 'N/A',
+        'vehicle': 'N/A',
+        'driver': 'N/A',
+        'contact': 'N/A',
+    }
+
+    match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})\s+(\d{1,2}:\d{2})', text)
+    if match:
+        parsed['date'], parsed['time'] = match.group(1).replace('/', '-'), match.group(2)
+    else:
+        match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})', text)
+        if match:
+            parsed['date'] = match.group(1).replace('/', '-')
+
+    for pattern in ['車號', '車牌', '車輛']:
+        match = re.search(f'{pattern}[：:]\\s*([A-Z0-9\\-]+)', text)
+        if match:
+            parsed['vehicle'] = match.group(1)
+            break
+    for pattern in ['司機', '駕駛', '指派司機']:
+        match = re.search(f'{pattern}[：:]\\s*([^\\s\\n]+)', text)
+        if match:
+            parsed['driver'] = match.group(1)
+            break
+    match = re.search(r'(\d{2,4}-?\d{6,8}|\d{10})', text)
+    if match:
+        parsed['contact'] = match.group(1)
+    return parsed
+
+
+def _parse_record(text, classes=''):
+    parsed = record_parser.parse_record(text, classes)
+    parsed['assigned'] = record_parser.is_assigned(parsed.pop('keywords'))
+    return parsed
+
+
+FRAGMENTS = ['派車', '已派車', '執行', '完成', '取消', '成立', '媒合中', '指派司機', '司機姓名', '司機', '駕駛',
+             '車號', '車牌', '車輛', '聯絡電話', ':', '：', ' ', '\n', 'RAB-1234', '王大明', '0922333444',
+             '02-29561234', '2025/06/26', '09:30', '號', '派', '車', '-', '12345678']
+
+
+def test_snapshot_matches_legacy():
+    with open(SNAPSHOT_FIXTURE, 'r', encoding='utf-8') as f:
+        _, raw_records = snapshot_parser.parse_snapshot(f.read())
+    assert raw_records
+    for raw in raw_records:
+        text, classes = f"{raw['text']}\n{raw['detail']}", raw['classes']
+        assert _parse_record(text, classes) == _legacy_parse_record(text, classes), text
+
+
+def test_random_texts_match_legacy():
+    rng = random.Random(20250623)
+    for _ in range(5000):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 12)))
+        classes = rng.choice(['', 'order_list log dispatch', 'order_list log cancel', 'order_list log finish'])
+        assert _parse_record(text, classes) == _legacy_parse_record(text, classes), repr(text)
+
+
+def test_overlapping_keywords():
+    assert record_parser.scan('派車號') == {'派車', '車號'}
+    assert record_parser.scan('已派車') == {'已派車', '派車'}
+    assert record_parser.scan('') == set()
+
+
+def test_parse_record():
+    parsed = record_parser.parse_record('派車\n2025/06/26 09:30\n指派司機: 王大明(0922333444)\n車號: RAB-1234',
+                                        'order_list log dispatch')
+    assert parsed['is_dispatch']
+    assert parsed['status'] == '已派車'
+    assert parsed['vehicle'] == 'RAB-1234'
+    assert parsed['driver'] == '王大明(0922333444)'
+    assert parsed['contact'] == '0922333444'
+    assert (parsed['date'], parsed['time']) == ('2025-06-26', '09:30')
+
+
+def test_detail_only_feeds_driver_fields():
+    # 展開區塊的司機資訊只用於擷取欄位，不影響以 text 判定的派車狀態與 keywords
+    parsed = record_parser.parse_record('成立\n2025/06/26 09:30', 'order_list log', '指派司機: 王大明\n車號: RAB-1234')
+    assert not parsed['is_dispatch'] and parsed['status'] == '派車相關'
+    assert parsed['keywords'] == {'成立'}
+    assert parsed['has_driver_info'] and parsed['vehicle'] == 'RAB-1234' and parsed['driver'] == '王大明'
+
+
+if __name__ == "__main__":
+    test_snapshot_matches_legacy()
+    test_random_texts_match_legacy()
+    test_overlapping_keywords()
+    test_parse_record()
+    test_detail_only_feeds_driver_fields()
+    print("✅ record_parser 測試通過")
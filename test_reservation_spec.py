@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+測試預約內容的宣告式設定
+設定檔寫到暫存目錄，不影響實際的 reservation_specs.json
+"""
+
+import json
+import os
+import tempfile
+from datetime import date
+
+import reservation_spec
+from accounts import get_account
+
+
+def test_defaults_match_legacy_flow():
+    spec = reservation_spec.normalize({})
+    assert spec['pickup']['type'] == '醫療院所' and spec['pickup']['query'] == '亞東紀念醫院'
+    assert spec['dropoff'] == {'type': '住家'}
+    assert (spec['date'], spec['hour'], spec['minute']) == ('last', '16', '40')
+    assert (spec['time_window'], spec['companions']) == ('不同意', '1人(免費)')
+    assert (spec['carpool'], spec['wheelchair'], spec['large_wheelchair']) == ('否', '是', '否')
+
+
+def test_normalize_overrides_and_validation():
+    spec = reservation_spec.normalize({'pickup': {'query': '臺大醫院'}, 'time': '9:05', 'date': '+7'})
+    # 同一類型只換關鍵字時，沿用類型並改用新關鍵字判斷
+    assert spec['pickup']['type'] == '醫療院所' and spec['pickup']['query'] == '臺大醫院'
+    assert (spec['hour'], spec['minute']) == ('09', '05')
+    assert reservation_spec.resolve_date(spec['date'], date(2025, 6, 23)) == '2025-06-30'
+    assert reservation_spec.resolve_date('last') is None
+
+    spec = reservation_spec.normalize({'pickup': {'type': '其他', 'query': '板橋車站'}})
+    assert spec['pickup']['match'] == ['板橋', '板橋車站']
+
+    for bad in ({'time': '25:00'}, {'date': 'tomorrow'}, {'carpool': 'yes'},
+                {'dropoff': {'type': '醫療院所', 'query': '亞東紀念醫院'}}, {'pickup': {'type': '其他'}}):
+        try:
+            reservation_spec.normalize(bad)
+        except reservation_spec.SpecError:
+            continue
+        raise AssertionError(f"應該拒絕 {bad}")
+
+
+def test_pickup_selected():
+    spec = reservation_spec.normalize({})
+    assert not reservation_spec.pickup_selected('', spec)
+    assert not reservation_spec.pickup_selected('亞', spec)
+    assert reservation_spec.pickup_selected('Far Eastern Memorial Hospital', spec)
+    assert reservation_spec.pickup_selected('新北市板橋區南雅南路二段21號', spec)
+
+
+def test_load_specs_by_account():
+    default_id = get_account()['id']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'reservation_specs.json')
+        # 沒有設定檔時只有預設帳號的單趟預約
+        assert [spec['name'] for spec in reservation_spec.load_specs(path=path)] == ['default']
+        assert reservation_spec.load_specs('B987654321', path=path) == []
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'specs': [{'name': '回診'}, {'account': 'B987654321', 'time': '08:00'}, {'date': 'first'}]},
+                      f, ensure_ascii=False)
+        assert [spec['name'] for spec in reservation_spec.load_specs(default_id, path=path)] == ['回診', 'spec3']
+        other = reservation_spec.load_specs('B987654321', path=path)
+        assert [(spec['name'], spec['hour']) for spec in other] == [('spec2', '08')]
+
+
+if __name__ == "__main__":
+    test_defaults_match_legacy_flow()
+    test_normalize_overrides_and_validation()
+    test_pickup_selected()
+    test_load_specs_by_account()
+    print("✅ reservation_spec 測試通過")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+測試以內容雜湊保存的截圖
+截圖寫到暫存目錄；以固定的位元組代替瀏覽器截圖（不需要 Pillow）
+"""
+
+import os
+import tempfile
+
+import screenshot_store
+
+
+def _with_dir(test):
+    def run():
+        original = screenshot_store.SCREENSHOT_DIR
+        with tempfile.TemporaryDirectory() as tmp:
+            screenshot_store.SCREENSHOT_DIR = tmp
+            try:
+                test()
+            finally:
+                screenshot_store.SCREENSHOT_DIR = original
+    run.__name__ = test.__name__
+    return run
+
+
+@_with_dir
+def test_exact_duplicates_are_stored_once():
+    original_image = screenshot_store.Image
+    screenshot_store.Image = None
+    try:
+        run = screenshot_store.ScreenshotRun('dispatch')
+        first = screenshot_store.store(run, 'step5_order_query_clicked', b'frame-a', 120)
+        second = screenshot_store.store(run, 'step6_order_page', b'frame-a', 80)
+        third = screenshot_store.store(run, 'dispatch_results', b'frame-b', 90)
+    finally:
+        screenshot_store.Image = original_image
+
+    assert first['duplicate'] is None and second['duplicate'] == 'exact'
+    assert first['file'] == second['file'] and first['file'].endswith('.jpg')
+    assert third['file'] != first['file']
+    assert os.path.exists(os.path.join(screenshot_store.SCREENSHOT_DIR, first['file']))
+
+    summary = screenshot_store.finish_run(run)
+    assert summary['frames'] == 3 and summary['written'] == 2 and summary['exact_duplicates'] == 1
+    assert summary['bytes_written'] == len(b'frame-a') + len(b'frame-b')
+    assert summary['bytes_skipped'] == len(b'frame-a')
+    assert summary['capture_ms'] == 290
+
+    usage = screenshot_store.usage()
+    assert usage['objects'] == 2 and usage['object_bytes'] == 14
+
+    # 其他執行拍到相同畫面也不會再寫一次
+    other = screenshot_store.ScreenshotRun('reservation')
+    screenshot_store.Image = None
+    try:
+        assert screenshot_store.store(other, 'step_001_page_loaded', b'frame-b')['duplicate'] == 'exact'
+    finally:
+        screenshot_store.Image = original_image
+
+
+@_with_dir
+def test_recent_frames_by_flow():
+    original_image = screenshot_store.Image
+    screenshot_store.Image = None
+    try:
+        dispatch = screenshot_store.ScreenshotRun('dispatch')
+        screenshot_store.store(dispatch, 'step1_homepage', b'home')
+        screenshot_store.store(dispatch, 'dispatch_results', b'results')
+        reservation = screenshot_store.ScreenshotRun('reservation')
+        screenshot_store.store(reservation, 'step_001_page_loaded', b'home')
+    finally:
+        screenshot_store.Image = original_image
+
+    frames = screenshot_store.recent_frames('dispatch')
+    assert [f['name'] for f in frames] == ['step1_homepage', 'dispatch_results']
+    assert all(f['run_id'] == dispatch.run_id for f in frames)
+    assert [f['name'] for f in screenshot_store.recent_frames('reservation')] == ['step_001_page_loaded']
+
+
+@_with_dir
+def test_failure_mode_buffers_until_failure():
+    original_image, original_size = screenshot_store.Image, screenshot_store.SCREENSHOT_BUFFER_SIZE
+    screenshot_store.Image, screenshot_store.SCREENSHOT_BUFFER_SIZE = None, 2
+    try:
+        # 成功的執行：不寫入任何截圖
+        ok = screenshot_store.ScreenshotRun('reservation', mode='failure')
+        entry = screenshot_store.record(ok, 'step_001_page_loaded', b'home', 50)
+        assert entry['file'] is None and entry['buffered']
+        summary = screenshot_store.finish_run(ok)
+        assert summary['frames'] == 0 and summary['discarded'] == 1 and summary['capture_ms'] == 50
+        assert screenshot_store.usage()['objects'] == 0
+
+        # 失敗的執行：只寫入緩衝區中最近的 2 張與錯誤畫面
+        failed = screenshot_store.ScreenshotRun('reservation', mode='failure')
+        for i, data in enumerate([b'a', b'b', b'c']):
+            screenshot_store.record(failed, f'step_{i:03d}', data, 10)
+        entry = screenshot_store.record(failed, 'error', b'd', 10, failure=True)
+        assert entry['name'] == 'error' and entry['file']
+        assert [f['name'] for f in failed.frames] == ['step_002', 'error']
+        summary = screenshot_store.finish_run(failed)
+        assert summary['failed'] and summary['buffered'] == 4 and summary['discarded'] == 2
+        assert summary['capture_ms'] == 40
+
+        # 沒有錯誤畫面、以失敗結束時也會寫入
+        ended = screenshot_store.ScreenshotRun('dispatch', mode='failure')
+        screenshot_store.record(ended, 'step1_homepage', b'e')
+        screenshot_store.finish_run(ended, failed=True)
+        assert [f['name'] for f in ended.frames] == ['step1_homepage']
+    finally:
+        screenshot_store.Image, screenshot_store.SCREENSHOT_BUFFER_SIZE = original_image, original_size
+
+
+def test_format_falls_back_without_pillow():
+    original = screenshot_store.Image, screenshot_store.SCREENSHOT_FORMAT
+    try:
+        screenshot_store.Image, screenshot_store.SCREENSHOT_FORMAT = None, 'webp'
+        assert screenshot_store.output_format() == 'jpeg'
+        assert screenshot_store.screenshot_options()['type'] == 'jpeg'
+    finally:
+        screenshot_store.Image, screenshot_store.SCREENSHOT_FORMAT = original
+
+
+if __name__ == "__main__":
+    test_exact_duplicates_are_stored_once()
+    test_recent_frames_by_flow()
+    test_failure_mode_buffers_until_failure()
+    test_format_falls_back_without_pillow()
+    print("✅ screenshot_store 測試通過")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+測試預約日期與時段的預先檢查
+"""
+
+from datetime import date, datetime
+
+import pytz
+
+import reservation_spec
+import slot_precheck
+
+TODAY = date(2025, 6, 23)
+
+
+def test_computed_slots():
+    slots = slot_precheck.computed_slots(TODAY)
+    assert slots['dates'][0] == '2025-06-26' and slots['dates'][-1] == '2025-07-07'
+    assert len(slots['dates']) == 12
+    assert slots['hours'][0] == '00' and slots['hours'][-1] == '23'
+    assert slots['minutes'] == ['00', '05', '10', '15', '20', '25', '30', '35', '40', '45', '50', '55']
+
+
+def test_plan_primary_and_fallback():
+    slot, message = slot_precheck.plan(reservation_spec.normalize({}), today=TODAY)
+    assert slot == {'date': '2025-07-07', 'hour': '16', 'minute': '40', 'fallback': False} and message is None
+    slot, _ = slot_precheck.plan(reservation_spec.normalize({'date': 'first', 'time': '08:05'}), today=TODAY)
+    assert (slot['date'], slot['hour'], slot['minute']) == ('2025-06-26', '08', '05')
+
+    # +20 超出可預約範圍：沒有備用時段時立即失敗，有時改用備用時段
+    spec = reservation_spec.normalize({'date': '+20'})
+    slot, message = slot_precheck.plan(spec, today=TODAY)
+    assert slot is None and '2025-07-13' in message
+    spec = reservation_spec.normalize({'date': '+20', 'fallback': {'date': 'last', 'time': '09:00'}})
+    slot, message = slot_precheck.plan(spec, today=TODAY)
+    assert slot == {'date': '2025-07-07', 'hour': '09', 'minute': '00', 'fallback': True} and '備用' in message
+
+    applied = slot_precheck.apply(spec, slot)
+    assert (applied['date'], applied['time']) == ('2025-07-07', '09:00')
+
+
+def test_plan_uses_page_slots():
+    # 頁面實際提供的選項（例如瀏覽器時區不同，日期範圍差一天）優先於推算的結果
+    page_slots = {'dates': ['2025-06-25', '2025-07-06'], 'hours': ['16'], 'minutes': ['40']}
+    slot, _ = slot_precheck.plan(reservation_spec.normalize({}), page_slots, today=TODAY)
+    assert slot['date'] == '2025-07-06'
+    slot, message = slot_precheck.plan(reservation_spec.normalize({'time': '17:00'}), page_slots, today=TODAY)
+    assert slot is None and '17:00' in message
+
+
+def test_release_day():
+    # 預先就緒模式在週日 23:56 執行，目標與日期範圍以週一 00:01 放號當天計算
+    submit_at = reservation_spec.TAIPEI_TZ.localize(datetime(2025, 6, 23, 0, 1))
+    assert slot_precheck.release_day(submit_at) == TODAY
+    assert slot_precheck.release_day(submit_at.astimezone(pytz.utc)) == TODAY
+    assert slot_precheck.release_day(None) is None
+
+    slot, _ = slot_precheck.plan(reservation_spec.normalize({}), today=slot_precheck.release_day(submit_at))
+    assert slot['date'] == '2025-07-07'
+    slot, message = slot_precheck.plan(reservation_spec.normalize({'date': '+14'}), today=slot_precheck.release_day(submit_at))
+    assert slot['date'] == '2025-07-07' and message is None
+
+
+def test_date_label():
+    # 放號時刻補上的日期選項文字與頁面相同
+    assert slot_precheck.date_label('2025-07-07') == '2025-07-07(週一)'
+    assert slot_precheck.date_label('2025-07-06') == '2025-07-06(週日)'
+
+
+def test_minutes_must_be_five_minute_steps():
+    try:
+        reservation_spec.normalize({'time': '16:42'})
+    except reservation_spec.SpecError:
+        return
+    raise AssertionError("應該拒絕不是 5 分鐘倍數的時間")
+
+
+if __name__ == "__main__":
+    test_computed_slots()
+    test_plan_primary_and_fallback()
+    test_plan_uses_page_slots()
+    test_release_day()
+    test_date_label()
+    test_minutes_must_be_five_minute_steps()
+    print("✅ slot_precheck 測試通過")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+測試訂單頁 HTML 快照的離線解析
+以 fixtures/order_snapshot_20250623_001000.html（訂單頁展開後的容器快照）驗證
+"""
+
+import order_dom
+import snapshot_parser
+
+FIXTURE = 'fixtures/order_snapshot_20250623_001000.html'
+
+
+def _load():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parse_snapshot():
+    container, raw_records = snapshot_parser.parse_snapshot(_load())
+    assert container == '.main_content'
+    assert len(raw_records) == 5
+
+    first = raw_records[0]
+    # v-show 隱藏的狀態標籤不計入，只留下目前狀態
+    assert first['state_text'] == '派車'
+    assert first['active_state'] == '派車'
+    assert first['time_text'] == '2025/06/26 09:30'
+    assert first['places'] == ['住家 新北市板橋區文化路一段100號', '醫療機構 亞東紀念醫院']
+    assert first['contact_phone'] == '0229561234'
+    assert '車號: RAB-1234' in first['detail']
+
+
+def test_hidden_detail_is_kept():
+    _, raw_records = snapshot_parser.parse_snapshot(_load())
+    # 第 4 筆的展開區塊仍是 display:none，innerText 不含司機資訊，但 detail 仍要保留
+    assert '陳志明' not in raw_records[3]['text']
+    assert '陳志明' in raw_records[3]['detail']
+
+
+def test_classify_matches_dom_rules():
+    _, raw_records = snapshot_parser.parse_snapshot(_load())
+    results = order_dom.classify_orders(raw_records)
+    assert [r['index'] for r in results] == [1, 4]
+    assert results[0]['vehicle'] == 'RAB-1234'
+    assert results[1]['vehicle'] == 'RAD-9012'
+    assert results[1]['contact'] == '0229565678'
+
+
+def test_parse_files_in_parallel():
+    results = snapshot_parser.parse_files([FIXTURE, FIXTURE], workers=2)
+    assert len(results) == 2
+    assert all(r['dispatch_records'] == 2 for r in results)
+    assert results[0]['timestamp'] == '2025-06-23 00:10:00'
+
+
+def test_select():
+    root = snapshot_parser.parse_html('<div class="a b"><p class="c" data-x="hello">hi</p><br><span>x</span></div>')
+    assert len(snapshot_parser.select(root, '.a .c')) == 1
+    assert len(snapshot_parser.select(root, 'div.a.b')) == 1
+    assert len(snapshot_parser.select(root, '[data-x^="he"], span')) == 2
+    assert snapshot_parser.select_one(root, '.b p').inner_text() == 'hi'
+
+
+if __name__ == "__main__":
+    test_parse_snapshot()
+    test_hidden_detail_is_kept()
+    test_classify_matches_dom_rules()
+    test_parse_files_in_parallel()
+    test_select()
+    print("✅ snapshot_parser 測試通過")
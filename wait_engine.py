@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+事件驅動的等待
+
+取代流程中固定毫秒數的 wait_for_timeout / time.sleep：每個等待都有明確的完成條件，
+條件成立就立刻繼續，timeout 只是上限。
+
+- wait_for_response:      等待特定 API 回應（例如 GET Order）
+- wait_for_condition:     等待頁面中的 JS 條件成立（DOM 條件）
+- wait_for_element:       等待某個元素上的 JS 條件成立（例如輸入框的值改變）
+- wait_for_network_quiet: 等待網路靜止（沒有進行中的請求並持續 quiet_ms）
+- wait_for_stable:        等待元素（或列表）的位置、大小、數量不再變化
+- wait_for_list_settled:  在列表容器上以 MutationObserver 等待記錄數量靜止（必要時點擊載入更多）
+
+每個等待都帶著原本固定等待的毫秒數（budget_ms）。上限預設等於 budget_ms 乘上
+WAIT_CEILING_FACTOR（預設 1，最壞情況與原本的固定等待相同）。
+
+每次執行以 WaitRecorder 記錄每個等待實際花費的時間與原本預算的差距，
+結束時輸出摘要並寫入 wait_report.json。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+WAIT_REPORT_FILE = os.environ.get('WAIT_REPORT_FILE', 'wait_report.json')
+
+# 網路靜止判斷時輪詢的間隔（同步 API 只在呼叫 Playwright 時才會處理事件）
+POLL_INTERVAL_MS = 50
+
+# 不計入網路靜止判斷的長連線請求
+LONG_LIVED_TYPES = {'websocket', 'eventsource'}
+
+# 最近幾次執行的等待統計
+recent_runs = deque(maxlen=20)
+
+_report_lock = threading.Lock()
+
+# 元素穩定判斷：數量與第一個、最後一個元素的位置大小連續 stableMs 沒有變化
+STABLE_JS = '''
+({selector, stableMs}) => {
+    const elements = document.querySelectorAll(selector);
+    if (elements.length === 0) return false;
+    const rect = el => {
+        const r = el.getBoundingClientRect();
+        return [r.x, r.y, r.width, r.height].map(Math.round).join(',');
+    };
+    const signature = elements.length + '|' + rect(elements[0]) + '|' + rect(elements[elements.length - 1]);
+    const states = window.__waitStable || (window.__waitStable = {});
+    const now = performance.now();
+    const state = states[selector];
+    if (!state || state.signature !== signature) {
+        states[selector] = {signature: signature, since: now};
+        return false;
+    }
+    return now - state.since >= stableMs;
+}
+'''
+
+# 列表靜止判斷：在容器上安裝 MutationObserver，記錄數量持續 quietMs 沒有變化即完成。
+# 只有真的存在可見、未停用的「載入更多」控制項時才點擊，點擊後最多等待 loadMoreMs 讓新記錄出現。
+# 網站的訂單頁是分頁（.pagination 會整頁替換記錄），分頁按鈕不列入。
+LIST_SETTLE_JS = '''
+({containers, item, loadMoreTexts, loadMoreSelectors, quietMs, loadMoreMs, timeoutMs, maxClicks}) => new Promise(resolve => {
+    const started = performance.now();
+    let root = null;
+    for (const selector of containers) {
+        root = document.querySelector(selector);
+        if (root) break;
+    }
+    root = root || document.body;
+
+    const count = () => root.querySelectorAll(item).length;
+    const usable = el => el.offsetParent !== null && !el.disabled
+        && !el.classList.contains('disabled') && el.getAttribute('aria-disabled') !== 'true';
+    const findLoadMore = () => {
+        for (const selector of loadMoreSelectors) {
+            const el = Array.from(document.querySelectorAll(selector)).find(usable);
+            if (el) return el;
+        }
+        return Array.from(document.querySelectorAll('button, a, [role="button"]')).find(el =>
+            loadMoreTexts.includes((el.textContent || '').trim()) && usable(el)) || null;
+    };
+
+    let last = count();
+    let clicks = 0;
+    let mutations = 0;
+    let timer = null;
+    let done = false;
+
+    const finish = settled => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(deadline);
+        resolve({count: count(), elapsed_ms: Math.round(performance.now() - started),
+                 load_more_clicks: clicks, mutations: mutations, settled: settled});
+    };
+    const quiet = () => {
+        const control = clicks < maxClicks ? findLoadMore() : null;
+        if (!control) return finish(true);
+        clicks += 1;
+        control.click();
+        // 點擊後等待新記錄；期間數量有變化會重新計算靜止時間
+        timer = setTimeout(quiet, loadMoreMs);
+    };
+    const observer = new MutationObserver(records => {
+        mutations += records.length;
+        const current = count();
+        if (current !== last) {
+            last = current;
+            clearTimeout(timer);
+            timer = setTimeout(quiet, quietMs);
+        }
+    });
+    observer.observe(root, {childList: true, subtree: true});
+    const deadline = setTimeout(() => finish(false), timeoutMs);
+    timer = setTimeout(quiet, quietMs);
+})
+'''
+
+# 「載入更多」控制項（文字需完全相符，避免點到「更多資訊」之類的連結）
+LOAD_MORE_TEXTS = ['載入更多', '查看更多', '顯示更多', '更多', 'Load More', 'Show More']
+LOAD_MORE_SELECTORS = ['.load-more', '.btn-load-more', '[data-action="load-more"]']
+
+
+def ceiling_factor():
+    """條件等待上限為原本固定等待的幾倍（環境變數 WAIT_CEILING_FACTOR）"""
+    return float(os.environ.get('WAIT_CEILING_FACTOR', 1))
+
+
+class NetworkTracker:
+    """以頁面的 request 事件追蹤進行中的請求數量"""
+
+    def __init__(self, page):
+        self.inflight = set()
+        self.last_activity = time.perf_counter()
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_done)
+        page.on('requestfailed', self._on_done)
+
+    def _on_request(self, request):
+        if request.resource_type in LONG_LIVED_TYPES:
+            return
+        self.inflight.add(request)
+        self.last_activity = time.perf_counter()
+
+    def _on_done(self, request):
+        self.inflight.discard(request)
+        self.last_activity = time.perf_counter()
+
+    def quiet_for_ms(self):
+        """沒有進行中請求的持續毫秒數，仍有請求時回傳 0"""
+        if self.inflight:
+            return 0
+        return (time.perf_counter() - self.last_activity) * 1000
+
+
+class WaitRecorder:
+    """記錄單次執行中每個等待的實際耗時與原本的固定預算"""
+
+    def __init__(self, flow=None):
+        self.flow = flow or 'default'
+        self.started_at = time.time()
+        self.waits = []
+
+    def record(self, name, kind, budget_ms, actual_ms, outcome):
+        self.waits.append({
+            'name': name,
+            'kind': kind,
+            'budget_ms': budget_ms,
+            'actual_ms': round(actual_ms, 1),
+            'outcome': outcome,
+        })
+
+    def summary(self):
+        budget = sum(w['budget_ms'] for w in self.waits)
+        actual = sum(w['actual_ms'] for w in self.waits)
+        outcomes = {}
+        for w in self.waits:
+            outcomes[w['outcome']] = outcomes.get(w['outcome'], 0) + 1
+        return {
+            'flow': self.flow,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'waits': len(self.waits),
+            'budget_ms': budget,
+            'actual_ms': round(actual, 1),
+            'saved_ms': round(budget - actual, 1),
+            'outcomes': outcomes,
+            'details': list(self.waits),
+        }
+
+
+def attach(driver, flow=None):
+    """在 driver 上安裝等待記錄器與網路追蹤（setup_driver 建立頁面後呼叫）"""
+    driver['waits'] = WaitRecorder(flow)
+    try:
+        driver['network'] = NetworkTracker(driver['page'])
+    except Exception as e:
+        print(f"⚠️ 無法追蹤網路請求，網路靜止等待將改用 networkidle: {e}")
+        driver['network'] = None
+    return driver
+
+
+def _ceiling(budget_ms, ceiling_ms):
+    if ceiling_ms is not None:
+        return ceiling_ms
+    return max(int(budget_ms * ceiling_factor()), POLL_INTERVAL_MS)
+
+
+def _run(driver, name, kind, budget_ms, wait):
+    """執行等待並記錄，條件成立回傳 True，超過上限或發生錯誤回傳 False"""
+    started = time.perf_counter()
+    try:
+        met = wait()
+        outcome = 'met' if met else 'timeout'
+    except PlaywrightTimeoutError:
+        met, outcome = False, 'timeout'
+    except Exception as e:
+        print(f"⚠️ 等待 {name} 時發生錯誤: {e}")
+        met, outcome = False, 'error'
+    actual_ms = (time.perf_counter() - started) * 1000
+
+    recorder = driver.get('waits')
+    if recorder is not None:
+        recorder.record(name, kind, budget_ms, actual_ms, outcome)
+    if outcome != 'met':
+        print(f"⏳ 等待 {name} 未達成（{outcome}，{actual_ms:.0f} ms）")
+    return met
+
+
+def wait_for_response(driver, name, url_pattern, budget_ms, trigger=None, ceiling_ms=None):
+    """等待 URL 符合 url_pattern（正規表示式物件或子字串）的回應
+
+    trigger: 觸發請求的動作（點擊、捲動等），在開始監聽後才執行，避免錯過回應。
+    沒有 trigger 時只等待之後出現的回應。
+    """
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+
+    def matches(response):
+        if hasattr(url_pattern, 'search'):
+            return bool(url_pattern.search(response.url))
+        return url_pattern in response.url
+
+    def wait():
+        if trigger is None:
+            page.wait_for_event('response', matches, timeout=timeout)
+            return True
+        with page.expect_response(matches, timeout=timeout):
+            trigger()
+        return True
+
+    return _run(driver, name, 'response', budget_ms, wait)
+
+
+def wait_for_condition(driver, name, js, budget_ms, arg=None, ceiling_ms=None):
+    """等待頁面中的 JS 條件成立（每個動畫影格檢查一次）"""
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+
+    def wait():
+        page.wait_for_function(js, arg=arg, timeout=timeout)
+        return True
+
+    return _run(driver, name, 'condition', budget_ms, wait)
+
+
+def wait_for_element(driver, name, locator, js, budget_ms, ceiling_ms=None):
+    """等待 locator 對應元素上的 JS 條件成立，js 的參數為該元素"""
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+
+    def wait():
+        handle = locator.element_handle(timeout=timeout)
+        try:
+            page.wait_for_function(js, arg=handle, timeout=timeout)
+        finally:
+            # 釋放元素參照，避免在頁面存續期間一直累積
+            handle.dispose()
+        return True
+
+    return _run(driver, name, 'element', budget_ms, wait)
+
+
+def wait_for_network_quiet(driver, name, budget_ms, quiet_ms=500, ceiling_ms=None):
+    """等待沒有進行中的請求並持續 quiet_ms"""
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+    tracker = driver.get('network')
+
+    def wait():
+        if tracker is None:
+            page.wait_for_load_state('networkidle', timeout=timeout)
+            return True
+        deadline = time.perf_counter() + timeout / 1000
+        while tracker.quiet_for_ms() < quiet_ms:
+            if time.perf_counter() >= deadline:
+                return False
+            page.wait_for_timeout(POLL_INTERVAL_MS)
+        return True
+
+    return _run(driver, name, 'network_quiet', budget_ms, wait)
+
+
+def wait_for_stable(driver, name, selector, budget_ms, stable_ms=300, ceiling_ms=None):
+    """等待 selector 對應的元素出現，且數量、位置、大小連續 stable_ms 沒有變化"""
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+
+    def wait():
+        page.wait_for_function(STABLE_JS, arg={'selector': selector, 'stableMs': stable_ms}, timeout=timeout)
+        return True
+
+    return _run(driver, name, 'stable', budget_ms, wait)
+
+
+def wait_for_list_settled(driver, name, containers, item, budget_ms, quiet_ms=500, load_more_ms=2000,
+                          max_clicks=10, ceiling_ms=None):
+    """在列表容器上等待記錄數量靜止，回傳 {'count', 'elapsed_ms', 'load_more_clicks', 'settled'}
+
+    containers: 依序嘗試的容器選擇器，item: 記錄的選擇器。
+    數量持續 quiet_ms 沒有變化且沒有可用的載入更多控制項時完成；整個等待在頁面中一次完成。
+    """
+    page = driver['page']
+    timeout = _ceiling(budget_ms, ceiling_ms)
+    result = {'count': 0, 'elapsed_ms': 0, 'load_more_clicks': 0, 'settled': False}
+
+    def wait():
+        result.update(page.evaluate(LIST_SETTLE_JS, {
+            'containers': list(containers),
+            'item': item,
+            'loadMoreTexts': LOAD_MORE_TEXTS,
+            'loadMoreSelectors': LOAD_MORE_SELECTORS,
+            'quietMs': quiet_ms,
+            'loadMoreMs': load_more_ms,
+            'timeoutMs': timeout,
+            'maxClicks': max_clicks,
+        }))
+        return result['settled']
+
+    _run(driver, name, 'list_settled', budget_ms, wait)
+    return result
+
+
+def _save_report():
+    with _report_lock:
+        try:
+            tmp_path = WAIT_REPORT_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(recent_runs), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, WAIT_REPORT_FILE)
+        except Exception as e:
+            print(f"保存等待統計失敗: {e}")
+
+
+def finish_run(driver):
+    """結束一次執行：輸出實際等待與原本固定等待的比較並寫入報告"""
+    recorder = driver.get('waits') if driver else None
+    if recorder is None or not recorder.waits:
+        return None
+
+    summary = recorder.summary()
+    recent_runs.append(summary)
+    _save_report()
+
+    print(f"⏱️ 等待 {summary['waits']} 次，實際 {summary['actual_ms'] / 1000:.1f} 秒"
+          f"（原本固定 {summary['budget_ms'] / 1000:.1f} 秒，"
+          f"節省 {summary['saved_ms'] / 1000:.1f} 秒），結果: {summary['outcomes']}")
+    slowest = sorted(summary['details'], key=lambda w: w['actual_ms'], reverse=True)[:3]
+    for w in slowest:
+        print(f"   ⏱️ {w['name']}: {w['actual_ms']:.0f} / {w['budget_ms']} ms（{w['outcome']}）")
+    return summary